@@ -0,0 +1,307 @@
+"""
+Время запросов поиска медицинских карт и отзывов пациента в трех вариантах:
+    * distinct - JOIN таблиц связей и DISTINCT/GROUP BY (до перехода на
+      полусоединения);
+    * semi_join - EXISTS/IN по таблицам связей;
+    * current - текущие запросы репозиториев (для симптомов - по массиву
+      `symptom_ids` с GIN-индексом).
+
+Для медицинских карт замеряется первая фаза пагинации - выборка только `id`
+по всем подходящим картам (all) и одной страницы (page). Параллельные
+воркеры Postgres отключены. Варианты одного запроса должны вернуть
+одинаковое количество строк, иначе бенчмарк завершается ошибкой.
+
+Бенчмарк создает таблицы в тестовой БД (TEST_DATABASE_* из .env),
+заполняет их синтетическими данными и удаляет после замеров.
+
+Запуск из components/backend:
+    PYTHONPATH=. python benchmarks/medical_book_filters.py --med-books 20000
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable
+
+from sqlalchemy import Connection, Select, and_, create_engine, func, insert, select, text
+
+from med_sharing_system.adapters.database import Settings, metadata, tables
+from med_sharing_system.adapters.database.repositories.item_reviews import (
+    _ItemReviewQueryCollection
+)
+from med_sharing_system.adapters.database.repositories.medical_books import (
+    _MedicalBookQueryCollection,
+    _MedicalBookQueryPagination,
+    _has_all_symptoms_in_link_table,
+    _has_helped_reviews,
+    _has_helped_reviews_of_items,
+    _has_reviews_of_items,
+    _has_symptoms_in_link_table
+)
+from med_sharing_system.application import entities, schemas
+
+MedicalBook = entities.MedicalBook
+ItemReview = entities.ItemReview
+med_books_symptoms = tables.medical_books_symptoms
+med_books_reviews = tables.medical_books_item_reviews
+
+# -----------------------------------------------------------------------------------
+# Данные
+# -----------------------------------------------------------------------------------
+CHUNK_SIZE: int = 10_000
+
+
+def insert_chunked(connection: Connection, table, rows: list[dict]) -> None:
+    for start in range(0, len(rows), CHUNK_SIZE):
+        connection.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def fill_db(connection: Connection,
+            randomizer: random.Random,
+            args: argparse.Namespace
+            ) -> None:
+    patients_count: int = max(args.med_books // 4, 1)
+    insert_chunked(connection, tables.patients, [
+        {'id': number, 'nickname': f'patient_{number}', 'gender': 'female',
+         'age': randomizer.randint(18, 80), 'skin_type': 'сухая'}
+        for number in range(1, patients_count + 1)
+    ])
+    insert_chunked(connection, tables.diagnoses, [
+        {'id': number, 'name': f'diagnosis_{number}'}
+        for number in range(1, args.diagnoses + 1)
+    ])
+    insert_chunked(connection, tables.symptoms, [
+        {'id': number, 'name': f'symptom_{number}'}
+        for number in range(1, args.symptoms + 1)
+    ])
+    connection.execute(insert(tables.item_types), [{'id': 1, 'name': 'type'}])
+    connection.execute(insert(tables.item_categories), [{'id': 1, 'name': 'category'}])
+    insert_chunked(connection, tables.treatment_items, [
+        {'id': number, 'title': f'item_{number}', 'type_id': 1, 'category_id': 1}
+        for number in range(1, args.items + 1)
+    ])
+    insert_chunked(connection, tables.medical_books, [
+        {'id': number, 'title_history': f'history_{number}', 'history': 'x' * 500,
+         'patient_id': randomizer.randint(1, patients_count),
+         'diagnosis_id': randomizer.randint(1, args.diagnoses)}
+        for number in range(1, args.med_books + 1)
+    ])
+
+    # Частоты симптомов и популярность товаров убывают по степенному закону
+    symptom_weights: list[float] = [1 / (i + 1) ** 0.8 for i in range(args.symptoms)]
+    item_weights: list[float] = [1 / (i + 1) ** 0.7 for i in range(args.items)]
+    symptom_links: list[dict] = []
+    reviews: list[dict] = []
+    review_links: list[dict] = []
+    for med_book_id in range(1, args.med_books + 1):
+        symptom_ids = set(randomizer.choices(range(1, args.symptoms + 1),
+                                             weights=symptom_weights,
+                                             k=args.symptoms_per_book))
+        symptom_links.extend({'med_book_id': med_book_id, 'symptom_id': symptom_id}
+                             for symptom_id in symptom_ids)
+        for item_id in randomizer.choices(range(1, args.items + 1),
+                                          weights=item_weights,
+                                          k=args.reviews_per_book):
+            review_id: int = len(reviews) + 1
+            reviews.append({'id': review_id, 'item_id': item_id,
+                            'is_helped': randomizer.random() < 0.6,
+                            'item_rating': randomizer.randint(2, 20) / 2,
+                            'item_count': 1})
+            review_links.append({'med_book_id': med_book_id,
+                                 'item_review_id': review_id})
+
+    insert_chunked(connection, med_books_symptoms, symptom_links)
+    insert_chunked(connection, tables.item_reviews, reviews)
+    insert_chunked(connection, med_books_reviews, review_links)
+
+
+# -----------------------------------------------------------------------------------
+# Запросы
+# -----------------------------------------------------------------------------------
+def _joined_symptoms(query: Select, params: schemas.FindMedicalBooks) -> Select:
+    return (
+        query
+        .join(med_books_symptoms, med_books_symptoms.c.med_book_id == MedicalBook.id)
+        .where(med_books_symptoms.c.symptom_id.in_(params.symptom_ids))
+    )
+
+
+def _joined_reviews(query: Select) -> Select:
+    return (
+        query
+        .join(med_books_reviews, med_books_reviews.c.med_book_id == MedicalBook.id)
+        .join(ItemReview, ItemReview.id == med_books_reviews.c.item_review_id)
+    )
+
+
+def _having_all_symptoms(query: Select, params: schemas.FindMedicalBooks) -> Select:
+    return (
+        query
+        .group_by(MedicalBook.id)
+        .having(func.count(med_books_symptoms.c.symptom_id.distinct())
+                == len(params.symptom_ids))
+    )
+
+
+MedicalBookQuery = Callable[[schemas.FindMedicalBooks], Select]
+
+MEDICAL_BOOK_CASES: dict[str, dict[str, MedicalBookQuery]] = {
+    'fetch_by_symptoms': {
+        'distinct': lambda params: _joined_symptoms(
+            select(MedicalBook).distinct(), params
+        ),
+        'semi_join': lambda params: (
+            select(MedicalBook).where(_has_symptoms_in_link_table(params))
+        ),
+        'current': _MedicalBookQueryCollection.fetch_by_symptoms,
+    },
+    'fetch_by_matching_all_symptoms': {
+        'distinct': lambda params: _having_all_symptoms(
+            _joined_symptoms(select(MedicalBook), params), params
+        ),
+        'semi_join': lambda params: (
+            select(MedicalBook).where(_has_all_symptoms_in_link_table(params))
+        ),
+        'current': _MedicalBookQueryCollection.fetch_by_matching_all_symptoms,
+    },
+    'fetch_by_helped_status_and_symptoms': {
+        'distinct': lambda params: _joined_symptoms(
+            _joined_reviews(select(MedicalBook).distinct())
+            .where(ItemReview.is_helped == params.is_helped),
+            params
+        ),
+        'semi_join': lambda params: (
+            select(MedicalBook).where(_has_helped_reviews(params),
+                                      _has_symptoms_in_link_table(params))
+        ),
+        'current': _MedicalBookQueryCollection.fetch_by_helped_status_and_symptoms,
+    },
+    'fetch_by_items_and_symptoms': {
+        'distinct': lambda params: _joined_symptoms(
+            _joined_reviews(select(MedicalBook).distinct())
+            .where(ItemReview.item_id.in_(params.item_ids)),
+            params
+        ),
+        'semi_join': lambda params: (
+            select(MedicalBook).where(_has_reviews_of_items(params),
+                                      _has_symptoms_in_link_table(params))
+        ),
+        'current': _MedicalBookQueryCollection.fetch_by_items_and_symptoms,
+    },
+    'fetch_by_helped_status_diagnosis_and_items': {
+        'distinct': lambda params: (
+            _joined_reviews(select(MedicalBook).distinct())
+            .where(ItemReview.is_helped == params.is_helped,
+                   MedicalBook.diagnosis_id == params.diagnosis_id,
+                   ItemReview.item_id.in_(params.item_ids))
+        ),
+        'semi_join': lambda params: (
+            select(MedicalBook).where(_has_helped_reviews_of_items(params),
+                                      MedicalBook.diagnosis_id == params.diagnosis_id)
+        ),
+        'current': (
+            _MedicalBookQueryCollection.fetch_by_helped_status_diagnosis_and_items
+        ),
+    },
+}
+
+ItemReviewQuery = Callable[[schemas.FindItemReviews], Select]
+
+ITEM_REVIEW_CASES: dict[str, dict[str, ItemReviewQuery]] = {
+    'item reviews fetch_by_patient': {
+        'distinct': lambda params: (
+            select(ItemReview)
+            .distinct()
+            .join(med_books_reviews,
+                  med_books_reviews.c.item_review_id == ItemReview.id)
+            .join(MedicalBook, and_(MedicalBook.id == med_books_reviews.c.med_book_id,
+                                    MedicalBook.patient_id == params.patient_id))
+        ),
+        'current': _ItemReviewQueryCollection.fetch_by_patient,
+    },
+}
+
+
+# -----------------------------------------------------------------------------------
+# Замеры
+# -----------------------------------------------------------------------------------
+def measure(connection: Connection, query: Select, repeats: int) -> tuple[float, int]:
+    """
+    Возвращает медиану времени выполнения (мс) и количество строк.
+    """
+    rows: int = len(connection.execute(query).all())
+    timings: list[float] = []
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        connection.execute(query).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), rows
+
+
+def compare(connection: Connection,
+            name: str,
+            queries: dict[str, Select],
+            repeats: int
+            ) -> str:
+    results: dict[str, tuple[float, int]] = {
+        variant: measure(connection, query, repeats)
+        for variant, query in queries.items()
+    }
+    row_counts: set[int] = {rows for _, rows in results.values()}
+    assert len(row_counts) == 1, f'{name}: variants returned different row counts ' \
+                                 f'{ {variant: rows for variant, (_, rows) in results.items()} }'
+    timings: str = ', '.join(f'{variant} {elapsed:.1f}'
+                             for variant, (elapsed, _) in results.items())
+    return f'{name} ({row_counts.pop()} rows): {timings} ms'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--med-books', type=int, default=20_000)
+    parser.add_argument('--symptoms', type=int, default=300)
+    parser.add_argument('--symptoms-per-book', type=int, default=40)
+    parser.add_argument('--reviews-per-book', type=int, default=5)
+    parser.add_argument('--diagnoses', type=int, default=60)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    randomizer = random.Random(args.seed)
+    engine = create_engine(Settings().TEST_DATABASE_URL)
+    metadata.create_all(bind=engine)
+    try:
+        with engine.begin() as connection:
+            fill_db(connection, randomizer, args)
+        with engine.connect() as connection:
+            connection.execute(text('ANALYZE'))
+            connection.execute(text('SET max_parallel_workers_per_gather = 0'))
+
+            pagination = _MedicalBookQueryPagination()
+            for name, variants in MEDICAL_BOOK_CASES.items():
+                for mode, limit in (('all', None), ('page', args.page_size)):
+                    params = schemas.FindMedicalBooks(symptom_ids=[2, 5, 9],
+                                                      item_ids=[1, 2, 3],
+                                                      is_helped=True,
+                                                      diagnosis_id=1,
+                                                      limit=limit)
+                    queries: dict[str, Select] = {
+                        variant: pagination.apply(build(params), params)
+                        .with_only_columns(MedicalBook.id)
+                        for variant, build in variants.items()
+                    }
+                    print(compare(connection, f'{name} [{mode}]', queries,
+                                  args.repeats))
+
+            for name, variants in ITEM_REVIEW_CASES.items():
+                params = schemas.FindItemReviews(patient_id=1)
+                queries = {variant: build(params).order_by(ItemReview.id)
+                           for variant, build in variants.items()}
+                print(compare(connection, name, queries, args.repeats))
+    finally:
+        metadata.drop_all(bind=engine)
+
+
+if __name__ == '__main__':
+    main()
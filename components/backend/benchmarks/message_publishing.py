@@ -0,0 +1,113 @@
+"""
+Пропускная способность публикации сообщений через транспорт Kombu 'memory'
+без подтверждений (`KombuPublisher`) и с подтверждениями пачками разного
+размера (`ConfirmingKombuPublisher`).
+
+Транспорт 'memory' не поддерживает publisher confirms, поэтому ожидание
+подтверждения пачки брокером имитируется задержкой `--rtt-ms`.
+
+Запуск из components/backend:
+    PYTHONPATH=. python benchmarks/message_publishing.py --messages 20000 --rtt-ms 1
+"""
+import argparse
+import threading
+import time
+import uuid
+from unittest import mock
+
+from kombu import Connection, Exchange, Queue
+
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    BrokerScheme,
+    ConfirmingKombuPublisher,
+    KombuPublisher
+)
+from med_sharing_system.application.interfaces.message_publishing import (
+    Publisher,
+    QueueMessage
+)
+
+
+def publish_from_threads(publisher: Publisher,
+                         messages: list[QueueMessage],
+                         threads: int,
+                         flush_size: int
+                         ) -> float:
+    """
+    Публикует сообщения из нескольких потоков, каждый поток передает
+    их публикатору через `plan` по `flush_size` штук. Возвращает время
+    публикации в секундах.
+    """
+    def publish_part(part: list[QueueMessage]) -> None:
+        for start in range(0, len(part), flush_size):
+            with publisher:
+                publisher.plan(*part[start:start + flush_size])
+
+    workers: list[threading.Thread] = [
+        threading.Thread(target=publish_part, args=(messages[number::threads],))
+        for number in range(threads)
+    ]
+    start: float = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--flush-size', type=int, default=50)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--linger-ms', type=int, default=0)
+    parser.add_argument('--rtt-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    queue_name: str = f'benchmark_{uuid.uuid4().hex}'
+    scheme = BrokerScheme(Queue(queue_name, Exchange(queue_name)))
+    connection = Connection('memory://')
+    scheme.declare(connection)
+    messages: list[QueueMessage] = [
+        QueueMessage(target=queue_name, body={'patient_id': number, 'matched': []})
+        for number in range(args.messages)
+    ]
+
+    def purge() -> None:
+        with connection.channel() as channel:
+            channel.queue_purge(queue_name)
+
+    publisher: Publisher = KombuPublisher(connection=connection, scheme=scheme)
+    elapsed: float = publish_from_threads(publisher, messages, args.threads,
+                                          args.flush_size)
+    print(f'without confirms: {args.messages / elapsed:,.0f} msg/s')
+    purge()
+
+    publish_batch = ConfirmingKombuPublisher._publish_batch
+
+    def publish_batch_with_rtt(self, batch):
+        # Подтверждения пачки приходят через один круг до брокера
+        time.sleep(args.rtt_ms / 1000)
+        return publish_batch(self, batch)
+
+    with mock.patch.object(ConfirmingKombuPublisher, '_publish_batch',
+                           publish_batch_with_rtt):
+        for batch_size in args.batch_sizes:
+            publisher = ConfirmingKombuPublisher(connection=connection, scheme=scheme,
+                                                 batch_size=batch_size,
+                                                 linger_ms=args.linger_ms)
+            try:
+                elapsed = publish_from_threads(publisher, messages, args.threads,
+                                               args.flush_size)
+            finally:
+                publisher.close()
+            print(f'confirms, batch {batch_size}: '
+                  f'{args.messages / elapsed:,.0f} msg/s')
+            purge()
+
+    connection.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Сравнение точного и приближенного (MinHash + LSH) индексов подбора похожих
+пациентов на синтетических данных: полнота top-k относительно точного
+индекса и задержка поиска.
+
+Запуск из components/backend:
+    PYTHONPATH=. python benchmarks/patient_similarity.py --patients 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from med_sharing_system.application import entities, schemas
+from med_sharing_system.application.utils import (
+    ExactPatientSimilarityIndex,
+    MinHashPatientSimilarityIndex
+)
+
+GENDERS: tuple[str, ...] = ('male', 'female')
+SKIN_TYPES: tuple[str, ...] = ('сухая', 'жирная', 'нормальная', 'комбинированная')
+
+
+def generate_profiles(randomizer: random.Random,
+                      patients: int,
+                      symptoms: int,
+                      diagnoses: int
+                      ) -> list[entities.PatientProfile]:
+    # Частоты симптомов убывают по степенному закону, как в реальных данных
+    symptom_weights: list[float] = [1 / (i + 1) ** 0.8 for i in range(symptoms)]
+    profiles: list[entities.PatientProfile] = []
+    for patient_id in range(1, patients + 1):
+        med_books: int = randomizer.randint(1, 7)
+        profiles.append(entities.PatientProfile(
+            patient_id=patient_id,
+            gender=randomizer.choice(GENDERS),
+            age=randomizer.randint(10, 90),
+            skin_type=randomizer.choice(SKIN_TYPES),
+            symptom_ids=frozenset(randomizer.choices(range(1, symptoms + 1),
+                                                     weights=symptom_weights,
+                                                     k=med_books * 3)),
+            diagnosis_ids=frozenset(randomizer.choices(range(1, diagnoses + 1),
+                                                       k=med_books))
+        ))
+    return profiles
+
+
+def generate_queries(randomizer: random.Random,
+                     profiles: list[entities.PatientProfile],
+                     queries: int,
+                     limit: int
+                     ) -> list[schemas.MatchPatients]:
+    # Запросы строятся по симптомам существующих пациентов
+    result: list[schemas.MatchPatients] = []
+    for profile in randomizer.sample(profiles, queries):
+        result.append(schemas.MatchPatients(
+            symptom_ids=list(profile.symptom_ids),
+            diagnosis_id=min(profile.diagnosis_ids),
+            gender=randomizer.choice(GENDERS),
+            age=randomizer.randint(10, 90),
+            skin_type=randomizer.choice(SKIN_TYPES),
+            limit=limit
+        ))
+    return result
+
+
+def measure(index, queries: list[schemas.MatchPatients]) -> tuple[list, list[float]]:
+    results: list = []
+    latencies: list[float] = []
+    for match_params in queries:
+        start: float = time.perf_counter()
+        results.append(index.search(match_params))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered: list[float] = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=100_000)
+    parser.add_argument('--symptoms', type=int, default=300)
+    parser.add_argument('--diagnoses', type=int, default=60)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--configs', default='8x4,16x2,32x2,32x1',
+                        help='Конфигурации MinHash в виде <bands>x<rows>')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    randomizer = random.Random(args.seed)
+    profiles = generate_profiles(randomizer, args.patients, args.symptoms,
+                                 args.diagnoses)
+    queries = generate_queries(randomizer, profiles, args.queries, args.limit)
+
+    exact_index = ExactPatientSimilarityIndex()
+    exact_index.rebuild(profiles)
+    expected, latencies = measure(exact_index, queries)
+    print(f'{"index":<16}{"recall@k":>10}{"p50, ms":>10}{"p99, ms":>10}')
+    print(f'{"exact":<16}{1:>10.3f}{statistics.median(latencies):>10.2f}'
+          f'{percentile(latencies, 0.99):>10.2f}')
+
+    for config in args.configs.split(','):
+        bands, rows = map(int, config.split('x'))
+        index = MinHashPatientSimilarityIndex(bands=bands, rows=rows)
+        index.rebuild(profiles)
+        found, latencies = measure(index, queries)
+
+        hits: int = 0
+        total: int = 0
+        for expected_patients, found_patients in zip(expected, found):
+            expected_ids = {patient.patient_id for patient in expected_patients}
+            hits += len(expected_ids & {patient.patient_id for patient in found_patients})
+            total += len(expected_ids)
+
+        print(f'{"minhash " + config:<16}{hits / max(total, 1):>10.3f}'
+              f'{statistics.median(latencies):>10.2f}'
+              f'{percentile(latencies, 0.99):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Время построения индекса рекомендаций товаров и задержка рекомендаций
+на синтетических медицинских картах.
+
+Запуск из components/backend:
+    PYTHONPATH=. python benchmarks/treatment_recommendations.py --med-books 250000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from med_sharing_system.application import entities, schemas
+from med_sharing_system.application.utils import ItemRecommendationIndex
+
+
+def generate_outcomes(randomizer: random.Random,
+                      med_books: int,
+                      symptoms: int,
+                      diagnoses: int,
+                      items: int
+                      ) -> list[entities.TreatmentOutcome]:
+    # Частоты симптомов и популярность товаров убывают по степенному закону
+    symptom_weights: list[float] = [1 / (i + 1) ** 0.8 for i in range(symptoms)]
+    item_weights: list[float] = [1 / (i + 1) ** 0.7 for i in range(items)]
+    outcomes: list[entities.TreatmentOutcome] = []
+    for med_book_id in range(1, med_books + 1):
+        outcomes.append(entities.TreatmentOutcome(
+            med_book_id=med_book_id,
+            diagnosis_id=randomizer.randint(1, diagnoses),
+            symptom_ids=frozenset(randomizer.choices(range(1, symptoms + 1),
+                                                     weights=symptom_weights,
+                                                     k=randomizer.randint(1, 4))),
+            item_outcomes=tuple(
+                entities.ItemOutcome(item_id=item_id,
+                                     is_helped=randomizer.random() < 0.6,
+                                     item_rating=randomizer.randint(2, 20) / 2)
+                for item_id in randomizer.choices(range(1, items + 1),
+                                                  weights=item_weights,
+                                                  k=randomizer.randint(0, 3))
+            )
+        ))
+    return outcomes
+
+
+def generate_queries(randomizer: random.Random,
+                     queries: int,
+                     symptoms: int,
+                     diagnoses: int,
+                     limit: int
+                     ) -> list[schemas.RecommendTreatmentItems]:
+    symptom_weights: list[float] = [1 / (i + 1) ** 0.8 for i in range(symptoms)]
+    return [
+        schemas.RecommendTreatmentItems(
+            diagnosis_id=randomizer.choice([None, randomizer.randint(1, diagnoses)]),
+            symptom_ids=randomizer.choices(range(1, symptoms + 1),
+                                           weights=symptom_weights,
+                                           k=randomizer.randint(1, 4)),
+            limit=limit
+        )
+        for _ in range(queries)
+    ]
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered: list[float] = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--med-books', type=int, default=250_000)
+    parser.add_argument('--symptoms', type=int, default=300)
+    parser.add_argument('--diagnoses', type=int, default=60)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    randomizer = random.Random(args.seed)
+    outcomes = generate_outcomes(randomizer, args.med_books, args.symptoms,
+                                 args.diagnoses, args.items)
+    queries = generate_queries(randomizer, args.queries, args.symptoms,
+                               args.diagnoses, args.limit)
+
+    index = ItemRecommendationIndex()
+    start: float = time.perf_counter()
+    index.rebuild(outcomes)
+    print(f'build: {time.perf_counter() - start:.1f} s')
+
+    latencies: list[float] = []
+    for params in queries:
+        start = time.perf_counter()
+        index.recommend(params)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f'p50: {statistics.median(latencies):.2f} ms, '
+          f'p99: {percentile(latencies, 0.99):.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,28 @@
 from . import repositories
-from .mapping import mapper
+from .mapping import mapper, raise_on_lazy_load
 from .settings import Settings
 from .tables import metadata
-from .utils import TransactionContext
+from .utils import (
+    ItemCooccurrenceIndex,
+    MedicalBooksBitmapIndex,
+    MedicalBooksChangeFeed,
+    MedicalBooksIndexSynchronizer,
+    QueryProfiler,
+    QueryStatistics,
+    TransactionContext,
+)
 
 __all__ = (
     'repositories',
     'mapper',
+    'raise_on_lazy_load',
     'Settings',
     'metadata',
+    'ItemCooccurrenceIndex',
+    'MedicalBooksBitmapIndex',
+    'MedicalBooksChangeFeed',
+    'MedicalBooksIndexSynchronizer',
+    'QueryProfiler',
+    'QueryStatistics',
     'TransactionContext',
 )
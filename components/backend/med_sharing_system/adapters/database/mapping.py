@@ -1,4 +1,5 @@
-from sqlalchemy.orm import registry, relationship
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, raiseload, registry, relationship
 
 from med_sharing_system.application import entities
 from . import tables
@@ -26,6 +27,8 @@ mapper.map_imperatively(entities.ItemReview, tables.item_reviews)
 mapper.map_imperatively(
     entities.MedicalBook,
     tables.medical_books,
+    # `symptom_ids` заполняется триггером и используется только в фильтрах
+    exclude_properties=['symptom_ids'],
     properties={
         'symptoms': relationship(
             entities.Symptom,
@@ -57,3 +60,29 @@ mapper.map_imperatively(
         ),
     }
 )
+
+
+def raise_on_lazy_load(target) -> None:
+    """
+    Тестовый режим маппинга: ленивая загрузка связей (`lazy='select'`), для которой
+    нужен дополнительный SQL-запрос, вызывает `InvalidRequestError`.
+
+    Связи, загруженные явно (например, через `joinedload`), и связи, уже находящиеся
+    в сессии, остаются доступны. Таким образом, тесты падают при появлении
+    неожиданных ленивых загрузок (проблема N+1).
+
+    :param target: Session, sessionmaker или класс сессии, к которому
+        применяется режим.
+    """
+    event.listen(target, 'do_orm_execute', _add_raiseload_option)
+
+
+def _add_raiseload_option(orm_execute_state: ORMExecuteState) -> None:
+    if (
+        orm_execute_state.is_select and
+        not orm_execute_state.is_column_load and
+        not orm_execute_state.is_relationship_load
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            raiseload('*', sql_only=True)
+        )
@@ -0,0 +1,51 @@
+"""medical_books_symptom_ids
+
+Revision ID: 3c1d7a9e4b20
+Revises: f98f4162ed6d
+Create Date: 2026-10-19 09:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from med_sharing_system.adapters.database import tables
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d7a9e4b20'
+down_revision = 'f98f4162ed6d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('medical_books',
+                  sa.Column('symptom_ids', postgresql.ARRAY(sa.Integer()),
+                            server_default=sa.text("'{}'"), nullable=False))
+    op.execute(
+        """
+        UPDATE medical_books
+        SET symptom_ids = ARRAY(
+            SELECT symptom_id
+            FROM medical_books_symptoms
+            WHERE med_book_id = medical_books.id
+            ORDER BY symptom_id
+        )
+        """
+    )
+    op.create_index('ix_medical_books_symptom_ids', 'medical_books', ['symptom_ids'],
+                    unique=False, postgresql_using='gin')
+    op.execute(tables.SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION)
+    for trigger in tables.SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS:
+        op.execute(trigger)
+
+
+def downgrade():
+    op.execute(tables.DROP_SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS)
+    op.execute('DROP TRIGGER IF EXISTS sync_medical_book_symptom_ids '
+               'ON medical_books_symptoms')
+    op.execute(tables.DROP_SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION)
+    op.drop_index('ix_medical_books_symptom_ids', table_name='medical_books',
+                  postgresql_using='gin')
+    op.drop_column('medical_books', 'symptom_ids')
@@ -0,0 +1,43 @@
+"""patient_changes
+
+Revision ID: 8e2f5b1c7d43
+Revises: 3c1d7a9e4b20
+Create Date: 2026-10-19 12:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from med_sharing_system.adapters.database import tables
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2f5b1c7d43'
+down_revision = '3c1d7a9e4b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('patient_changes',
+                    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+                    sa.Column('patient_id', sa.Integer(), nullable=False),
+                    sa.Column('xact_id', sa.BigInteger(),
+                              server_default=sa.text('pg_current_xact_id()::text::bigint'),
+                              nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_patient_changes')))
+    op.create_index('ix_patient_changes_xact_id', 'patient_changes', ['xact_id'],
+                    unique=False)
+    op.execute(tables.LOG_PATIENT_CHANGE_FUNCTION)
+    op.execute(tables.LOG_PATIENT_CHANGE_ON_PATIENTS_TRIGGER)
+    op.execute(tables.LOG_PATIENT_CHANGE_ON_MEDICAL_BOOKS_TRIGGER)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS log_patient_change ON medical_books')
+    op.execute('DROP TRIGGER IF EXISTS log_patient_change ON patients')
+    op.execute(tables.DROP_LOG_PATIENT_CHANGE_FUNCTION)
+    op.drop_index('ix_patient_changes_xact_id', table_name='patient_changes')
+    op.drop_table('patient_changes')
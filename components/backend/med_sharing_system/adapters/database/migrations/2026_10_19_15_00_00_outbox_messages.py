@@ -0,0 +1,32 @@
+"""outbox_messages
+
+Revision ID: 5a9c3e7f1b62
+Revises: 8e2f5b1c7d43
+Create Date: 2026-10-19 15:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9c3e7f1b62'
+down_revision = '8e2f5b1c7d43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_messages',
+                    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+                    sa.Column('target', sa.String(length=255), nullable=False),
+                    sa.Column('body', postgresql.JSONB(astext_type=sa.Text()),
+                              nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_outbox_messages')))
+
+
+def downgrade():
+    op.drop_table('outbox_messages')
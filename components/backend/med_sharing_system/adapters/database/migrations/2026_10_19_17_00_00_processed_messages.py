@@ -0,0 +1,33 @@
+"""processed_messages
+
+Revision ID: 3d7b1f9e4c20
+Revises: 5a9c3e7f1b62
+Create Date: 2026-10-19 17:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7b1f9e4c20'
+down_revision = '5a9c3e7f1b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('processed_messages',
+                    sa.Column('message_id', sa.String(length=255), nullable=False),
+                    sa.Column('processed_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('message_id',
+                                            name=op.f('pk_processed_messages')))
+    op.create_index('ix_processed_messages_processed_at', 'processed_messages',
+                    ['processed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_processed_messages_processed_at',
+                  table_name='processed_messages')
+    op.drop_table('processed_messages')
@@ -0,0 +1,25 @@
+"""outbox_messages_priority
+
+Revision ID: 9b4e6a2d8f15
+Revises: 3d7b1f9e4c20
+Create Date: 2026-10-19 18:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e6a2d8f15'
+down_revision = '3d7b1f9e4c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox_messages',
+                  sa.Column('priority', sa.SmallInteger(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('outbox_messages', 'priority')
@@ -0,0 +1,24 @@
+"""item_reviews_item_id_index
+
+Revision ID: 6c8d2e4f1a37
+Revises: 9b4e6a2d8f15
+Create Date: 2026-10-19 19:00:00.000000+00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6c8d2e4f1a37'
+down_revision = '9b4e6a2d8f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_item_reviews_item_id', 'item_reviews', ['item_id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_reviews_item_id', table_name='item_reviews')
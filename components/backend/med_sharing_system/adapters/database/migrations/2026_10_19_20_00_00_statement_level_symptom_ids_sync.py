@@ -0,0 +1,34 @@
+"""statement_level_symptom_ids_sync
+
+Revision ID: 2f7a9c5e3b81
+Revises: 6c8d2e4f1a37
+Create Date: 2026-10-19 20:00:00.000000+00:00
+
+"""
+from alembic import op
+
+from med_sharing_system.adapters.database import tables
+
+
+# revision identifiers, used by Alembic.
+revision = '2f7a9c5e3b81'
+down_revision = '6c8d2e4f1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Построчный триггер переписывал массив карты и журнал `patient_changes`
+    # на каждый добавленный симптом
+    op.execute('DROP TRIGGER IF EXISTS sync_medical_book_symptom_ids '
+               'ON medical_books_symptoms')
+    op.execute(tables.DROP_SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS)
+    op.execute(tables.SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION)
+    for trigger in tables.SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS:
+        op.execute(trigger)
+
+
+def downgrade():
+    # Триггеры на оператор поддерживают `symptom_ids` так же, как построчный,
+    # их удаляет откат миграции medical_books_symptom_ids
+    pass
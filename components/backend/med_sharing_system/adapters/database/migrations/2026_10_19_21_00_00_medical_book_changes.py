@@ -0,0 +1,46 @@
+"""medical_book_changes
+
+Revision ID: 7d3b5f1a9e62
+Revises: 2f7a9c5e3b81
+Create Date: 2026-10-19 21:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from med_sharing_system.adapters.database import tables
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3b5f1a9e62'
+down_revision = '2f7a9c5e3b81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('medical_book_changes',
+                    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+                    sa.Column('med_book_id', sa.Integer(), nullable=False),
+                    sa.Column('xact_id', sa.BigInteger(),
+                              server_default=sa.text('pg_current_xact_id()::text::bigint'),
+                              nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_medical_book_changes')))
+    op.create_index('ix_medical_book_changes_xact_id', 'medical_book_changes',
+                    ['xact_id'], unique=False)
+    op.execute(tables.LOG_MEDICAL_BOOK_CHANGE_FUNCTION)
+    op.execute(tables.LOG_ITEM_REVIEW_CHANGE_FUNCTION)
+    for trigger in tables.LOG_MEDICAL_BOOK_CHANGE_TRIGGERS:
+        op.execute(trigger)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS log_medical_book_change ON item_reviews')
+    op.execute('DROP TRIGGER IF EXISTS log_medical_book_change '
+               'ON medical_books_item_reviews')
+    op.execute('DROP TRIGGER IF EXISTS log_medical_book_change ON medical_books')
+    op.execute(tables.DROP_LOG_MEDICAL_BOOK_CHANGE_FUNCTIONS)
+    op.drop_index('ix_medical_book_changes_xact_id', table_name='medical_book_changes')
+    op.drop_table('medical_book_changes')
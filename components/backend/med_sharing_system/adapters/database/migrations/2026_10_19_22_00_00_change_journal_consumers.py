@@ -0,0 +1,31 @@
+"""change_journal_consumers
+
+Revision ID: 4e9a1c7b3d56
+Revises: 7d3b5f1a9e62
+Create Date: 2026-10-19 22:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e9a1c7b3d56'
+down_revision = '7d3b5f1a9e62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_journal_consumers',
+                    sa.Column('journal', sa.String(length=255), nullable=False),
+                    sa.Column('consumer', sa.String(length=255), nullable=False),
+                    sa.Column('change_mark', sa.BigInteger(), nullable=False),
+                    sa.Column('updated_at', sa.DateTime(timezone=True),
+                              server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('journal', 'consumer',
+                                            name=op.f('pk_change_journal_consumers')))
+
+
+def downgrade():
+    op.drop_table('change_journal_consumers')
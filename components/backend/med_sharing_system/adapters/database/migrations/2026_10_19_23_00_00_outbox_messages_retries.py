@@ -0,0 +1,33 @@
+"""outbox_messages_retries
+
+Revision ID: 8a2c6e4f9d13
+Revises: 4e9a1c7b3d56
+Create Date: 2026-10-19 23:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a2c6e4f9d13'
+down_revision = '4e9a1c7b3d56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox_messages',
+                  sa.Column('attempts', sa.Integer(),
+                            server_default=sa.text('0'), nullable=False))
+    op.add_column('outbox_messages',
+                  sa.Column('available_at', sa.DateTime(timezone=True),
+                            server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_outbox_messages_available_at', 'outbox_messages',
+                    ['available_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_outbox_messages_available_at', table_name='outbox_messages')
+    op.drop_column('outbox_messages', 'available_at')
+    op.drop_column('outbox_messages', 'attempts')
@@ -6,3 +6,9 @@ from .patients import PatientsRepo
 from .diagnoses import DiagnosesRepo
 from .item_categories import ItemCategoriesRepo
 from .item_types import ItemTypesRepo
+from .bitmap_medical_books import BitmapMedicalBooksRepo
+from .patient_profiles import PatientProfilesRepo
+from .patient_changes import PatientChangesRepo
+from .treatment_outcomes import TreatmentOutcomesRepo
+from .outbox import OutboxRepo
+from .processed_messages import ProcessedMessagesRepo
@@ -0,0 +1,187 @@
+from typing import Callable, Sequence
+
+from sqlalchemy import select, Select
+
+from med_sharing_system.adapters.database.utils import MedicalBooksBitmapIndex
+from med_sharing_system.adapters.database.utils.bitmap_index import bitmaps
+from med_sharing_system.application import entities, schemas
+from .medical_books import MedicalBooksRepo
+
+
+def _indexed_search(method_name: str, match_all_symptoms: bool = False) -> Callable:
+    """
+    Создает метод поиска, который отбирает карты по индексу. Пока индекс
+    не построен, вызывается одноименный метод SQL-репозитория.
+    """
+
+    def search(self: 'BitmapMedicalBooksRepo',
+               filter_params: schemas.FindMedicalBooks,
+               *,
+               include_symptoms: bool,
+               include_reviews: bool
+               ) -> Sequence[entities.MedicalBook | None]:
+        if not self.index.is_built:
+            sql_search: Callable = getattr(super(BitmapMedicalBooksRepo, self),
+                                           method_name)
+            return sql_search(filter_params,
+                              include_symptoms=include_symptoms,
+                              include_reviews=include_reviews)
+
+        return self._fetch_from_index(filter_params,
+                                      match_all_symptoms,
+                                      include_symptoms,
+                                      include_reviews)
+
+    search.__name__ = method_name
+    return search
+
+
+class BitmapMedicalBooksRepo(MedicalBooksRepo):
+    """
+    Репозиторий медицинских карт, который выполняет поиск по битовому индексу
+    в памяти (`MedicalBooksBitmapIndex`), а из Postgres загружает только
+    итоговую страницу. Получение по id и запись выполняются как в
+    `MedicalBooksRepo`.
+    """
+
+    def __init__(self, *args, index: MedicalBooksBitmapIndex, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.index = index
+
+    def _fetch_from_index(self,
+                          filter_params: schemas.FindMedicalBooks,
+                          match_all_symptoms: bool,
+                          include_symptoms: bool,
+                          include_reviews: bool
+                          ) -> Sequence[entities.MedicalBook | None]:
+
+        found: bitmaps.Bitmap = self.index.search(filter_params, match_all_symptoms)
+
+        if filter_params.sort_field in (None, *self.index.SORT_FIELDS):
+            med_book_ids: list[int] = self.index.get_page(found, filter_params)
+            return self.query_executor.get_med_books_by_ids(med_book_ids,
+                                                            filter_params,
+                                                            include_symptoms,
+                                                            include_reviews)
+
+        # Текстовые поля сортируются в Postgres среди уже найденных карт
+        query: Select = (
+            select(entities.MedicalBook)
+            .where(entities.MedicalBook.id.in_(list(bitmaps.iter_ids(found))))
+        )
+        query: Select = self.query_pagination.apply(query, filter_params)
+        return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
+                                                     include_symptoms,
+                                                     include_reviews)
+
+    fetch_all = _indexed_search('fetch_all')
+    fetch_by_symptoms = _indexed_search('fetch_by_symptoms')
+    fetch_by_matching_all_symptoms = _indexed_search(
+        'fetch_by_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_diagnosis = _indexed_search('fetch_by_diagnosis')
+    fetch_by_diagnosis_and_symptoms = _indexed_search('fetch_by_diagnosis_and_symptoms')
+    fetch_by_diagnosis_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_diagnosis_with_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_helped_status = _indexed_search('fetch_by_helped_status')
+    fetch_by_helped_status_and_symptoms = _indexed_search(
+        'fetch_by_helped_status_and_symptoms'
+    )
+    fetch_by_helped_status_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_helped_status_with_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_helped_status_and_diagnosis = _indexed_search(
+        'fetch_by_helped_status_and_diagnosis'
+    )
+    fetch_by_helped_status_diagnosis_and_symptoms = _indexed_search(
+        'fetch_by_helped_status_diagnosis_and_symptoms'
+    )
+    fetch_by_helped_status_diagnosis_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_helped_status_diagnosis_with_matching_all_symptoms',
+        match_all_symptoms=True
+    )
+    fetch_by_patient = _indexed_search('fetch_by_patient')
+    fetch_by_patient_and_symptoms = _indexed_search('fetch_by_patient_and_symptoms')
+    fetch_by_patient_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_patient_with_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_patient_and_helped_status = _indexed_search(
+        'fetch_by_patient_and_helped_status'
+    )
+    fetch_by_patient_helped_status_and_symptoms = _indexed_search(
+        'fetch_by_patient_helped_status_and_symptoms'
+    )
+    fetch_by_patient_helped_status_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_patient_helped_status_with_matching_all_symptoms',
+        match_all_symptoms=True
+    )
+    fetch_by_patient_helped_status_and_diagnosis = _indexed_search(
+        'fetch_by_patient_helped_status_and_diagnosis'
+    )
+    fetch_by_patient_helped_status_diagnosis_and_symptoms = _indexed_search(
+        'fetch_by_patient_helped_status_diagnosis_and_symptoms'
+    )
+    fetch_by_patient_helped_status_diagnosis_with_matching_all_symptoms = (
+        _indexed_search(
+            'fetch_by_patient_helped_status_diagnosis_with_matching_all_symptoms',
+            match_all_symptoms=True
+        )
+    )
+    fetch_by_patient_diagnosis_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_patient_diagnosis_with_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_patient_diagnosis_and_symptoms = _indexed_search(
+        'fetch_by_patient_diagnosis_and_symptoms'
+    )
+    fetch_by_patient_and_diagnosis = _indexed_search('fetch_by_patient_and_diagnosis')
+    fetch_by_items = _indexed_search('fetch_by_items')
+    fetch_by_patient_and_items = _indexed_search('fetch_by_patient_and_items')
+    fetch_by_items_and_helped_status = _indexed_search('fetch_by_items_and_helped_status')
+    fetch_by_items_and_diagnosis = _indexed_search('fetch_by_items_and_diagnosis')
+    fetch_by_items_and_symptoms = _indexed_search('fetch_by_items_and_symptoms')
+    fetch_by_items_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_items_with_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_diagnosis_items_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_diagnosis_items_with_matching_all_symptoms', match_all_symptoms=True
+    )
+    fetch_by_helped_status_items_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_helped_status_items_with_matching_all_symptoms',
+        match_all_symptoms=True
+    )
+    fetch_by_helped_status_diagnosis_and_items = _indexed_search(
+        'fetch_by_helped_status_diagnosis_and_items'
+    )
+    fetch_by_helped_status_diagnosis_items_with_matching_all_symptoms = (
+        _indexed_search(
+            'fetch_by_helped_status_diagnosis_items_with_matching_all_symptoms',
+            match_all_symptoms=True
+        )
+    )
+    fetch_by_patient_diagnosis_and_items = _indexed_search(
+        'fetch_by_patient_diagnosis_and_items'
+    )
+    fetch_by_patient_diagnosis_items_with_matching_all_symptoms = _indexed_search(
+        'fetch_by_patient_diagnosis_items_with_matching_all_symptoms',
+        match_all_symptoms=True
+    )
+    fetch_by_patient_helped_status_and_items = _indexed_search(
+        'fetch_by_patient_helped_status_and_items'
+    )
+    fetch_by_patient_helped_status_diagnosis_and_items = _indexed_search(
+        'fetch_by_patient_helped_status_diagnosis_and_items'
+    )
+    fetch_by_patient_helped_status_items_with_matching_all_symptoms = (
+        _indexed_search(
+            'fetch_by_patient_helped_status_items_with_matching_all_symptoms',
+            match_all_symptoms=True
+        )
+    )
+    fetch_by_patient_helped_status_diagnosis_items_with_matching_all_symptoms = (
+        _indexed_search(
+            'fetch_by_patient_helped_status_diagnosis_items_with_matching_all_symptoms',
+            match_all_symptoms=True
+        )
+    )
@@ -1,8 +1,10 @@
+from collections import defaultdict
 from typing import Sequence
 
-from sqlalchemy import select, desc, asc, between, Select, RowMapping
-from sqlalchemy.orm import InstrumentedAttribute, Session
+from sqlalchemy import select, desc, asc, between, func, Select, RowMapping
+from sqlalchemy.orm import InstrumentedAttribute, Session, aliased
 
+from med_sharing_system.adapters.database import tables
 from med_sharing_system.application import interfaces, entities, schemas, dtos
 from .base import BaseRepository
 
@@ -48,6 +50,26 @@ class ItemReviewsRepo(BaseRepository, interfaces.ItemReviewsRepo):
 
         return self.query_executor.fetch_review_list(query)
 
+    def fetch_top_by_items(
+        self,
+        filter_params: schemas.FindItemReviews,
+    ) -> dict[int, list[entities.ItemReview | dtos.ItemReview]]:
+        """
+        Получает отзывы сразу для нескольких товаров одним запросом.
+        Сортировка, limit и offset применяются к отзывам каждого товара отдельно.
+
+        :return: Словарь {id товара: список отзывов}.
+        """
+        query: Select = self.query_collection.fetch_by_items(filter_params)
+        query: Select = self.query_pagination.apply_per_item(query, filter_params)
+
+        if filter_params.exclude_review_fields:
+            return self.query_executor.fetch_review_lists_by_items_with_selected_columns(
+                query, filter_params.exclude_review_fields
+            )
+
+        return self.query_executor.fetch_review_lists_by_items(query)
+
     def fetch_by_patient(self,
                          filter_params: schemas.FindItemReviews,
                          ) -> Sequence[entities.ItemReview | dtos.ItemReview | None]:
@@ -296,6 +318,19 @@ class ItemReviewsRepo(BaseRepository, interfaces.ItemReviewsRepo):
         return review
 
 
+def _is_reviewed_by_patient(filter_params: schemas.FindItemReviews):
+    """
+    IN-условие: отзыв входит в одну из медицинских карт пациента `patient_id`.
+    """
+    med_books_reviews = tables.medical_books_item_reviews
+    return entities.ItemReview.id.in_(
+        select(med_books_reviews.c.item_review_id)
+        .join(entities.MedicalBook,
+              entities.MedicalBook.id == med_books_reviews.c.med_book_id)
+        .where(entities.MedicalBook.patient_id == filter_params.patient_id)
+    )
+
+
 class _ItemReviewQueryCollection:
 
     @staticmethod
@@ -304,13 +339,12 @@ class _ItemReviewQueryCollection:
 
     @staticmethod
     def fetch_all() -> Select:
-        return select(entities.ItemReview).distinct()
+        return select(entities.ItemReview)
 
     @staticmethod
     def fetch_by_items(filter_params: schemas.FindItemReviews) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
             .where(entities.ItemReview.item_id.in_(filter_params.item_ids))
         )
 
@@ -318,24 +352,20 @@ class _ItemReviewQueryCollection:
     def fetch_by_patient(filter_params: schemas.FindItemReviews) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id)
+            .where(_is_reviewed_by_patient(filter_params))
         )
 
     @staticmethod
     def fetch_patient_reviews_by_item(filter_params: schemas.FindItemReviews) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.item_id.in_(filter_params.item_ids))
         )
 
     @staticmethod
     def fetch_by_rating(filter_params: schemas.FindItemReviews) -> Select:
-        query: Select = select(entities.ItemReview).distinct()
+        query: Select = select(entities.ItemReview)
 
         if filter_params.max_rating is not None and filter_params.min_rating is not None:
             return query.where(
@@ -353,7 +383,6 @@ class _ItemReviewQueryCollection:
     def fetch_by_helped_status(filter_params: schemas.FindItemReviews) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
             .where(entities.ItemReview.is_helped == filter_params.is_helped)
         )
 
@@ -361,9 +390,7 @@ class _ItemReviewQueryCollection:
     def fetch_by_items_and_patient(filter_params: schemas.FindItemReviews) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.item_id.in_(filter_params.item_ids))
         )
 
@@ -372,7 +399,6 @@ class _ItemReviewQueryCollection:
                                          ) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
             .where(entities.ItemReview.item_id.in_(filter_params.item_ids),
                    entities.ItemReview.is_helped == filter_params.is_helped)
         )
@@ -381,7 +407,6 @@ class _ItemReviewQueryCollection:
     def fetch_by_items_and_rating(filter_params: schemas.FindItemReviews) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
             .where(entities.ItemReview.item_id.in_(filter_params.item_ids))
         )
         if filter_params.max_rating is not None and filter_params.min_rating is not None:
@@ -401,9 +426,7 @@ class _ItemReviewQueryCollection:
                                            ) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.is_helped == filter_params.is_helped)
         )
 
@@ -411,9 +434,7 @@ class _ItemReviewQueryCollection:
     def fetch_by_patient_and_rating(filter_params: schemas.FindItemReviews) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id)
+            .where(_is_reviewed_by_patient(filter_params))
         )
         if filter_params.max_rating is not None and filter_params.min_rating is not None:
             return query.where(
@@ -432,7 +453,6 @@ class _ItemReviewQueryCollection:
                                           ) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
             .where(entities.ItemReview.is_helped == filter_params.is_helped)
         )
         if filter_params.max_rating is not None and filter_params.min_rating is not None:
@@ -452,9 +472,7 @@ class _ItemReviewQueryCollection:
                                                  ) -> Select:
         return (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.item_id.in_(filter_params.item_ids),
                    entities.ItemReview.is_helped == filter_params.is_helped)
         )
@@ -464,9 +482,7 @@ class _ItemReviewQueryCollection:
                                           ) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.item_id.in_(filter_params.item_ids))
         )
         if filter_params.max_rating is not None and filter_params.min_rating is not None:
@@ -487,7 +503,6 @@ class _ItemReviewQueryCollection:
     ) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
             .where(entities.ItemReview.item_id.in_(filter_params.item_ids),
                    entities.ItemReview.is_helped == filter_params.is_helped)
         )
@@ -508,9 +523,7 @@ class _ItemReviewQueryCollection:
                                                   ) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.is_helped == filter_params.is_helped)
         )
         if filter_params.max_rating is not None and filter_params.min_rating is not None:
@@ -531,9 +544,7 @@ class _ItemReviewQueryCollection:
     ) -> Select:
         query: Select = (
             select(entities.ItemReview)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.MedicalBook.patient_id == filter_params.patient_id,
+            .where(_is_reviewed_by_patient(filter_params),
                    entities.ItemReview.item_id.in_(filter_params.item_ids),
                    entities.ItemReview.is_helped == filter_params.is_helped)
         )
@@ -557,18 +568,53 @@ class _ItemReviewQueryPagination:
         query = self.set_offset(query, filter_params)
         return query
 
-    @staticmethod
-    def set_order(query: Select, filter_params: schemas.FindItemReviews) -> Select:
+    def apply_per_item(self,
+                       query: Select,
+                       filter_params: schemas.FindItemReviews
+                       ) -> Select:
+        """
+        Применяет сортировку, limit и offset к отзывам каждого товара отдельно:
+        отзывы нумеруются через ROW_NUMBER() OVER (PARTITION BY item_id ...),
+        и из каждой группы отбираются строки с номерами (offset, offset + limit].
+        Результат упорядочен по id товара, а внутри товара - по заданной сортировке.
+        """
+        order_by = [entities.ItemReview.id]
+        if filter_params.sort_field is not None:
+            order_by.insert(0, self.get_order_by(filter_params))
+
+        row_number = (
+            func.row_number()
+            .over(partition_by=entities.ItemReview.item_id, order_by=order_by)
+            .label('row_number')
+        )
+        ranked_reviews = query.add_columns(row_number).subquery()
+        review = aliased(entities.ItemReview, ranked_reviews)
+
+        offset: int = filter_params.offset or 0
+        query: Select = (
+            select(review)
+            .where(ranked_reviews.c.row_number > offset)
+            .order_by(ranked_reviews.c.item_id, ranked_reviews.c.row_number)
+        )
+
+        if filter_params.limit is None:
+            return query
+
+        return query.where(ranked_reviews.c.row_number <= offset + filter_params.limit)
+
+    def set_order(self, query: Select, filter_params: schemas.FindItemReviews) -> Select:
         if filter_params.sort_field is None:
             return query
 
+        return query.order_by(self.get_order_by(filter_params))
+
+    @staticmethod
+    def get_order_by(filter_params: schemas.FindItemReviews):
         sort_field = getattr(entities.ItemReview, filter_params.sort_field)
         return (
-            query.order_by(
-                desc(sort_field).nullslast()
-                if filter_params.sort_direction == 'desc'
-                else asc(sort_field).nullslast()
-            )
+            desc(sort_field).nullslast()
+            if filter_params.sort_direction == 'desc'
+            else asc(sort_field).nullslast()
         )
 
     @staticmethod
@@ -610,3 +656,40 @@ class _ItemReviewQueryExecutor:
                                                 maintain_column_froms=True)
         result: Sequence[RowMapping | None] = self.session.execute(query).mappings().all()
         return [dtos.ItemReview(**row) for row in result]
+
+    def fetch_review_lists_by_items(
+        self,
+        query: Select
+    ) -> dict[int, list[entities.ItemReview]]:
+
+        reviews_by_items: dict[int, list[entities.ItemReview]] = defaultdict(list)
+        for review in self.session.execute(query).scalars():
+            reviews_by_items[review.item_id].append(review)
+
+        return dict(reviews_by_items)
+
+    def fetch_review_lists_by_items_with_selected_columns(
+        self,
+        query: Select,
+        exclude_review_fields: list[str]
+    ) -> dict[int, list[dtos.ItemReview]]:
+
+        review = query.column_descriptions[0]['entity']
+        included_column_names: list[str] = entities.ItemReview.get_field_names(
+            exclude_fields=exclude_review_fields
+        )
+        included_columns: list[InstrumentedAttribute] = [
+            getattr(review, column) for column in included_column_names
+        ]
+        # id товара нужен для группировки, даже если он исключен из ответа
+        query: Select = query.with_only_columns(*included_columns,
+                                                review.item_id.label('group_item_id'),
+                                                maintain_column_froms=True)
+
+        reviews_by_items: dict[int, list[dtos.ItemReview]] = defaultdict(list)
+        for row in self.session.execute(query).mappings():
+            review_info = dict(row)
+            item_id: int = review_info.pop('group_item_id')
+            reviews_by_items[item_id].append(dtos.ItemReview(**review_info))
+
+        return dict(reviews_by_items)
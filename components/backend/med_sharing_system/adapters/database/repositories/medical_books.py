@@ -1,8 +1,10 @@
 from typing import Sequence
 
-from sqlalchemy import select, desc, Select, asc, func
-from sqlalchemy.orm import joinedload, Session
+from sqlalchemy import select, desc, Select, asc, func, Table, and_, exists
+from sqlalchemy.orm import joinedload, Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
 
+from med_sharing_system.adapters.database import tables
 from med_sharing_system.adapters.database.repositories.base import BaseRepository
 from med_sharing_system.application import interfaces, entities, schemas
 
@@ -32,6 +34,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_all()
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -44,6 +47,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_symptoms(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -58,6 +62,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -70,6 +75,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_diagnosis(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -84,6 +90,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -100,6 +107,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -112,6 +120,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_helped_status(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -126,6 +135,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -143,6 +153,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -157,6 +168,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -174,6 +186,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -191,6 +204,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -203,6 +217,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_patient(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -215,6 +230,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_patient_and_symptoms(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -232,6 +248,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -247,6 +264,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -264,6 +282,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -281,6 +300,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -298,6 +318,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -315,6 +336,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -334,6 +356,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -351,6 +374,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -366,6 +390,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -381,6 +406,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -393,6 +419,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_items(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -405,6 +432,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_patient_and_items(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -419,6 +447,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -431,6 +460,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_items_and_diagnosis(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -443,6 +473,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         query: Select = self.query_collection.fetch_by_items_and_symptoms(filter_params)
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -458,6 +489,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -475,6 +507,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -492,6 +525,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -509,6 +543,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -528,6 +563,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -543,6 +579,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -562,6 +599,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -577,6 +615,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -594,6 +633,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -613,6 +653,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -632,6 +673,7 @@ class MedicalBooksRepo(BaseRepository, interfaces.MedicalBooksRepo):
         )
         query: Select = self.query_pagination.apply(query, filter_params)
         return self.query_executor.get_med_book_list(query,
+                                                     filter_params,
                                                      include_symptoms,
                                                      include_reviews)
 
@@ -656,17 +698,162 @@ class _MedicalBookQueryExecutor:
                      include_reviews: bool
                      ) -> entities.MedicalBook | None:
 
-        self._set_query_options(query, include_symptoms, include_reviews)
+        query = self._set_query_options(query, include_symptoms, include_reviews)
         return self.session.execute(query).scalars().unique().one_or_none()
 
     def get_med_book_list(self,
                           query: Select,
+                          filter_params: schemas.FindMedicalBooks,
                           include_symptoms: bool,
                           include_reviews: bool
                           ) -> Sequence[entities.MedicalBook | None]:
+        med_book_ids: list[int] = self._get_med_book_ids_page(query, filter_params)
+        return self.get_med_books_by_ids(med_book_ids,
+                                         filter_params,
+                                         include_symptoms,
+                                         include_reviews)
+
+    def get_med_books_by_ids(self,
+                             med_book_ids: list[int],
+                             filter_params: schemas.FindMedicalBooks,
+                             include_symptoms: bool,
+                             include_reviews: bool
+                             ) -> list[entities.MedicalBook]:
+        """
+        Вторая фаза выборки: загружает полные строки и коллекции только для
+        `med_book_ids`, сохраняя их порядок. Карты, удаленные между фазами,
+        пропускаются.
+        """
+        # Параметры вложенных коллекций есть только у
+        # FindMedicalBooksWithSymptoms / FindMedicalBooksWithItemReviews.
+        # Коллекции с ограничениями загружаются отдельными запросами,
+        # остальные - через joinedload.
+        symptoms_limit: int | None = getattr(filter_params, 'symptoms_limit', None)
+        reviews_limit: int | None = getattr(filter_params, 'reviews_limit', None)
+        reviews_sort_field: str | None = getattr(filter_params, 'reviews_sort_field',
+                                                 None)
+
+        limit_symptoms: bool = include_symptoms and symptoms_limit is not None
+        limit_reviews: bool = include_reviews and (
+            reviews_limit is not None or reviews_sort_field is not None
+        )
+
+        if not med_book_ids:
+            return []
+
+        query = self._set_query_options(
+            select(entities.MedicalBook)
+            .where(entities.MedicalBook.id.in_(med_book_ids)),
+            include_symptoms and not limit_symptoms,
+            include_reviews and not limit_reviews
+        )
+        med_books_by_ids: dict[int, entities.MedicalBook] = {
+            med_book.id: med_book
+            for med_book in self.session.execute(query).scalars().unique()
+        }
+        med_books = [med_books_by_ids[med_book_id] for med_book_id in med_book_ids
+                     if med_book_id in med_books_by_ids]
+
+        if limit_symptoms:
+            self._load_limited_collection(
+                med_books,
+                relationship_name='symptoms',
+                secondary=tables.medical_books_symptoms,
+                target=entities.Symptom,
+                target_key=tables.medical_books_symptoms.c.symptom_id,
+                order_by=[asc(entities.Symptom.name)],
+                limit=symptoms_limit
+            )
+
+        if limit_reviews:
+            self._load_limited_collection(
+                med_books,
+                relationship_name='item_reviews',
+                secondary=tables.medical_books_item_reviews,
+                target=entities.ItemReview,
+                target_key=tables.medical_books_item_reviews.c.item_review_id,
+                order_by=[self._get_reviews_order_by(filter_params)],
+                limit=reviews_limit
+            )
+
+        return med_books
+
+    def _get_med_book_ids_page(self,
+                               query: Select,
+                               filter_params: schemas.FindMedicalBooks
+                               ) -> list[int]:
+        """
+        Первая фаза выборки: постраничный проход по узким кортежам
+        (sort_key, id) с теми же фильтрами, сортировкой, LIMIT и OFFSET.
+        """
+        columns: list = [entities.MedicalBook.id]
+        if filter_params.sort_field is not None:
+            columns.append(getattr(entities.MedicalBook, filter_params.sort_field))
+
+        return list(self.session.execute(query.with_only_columns(*columns)).scalars())
+
+    def _load_limited_collection(self,
+                                 med_books: Sequence[entities.MedicalBook],
+                                 relationship_name: str,
+                                 secondary: Table,
+                                 target: type,
+                                 target_key,
+                                 order_by: list,
+                                 limit: int | None
+                                 ) -> None:
+        """
+        Загружает коллекцию `relationship_name` для всех медицинских карт одним
+        запросом. Строки каждой карты нумеруются через
+        ROW_NUMBER() OVER (PARTITION BY med_book_id ORDER BY ...), и из БД
+        возвращаются только первые `limit` строк каждой карты.
+        """
+        if not med_books:
+            return None
+
+        med_books_by_ids = {med_book.id: med_book for med_book in med_books}
+
+        row_number = (
+            func.row_number()
+            .over(partition_by=secondary.c.med_book_id,
+                  order_by=[*order_by, target.id])
+            .label('row_number')
+        )
+        ranked_rows = (
+            select(secondary.c.med_book_id, target, row_number)
+            .join_from(secondary, target, target.id == target_key)
+            .where(secondary.c.med_book_id.in_(med_books_by_ids))
+            .subquery()
+        )
+        related_entity = aliased(target, ranked_rows)
 
-        self._set_query_options(query, include_symptoms, include_reviews)
-        return self.session.execute(query).scalars().unique().all()
+        query: Select = (
+            select(ranked_rows.c.med_book_id, related_entity)
+            .order_by(ranked_rows.c.med_book_id, ranked_rows.c.row_number)
+        )
+        if limit is not None:
+            query = query.where(ranked_rows.c.row_number <= limit)
+
+        collections: dict[int, list] = {
+            med_book_id: [] for med_book_id in med_books_by_ids
+        }
+        for med_book_id, related_obj in self.session.execute(query):
+            collections[med_book_id].append(related_obj)
+
+        for med_book_id, collection in collections.items():
+            set_committed_value(med_books_by_ids[med_book_id], relationship_name,
+                                collection)
+
+    @staticmethod
+    def _get_reviews_order_by(filter_params: schemas.FindMedicalBooksWithItemReviews):
+        if filter_params.reviews_sort_field is None:
+            return desc(entities.ItemReview.item_rating)
+
+        sort_field = getattr(entities.ItemReview, filter_params.reviews_sort_field)
+        return (
+            desc(sort_field).nullslast()
+            if filter_params.reviews_sort_direction == 'desc'
+            else asc(sort_field).nullslast()
+        )
 
     @staticmethod
     def _set_query_options(query: Select,
@@ -695,14 +882,17 @@ class _MedicalBookQueryPagination:
 
     @staticmethod
     def set_order(query, filter_params) -> Select:
+        # `id` замыкает сортировку, чтобы страницы не пересекались
+        # при одинаковых значениях `sort_field`
         if filter_params.sort_field is None:
-            return query
+            return query.order_by(entities.MedicalBook.id)
 
         return (
             query.order_by(
                 desc(getattr(entities.MedicalBook, filter_params.sort_field))
                 if filter_params.sort_direction == 'desc'
-                else asc(getattr(entities.MedicalBook, filter_params.sort_field))
+                else asc(getattr(entities.MedicalBook, filter_params.sort_field)),
+                entities.MedicalBook.id
             )
         )
 
@@ -721,6 +911,78 @@ class _MedicalBookQueryPagination:
         return query.offset(filter_params.offset)
 
 
+def _has_symptoms(filter_params: schemas.FindMedicalBooks):
+    """
+    Условие: у карты есть хотя бы один из симптомов `symptom_ids`.
+    Пересечение массивов (`&&`) использует GIN-индекс по `symptom_ids`.
+    """
+    return tables.medical_books.c.symptom_ids.overlap(filter_params.symptom_ids)
+
+
+def _has_all_symptoms(filter_params: schemas.FindMedicalBooks):
+    """
+    Условие: у карты есть все симптомы `symptom_ids`.
+    Вхождение массива (`@>`) использует GIN-индекс по `symptom_ids`.
+    """
+    return tables.medical_books.c.symptom_ids.contains(filter_params.symptom_ids)
+
+
+def _has_symptoms_in_link_table(filter_params: schemas.FindMedicalBooks):
+    """
+    То же, что `_has_symptoms`, но по таблице связей `medical_books_symptoms`.
+    Используется для сверки с денормализованным `symptom_ids`.
+    """
+    med_books_symptoms = tables.medical_books_symptoms
+    return exists().where(
+        med_books_symptoms.c.med_book_id == entities.MedicalBook.id,
+        med_books_symptoms.c.symptom_id.in_(filter_params.symptom_ids)
+    )
+
+
+def _has_all_symptoms_in_link_table(filter_params: schemas.FindMedicalBooks):
+    """
+    То же, что `_has_all_symptoms`, но по таблице связей `medical_books_symptoms`.
+    Используется для сверки с денормализованным `symptom_ids`.
+    """
+    med_books_symptoms = tables.medical_books_symptoms
+    return entities.MedicalBook.id.in_(
+        select(med_books_symptoms.c.med_book_id)
+        .where(med_books_symptoms.c.symptom_id.in_(filter_params.symptom_ids))
+        .group_by(med_books_symptoms.c.med_book_id)
+        .having(func.count(med_books_symptoms.c.symptom_id.distinct()) == len(
+            set(filter_params.symptom_ids)))
+    )
+
+
+def _has_reviews_of_items(filter_params: schemas.FindMedicalBooks):
+    """
+    EXISTS-условие: в карте есть отзыв на один из товаров `item_ids`.
+    """
+    return entities.MedicalBook.item_reviews.any(
+        entities.ItemReview.item_id.in_(filter_params.item_ids)
+    )
+
+
+def _has_helped_reviews(filter_params: schemas.FindMedicalBooks):
+    """
+    EXISTS-условие: в карте есть отзыв со статусом `is_helped`.
+    """
+    return entities.MedicalBook.item_reviews.any(
+        entities.ItemReview.is_helped == filter_params.is_helped
+    )
+
+
+def _has_helped_reviews_of_items(filter_params: schemas.FindMedicalBooks):
+    """
+    EXISTS-условие: в карте есть отзыв на один из товаров `item_ids`
+    со статусом `is_helped` (оба условия - для одного и того же отзыва).
+    """
+    return entities.MedicalBook.item_reviews.any(
+        and_(entities.ItemReview.item_id.in_(filter_params.item_ids),
+             entities.ItemReview.is_helped == filter_params.is_helped)
+    )
+
+
 class _MedicalBookQueryCollection:
 
     @staticmethod
@@ -732,18 +994,13 @@ class _MedicalBookQueryCollection:
 
     @staticmethod
     def fetch_all() -> Select:
-        return (
-            select(entities.MedicalBook)
-            .distinct()
-        )
+        return select(entities.MedicalBook)
 
     @staticmethod
     def fetch_by_symptoms(filter_params: schemas.FindMedicalBooks) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.Symptom.id.in_(filter_params.symptom_ids))
+            .where(_has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -751,11 +1008,7 @@ class _MedicalBookQueryCollection:
                                        ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+            .where(_has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -763,7 +1016,6 @@ class _MedicalBookQueryCollection:
                            ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id)
         )
 
@@ -772,10 +1024,8 @@ class _MedicalBookQueryCollection:
                                         ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -784,21 +1034,15 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
     def fetch_by_helped_status(filter_params: schemas.FindMedicalBooks) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.ItemReview.is_helped == filter_params.is_helped)
+            .where(_has_helped_reviews(filter_params))
         )
 
     @staticmethod
@@ -806,11 +1050,8 @@ class _MedicalBookQueryCollection:
                                             ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+            .where(_has_helped_reviews(filter_params),
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -819,13 +1060,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+            .where(_has_helped_reviews(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -833,10 +1069,8 @@ class _MedicalBookQueryCollection:
                                              ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped)
+                   _has_helped_reviews(filter_params))
         )
 
     @staticmethod
@@ -845,12 +1079,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+                   _has_helped_reviews(filter_params),
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -859,21 +1090,15 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_helped_reviews(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
     def fetch_by_patient(filter_params: schemas.FindMedicalBooks) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
             .where(entities.MedicalBook.patient_id == filter_params.patient_id)
         )
 
@@ -882,10 +1107,8 @@ class _MedicalBookQueryCollection:
                                       ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -894,12 +1117,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -908,10 +1127,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped)
+                   _has_helped_reviews(filter_params))
         )
 
     @staticmethod
@@ -920,12 +1137,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+                   _has_helped_reviews(filter_params),
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -934,14 +1148,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.symptoms)
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_helped_reviews(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -950,11 +1159,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped)
+                   _has_helped_reviews(filter_params))
         )
 
     @staticmethod
@@ -963,13 +1170,10 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids),
-                   entities.ItemReview.is_helped == filter_params.is_helped)
+                   _has_symptoms(filter_params),
+                   _has_helped_reviews(filter_params))
         )
 
     @staticmethod
@@ -978,15 +1182,10 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.symptoms)
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids),
-                   entities.ItemReview.is_helped == filter_params.is_helped)
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_all_symptoms(filter_params),
+                   _has_helped_reviews(filter_params))
         )
 
     @staticmethod
@@ -995,13 +1194,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1010,11 +1205,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1023,7 +1216,6 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id)
         )
@@ -1032,9 +1224,7 @@ class _MedicalBookQueryCollection:
     def fetch_by_items(filter_params: schemas.FindMedicalBooks) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.ItemReview.item_id.in_(filter_params.item_ids))
+            .where(_has_reviews_of_items(filter_params))
         )
 
     @staticmethod
@@ -1042,10 +1232,8 @@ class _MedicalBookQueryCollection:
                                    ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids))
+                   _has_reviews_of_items(filter_params))
         )
 
     @staticmethod
@@ -1053,31 +1241,23 @@ class _MedicalBookQueryCollection:
                                          ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.ItemReview.is_helped == filter_params.is_helped)
+            .where(_has_helped_reviews_of_items(filter_params))
         )
 
     @staticmethod
     def fetch_by_items_and_diagnosis(filter_params: schemas.FindMedicalBooks) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids))
+                   _has_reviews_of_items(filter_params))
         )
 
     @staticmethod
     def fetch_by_items_and_symptoms(filter_params: schemas.FindMedicalBooks) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
+            .where(_has_reviews_of_items(filter_params),
+                   _has_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1085,13 +1265,8 @@ class _MedicalBookQueryCollection:
                                                   ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+            .where(_has_reviews_of_items(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1100,14 +1275,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_reviews_of_items(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1116,14 +1286,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+            .where(_has_helped_reviews_of_items(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1132,11 +1296,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
-            .where(entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids))
+            .where(_has_helped_reviews_of_items(filter_params),
+                   entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id)
         )
 
     @staticmethod
@@ -1145,15 +1306,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
-            .where(entities.ItemReview.is_helped == filter_params.is_helped,
+            .where(_has_helped_reviews_of_items(filter_params),
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1162,11 +1317,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids))
+                   _has_reviews_of_items(filter_params))
         )
 
     @staticmethod
@@ -1175,15 +1328,10 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_reviews_of_items(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1192,11 +1340,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids))
+                   _has_helped_reviews_of_items(filter_params))
         )
 
     @staticmethod
@@ -1205,12 +1350,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .distinct()
-            .join(entities.MedicalBook.item_reviews)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids))
+                   _has_helped_reviews_of_items(filter_params))
         )
 
     @staticmethod
@@ -1219,15 +1361,9 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_helped_reviews_of_items(filter_params),
+                   _has_all_symptoms(filter_params))
         )
 
     @staticmethod
@@ -1236,14 +1372,8 @@ class _MedicalBookQueryCollection:
     ) -> Select:
         return (
             select(entities.MedicalBook)
-            .join(entities.MedicalBook.item_reviews)
-            .join(entities.MedicalBook.symptoms)
             .where(entities.MedicalBook.patient_id == filter_params.patient_id,
                    entities.MedicalBook.diagnosis_id == filter_params.diagnosis_id,
-                   entities.ItemReview.is_helped == filter_params.is_helped,
-                   entities.ItemReview.item_id.in_(filter_params.item_ids),
-                   entities.Symptom.id.in_(filter_params.symptom_ids))
-            .group_by(entities.MedicalBook.id)
-            .having(func.count(entities.Symptom.id.distinct()) == len(
-                filter_params.symptom_ids))
+                   _has_helped_reviews_of_items(filter_params),
+                   _has_all_symptoms(filter_params))
         )
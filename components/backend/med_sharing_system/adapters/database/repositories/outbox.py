@@ -0,0 +1,84 @@
+import math
+from datetime import timedelta
+from typing import Sequence
+
+from sqlalchemy import Select, delete, func, insert, select, update
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.application import interfaces
+from med_sharing_system.application.interfaces.message_publishing import QueueMessage
+from .base import BaseRepository
+
+
+class OutboxRepo(BaseRepository, interfaces.OutboxRepo):
+    """
+    Хранит сообщения для брокера в таблице `outbox_messages`.
+
+    Сообщения забираются с `FOR UPDATE SKIP LOCKED`, поэтому несколько
+    процессов могут разбирать таблицу одновременно, не получая одни и те же
+    сообщения.
+    """
+    # Идентификатор сообщения для брокера - id строки с префиксом
+    _MESSAGE_ID_PREFIX = 'outbox-'
+
+    def add(self, messages: Sequence[QueueMessage]) -> None:
+        self.session.execute(
+            insert(tables.outbox_messages),
+            [{'target': message.target, 'body': message.body,
+              'priority': message.priority}
+             for message in messages]
+        )
+
+    def take(self, limit: int) -> list[QueueMessage]:
+        outbox = tables.outbox_messages
+        query: Select = (
+            select(outbox.c.id, outbox.c.target, outbox.c.body, outbox.c.priority)
+            .where(outbox.c.available_at <= func.now())
+            .order_by(outbox.c.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        # Сообщение, опубликованное повторно, сохраняет идентификатор,
+        # и потребители его отбросят
+        return [QueueMessage(target=row.target, body=row.body,
+                             message_id=f'{self._MESSAGE_ID_PREFIX}{row.id}',
+                             priority=row.priority)
+                for row in self.session.execute(query)]
+
+    def remove(self, messages: Sequence[QueueMessage]) -> None:
+        if not messages:
+            return None
+
+        outbox = tables.outbox_messages
+        self.session.execute(
+            delete(outbox).where(outbox.c.id.in_(self._get_row_ids(messages)))
+        )
+
+    def postpone(self,
+                 messages: Sequence[QueueMessage],
+                 retry_delay: float,
+                 max_retry_delay: float
+                 ) -> None:
+        if not messages:
+            return None
+
+        # Показатель степени ограничивается до умножения: иначе при большом
+        # числе попыток Postgres не вычислит задержку (переполнение)
+        max_exponent: int = (max(math.ceil(math.log2(max_retry_delay / retry_delay)), 0)
+                             if 0 < retry_delay < max_retry_delay
+                             else 0)
+        outbox = tables.outbox_messages
+        delay = func.least(
+            retry_delay * func.power(2, func.least(outbox.c.attempts, max_exponent)),
+            max_retry_delay
+        )
+        self.session.execute(
+            update(outbox)
+            .where(outbox.c.id.in_(self._get_row_ids(messages)))
+            .values(attempts=outbox.c.attempts + 1,
+                    available_at=func.now() + delay * timedelta(seconds=1))
+        )
+
+    def _get_row_ids(self, messages: Sequence[QueueMessage]) -> list[int]:
+        return [int(message.message_id.removeprefix(self._MESSAGE_ID_PREFIX))
+                for message in messages]
@@ -0,0 +1,46 @@
+from sqlalchemy import Select, select
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.adapters.database.utils import change_journal
+from med_sharing_system.application import interfaces
+from .base import BaseRepository
+
+
+class PatientChangesRepo(BaseRepository, interfaces.PatientChangesRepo):
+    """
+    Читает журнал изменений пациентов (`patient_changes`), который
+    заполняется триггерами на `patients` и `medical_books`.
+
+    Отметкой служит нижняя граница активных транзакций: все транзакции
+    с меньшим номером завершены, поэтому их записи в журнале окончательны.
+    Изменения незавершенных транзакций будут прочитаны при следующем вызове.
+    """
+
+    def get_change_mark(self) -> int:
+        return change_journal.get_change_mark(self.session)
+
+    def fetch_changed_patient_ids(self, since_mark: int) -> tuple[set[int], int]:
+        # Отметка берется до чтения журнала: транзакции до нее уже завершены,
+        # и следующий запрос увидит все их записи
+        change_mark: int = max(since_mark, self.get_change_mark())
+
+        patient_changes = tables.patient_changes
+        query: Select = (
+            select(patient_changes.c.patient_id)
+            .distinct()
+            .where(patient_changes.c.xact_id >= since_mark,
+                   patient_changes.c.xact_id < change_mark)
+        )
+        return set(self.session.execute(query).scalars()), change_mark
+
+    def save_change_mark(self, consumer: str, change_mark: int) -> None:
+        change_journal.save_change_mark(self.session, tables.patient_changes,
+                                        consumer, change_mark)
+
+    def fetch_saved_change_mark(self, consumer: str) -> int | None:
+        return change_journal.fetch_saved_change_mark(self.session,
+                                                      tables.patient_changes,
+                                                      consumer)
+
+    def prune(self, consumer_ttl: float) -> int:
+        return change_journal.prune(self.session, tables.patient_changes, consumer_ttl)
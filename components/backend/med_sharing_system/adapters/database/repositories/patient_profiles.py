@@ -0,0 +1,72 @@
+from typing import Iterable
+
+from sqlalchemy import Select, select
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.application import entities, interfaces
+from .base import BaseRepository
+
+
+class PatientProfilesRepo(BaseRepository, interfaces.PatientProfilesRepo):
+    """
+    Собирает профили пациентов для подбора похожих пациентов. Симптомы
+    берутся из денормализованного столбца `medical_books.symptom_ids`,
+    поэтому на каждую медицинскую карту приходится одна строка результата.
+    """
+    # Количество строк, которое читается из курсора БД за один раз
+    YIELD_PER: int = 10_000
+
+    def fetch_all(self) -> list[entities.PatientProfile]:
+        return self._fetch(patient_ids=None)
+
+    def fetch_by_patient_ids(self,
+                             patient_ids: Iterable[int]
+                             ) -> list[entities.PatientProfile]:
+        patient_ids = set(patient_ids)
+        if not patient_ids:
+            return []
+
+        return self._fetch(patient_ids)
+
+    def _fetch(self, patient_ids: set[int] | None) -> list[entities.PatientProfile]:
+        patients = tables.patients
+        medical_books = tables.medical_books
+
+        patients_query: Select = select(patients.c.id,
+                                        patients.c.gender,
+                                        patients.c.age,
+                                        patients.c.skin_type)
+        med_books_query: Select = (
+            select(medical_books.c.patient_id,
+                   medical_books.c.diagnosis_id,
+                   medical_books.c.symptom_ids)
+            .where(medical_books.c.patient_id.is_not(None))
+        )
+        if patient_ids is not None:
+            patients_query = patients_query.where(patients.c.id.in_(patient_ids))
+            med_books_query = med_books_query.where(
+                medical_books.c.patient_id.in_(patient_ids)
+            )
+
+        symptom_ids: dict[int, set[int]] = {}
+        diagnosis_ids: dict[int, set[int]] = {}
+        for patient_id, diagnosis_id, med_book_symptom_ids in self.session.execute(
+            med_books_query, execution_options={'yield_per': self.YIELD_PER}
+        ):
+            symptom_ids.setdefault(patient_id, set()).update(med_book_symptom_ids)
+            if diagnosis_id is not None:
+                diagnosis_ids.setdefault(patient_id, set()).add(diagnosis_id)
+
+        return [
+            entities.PatientProfile(
+                patient_id=patient_id,
+                gender=gender,
+                age=age,
+                skin_type=skin_type,
+                symptom_ids=frozenset(symptom_ids.get(patient_id, ())),
+                diagnosis_ids=frozenset(diagnosis_ids.get(patient_id, ()))
+            )
+            for patient_id, gender, age, skin_type in self.session.execute(
+                patients_query, execution_options={'yield_per': self.YIELD_PER}
+            )
+        ]
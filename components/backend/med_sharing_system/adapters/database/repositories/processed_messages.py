@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.adapters.database.utils import TransactionContext
+from med_sharing_system.application import interfaces
+from .base import BaseRepository
+
+
+class ProcessedMessagesRepo(BaseRepository, interfaces.MessageDeduplicationStore):
+    """
+    Идентификаторы обработанных сообщений в таблице `processed_messages`,
+    общие для всех процессов потребителей. Идентификатор считается
+    обработанным `ttl` секунд, устаревшие записи удаляются при каждом
+    `purge_interval`-ом добавлении.
+
+    Потребитель вызывает методы вне транзакций сервисов, поэтому каждый
+    вызов выполняется в собственной транзакции (или присоединяется
+    к текущей).
+    """
+
+    def __init__(self,
+                 context: TransactionContext,
+                 ttl: float,
+                 purge_interval: int = 1000
+                 ) -> None:
+        super().__init__(context)
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._added: int = 0
+
+    @property
+    def _expired_before(self):
+        return func.now() - timedelta(seconds=self.ttl)
+
+    def contains(self, message_id: str) -> bool:
+        processed = tables.processed_messages
+        query = select(exists().where(processed.c.message_id == message_id,
+                                      processed.c.processed_at > self._expired_before))
+        with self.context:
+            return self.session.execute(query).scalar()
+
+    def add(self, message_id: str) -> None:
+        processed = tables.processed_messages
+        query = (
+            insert(processed)
+            .values(message_id=message_id)
+            .on_conflict_do_update(index_elements=[processed.c.message_id],
+                                   set_={'processed_at': func.now()})
+        )
+        self._added += 1
+        with self.context:
+            if self._added % self.purge_interval == 0:
+                self.session.execute(
+                    delete(processed)
+                    .where(processed.c.processed_at <= self._expired_before)
+                )
+            self.session.execute(query)
@@ -0,0 +1,53 @@
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator
+
+from sqlalchemy import Select, select
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.application import entities, interfaces
+from .base import BaseRepository
+
+
+class TreatmentOutcomesRepo(BaseRepository, interfaces.TreatmentOutcomesRepo):
+    """
+    Читает медицинские карты с отзывами о товарах для построения индекса
+    рекомендаций. Карты без отзывов ничего не говорят о лечении и
+    пропускаются.
+    """
+    # Количество строк, которое читается из курсора БД за один раз
+    YIELD_PER: int = 10_000
+
+    def fetch_all(self) -> Iterator[entities.TreatmentOutcome]:
+        medical_books = tables.medical_books
+        med_books_reviews = tables.medical_books_item_reviews
+        reviews = tables.item_reviews
+
+        query: Select = (
+            select(medical_books.c.id,
+                   medical_books.c.diagnosis_id,
+                   medical_books.c.symptom_ids,
+                   reviews.c.item_id,
+                   reviews.c.is_helped,
+                   reviews.c.item_rating)
+            .join_from(medical_books, med_books_reviews,
+                       med_books_reviews.c.med_book_id == medical_books.c.id)
+            .join(reviews, reviews.c.id == med_books_reviews.c.item_review_id)
+            .order_by(medical_books.c.id)
+        )
+        rows = self.session.execute(query,
+                                    execution_options={'yield_per': self.YIELD_PER})
+        for med_book_id, med_book_rows in groupby(rows, key=itemgetter(0)):
+            med_book_rows = list(med_book_rows)
+            _, diagnosis_id, symptom_ids, *_ = med_book_rows[0]
+            yield entities.TreatmentOutcome(
+                med_book_id=med_book_id,
+                diagnosis_id=diagnosis_id,
+                symptom_ids=frozenset(symptom_ids),
+                item_outcomes=tuple(
+                    entities.ItemOutcome(item_id=item_id,
+                                         is_helped=is_helped,
+                                         item_rating=item_rating)
+                    for *_, item_id, is_helped, item_rating in med_book_rows
+                )
+            )
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseSettings, Field
 
@@ -38,6 +39,30 @@ class Settings(BaseSettings):
     LOGGING_LEVEL: str = 'INFO'
     SA_LOGS: bool = False
 
+    # Профилирование SQL-запросов в рамках HTTP-запроса (заголовок Server-Timing)
+    SA_PROFILING: bool = False
+    # Предупреждать о запросах, повторенных в рамках HTTP-запроса не менее
+    # указанного количества раз (проблема N+1). 0 - не предупреждать.
+    SA_PROFILING_REPEATS_THRESHOLD: int = 0
+
+    # Движок поиска медицинских карт: 'sql' - запросы к Postgres,
+    # 'bitmap' - битовый индекс в памяти процесса (строится при старте)
+    MEDICAL_BOOKS_SEARCH_ENGINE: Literal['sql', 'bitmap'] = 'sql'
+    # Индекс товаров, упоминаемых в одних медицинских картах (связанные товары),
+    # в памяти процесса (строится при старте). False - связанные товары
+    # недоступны
+    ITEM_COOCCURRENCE_INDEX: bool = False
+    # Период (мс), с которым индексы медицинских карт в памяти применяют
+    # изменения других процессов из журнала `medical_book_changes`
+    MEDICAL_BOOKS_INDEX_REFRESH_MS: int = 1000
+
+    # Потребители журналов изменений (`patient_changes`, `medical_book_changes`)
+    # сохраняют прочитанные отметки и удаляют записи, прочитанные всеми, не чаще
+    # CHANGE_JOURNAL_PRUNE_INTERVAL_SECONDS (с). Потребитель, не обновлявший
+    # отметку CHANGE_JOURNAL_CONSUMER_TTL_SECONDS (с), больше не учитывается
+    CHANGE_JOURNAL_PRUNE_INTERVAL_SECONDS: float = 60
+    CHANGE_JOURNAL_CONSUMER_TTL_SECONDS: float = 7 * 24 * 3600
+
     class Config:
         env_file = Path(__file__).parent.parent.parent.parent.joinpath(".env")
         env_file_encoding = 'utf-8'
@@ -83,4 +108,11 @@ class Settings(BaseSettings):
                 'propagate': False
             }
 
+        if self.SA_PROFILING:
+            config['loggers']['query_profiling'] = {
+                'handlers': ['default'],
+                'level': self.LOGGING_LEVEL,
+                'propagate': False
+            }
+
         return config
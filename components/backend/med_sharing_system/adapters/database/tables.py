@@ -1,15 +1,24 @@
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Boolean,
     Column,
+    DateTime,
     DECIMAL,
     Float,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
+    SmallInteger,
     String,
     Table,
     Text,
+    event,
+    func,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 
 naming_convention = {
     'ix': 'ix_%(column_0_label)s',
@@ -81,9 +90,11 @@ item_reviews = Table(
     'item_reviews',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
+    # Индекс нужен полусоединениям фильтров медицинских карт по товарам
     Column('item_id', Integer,
            ForeignKey('treatment_items.id', ondelete='CASCADE', onupdate='CASCADE'),
-           nullable=False),
+           nullable=False,
+           index=True),
     Column('is_helped', Boolean, nullable=False),
     Column('item_rating', Float, nullable=False),
     Column('item_count', Integer, nullable=False),
@@ -126,4 +137,282 @@ medical_books = Table(
            ForeignKey('patients.id', ondelete='CASCADE', onupdate='CASCADE')),
     Column('diagnosis_id', Integer,
            ForeignKey('diagnoses.id', ondelete='CASCADE', onupdate='CASCADE')),
+    # Денормализованный набор симптомов карты для поиска по `@>` и `&&`.
+    # Поддерживается триггером на `medical_books_symptoms`.
+    Column('symptom_ids', ARRAY(Integer), nullable=False,
+           server_default=text("'{}'")),
+    Index('ix_medical_books_symptom_ids', 'symptom_ids', postgresql_using='gin'),
+)
+
+# Триггеры срабатывают один раз на оператор: каждая затронутая карта
+# обновляется (и попадает в `patient_changes`) один раз, сколько бы
+# симптомов ей ни добавили одним INSERT
+SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION sync_medical_book_symptom_ids() RETURNS trigger AS $$
+DECLARE
+    changed_med_book_ids integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT med_book_id) INTO changed_med_book_ids
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT med_book_id) INTO changed_med_book_ids
+        FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT med_book_id) INTO changed_med_book_ids
+        FROM (
+            SELECT med_book_id FROM old_rows
+            UNION
+            SELECT med_book_id FROM new_rows
+        ) AS changed_rows;
+    END IF;
+
+    UPDATE medical_books
+    SET symptom_ids = synced.symptom_ids
+    FROM (
+        SELECT changed.id,
+               ARRAY(
+                   SELECT symptom_id
+                   FROM medical_books_symptoms
+                   WHERE med_book_id = changed.id
+                   ORDER BY symptom_id
+               ) AS symptom_ids
+        FROM unnest(changed_med_book_ids) AS changed(id)
+    ) AS synced
+    WHERE medical_books.id = synced.id
+      AND medical_books.symptom_ids IS DISTINCT FROM synced.symptom_ids;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+# Переходные таблицы нельзя объявить у триггера на несколько событий
+SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS = (
+    DDL("""
+CREATE TRIGGER sync_medical_book_symptom_ids_on_insert
+AFTER INSERT ON medical_books_symptoms
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sync_medical_book_symptom_ids()
+"""),
+    DDL("""
+CREATE TRIGGER sync_medical_book_symptom_ids_on_update
+AFTER UPDATE ON medical_books_symptoms
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sync_medical_book_symptom_ids()
+"""),
+    DDL("""
+CREATE TRIGGER sync_medical_book_symptom_ids_on_delete
+AFTER DELETE ON medical_books_symptoms
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION sync_medical_book_symptom_ids()
+"""),
+)
+DROP_SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS = DDL("""
+DROP TRIGGER IF EXISTS sync_medical_book_symptom_ids_on_insert ON medical_books_symptoms;
+DROP TRIGGER IF EXISTS sync_medical_book_symptom_ids_on_update ON medical_books_symptoms;
+DROP TRIGGER IF EXISTS sync_medical_book_symptom_ids_on_delete ON medical_books_symptoms
+""")
+DROP_SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION = DDL(
+    "DROP FUNCTION IF EXISTS sync_medical_book_symptom_ids()"
+)
+
+event.listen(medical_books_symptoms, 'after_create',
+             SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION.execute_if(dialect='postgresql'))
+for sync_trigger in SYNC_MEDICAL_BOOK_SYMPTOM_IDS_TRIGGERS:
+    event.listen(medical_books_symptoms, 'after_create',
+                 sync_trigger.execute_if(dialect='postgresql'))
+event.listen(medical_books_symptoms, 'after_drop',
+             DROP_SYNC_MEDICAL_BOOK_SYMPTOM_IDS_FUNCTION.execute_if(dialect='postgresql'))
+
+# Журнал изменений пациентов и их медицинских карт. По нему процессы,
+# которые держат данные пациентов в памяти, догоняют изменения.
+# `xact_id` - номер транзакции, в которой произошло изменение: записи
+# транзакций младше `pg_snapshot_xmin(pg_current_snapshot())` уже не могут
+# появиться задним числом, в отличие от записей с меньшим `id`.
+patient_changes = Table(
+    'patient_changes',
+    metadata,
+    Column('id', BigInteger, primary_key=True, autoincrement=True),
+    Column('patient_id', Integer, nullable=False),
+    Column('xact_id', BigInteger, nullable=False,
+           server_default=text('pg_current_xact_id()::text::bigint')),
+    Column('created_at', DateTime(timezone=True), nullable=False,
+           server_default=func.now()),
+    Index('ix_patient_changes_xact_id', 'xact_id'),
+)
+
+LOG_PATIENT_CHANGE_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION log_patient_change() RETURNS trigger AS $$
+DECLARE
+    old_patient_id integer;
+    new_patient_id integer;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_patient_id := (to_jsonb(OLD) ->> TG_ARGV[0])::integer;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_patient_id := (to_jsonb(NEW) ->> TG_ARGV[0])::integer;
+    END IF;
+
+    IF old_patient_id IS NOT NULL THEN
+        INSERT INTO patient_changes (patient_id) VALUES (old_patient_id);
+    END IF;
+    IF new_patient_id IS NOT NULL
+            AND new_patient_id IS DISTINCT FROM old_patient_id THEN
+        INSERT INTO patient_changes (patient_id) VALUES (new_patient_id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+LOG_PATIENT_CHANGE_ON_PATIENTS_TRIGGER = DDL("""
+CREATE TRIGGER log_patient_change
+AFTER INSERT OR DELETE OR UPDATE OF id, gender, age, skin_type ON patients
+FOR EACH ROW EXECUTE FUNCTION log_patient_change('id')
+""")
+LOG_PATIENT_CHANGE_ON_MEDICAL_BOOKS_TRIGGER = DDL("""
+CREATE TRIGGER log_patient_change
+AFTER INSERT OR DELETE OR UPDATE OF patient_id, diagnosis_id, symptom_ids ON medical_books
+FOR EACH ROW EXECUTE FUNCTION log_patient_change('patient_id')
+""")
+DROP_LOG_PATIENT_CHANGE_FUNCTION = DDL(
+    "DROP FUNCTION IF EXISTS log_patient_change()"
+)
+
+# Триггеры ссылаются на несколько таблиц, поэтому создаются после всех таблиц
+event.listen(metadata, 'after_create',
+             LOG_PATIENT_CHANGE_FUNCTION.execute_if(dialect='postgresql'))
+event.listen(metadata, 'after_create',
+             LOG_PATIENT_CHANGE_ON_PATIENTS_TRIGGER.execute_if(dialect='postgresql'))
+event.listen(metadata, 'after_create',
+             LOG_PATIENT_CHANGE_ON_MEDICAL_BOOKS_TRIGGER.execute_if(dialect='postgresql'))
+event.listen(metadata, 'after_drop',
+             DROP_LOG_PATIENT_CHANGE_FUNCTION.execute_if(dialect='postgresql'))
+
+# Журнал изменений медицинских карт, по которому индексы карт в памяти
+# (`MedicalBooksChangeFeed`) догоняют изменения других процессов.
+# Отметки - номера транзакций, как у `patient_changes`
+medical_book_changes = Table(
+    'medical_book_changes',
+    metadata,
+    Column('id', BigInteger, primary_key=True, autoincrement=True),
+    Column('med_book_id', Integer, nullable=False),
+    Column('xact_id', BigInteger, nullable=False,
+           server_default=text('pg_current_xact_id()::text::bigint')),
+    Column('created_at', DateTime(timezone=True), nullable=False,
+           server_default=func.now()),
+    Index('ix_medical_book_changes_xact_id', 'xact_id'),
+)
+
+LOG_MEDICAL_BOOK_CHANGE_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION log_medical_book_change() RETURNS trigger AS $$
+DECLARE
+    old_med_book_id integer;
+    new_med_book_id integer;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_med_book_id := (to_jsonb(OLD) ->> TG_ARGV[0])::integer;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_med_book_id := (to_jsonb(NEW) ->> TG_ARGV[0])::integer;
+    END IF;
+
+    IF old_med_book_id IS NOT NULL THEN
+        INSERT INTO medical_book_changes (med_book_id) VALUES (old_med_book_id);
+    END IF;
+    IF new_med_book_id IS NOT NULL
+            AND new_med_book_id IS DISTINCT FROM old_med_book_id THEN
+        INSERT INTO medical_book_changes (med_book_id) VALUES (new_med_book_id);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+LOG_ITEM_REVIEW_CHANGE_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION log_item_review_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO medical_book_changes (med_book_id)
+    SELECT med_book_id
+    FROM medical_books_item_reviews
+    WHERE item_review_id = NEW.id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+# Симптомы карты попадают в журнал через `symptom_ids`, а удаление
+# пациентов, диагнозов, симптомов и товаров - через каскадные изменения
+LOG_MEDICAL_BOOK_CHANGE_TRIGGERS = (
+    DDL("""
+CREATE TRIGGER log_medical_book_change
+AFTER INSERT OR DELETE OR UPDATE OF id, patient_id, diagnosis_id, symptom_ids
+ON medical_books
+FOR EACH ROW EXECUTE FUNCTION log_medical_book_change('id')
+"""),
+    DDL("""
+CREATE TRIGGER log_medical_book_change
+AFTER INSERT OR DELETE OR UPDATE ON medical_books_item_reviews
+FOR EACH ROW EXECUTE FUNCTION log_medical_book_change('med_book_id')
+"""),
+    DDL("""
+CREATE TRIGGER log_medical_book_change
+AFTER UPDATE OF item_id, is_helped ON item_reviews
+FOR EACH ROW EXECUTE FUNCTION log_item_review_change()
+"""),
+)
+DROP_LOG_MEDICAL_BOOK_CHANGE_FUNCTIONS = DDL("""
+DROP FUNCTION IF EXISTS log_medical_book_change();
+DROP FUNCTION IF EXISTS log_item_review_change()
+""")
+
+event.listen(metadata, 'after_create',
+             LOG_MEDICAL_BOOK_CHANGE_FUNCTION.execute_if(dialect='postgresql'))
+event.listen(metadata, 'after_create',
+             LOG_ITEM_REVIEW_CHANGE_FUNCTION.execute_if(dialect='postgresql'))
+for log_trigger in LOG_MEDICAL_BOOK_CHANGE_TRIGGERS:
+    event.listen(metadata, 'after_create',
+                 log_trigger.execute_if(dialect='postgresql'))
+event.listen(metadata, 'after_drop',
+             DROP_LOG_MEDICAL_BOOK_CHANGE_FUNCTIONS.execute_if(dialect='postgresql'))
+
+# Отметки потребителей журналов изменений (`patient_changes`,
+# `medical_book_changes`): записи журнала старше самой ранней отметки
+# потребителей, обновлявших ее недавно, больше никому не нужны и удаляются
+change_journal_consumers = Table(
+    'change_journal_consumers',
+    metadata,
+    Column('journal', String(255), primary_key=True),
+    Column('consumer', String(255), primary_key=True),
+    Column('change_mark', BigInteger, nullable=False),
+    Column('updated_at', DateTime(timezone=True), nullable=False,
+           server_default=func.now()),
+)
+
+# Сообщения, которые нужно опубликовать в брокер. Записываются в одной
+# транзакции с изменениями данных и удаляются после подтверждения брокером.
+# Сообщения, которые брокер не подтвердил, откладываются до `available_at`
+outbox_messages = Table(
+    'outbox_messages',
+    metadata,
+    Column('id', BigInteger, primary_key=True, autoincrement=True),
+    Column('target', String(255), nullable=False),
+    Column('body', JSONB, nullable=False),
+    Column('priority', SmallInteger, nullable=True),
+    Column('attempts', Integer, nullable=False, server_default=text('0')),
+    Column('available_at', DateTime(timezone=True), nullable=False,
+           server_default=func.now(), index=True),
+    Column('created_at', DateTime(timezone=True), nullable=False,
+           server_default=func.now()),
+)
+
+# Идентификаторы сообщений брокера, которые потребители уже обработали.
+# Общие для всех процессов потребителей, устаревшие записи удаляются
+processed_messages = Table(
+    'processed_messages',
+    metadata,
+    Column('message_id', String(255), primary_key=True),
+    Column('processed_at', DateTime(timezone=True), nullable=False,
+           server_default=func.now(), index=True),
 )
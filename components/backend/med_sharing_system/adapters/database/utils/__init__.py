@@ -1 +1,9 @@
+from . import change_journal
+from .bitmap_index import (
+    MedicalBooksBitmapIndex,
+    MedicalBooksChangeFeed,
+    MedicalBooksIndexSynchronizer
+)
+from .item_cooccurrence import ItemCooccurrenceIndex
+from .profiling import QueryProfiler, QueryStatistics
 from .transactions.transaction_context import TransactionContext
@@ -0,0 +1,3 @@
+from .change_feed import MedicalBooksChangeFeed
+from .medical_books_index import MedicalBooksBitmapIndex
+from .synchronizer import MedicalBooksIndexSynchronizer
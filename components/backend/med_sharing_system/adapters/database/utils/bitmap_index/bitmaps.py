@@ -0,0 +1,72 @@
+"""
+Битовые множества на основе `int`: бит с номером N установлен, если
+идентификатор N входит в множество. Объединение и пересечение - это `|` и `&`
+над целыми числами и выполняются на уровне C без циклов Python.
+"""
+from typing import Iterable, Iterator
+
+Bitmap = int
+
+EMPTY: Bitmap = 0
+
+# Номера установленных битов для каждого значения байта
+_BYTE_BITS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(bit for bit in range(8) if byte_value >> bit & 1)
+    for byte_value in range(256)
+)
+
+
+def from_ids(ids: Iterable[int]) -> Bitmap:
+    """
+    Собирает множество в `bytearray` и переводит в `int` один раз: `|=` по
+    одному биту копировал бы растущее число на каждый идентификатор.
+    """
+    ids = list(ids)
+    if not ids:
+        return EMPTY
+
+    data = bytearray(max(ids) // 8 + 1)
+    for id_ in ids:
+        data[id_ >> 3] |= 1 << (id_ & 7)
+    return int.from_bytes(data, 'little')
+
+
+def union(bitmaps: Iterable[Bitmap]) -> Bitmap:
+    result: Bitmap = EMPTY
+    for bitmap in bitmaps:
+        result |= bitmap
+    return result
+
+
+def intersection(bitmaps: Iterable[Bitmap], universe: Bitmap) -> Bitmap:
+    result: Bitmap = universe
+    for bitmap in bitmaps:
+        result &= bitmap
+        if not result:
+            break
+    return result
+
+
+def count(bitmap: Bitmap) -> int:
+    return bitmap.bit_count()
+
+
+def iter_ids(bitmap: Bitmap, reverse: bool = False) -> Iterator[int]:
+    """
+    Перебирает идентификаторы по возрастанию (или по убыванию) без
+    поразрядного сдвига всего числа: число разбирается на байты один раз.
+    """
+    if not bitmap:
+        return
+
+    data: bytes = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    byte_indexes = range(len(data) - 1, -1, -1) if reverse else range(len(data))
+    for byte_index in byte_indexes:
+        byte_value = data[byte_index]
+        if not byte_value:
+            continue
+
+        bits = _BYTE_BITS[byte_value]
+        base = byte_index * 8
+        for bit in (reversed(bits) if reverse else bits):
+            yield base + bit
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Sequence
+
+from sqlalchemy import Engine, select
+
+from med_sharing_system.adapters.database import tables
+from .. import change_journal
+from .synchronizer import SynchronizedIndex
+
+logger = logging.getLogger(__name__)
+
+
+class MedicalBooksChangeFeed:
+    """
+    Поддерживает индексы медицинских карт по журналу `medical_book_changes`,
+    который заполняют триггеры БД. В отличие от `MedicalBooksIndexSynchronizer`,
+    видит изменения всех процессов (других воркеров API, Core-запросов),
+    но с задержкой до `interval` секунд.
+
+    Отметкой служит нижняя граница активных транзакций, как в
+    `PatientChangesRepo`: `rebuild` запоминает ее до чтения данных, а
+    `catch_up` перечитывает карты, измененные с последней отметки.
+    Повторное перечитывание карты безвредно.
+
+    Если задан `consumer`, отметка сохраняется в `change_journal_consumers`
+    не чаще `prune_interval` секунд, и из журнала удаляются записи,
+    прочитанные всеми потребителями (см. `change_journal.prune`).
+    """
+
+    def __init__(self,
+                 indexes: Sequence[SynchronizedIndex],
+                 bind: Engine,
+                 interval: float = 1,
+                 consumer: str | None = None,
+                 consumer_ttl: float = 3600,
+                 prune_interval: float = 60
+                 ) -> None:
+        self.indexes = indexes
+        self.bind = bind
+        self.interval = interval
+        self.consumer = consumer
+        self.consumer_ttl = consumer_ttl
+        self.prune_interval = prune_interval
+        self.change_mark: int | None = None
+        self._pruned_at: float | None = None
+        self._stopped = threading.Event()
+
+    def rebuild(self) -> None:
+        """
+        Полностью перестраивает индексы по данным БД.
+        """
+        with self.bind.connect() as connection:
+            change_mark: int = change_journal.get_change_mark(connection)
+            for index in self.indexes:
+                index.rebuild(connection)
+        self.change_mark = change_mark
+
+    def catch_up(self) -> set[int]:
+        """
+        Перечитывает карты, измененные после последней отметки,
+        и возвращает их идентификаторы.
+        """
+        if self.change_mark is None:
+            return set()
+
+        medical_book_changes = tables.medical_book_changes
+        with self.bind.connect() as connection:
+            # Отметка берется до чтения журнала: транзакции до нее уже
+            # завершены, и следующий запрос увидит все их записи
+            change_mark: int = max(self.change_mark,
+                                   change_journal.get_change_mark(connection))
+            med_book_ids: set[int] = set(connection.execute(
+                select(medical_book_changes.c.med_book_id)
+                .distinct()
+                .where(medical_book_changes.c.xact_id >= self.change_mark,
+                       medical_book_changes.c.xact_id < change_mark)
+            ).scalars())
+            for index in self.indexes:
+                if index.is_built:
+                    index.refresh(connection, med_book_ids)
+        self.change_mark = change_mark
+        self._prune()
+        return med_book_ids
+
+    def _prune(self) -> None:
+        now: float = time.monotonic()
+        if (self.consumer is None
+                or (self._pruned_at is not None
+                    and now - self._pruned_at < self.prune_interval)):
+            return None
+
+        self._pruned_at = now
+        with self.bind.begin() as connection:
+            change_journal.save_change_mark(connection, tables.medical_book_changes,
+                                            self.consumer, self.change_mark)
+            change_journal.prune(connection, tables.medical_book_changes,
+                                 self.consumer_ttl)
+
+    def run(self) -> None:
+        """
+        Догоняет журнал каждые `interval` секунд до вызова `stop`.
+        """
+        while not self._stopped.wait(self.interval):
+            try:
+                self.catch_up()
+            except Exception:
+                logger.exception('Failed to catch up medical book changes',
+                                 extra={'change_mark': self.change_mark})
+
+    def stop(self) -> None:
+        self._stopped.set()
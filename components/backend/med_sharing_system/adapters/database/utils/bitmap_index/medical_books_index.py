@@ -0,0 +1,307 @@
+import heapq
+import threading
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable
+
+from sqlalchemy import Connection, select
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.application import schemas
+from . import bitmaps
+from .bitmaps import Bitmap
+
+
+@dataclass
+class _IndexedMedicalBook:
+    """
+    Все, что индекс знает об одной медицинской карте. Нужно для сортировки
+    и для точечного удаления карты из битовых множеств.
+    """
+    patient_id: int | None
+    diagnosis_id: int | None
+    symptom_ids: set[int] = field(default_factory=set)
+    reviewed_items: set[tuple[int, bool]] = field(default_factory=set)
+
+
+class MedicalBooksBitmapIndex:
+    """
+    Индекс медицинских карт в памяти процесса. Для каждого значения
+    низкокардинальных признаков (симптом, диагноз, товар из отзыва, статус
+    "помогло") хранится битовое множество идентификаторов карт, поэтому любая
+    комбинация фильтров вычисляется через AND/OR этих множеств без обращения
+    к БД. Множества пациентов разреженные и хранятся как `set`.
+
+    Индекс строится методом `rebuild` и поддерживается в актуальном состоянии
+    через `refresh` (см. `MedicalBooksIndexSynchronizer`).
+    """
+    # Поля, по которым сортировка выполняется в памяти. Сортировка по
+    # текстовым полям зависит от правил сравнения (collation) БД и
+    # выполняется в Postgres.
+    SORT_FIELDS: tuple[str, ...] = ('id', 'patient_id', 'diagnosis_id')
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._books: dict[int, _IndexedMedicalBook] = {}
+        self._all: Bitmap = bitmaps.EMPTY
+        self._by_patient: dict[int | None, set[int]] = {}
+        self._by_diagnosis: dict[int | None, Bitmap] = {}
+        self._by_symptom: dict[int, Bitmap] = {}
+        self._by_item: dict[int, Bitmap] = {}
+        self._by_helped_status: dict[bool, Bitmap] = {}
+        self._by_item_and_helped_status: dict[tuple[int, bool], Bitmap] = {}
+        self.is_built: bool = False
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    # -----------------------------------------------------------------------------------
+    # Построение и обновление
+    # -----------------------------------------------------------------------------------
+    def rebuild(self, connection: Connection) -> None:
+        """
+        Полностью перестраивает индекс по данным БД.
+        """
+        with self._lock:
+            self._clear()
+            self._build(self._load(connection, med_book_ids=None))
+            self.is_built = True
+
+    def refresh(self, connection: Connection, med_book_ids: Iterable[int]) -> None:
+        """
+        Перечитывает из БД указанные медицинские карты. Карты, которых
+        больше нет в БД, удаляются из индекса.
+        """
+        med_book_ids = set(med_book_ids)
+        if not med_book_ids:
+            return None
+
+        with self._lock:
+            for med_book_id in med_book_ids:
+                self._remove(med_book_id)
+            loaded_books = self._load(connection, med_book_ids=med_book_ids)
+            for med_book_id, book in loaded_books.items():
+                self._add(med_book_id, book)
+
+    def _load(self,
+              connection: Connection,
+              med_book_ids: set[int] | None
+              ) -> dict[int, _IndexedMedicalBook]:
+        med_books = tables.medical_books
+        med_books_symptoms = tables.medical_books_symptoms
+        med_books_reviews = tables.medical_books_item_reviews
+        reviews = tables.item_reviews
+
+        books_query = select(med_books.c.id,
+                             med_books.c.patient_id,
+                             med_books.c.diagnosis_id)
+        symptoms_query = select(med_books_symptoms.c.med_book_id,
+                                med_books_symptoms.c.symptom_id)
+        reviews_query = (
+            select(med_books_reviews.c.med_book_id,
+                   reviews.c.item_id,
+                   reviews.c.is_helped)
+            .join_from(med_books_reviews, reviews,
+                       reviews.c.id == med_books_reviews.c.item_review_id)
+        )
+        if med_book_ids is not None:
+            books_query = books_query.where(med_books.c.id.in_(med_book_ids))
+            symptoms_query = symptoms_query.where(
+                med_books_symptoms.c.med_book_id.in_(med_book_ids)
+            )
+            reviews_query = reviews_query.where(
+                med_books_reviews.c.med_book_id.in_(med_book_ids)
+            )
+
+        loaded_books: dict[int, _IndexedMedicalBook] = {
+            med_book_id: _IndexedMedicalBook(patient_id, diagnosis_id)
+            for med_book_id, patient_id, diagnosis_id in connection.execute(books_query)
+        }
+        for med_book_id, symptom_id in connection.execute(symptoms_query):
+            if med_book_id in loaded_books:
+                loaded_books[med_book_id].symptom_ids.add(symptom_id)
+        for med_book_id, item_id, is_helped in connection.execute(reviews_query):
+            if med_book_id in loaded_books:
+                loaded_books[med_book_id].reviewed_items.add((item_id, is_helped))
+        return loaded_books
+
+    def _build(self, books: dict[int, _IndexedMedicalBook]) -> None:
+        """
+        Заполняет пустой индекс. Идентификаторы сначала собираются по
+        значениям признаков, и каждое битовое множество строится один раз:
+        добавление карт по одной копировало бы растущие `int` на каждую карту.
+        """
+        by_diagnosis: dict[int | None, list[int]] = {}
+        by_symptom: dict[int, list[int]] = {}
+        by_item: dict[int, set[int]] = {}
+        by_helped_status: dict[bool, set[int]] = {}
+        by_item_and_helped_status: dict[tuple[int, bool], set[int]] = {}
+
+        for med_book_id, book in books.items():
+            self._by_patient.setdefault(book.patient_id, set()).add(med_book_id)
+            by_diagnosis.setdefault(book.diagnosis_id, []).append(med_book_id)
+            for symptom_id in book.symptom_ids:
+                by_symptom.setdefault(symptom_id, []).append(med_book_id)
+            for item_id, is_helped in book.reviewed_items:
+                by_item.setdefault(item_id, set()).add(med_book_id)
+                by_helped_status.setdefault(is_helped, set()).add(med_book_id)
+                by_item_and_helped_status.setdefault((item_id, is_helped),
+                                                     set()).add(med_book_id)
+
+        self._books = books
+        self._all = bitmaps.from_ids(books)
+        self._by_diagnosis = _to_bitmaps(by_diagnosis)
+        self._by_symptom = _to_bitmaps(by_symptom)
+        self._by_item = _to_bitmaps(by_item)
+        self._by_helped_status = _to_bitmaps(by_helped_status)
+        self._by_item_and_helped_status = _to_bitmaps(by_item_and_helped_status)
+
+    def _add(self, med_book_id: int, book: _IndexedMedicalBook) -> None:
+        bit: Bitmap = 1 << med_book_id
+
+        self._books[med_book_id] = book
+        self._all |= bit
+        self._by_patient.setdefault(book.patient_id, set()).add(med_book_id)
+        self._by_diagnosis[book.diagnosis_id] = (
+            self._by_diagnosis.get(book.diagnosis_id, bitmaps.EMPTY) | bit
+        )
+        for symptom_id in book.symptom_ids:
+            self._by_symptom[symptom_id] = (
+                self._by_symptom.get(symptom_id, bitmaps.EMPTY) | bit
+            )
+        for item_id, is_helped in book.reviewed_items:
+            self._by_item[item_id] = self._by_item.get(item_id, bitmaps.EMPTY) | bit
+            self._by_helped_status[is_helped] = (
+                self._by_helped_status.get(is_helped, bitmaps.EMPTY) | bit
+            )
+            self._by_item_and_helped_status[(item_id, is_helped)] = (
+                self._by_item_and_helped_status.get((item_id, is_helped),
+                                                    bitmaps.EMPTY) | bit
+            )
+
+    def _remove(self, med_book_id: int) -> None:
+        book: _IndexedMedicalBook | None = self._books.pop(med_book_id, None)
+        if book is None:
+            return None
+
+        mask: Bitmap = ~(1 << med_book_id)
+
+        self._all &= mask
+        self._by_patient[book.patient_id].discard(med_book_id)
+        self._by_diagnosis[book.diagnosis_id] &= mask
+        for symptom_id in book.symptom_ids:
+            self._by_symptom[symptom_id] &= mask
+        for item_id, is_helped in book.reviewed_items:
+            self._by_item[item_id] &= mask
+            self._by_item_and_helped_status[(item_id, is_helped)] &= mask
+        # Карта может оставаться в множестве статуса по другому отзыву,
+        # поэтому множества статусов пересчитываются по оставшимся товарам
+        for is_helped in {is_helped for _, is_helped in book.reviewed_items}:
+            self._by_helped_status[is_helped] = bitmaps.union(
+                bitmap for (_, helped), bitmap
+                in self._by_item_and_helped_status.items() if helped == is_helped
+            )
+
+    # -----------------------------------------------------------------------------------
+    # Поиск
+    # -----------------------------------------------------------------------------------
+    def search(self,
+               filter_params: schemas.FindMedicalBooks,
+               match_all_symptoms: bool = False
+               ) -> Bitmap:
+        """
+        Возвращает битовое множество карт, подходящих под фильтры.
+
+        :param filter_params: Параметры поиска (учитываются все заданные фильтры).
+        :param match_all_symptoms: Карта должна содержать все `symptom_ids`,
+            а не хотя бы один из них.
+        """
+        with self._lock:
+            result: Bitmap = self._all
+
+            if filter_params.patient_id is not None:
+                result &= bitmaps.from_ids(
+                    self._by_patient.get(filter_params.patient_id, ())
+                )
+
+            if filter_params.diagnosis_id is not None:
+                result &= self._by_diagnosis.get(filter_params.diagnosis_id,
+                                                 bitmaps.EMPTY)
+
+            if filter_params.symptom_ids is not None:
+                symptom_bitmaps = [
+                    self._by_symptom.get(symptom_id, bitmaps.EMPTY)
+                    for symptom_id in filter_params.symptom_ids
+                ]
+                result &= (bitmaps.intersection(symptom_bitmaps, result)
+                           if match_all_symptoms
+                           else bitmaps.union(symptom_bitmaps))
+
+            # Товар и статус "помогло" относятся к одному и тому же отзыву
+            if filter_params.item_ids is not None and filter_params.is_helped is not None:
+                result &= bitmaps.union(
+                    self._by_item_and_helped_status.get((item_id, filter_params.is_helped),
+                                                        bitmaps.EMPTY)
+                    for item_id in filter_params.item_ids
+                )
+            elif filter_params.item_ids is not None:
+                result &= bitmaps.union(
+                    self._by_item.get(item_id, bitmaps.EMPTY)
+                    for item_id in filter_params.item_ids
+                )
+            elif filter_params.is_helped is not None:
+                result &= self._by_helped_status.get(filter_params.is_helped,
+                                                     bitmaps.EMPTY)
+
+            return result
+
+    def get_page(self,
+                 found: Bitmap,
+                 filter_params: schemas.FindMedicalBooks
+                 ) -> list[int]:
+        """
+        Сортирует найденные карты и возвращает идентификаторы страницы
+        в том же порядке, что и SQL-репозиторий: значения NULL последние при
+        сортировке по возрастанию и первые при сортировке по убыванию,
+        при равенстве - по `id`.
+        """
+        if filter_params.sort_field not in (None, *self.SORT_FIELDS):
+            raise ValueError(f'Sorting by `{filter_params.sort_field}` '
+                             f'is not supported by the index')
+
+        offset: int = filter_params.offset or 0
+        stop: int | None = (offset + filter_params.limit
+                            if filter_params.limit is not None else None)
+        is_desc: bool = filter_params.sort_direction == 'desc'
+
+        if filter_params.sort_field is None:
+            return list(islice(bitmaps.iter_ids(found), offset, stop))
+
+        if filter_params.sort_field == 'id':
+            return list(islice(bitmaps.iter_ids(found, reverse=is_desc), offset, stop))
+
+        with self._lock:
+            sort_values: dict[int, int | None] = {
+                med_book_id: getattr(self._books[med_book_id], filter_params.sort_field)
+                for med_book_id in bitmaps.iter_ids(found)
+                if med_book_id in self._books
+            }
+
+        def sort_key(med_book_id: int) -> tuple:
+            value = sort_values[med_book_id]
+            if is_desc:
+                return value is not None, -(value or 0), med_book_id
+            return value is None, value or 0, med_book_id
+
+        if stop is None:
+            page = sorted(sort_values, key=sort_key)
+        else:
+            page = heapq.nsmallest(stop, sort_values, key=sort_key)
+        return page[offset:]
+
+
+def _to_bitmaps(ids_by_key: dict) -> dict:
+    return {key: bitmaps.from_ids(ids) for key, ids in ids_by_key.items()}
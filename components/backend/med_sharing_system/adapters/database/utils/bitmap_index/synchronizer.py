@@ -0,0 +1,144 @@
+import logging
+from contextlib import nullcontext
+from typing import Iterable, Protocol
+
+from sqlalchemy import Connection, Engine, event, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.application import entities
+
+logger = logging.getLogger(__name__)
+
+
+class SynchronizedIndex(Protocol):
+    """
+    Индекс медицинских карт, который умеет перечитывать отдельные карты
+    из БД (`MedicalBooksBitmapIndex`, `ItemCooccurrenceIndex`).
+    """
+    is_built: bool
+
+    def rebuild(self, connection: Connection) -> None:
+        ...
+
+    def refresh(self, connection: Connection, med_book_ids: Iterable[int]) -> None:
+        ...
+
+
+class MedicalBooksIndexSynchronizer:
+    """
+    Обновляет индекс медицинских карт (`MedicalBooksBitmapIndex`,
+    `ItemCooccurrenceIndex`) по событиям записи сессии. На одну фабрику
+    сессий можно подключить несколько синхронизаторов с разными индексами.
+
+    Во время flush собираются идентификаторы медицинских карт, которых
+    коснулись изменения (сами карты, их отзывы, а также удаляемые симптомы,
+    диагнозы, пациенты и товары). После commit эти карты перечитываются
+    из БД, после rollback изменения отбрасываются.
+
+    Изменения, сделанные в обход ORM (Core-запросы, другие процессы), индекс
+    не видит - их применяет `MedicalBooksChangeFeed`.
+    """
+    _INFO_KEY = 'medical_books_index_changes'
+
+    def __init__(self,
+                 index: SynchronizedIndex,
+                 bind: Engine | Connection
+                 ) -> None:
+        self.index = index
+        self.bind = bind
+        # Каждый синхронизатор копит изменения сессии отдельно
+        self._info_key = f'{self._INFO_KEY}_{id(self)}'
+
+    def attach(self, target: sessionmaker | Session | type[Session]) -> None:
+        event.listen(target, 'before_flush', self._before_flush)
+        event.listen(target, 'after_flush', self._after_flush)
+        event.listen(target, 'after_commit', self._after_commit)
+        event.listen(target, 'after_rollback', self._after_rollback)
+
+    def detach(self, target: sessionmaker | Session | type[Session]) -> None:
+        event.remove(target, 'before_flush', self._before_flush)
+        event.remove(target, 'after_flush', self._after_flush)
+        event.remove(target, 'after_commit', self._after_commit)
+        event.remove(target, 'after_rollback', self._after_rollback)
+
+    def _get_changes(self, session: Session) -> set[int]:
+        return session.info.setdefault(self._info_key, set())
+
+    def _before_flush(self, session: Session, flush_context, instances) -> None:
+        """
+        Связи удаляемых объектов исчезают каскадно в БД, поэтому затронутые
+        карты определяются до flush.
+        """
+        changed_reviews: set[int] = {
+            obj.id for obj in (*session.dirty, *session.deleted)
+            if isinstance(obj, entities.ItemReview) and obj.id is not None
+        }
+        deleted: dict[type, set[int]] = {}
+        for obj in session.deleted:
+            deleted.setdefault(type(obj), set()).add(getattr(obj, 'id', None))
+
+        med_books = tables.medical_books
+        med_books_symptoms = tables.medical_books_symptoms
+        med_books_reviews = tables.medical_books_item_reviews
+        reviews = tables.item_reviews
+
+        queries = []
+        if changed_reviews:
+            queries.append(
+                select(med_books_reviews.c.med_book_id)
+                .where(med_books_reviews.c.item_review_id.in_(changed_reviews))
+            )
+        if deleted.get(entities.TreatmentItem):
+            queries.append(
+                select(med_books_reviews.c.med_book_id)
+                .join_from(med_books_reviews, reviews,
+                           reviews.c.id == med_books_reviews.c.item_review_id)
+                .where(reviews.c.item_id.in_(deleted[entities.TreatmentItem]))
+            )
+        if deleted.get(entities.Symptom):
+            queries.append(
+                select(med_books_symptoms.c.med_book_id)
+                .where(med_books_symptoms.c.symptom_id.in_(deleted[entities.Symptom]))
+            )
+        if deleted.get(entities.Diagnosis):
+            queries.append(
+                select(med_books.c.id)
+                .where(med_books.c.diagnosis_id.in_(deleted[entities.Diagnosis]))
+            )
+        if deleted.get(entities.Patient):
+            queries.append(
+                select(med_books.c.id)
+                .where(med_books.c.patient_id.in_(deleted[entities.Patient]))
+            )
+
+        changes: set[int] = self._get_changes(session)
+        connection: Connection = session.connection()
+        for query in queries:
+            changes.update(connection.execute(query).scalars())
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        # Новые карты получают id только во время flush
+        self._get_changes(session).update(
+            obj.id for obj in (*session.new, *session.dirty, *session.deleted)
+            if isinstance(obj, entities.MedicalBook) and obj.id is not None
+        )
+
+    def _after_commit(self, session: Session) -> None:
+        changes: set[int] = session.info.pop(self._info_key, set())
+        if not changes or not self.index.is_built:
+            return None
+
+        try:
+            connection_context = (nullcontext(self.bind)
+                                  if isinstance(self.bind, Connection)
+                                  else self.bind.connect())
+            with connection_context as connection:
+                self.index.refresh(connection, changes)
+        except Exception:
+            # Ошибка обновления индекса не должна ломать уже выполненный commit
+            logger.exception('Failed to refresh %s', type(self.index).__name__,
+                             extra={'med_book_ids': sorted(changes)})
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(self._info_key, None)
@@ -0,0 +1,86 @@
+"""
+Общие операции журналов изменений (`patient_changes`, `medical_book_changes`).
+
+Отметкой служит нижняя граница активных транзакций: все транзакции
+с меньшим номером завершены, поэтому их записи в журнале окончательны.
+Потребители сохраняют прочитанные отметки в `change_journal_consumers`,
+и `prune` удаляет записи, которые прочитали все потребители.
+"""
+import os
+import socket
+from datetime import timedelta
+
+from sqlalchemy import BigInteger, Table, Text, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from med_sharing_system.adapters.database import tables
+
+
+def get_consumer_name(name: str) -> str:
+    """
+    Имя потребителя журнала, уникальное для процесса. Вызывается в самом
+    процессе (после fork), иначе процессы получат одно имя.
+    """
+    return f'{name}@{socket.gethostname()}:{os.getpid()}'
+
+
+def get_change_mark(executor: Connection | Session) -> int:
+    query = select(
+        cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+    )
+    return executor.execute(query).scalar_one()
+
+
+def save_change_mark(executor: Connection | Session,
+                     journal: Table,
+                     consumer: str,
+                     change_mark: int
+                     ) -> None:
+    consumers = tables.change_journal_consumers
+    executor.execute(
+        insert(consumers)
+        .values(journal=journal.name, consumer=consumer, change_mark=change_mark)
+        .on_conflict_do_update(index_elements=[consumers.c.journal,
+                                               consumers.c.consumer],
+                               set_={'change_mark': change_mark,
+                                     'updated_at': func.now()})
+    )
+
+
+def fetch_saved_change_mark(executor: Connection | Session,
+                            journal: Table,
+                            consumer: str
+                            ) -> int | None:
+    consumers = tables.change_journal_consumers
+    return executor.execute(
+        select(consumers.c.change_mark)
+        .where(consumers.c.journal == journal.name,
+               consumers.c.consumer == consumer)
+    ).scalar_one_or_none()
+
+
+def prune(executor: Connection | Session, journal: Table, consumer_ttl: float) -> int:
+    """
+    Забывает потребителей, не обновлявших отметку `consumer_ttl` секунд
+    (остановленные процессы), и удаляет записи журнала, которые прочитали
+    все остальные. Пока потребителей нет, журнал не очищается.
+    Возвращает количество удаленных записей.
+    """
+    consumers = tables.change_journal_consumers
+    executor.execute(
+        delete(consumers)
+        .where(consumers.c.journal == journal.name,
+               consumers.c.updated_at < func.now() - timedelta(seconds=consumer_ttl))
+    )
+    min_mark: int | None = executor.execute(
+        select(func.min(consumers.c.change_mark))
+        .where(consumers.c.journal == journal.name)
+    ).scalar_one()
+    if min_mark is None:
+        return 0
+
+    return executor.execute(
+        delete(journal).where(journal.c.xact_id < min_mark)
+    ).rowcount
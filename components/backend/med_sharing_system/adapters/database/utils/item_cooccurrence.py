@@ -0,0 +1,138 @@
+import heapq
+import threading
+from itertools import combinations
+from typing import Iterable
+
+from sqlalchemy import Connection, Select, select
+
+from med_sharing_system.adapters.database import tables
+from med_sharing_system.application import dtos, interfaces
+
+
+class ItemCooccurrenceIndex(interfaces.ItemCooccurrenceIndex):
+    """
+    Разреженная матрица "товар x товар" в памяти процесса: для каждой пары
+    товаров хранится количество медицинских карт, в отзывах которых
+    упоминаются оба товара.
+
+    Индекс строится методом `rebuild` и поддерживается в актуальном состоянии
+    через `refresh` (см. `MedicalBooksIndexSynchronizer`,
+    `MedicalBooksChangeFeed`): пары перечитанной карты вычитаются из матрицы
+    и добавляются заново.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        # Товары карт, у которых есть хотя бы одна пара. Нужны, чтобы вычесть
+        # пары карты при ее изменении.
+        self._book_items: dict[int, tuple[int, ...]] = {}
+        self._counts: dict[int, dict[int, int]] = {}
+        self.is_built: bool = False
+
+    def __len__(self) -> int:
+        return len(self._book_items)
+
+    # -----------------------------------------------------------------------------------
+    # Построение и обновление
+    # -----------------------------------------------------------------------------------
+    def rebuild(self, connection: Connection) -> None:
+        """
+        Полностью перестраивает индекс по данным БД. Новая матрица строится
+        без блокировки, и до ее подстановки поиск идет по прежней. Изменения,
+        примененные к прежней матрице за это время, теряются - их заново
+        применяет `MedicalBooksChangeFeed`, отметка которого берется до
+        перестроения.
+        """
+        built = type(self)()
+        for med_book_id, item_ids in self._load(connection, None).items():
+            built._add(med_book_id, item_ids)
+
+        with self._lock:
+            self._book_items = built._book_items
+            self._counts = built._counts
+            self.is_built = True
+
+    def refresh(self, connection: Connection, med_book_ids: Iterable[int]) -> None:
+        """
+        Перечитывает из БД товары указанных медицинских карт. Карты, которых
+        больше нет в БД или в которых не осталось отзывов, удаляются из индекса.
+        """
+        med_book_ids = set(med_book_ids)
+        if not med_book_ids:
+            return None
+
+        with self._lock:
+            loaded: dict[int, set[int]] = self._load(connection, med_book_ids)
+            for med_book_id in med_book_ids:
+                self._remove(med_book_id)
+                self._add(med_book_id, loaded.get(med_book_id, ()))
+
+    @staticmethod
+    def _load(connection: Connection,
+              med_book_ids: set[int] | None
+              ) -> dict[int, set[int]]:
+        med_books_reviews = tables.medical_books_item_reviews
+        reviews = tables.item_reviews
+
+        query: Select = (
+            select(med_books_reviews.c.med_book_id, reviews.c.item_id)
+            .join_from(med_books_reviews, reviews,
+                       reviews.c.id == med_books_reviews.c.item_review_id)
+        )
+        if med_book_ids is not None:
+            query = query.where(med_books_reviews.c.med_book_id.in_(med_book_ids))
+
+        book_items: dict[int, set[int]] = {}
+        for med_book_id, item_id in connection.execute(query):
+            book_items.setdefault(med_book_id, set()).add(item_id)
+        return book_items
+
+    def _add(self, med_book_id: int, item_ids: Iterable[int]) -> None:
+        item_ids: tuple[int, ...] = tuple(sorted(item_ids))
+        if len(item_ids) < 2:
+            return None
+
+        self._book_items[med_book_id] = item_ids
+        for first_id, second_id in combinations(item_ids, 2):
+            first_row: dict[int, int] = self._counts.setdefault(first_id, {})
+            first_row[second_id] = first_row.get(second_id, 0) + 1
+            second_row: dict[int, int] = self._counts.setdefault(second_id, {})
+            second_row[first_id] = second_row.get(first_id, 0) + 1
+
+    def _remove(self, med_book_id: int) -> None:
+        item_ids: tuple[int, ...] | None = self._book_items.pop(med_book_id, None)
+        if item_ids is None:
+            return None
+
+        for first_id, second_id in combinations(item_ids, 2):
+            self._decrement(first_id, second_id)
+            self._decrement(second_id, first_id)
+
+    def _decrement(self, item_id: int, related_id: int) -> None:
+        row: dict[int, int] = self._counts[item_id]
+        row[related_id] -= 1
+        if not row[related_id]:
+            del row[related_id]
+            if not row:
+                del self._counts[item_id]
+
+    # -----------------------------------------------------------------------------------
+    # Поиск
+    # -----------------------------------------------------------------------------------
+    def get_related_items(self, item_id: int, limit: int) -> list[dtos.RelatedItem]:
+        """
+        Возвращает `limit` товаров, которые чаще всего встречаются в одних
+        картах с `item_id`. При равенстве первым идет меньший id.
+        """
+        with self._lock:
+            row: dict[int, int] = self._counts.get(item_id, {})
+            related: list[tuple[int, int]] = heapq.nsmallest(
+                limit, row.items(), key=lambda related_item: (-related_item[1],
+                                                              related_item[0])
+            )
+
+        return [dtos.RelatedItem(item_id=related_id, med_books_count=med_books_count)
+                for related_id, med_books_count in related]
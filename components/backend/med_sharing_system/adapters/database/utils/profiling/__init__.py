@@ -0,0 +1,2 @@
+from .query_profiler import QueryProfiler
+from .statistics import QueryStatistics, get_fingerprint
@@ -0,0 +1,72 @@
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+
+from sqlalchemy import Engine, event
+
+from .statistics import QueryStatistics
+
+
+class QueryProfiler:
+    """
+    Собирает статистику SQL-запросов, выполняемых через `engine`
+    (или через любой движок, если передан класс `Engine`).
+
+    Статистика собирается только между вызовами `start` и `stop` и только для
+    текущего потока, поэтому профилировать можно каждый HTTP-запрос отдельно.
+    Допускается вложенное профилирование: запрос учитывается во всех активных
+    сборщиках текущего потока.
+    """
+
+    def __init__(self, engine: Engine | type[Engine]):
+        self.engine = engine
+        self._storage = threading.local()
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @property
+    def _collectors(self) -> list[QueryStatistics]:
+        collectors = getattr(self._storage, 'collectors', None)
+        if collectors is None:
+            collectors = self._storage.collectors = []
+        return collectors
+
+    def start(self) -> QueryStatistics:
+        statistics = QueryStatistics()
+        self._collectors.append(statistics)
+        return statistics
+
+    def stop(self, statistics: QueryStatistics) -> QueryStatistics:
+        if statistics in self._collectors:
+            self._collectors.remove(statistics)
+        return statistics
+
+    @contextmanager
+    def profile(self) -> Iterator[QueryStatistics]:
+        statistics = self.start()
+        try:
+            yield statistics
+        finally:
+            self.stop(statistics)
+
+    def detach(self) -> None:
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.remove(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        # Время начала хранится в контексте выполнения, а не в `conn.info`:
+        # для упавшего запроса `after_cursor_execute` не вызывается, и запись
+        # в пуле соединений осталась бы навсегда
+        context._query_start_time = perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        if not self._collectors:
+            return None
+
+        duration = perf_counter() - context._query_start_time
+        for statistics in self._collectors:
+            statistics.add(statement, duration)
@@ -0,0 +1,77 @@
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+_WHITESPACES = re.compile(r'\s+')
+
+# Параметры драйвера (%(name)s, %s, ?), строковые и числовые литералы
+_VALUES = re.compile(r"%\(\w+\)s|%s|\?|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+# Развернутые списки параметров: IN (?, ?, ?) -> IN (...)
+_VALUE_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+
+
+def get_fingerprint(statement: str) -> str:
+    """
+    Возвращает "отпечаток" SQL-запроса: текст запроса без значений параметров.
+
+    Запросы, которые отличаются только значениями параметров (или длиной списка
+    в IN), получают одинаковый отпечаток.
+
+    :param statement: Текст SQL-запроса.
+    :return: Нормализованный текст запроса.
+    """
+    fingerprint = _WHITESPACES.sub(' ', statement).strip()
+    fingerprint = _VALUES.sub('?', fingerprint)
+    return _VALUE_LISTS.sub('IN (...)', fingerprint)
+
+
+@dataclass
+class QueryStatistics:
+    """
+    Статистика SQL-запросов, выполненных за время профилирования.
+
+    Длительность хранится в секундах.
+    """
+    statements_count: int = 0
+    total_duration: float = 0.0
+    slowest_duration: float = 0.0
+    slowest_fingerprint: str | None = None
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def add(self, statement: str, duration: float) -> None:
+        fingerprint = get_fingerprint(statement)
+
+        self.statements_count += 1
+        self.total_duration += duration
+        self.fingerprints[fingerprint] += 1
+
+        if self.slowest_fingerprint is None or duration > self.slowest_duration:
+            self.slowest_duration = duration
+            self.slowest_fingerprint = fingerprint
+
+    @property
+    def slowest_fingerprint_hash(self) -> str | None:
+        """
+        Короткий хэш самого медленного запроса. Позволяет сопоставить значение
+        заголовка `Server-Timing` с записью в логах, не раскрывая текст запроса.
+        """
+        if self.slowest_fingerprint is None:
+            return None
+
+        return hashlib.sha1(self.slowest_fingerprint.encode()).hexdigest()[:12]
+
+    def get_repeated_fingerprints(self, threshold: int) -> dict[str, int]:
+        """
+        Возвращает отпечатки запросов, выполненных не менее `threshold` раз.
+        Многократное повторение одного и того же запроса - признак проблемы N+1.
+
+        :param threshold: Минимальное количество повторений.
+        :return: Словарь {отпечаток: количество выполнений}.
+        """
+        return {
+            fingerprint: count
+            for fingerprint, count in self.fingerprints.most_common()
+            if count >= threshold
+        }
@@ -0,0 +1,5 @@
+from .process_pool import ProcessPoolPatientSimilarityIndex
+
+__all__ = (
+    'ProcessPoolPatientSimilarityIndex',
+)
@@ -0,0 +1,211 @@
+import multiprocessing
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable
+
+from med_sharing_system.adapters.snapshots import SharedPatientProfiles
+from med_sharing_system.application import dtos, entities, errors, interfaces, schemas
+
+IndexFactory = Callable[[], interfaces.PatientSimilarityIndex]
+# Изменения индекса после публикации профилей: (обновленные профили, удаленные id)
+IndexChange = tuple[tuple[entities.PatientProfile, ...], tuple[int, ...]]
+
+
+class _WorkerState:
+    """
+    Индекс рабочего процесса, построенный по опубликованным профилям.
+    """
+    index: interfaces.PatientSimilarityIndex | None = None
+    profiles_name: str | None = None
+    applied_changes: int = 0
+
+
+def _init_worker(create_index: IndexFactory) -> None:
+    # Остановкой по Ctrl+C управляет родительский процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _WorkerState.index = create_index()
+
+
+def _search_in_worker(profiles_name: str,
+                      changes: tuple[IndexChange, ...],
+                      match_params: schemas.MatchPatients,
+                      deadline: float | None
+                      ) -> list[dtos.MatchedPatient]:
+    state = _WorkerState
+    if state.profiles_name != profiles_name:
+        profiles, _ = SharedPatientProfiles.read(profiles_name)
+        state.index.rebuild(profiles)
+        state.profiles_name = profiles_name
+        state.applied_changes = 0
+
+    for upserted, removed in changes[state.applied_changes:]:
+        state.index.upsert(upserted)
+        state.index.remove(removed)
+    state.applied_changes = len(changes)
+
+    return state.index.search(match_params, deadline=deadline)
+
+
+class ProcessPoolPatientSimilarityIndex(interfaces.PatientSimilarityIndex):
+    """
+    Индекс подбора, который выполняет поиск в пуле процессов, чтобы
+    вычисление сходства не занимало GIL процесса, обслуживающего
+    соединение с брокером.
+
+    Основной индекс (`create_index()`) ведется в текущем процессе. Его
+    профили публикуются в разделяемую память (`SharedPatientProfiles`),
+    по ним каждый рабочий процесс строит собственную копию индекса.
+    Обновления после публикации передаются вместе с запросами поиска,
+    а когда их накапливается больше `max_pending_changes`, профили
+    публикуются заново.
+
+    Если поиск не укладывается в `deadline`, ожидание прерывается ошибкой
+    `MatchingDeadlineExceeded`, а рабочий процесс прекращает поиск по тому
+    же сроку.
+    """
+
+    def __init__(self,
+                 create_index: IndexFactory,
+                 processes: int,
+                 max_pending_changes: int = 256
+                 ) -> None:
+        assert processes >= 1, 'Number of processes should be positive'
+        self.create_index = create_index
+        self.processes = processes
+        self.max_pending_changes = max_pending_changes
+
+        self._index: interfaces.PatientSimilarityIndex = create_index()
+        self._lock = threading.RLock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._profiles: SharedPatientProfiles | None = None
+        self._changes: tuple[IndexChange, ...] = ()
+        self._changes_size: int = 0
+        # Число поисков, которые используют сегмент, и сегменты, которые
+        # будут удалены после их завершения
+        self._searches: Counter[str] = Counter()
+        self._retired: dict[str, SharedPatientProfiles] = {}
+
+    @property
+    def is_built(self) -> bool:
+        return self._index.is_built
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # -----------------------------------------------------------------------------------
+    # Построение и обновление
+    # -----------------------------------------------------------------------------------
+    def rebuild(self, profiles: Iterable[entities.PatientProfile]) -> None:
+        profiles = list(profiles)
+        with self._lock:
+            self._index.rebuild(profiles)
+            self._publish(profiles)
+
+    def upsert(self, profiles: Iterable[entities.PatientProfile]) -> None:
+        profiles = tuple(profiles)
+        with self._lock:
+            self._index.upsert(profiles)
+            self._add_change((profiles, ()))
+
+    def remove(self, patient_ids: Iterable[int]) -> None:
+        patient_ids = tuple(patient_ids)
+        with self._lock:
+            self._index.remove(patient_ids)
+            self._add_change(((), patient_ids))
+
+    def get_profiles(self) -> list[entities.PatientProfile]:
+        return self._index.get_profiles()
+
+    def _add_change(self, change: IndexChange) -> None:
+        upserted, removed = change
+        if self._profiles is None or not (upserted or removed):
+            return None
+
+        self._changes += (change,)
+        self._changes_size += len(upserted) + len(removed)
+        if self._changes_size > self.max_pending_changes:
+            self._publish(self._index.get_profiles())
+
+    def _publish(self, profiles: list[entities.PatientProfile]) -> None:
+        previous: SharedPatientProfiles | None = self._profiles
+        self._profiles = SharedPatientProfiles.create(profiles)
+        self._changes, self._changes_size = (), 0
+
+        if previous is None:
+            return None
+        if self._searches[previous.name]:
+            self._retired[previous.name] = previous
+        else:
+            previous.unlink()
+
+    def _release(self, profiles_name: str, future: Future) -> None:
+        with self._lock:
+            self._searches[profiles_name] -= 1
+            if self._searches[profiles_name]:
+                return None
+            del self._searches[profiles_name]
+            retired: SharedPatientProfiles | None = self._retired.pop(profiles_name,
+                                                                     None)
+            if retired is not None:
+                retired.unlink()
+
+    # -----------------------------------------------------------------------------------
+    # Поиск
+    # -----------------------------------------------------------------------------------
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Рабочие процессы не наследуют память и потоки текущего процесса:
+            # индекс они строят по разделяемой памяти
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('forkserver'),
+                initializer=_init_worker,
+                initargs=(self.create_index,)
+            )
+        return self._pool
+
+    def search(self,
+               match_params: schemas.MatchPatients,
+               deadline: float | None = None
+               ) -> list[dtos.MatchedPatient]:
+        with self._lock:
+            if self._profiles is None:
+                return self._index.search(match_params, deadline=deadline)
+
+            profiles_name: str = self._profiles.name
+            future: Future = self._get_pool().submit(_search_in_worker,
+                                                     profiles_name,
+                                                     self._changes,
+                                                     match_params,
+                                                     deadline)
+            self._searches[profiles_name] += 1
+        future.add_done_callback(partial(self._release, profiles_name))
+
+        timeout: float | None = (max(deadline - time.monotonic(), 0)
+                                 if deadline is not None else None)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise errors.MatchingDeadlineExceeded
+
+    def close(self) -> None:
+        """
+        Останавливает рабочие процессы и удаляет сегменты разделяемой памяти.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        # Завершение поиска освобождает сегмент под блокировкой
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        with self._lock:
+            for shared in (self._profiles, *self._retired.values()):
+                if shared is not None:
+                    shared.unlink()
+            self._profiles = None
+            self._retired.clear()
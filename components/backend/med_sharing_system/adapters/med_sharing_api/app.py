@@ -1,12 +1,19 @@
+from functools import partial
+
 import falcon
 from pydantic import ValidationError
 
+from med_sharing_system.adapters.database import QueryProfiler
 from med_sharing_system.application import services
-from med_sharing_system.application.errors import Error, ErrorsList
+from med_sharing_system.application.errors import (
+    Error,
+    ErrorsList,
+    MatchingQueueOverloaded
+)
 from . import controllers
 from .settings import SwaggerSettings
 from .spec import setup_spectree
-from .utils import error_handlers
+from .utils import error_handlers, middlewares
 
 
 def create_app(swagger_settings: SwaggerSettings,
@@ -21,15 +28,37 @@ def create_app(swagger_settings: SwaggerSettings,
                patient: services.Patient,
                symptom: services.Symptom,
                patient_matcher: services.PatientMatcher | None = None,
+               patient_matching_timeout: float | None = None,
+               publication_errors: tuple[type[Exception], ...] = (),
+               patient_matching_retry_after: int = 5,
+               treatment_recommender: services.TreatmentRecommender | None = None,
+               query_profiler: QueryProfiler | None = None,
+               query_repeats_threshold: int = 0,
                ) -> falcon.App:
-    cors_middleware = falcon.CORSMiddleware(allow_origins=allow_origins)
+    expose_headers = ['Server-Timing'] if query_profiler is not None else None
+    cors_middleware = falcon.CORSMiddleware(allow_origins=allow_origins,
+                                            expose_headers=expose_headers)
     middleware = [cors_middleware]
 
+    if query_profiler is not None:
+        middleware.append(
+            middlewares.QueryProfilingMiddleware(
+                profiler=query_profiler,
+                repeats_threshold=query_repeats_threshold
+            )
+        )
+
     app = falcon.App(middleware=middleware)
 
     app.add_error_handler(ValidationError, error_handlers.validation_error)
     app.add_error_handler(Error, error_handlers.app_error)
     app.add_error_handler(ErrorsList, error_handlers.app_errors_list)
+    app.add_error_handler(MatchingQueueOverloaded, error_handlers.queue_overloaded)
+    # Ошибки публикации, которые означают, что брокер не принял запрос
+    for publication_error in publication_errors:
+        app.add_error_handler(publication_error,
+                              partial(error_handlers.publication_rejected,
+                                      retry_after=patient_matching_retry_after))
 
     # Diagnoses
     app.add_route(f'{api_prefix}/diagnoses',
@@ -70,6 +99,9 @@ def create_app(swagger_settings: SwaggerSettings,
     app.add_route(f'{api_prefix}/items/{{item_id}}',
                   controllers.Catalog(catalog=catalog),
                   suffix='by_id')
+    app.add_route(f'{api_prefix}/items/{{item_id}}/related',
+                  controllers.Catalog(catalog=catalog),
+                  suffix='related')
     app.add_route(f'{api_prefix}/items/{{item_id}}/reviews',
                   controllers.Catalog(catalog=catalog),
                   suffix='by_id_with_reviews')
@@ -77,6 +109,12 @@ def create_app(swagger_settings: SwaggerSettings,
                   controllers.Catalog(catalog=catalog),
                   suffix='with_reviews')
 
+    if treatment_recommender is not None:
+        app.add_route(f'{api_prefix}/items/recommendations',
+                      controllers.TreatmentRecommendations(
+                          treatment_recommender=treatment_recommender
+                      ))
+
     # Item Categories
     app.add_route(f'{api_prefix}/item_categories',
                   controllers.ItemCategories(item_category=item_category))
@@ -145,7 +183,10 @@ def create_app(swagger_settings: SwaggerSettings,
     if patient_matcher is not None:
         app.add_route(f'{api_prefix}/', controllers.Index())
         app.add_route(f'{api_prefix}/patients/match',
-                      controllers.PatientMatching(patient_matcher=patient_matcher))
+                      controllers.PatientMatching(
+                          patient_matcher=patient_matcher,
+                          inline_timeout=patient_matching_timeout
+                      ))
 
     if swagger_settings.ON:
         setup_spectree(
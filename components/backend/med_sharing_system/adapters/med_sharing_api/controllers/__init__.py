@@ -8,3 +8,4 @@ from .medical_books import MedicalBooks
 from .patient_matching import PatientMatching
 from .patients import Patients
 from .symptoms import Symptoms
+from .treatment_recommendations import TreatmentRecommendations
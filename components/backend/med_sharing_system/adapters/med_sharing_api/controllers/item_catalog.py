@@ -49,6 +49,26 @@ class Catalog:
         resp.media = item.dict(decode=True, exclude_none=True, exclude_unset=True)
         resp.status = status_codes.HTTP_200
 
+    @spectree.validate(
+        path_parameter_descriptions={"item_id": "Integer"},
+        query=api_schemas.GetRelatedItems,
+        resp=Response(HTTP_200=list[dtos.RelatedItem]),
+        tags=["Items"]
+    )
+    def on_get_related(self, req, resp, item_id):
+        """
+        Товары, которые чаще всего используются вместе с заданным item
+        (упоминаются в отзывах тех же медицинских карт).
+        """
+        filter_params = schemas.GetRelatedItems(item_id=item_id,
+                                                limit=req.context.query.limit)
+        related_items: list[dtos.RelatedItem] = (
+            self.catalog.get_related_items(filter_params)
+        )
+
+        resp.media = [item.dict() for item in related_items]
+        resp.status = status_codes.HTTP_200
+
     @spectree.validate(
         query=schemas.FindTreatmentItems,
         resp=Response(HTTP_200=list[dtos.TreatmentItem]),
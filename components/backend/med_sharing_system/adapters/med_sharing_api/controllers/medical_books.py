@@ -63,7 +63,8 @@ class MedicalBooks:
             sort_field=req.context.query.sort_field,
             sort_direction=req.context.query.sort_direction,
             limit=req.context.query.limit,
-            offset=req.context.query.offset
+            offset=req.context.query.offset,
+            symptoms_limit=req.context.query.symptoms_limit
         )
         found_books: list[dtos.MedicalBookWithSymptoms | None] = (
             self.med_book.find_med_books_with_symptoms(filter_params)
@@ -107,7 +108,10 @@ class MedicalBooks:
             sort_field=req.context.query.sort_field,
             sort_direction=req.context.query.sort_direction,
             limit=req.context.query.limit,
-            offset=req.context.query.offset
+            offset=req.context.query.offset,
+            reviews_sort_field=req.context.query.reviews_sort_field,
+            reviews_sort_direction=req.context.query.reviews_sort_direction,
+            reviews_limit=req.context.query.reviews_limit
         )
         found_books: list[dtos.MedicalBookWithItemReviews | None] = (
             self.med_book.find_med_books_with_reviews(filter_params)
@@ -155,7 +159,11 @@ class MedicalBooks:
             sort_field=req.context.query.sort_field,
             sort_direction=req.context.query.sort_direction,
             limit=req.context.query.limit,
-            offset=req.context.query.offset
+            offset=req.context.query.offset,
+            symptoms_limit=req.context.query.symptoms_limit,
+            reviews_sort_field=req.context.query.reviews_sort_field,
+            reviews_sort_direction=req.context.query.reviews_sort_direction,
+            reviews_limit=req.context.query.reviews_limit
         )
         found_books: list[dtos.MedicalBookWithSymptomsAndItemReviews | None] = (
             self.med_book.find_med_books_with_symptoms_and_reviews(filter_params)
@@ -1,23 +1,42 @@
-from falcon import status_codes, HTTP_BAD_REQUEST
+from falcon import status_codes
+from spectree import Response
 
-from med_sharing_system.application import services
+from med_sharing_system.application import dtos, services, schemas
 from .. import schemas as api_schemas
 from ..spec import spectree
 
 
 class PatientMatching:
-    def __init__(self, patient_matcher: services.PatientMatcher):
+    def __init__(self,
+                 patient_matcher: services.PatientMatcher,
+                 inline_timeout: float | None = None):
         self.patient_matcher = patient_matcher
+        self.inline_timeout = inline_timeout
 
     @spectree.validate(
-        json=api_schemas.ClientId,
+        json=api_schemas.PatientMatchingRequest,
+        resp=Response('HTTP_202', 'HTTP_429', HTTP_200=list[dtos.MatchedPatient]),
         tags=["Patient Matching"]
     )
     def on_post(self, req, resp):
-        client_id = req.media.get('client_id')
-        if client_id:
-            self.patient_matcher.publish_request_for_search_patients(client_id)
+        """
+        Запрос на подбор пациентов, похожих на клиента по симптомам,
+        диагнозу и личным данным. Если подбор успевает выполниться сразу,
+        результат возвращается в ответе, иначе он придет клиенту отдельным
+        сообщением. Если очередь подбора перегружена, запрос отклоняется
+        с кодом 429 и заголовком Retry-After.
+        """
+        match_params = schemas.MatchPatients(**req.media)
+        found_patients: list[dtos.MatchedPatient] | None = (
+            self.patient_matcher.match_patients(req.media['client_id'],
+                                                match_params,
+                                                timeout=self.inline_timeout)
+        )
+
+        if found_patients is None:
             resp.media = "Request accepted for processing"
             resp.status = status_codes.HTTP_202
-        else:
-            resp.status = HTTP_BAD_REQUEST
+            return None
+
+        resp.media = [patient.dict() for patient in found_patients]
+        resp.status = status_codes.HTTP_200
@@ -0,0 +1,30 @@
+from falcon import status_codes
+from spectree import Response
+
+from med_sharing_system.application import dtos, services, schemas
+from ..spec import spectree
+
+
+class TreatmentRecommendations:
+    def __init__(self, treatment_recommender: services.TreatmentRecommender):
+        self.treatment_recommender = treatment_recommender
+
+    @spectree.validate(
+        query=schemas.RecommendTreatmentItems,
+        resp=Response(HTTP_200=list[dtos.RecommendedItem]),
+        tags=["Items"]
+    )
+    def on_get(self, req, resp):
+        """
+        Рекомендация items для профиля "диагноз + симптомы": товары, которые
+        помогали и получали высокие оценки в похожих медицинских картах.
+        """
+        params = schemas.RecommendTreatmentItems(
+            diagnosis_id=req.context.query.diagnosis_id,
+            symptom_ids=req.context.query.symptom_ids,
+            limit=req.context.query.limit
+        )
+        items: list[dtos.RecommendedItem] = self.treatment_recommender.recommend(params)
+
+        resp.media = [item.dict() for item in items]
+        resp.status = status_codes.HTTP_200
@@ -1,4 +1,5 @@
 from .item_catalog import (
+    GetRelatedItems,
     GetTreatmentItemWithReviews,
     PutTreatmentItemInfo,
 )
@@ -17,4 +18,4 @@ from .medical_book import (
 )
 from .patient import InputUpdatedPatientInfo
 from .symptom import SymptomOutput
-from .client import ClientId
+from .client import ClientId, PatientMatchingRequest
@@ -1,5 +1,11 @@
 from pydantic import BaseModel as BaseSchema, Field
 
+from med_sharing_system.application import schemas
+
 
 class ClientId(BaseSchema):
     client_id: str = Field(..., example="client_1")
+
+
+class PatientMatchingRequest(ClientId, schemas.MatchPatients):
+    pass
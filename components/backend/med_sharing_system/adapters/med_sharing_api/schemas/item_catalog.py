@@ -4,6 +4,10 @@ from typing import Literal
 from pydantic import BaseModel as BaseSchema, Field
 
 
+class GetRelatedItems(BaseSchema):
+    limit: int = Field(10, ge=1, le=100)
+
+
 class GetTreatmentItemWithReviews(BaseSchema):
     reviews_sort_field: Literal[
         'id', 'item_id', 'is_helped', 'item_rating', 'item_count', 'usage_period'
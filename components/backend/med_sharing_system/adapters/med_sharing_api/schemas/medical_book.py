@@ -43,7 +43,8 @@ class SearchMedicalBooks(schemas.FindMedicalBooks):
         return values
 
 
-class SearchMedicalBooksWithSymptoms(SearchMedicalBooks):
+class SearchMedicalBooksWithSymptoms(SearchMedicalBooks,
+                                     schemas.FindMedicalBooksWithSymptoms):
     exclude_symptom_fields: list[Literal['id', 'name']] | None
 
     @validator('exclude_symptom_fields', pre=True)
@@ -63,7 +64,8 @@ class SearchMedicalBooksWithSymptoms(SearchMedicalBooks):
         return value
 
 
-class SearchMedicalBooksWithItemReviews(SearchMedicalBooks):
+class SearchMedicalBooksWithItemReviews(SearchMedicalBooks,
+                                        schemas.FindMedicalBooksWithItemReviews):
     exclude_item_review_fields: list[Literal[
         'id', 'item_id', 'is_helped', 'item_rating', 'item_count', 'usage_period']] | None
 
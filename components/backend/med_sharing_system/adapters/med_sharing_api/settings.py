@@ -24,6 +24,29 @@ class Settings(BaseSettings):
 
     ALLOW_ORIGINS: str | tuple[str, ...] = Field(default_factory=tuple)
 
+    # Время (мс), за которое подбор похожих пациентов пытается выполниться
+    # прямо в запросе. Если не успевает, запрос уходит в очередь подбора.
+    # 0 - всегда через очередь.
+    PATIENT_MATCHING_INLINE_TIMEOUT_MS: int = 0
+    # Период (мс), с которым индекс и кэш результатов подбора в фоне догоняют
+    # изменения в БД: запросы подбора не читают журнал изменений и могут
+    # отставать на него
+    PATIENT_MATCHING_INDEX_REFRESH_MS: int = 1000
+
+    # Глубина очереди подбора, начиная с которой запросы отклоняются с кодом
+    # 429 (0 - всегда принимаются), и глубина, до которой она должна
+    # опуститься, чтобы запросы снова принимались (0 - 3/4 верхнего порога).
+    # PATIENT_MATCHING_RETRY_AFTER_SECONDS - Retry-After, пока скорость
+    # разбора очереди неизвестна
+    PATIENT_MATCHING_QUEUE_HIGH_WATERMARK: int = 0
+    PATIENT_MATCHING_QUEUE_LOW_WATERMARK: int = 0
+    PATIENT_MATCHING_RETRY_AFTER_SECONDS: int = 5
+    PATIENT_MATCHING_QUEUE_CHECK_INTERVAL_MS: int = 500
+
+    # Период (с) перестроения индекса рекомендаций товаров в фоне.
+    # 0 - индекс строится один раз при старте
+    RECOMMENDATIONS_REFRESH_SECONDS: int = 600
+
     LOGGING_LEVEL: str = 'DEBUG'
 
     @property
@@ -5,7 +5,7 @@ from falcon import status_codes
 from pydantic import ValidationError
 
 from med_sharing_system.application.errors import (
-    Error, ErrorsList
+    Error, ErrorsList, MatchingQueueOverloaded
 )
 
 
@@ -38,3 +38,27 @@ def app_errors_list(
          'ctx': e.context}
         for e in error.errors
     ]
+
+
+def queue_overloaded(
+    request: Request, response: Response,
+    error: MatchingQueueOverloaded, params: dict[str, Any],
+):
+    response.status = status_codes.HTTP_429
+    response.set_header('Retry-After', str(error.context['retry_after']))
+    response.media = [{'type': error.code,
+                       'msg': error.message,
+                       'ctx': error.context}]
+
+
+def publication_rejected(
+    request: Request, response: Response,
+    error: Exception, params: dict[str, Any],
+    retry_after: int,
+):
+    """
+    Брокер отклонил публикацию (например, переполненная очередь
+    с `x-overflow: reject-publish`) - ответ такой же, как при перегрузке.
+    """
+    queue_overloaded(request, response,
+                     MatchingQueueOverloaded(retry_after=retry_after), params)
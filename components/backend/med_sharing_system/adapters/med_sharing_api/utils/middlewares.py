@@ -0,0 +1,92 @@
+import logging
+
+from falcon import Request, Response
+
+from med_sharing_system.adapters.database import QueryProfiler, QueryStatistics
+
+
+class QueryProfilingMiddleware:
+    """
+    Профилирует SQL-запросы, выполненные во время обработки HTTP-запроса.
+
+    Результат добавляется в заголовок ответа `Server-Timing`:
+        db;dur=<общее время>;desc="<количество запросов> statements",
+        db-slowest;dur=<время самого медленного>;desc="<хэш его отпечатка>"
+    и записывается в лог `query_profiling` вместе с отпечатком самого медленного
+    запроса.
+
+    Если задан `repeats_threshold`, то запросы с одинаковым отпечатком,
+    повторенные не менее `repeats_threshold` раз, выводятся в лог как
+    предупреждение о возможной проблеме N+1.
+    """
+
+    def __init__(self, profiler: QueryProfiler, repeats_threshold: int = 0):
+        self.profiler = profiler
+        self.repeats_threshold = repeats_threshold
+        self.logger = logging.getLogger('query_profiling')
+
+    def process_request(self, req: Request, resp: Response) -> None:
+        req.context.query_statistics = self.profiler.start()
+
+    def process_response(self, req: Request, resp: Response,
+                         resource: object, req_succeeded: bool) -> None:
+        statistics: QueryStatistics | None = req.context.get('query_statistics')
+        if statistics is None:
+            return None
+
+        self.profiler.stop(statistics)
+
+        resp.append_header('Server-Timing', self._get_server_timing(statistics))
+
+        self.logger.info(
+            'SQL statistics: %s %s', req.method, req.path,
+            extra={
+                'method': req.method,
+                'path': req.path,
+                'status': resp.status,
+                'statements_count': statistics.statements_count,
+                'db_duration_ms': self._to_ms(statistics.total_duration),
+                'slowest_duration_ms': self._to_ms(statistics.slowest_duration),
+                'slowest_fingerprint': statistics.slowest_fingerprint,
+                'slowest_fingerprint_hash': statistics.slowest_fingerprint_hash,
+            }
+        )
+
+        if self.repeats_threshold > 0:
+            self._warn_about_repeats(req, statistics)
+
+    def _warn_about_repeats(self, req: Request, statistics: QueryStatistics) -> None:
+        repeats = statistics.get_repeated_fingerprints(self.repeats_threshold)
+
+        if not repeats:
+            return None
+
+        self.logger.warning(
+            'Repeated SQL statements (possible N+1): %s %s', req.method, req.path,
+            extra={
+                'method': req.method,
+                'path': req.path,
+                'repeated_statements': [
+                    {'fingerprint': fingerprint, 'count': count}
+                    for fingerprint, count in repeats.items()
+                ],
+            }
+        )
+
+    def _get_server_timing(self, statistics: QueryStatistics) -> str:
+        metrics = [
+            f'db;dur={self._to_ms(statistics.total_duration)};'
+            f'desc="{statistics.statements_count} statements"'
+        ]
+
+        if statistics.slowest_fingerprint is not None:
+            metrics.append(
+                f'db-slowest;dur={self._to_ms(statistics.slowest_duration)};'
+                f'desc="{statistics.slowest_fingerprint_hash}"'
+            )
+
+        return ', '.join(metrics)
+
+    @staticmethod
+    def _to_ms(seconds: float) -> float:
+        return round(seconds * 1000, 2)
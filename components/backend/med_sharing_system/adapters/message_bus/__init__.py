@@ -1,7 +1,18 @@
+from .autoscaling import (
+    ProcessWorker,
+    ScalingPolicy,
+    SupervisorMetrics,
+    ThreadWorker,
+    WorkerSupervisor
+)
 from .consumers import create_delivery_consumer
+from .monitoring import QueueLoadMonitor
 from .scheme import (
     broker_scheme,
+    MATCHING_LANE_WEIGHTS,
+    MATCHING_PRIORITY_LANES,
     QUEUE_TO_MATCHING,
+    QUEUE_TO_BULK_MATCHING,
     QUEUE_TO_DELIVERY,
     EXCHANGE_TO_MATCHING,
     EXCHANGE_TO_DELIVERY
@@ -12,7 +23,16 @@ from .workers import create_match_worker
 __all__ = (
     'create_match_worker',
     'create_delivery_consumer',
+    'QueueLoadMonitor',
+    'ProcessWorker',
+    'ScalingPolicy',
+    'SupervisorMetrics',
+    'ThreadWorker',
+    'WorkerSupervisor',
     'broker_scheme',
+    'MATCHING_LANE_WEIGHTS',
+    'MATCHING_PRIORITY_LANES',
+    'QUEUE_TO_BULK_MATCHING',
     'QUEUE_TO_DELIVERY',
     'QUEUE_TO_MATCHING',
     'EXCHANGE_TO_DELIVERY',
@@ -0,0 +1,351 @@
+import logging
+import math
+import multiprocessing
+import os
+import runpy
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Protocol, Sequence
+
+from med_sharing_system.application import dtos, interfaces
+
+logger = logging.getLogger(__name__)
+
+
+class Worker(Protocol):
+    """
+    Запущенный потребитель: процесс или поток.
+    """
+
+    def is_alive(self) -> bool:
+        ...
+
+    def stop(self) -> None:
+        """
+        Просит потребителя завершиться после обработки начатых сообщений.
+        """
+        ...
+
+    def kill(self) -> None:
+        ...
+
+
+def run_module(module_name: str) -> None:
+    """
+    Выполняет модуль как `python -m module_name`. Цель для `ProcessWorker`:
+    лаунчер импортируется только в дочернем процессе.
+    """
+    runpy.run_module(module_name, run_name='__main__', alter_sys=True)
+
+
+class ProcessWorker:
+    """
+    Потребитель в отдельном процессе. `target` должна быть доступна для
+    импорта в дочернем процессе. Остановка - сигнал SIGTERM: лаунчеры
+    потребителей в ответ перестают принимать сообщения и дожидаются
+    завершения начатой обработки.
+    """
+
+    def __init__(self, target: Callable[[], None], name: str | None = None) -> None:
+        # Дочерний процесс не наследует потоки и соединения супервизора
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(target=target, name=name)
+        self.process.start()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self) -> None:
+        self.process.terminate()
+
+    def kill(self) -> None:
+        self.process.kill()
+
+
+class ThreadWorker:
+    """
+    Потребитель `KombuConsumer` (или другой объект с методами `run`
+    и `stop`) в потоке супервизора.
+    """
+
+    def __init__(self, consumer, name: str | None = None) -> None:
+        self.consumer = consumer
+        self.thread = threading.Thread(target=consumer.run, name=name, daemon=True)
+        self.thread.start()
+
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def stop(self) -> None:
+        self.consumer.stop()
+
+    def kill(self) -> None:
+        # Поток нельзя прервать: он завершится вместе с процессом
+        pass
+
+
+@dataclass(frozen=True)
+class ScalingPolicy:
+    """
+    Число потребителей по нагрузке на очередь:
+        * по глубине - один потребитель на `messages_per_worker` сообщений;
+        * по задержке - если сообщение ждет в очереди дольше `max_latency`
+          секунд, потребителей становится пропорционально больше.
+    Задержка оценивается по закону Литтла: глубина очереди, деленная на
+    скорость ее разбора. Результат ограничен `min_workers` и `max_workers`.
+    """
+    min_workers: int = 1
+    max_workers: int = 4
+    messages_per_worker: int = 50
+    max_latency: float = 5
+
+    def __post_init__(self):
+        assert 0 <= self.min_workers <= self.max_workers, \
+            'Workers bounds should satisfy 0 <= min_workers <= max_workers'
+        assert self.messages_per_worker >= 1, 'Messages per worker should be positive'
+
+    @staticmethod
+    def get_latency(load: dtos.QueueLoad) -> float | None:
+        if not load.depth:
+            return 0.0
+        if not load.drain_rate:
+            return None
+        return load.depth / load.drain_rate
+
+    def get_desired_workers(self, load: dtos.QueueLoad, current: int) -> int:
+        desired: int = math.ceil(load.depth / self.messages_per_worker)
+
+        latency: float | None = self.get_latency(load)
+        if latency is not None and latency > self.max_latency:
+            # Скорость разбора примерно пропорциональна числу потребителей
+            desired = max(desired,
+                          math.ceil(max(current, 1) * latency / self.max_latency))
+
+        return min(max(desired, self.min_workers), self.max_workers)
+
+
+@dataclass
+class SupervisorMetrics:
+    """
+    Состояние супервизора после последнего решения.
+    """
+    workers: int = 0
+    desired_workers: int = 0
+    stopping_workers: int = 0
+    queue_depth: int = 0
+    # Оценка времени ожидания в очереди (с), -1 - оценки еще нет
+    queue_latency: float = 0
+    scale_ups: int = 0
+    scale_downs: int = 0
+    restarts: int = 0
+
+    def to_prometheus(self, prefix: str, labels: dict[str, str]) -> str:
+        """
+        Метрики в текстовом формате Prometheus (например, для textfile
+        collector из node_exporter).
+        """
+        label_text: str = ','.join(f'{name}="{value}"'
+                                   for name, value in labels.items())
+        counters: set[str] = {'scale_ups', 'scale_downs', 'restarts'}
+        lines: list[str] = []
+        for name, value in asdict(self).items():
+            metric: str = (f'{prefix}_{name}_total' if name in counters
+                           else f'{prefix}_{name}')
+            lines.append(f'# TYPE {metric} {"counter" if name in counters else "gauge"}')
+            lines.append(f'{metric}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class WorkerSupervisor:
+    """
+    Держит от `policy.min_workers` до `policy.max_workers` потребителей
+    и каждые `interval` секунд выбирает их число по нагрузке на очереди
+    (`monitors`, нагрузка очередей складывается).
+
+    Новые потребители запускаются сразу, а лишние останавливаются, только
+    если нагрузка не требовала их в течение `scale_down_delay` секунд:
+    кратковременный спад не приводит к перезапускам. Остановка мягкая -
+    потребитель дообрабатывает начатые сообщения, а если он не завершился
+    за `shutdown_timeout` секунд, процесс завершается принудительно.
+    Потребители, завершившиеся сами (например, после ошибки), заменяются.
+
+    Решения пишутся в лог и доступны в `metrics`, а если задан
+    `metrics_path`, метрики записываются в этот файл в формате Prometheus.
+    """
+
+    def __init__(self,
+                 start_worker: Callable[[], Worker],
+                 monitors: Sequence[interfaces.SearchQueueMonitor],
+                 policy: ScalingPolicy,
+                 name: str = 'worker',
+                 interval: float = 2,
+                 scale_down_delay: float = 60,
+                 shutdown_timeout: float = 30,
+                 metrics_path: str | Path | None = None,
+                 clock: Callable[[], float] = time.monotonic
+                 ) -> None:
+        assert monitors, 'At least one queue monitor is required'
+        self.start_worker = start_worker
+        self.monitors = monitors
+        self.policy = policy
+        self.name = name
+        self.interval = interval
+        self.scale_down_delay = scale_down_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.clock = clock
+
+        self.metrics = SupervisorMetrics()
+        self._workers: list[Worker] = []
+        # Останавливаемые потребители и время, после которого они
+        # завершаются принудительно
+        self._stopping: list[tuple[Worker, float]] = []
+        self._scale_down_since: float | None = None
+        self._should_stop = threading.Event()
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def get_load(self) -> dtos.QueueLoad:
+        loads: list[dtos.QueueLoad] = [monitor.get_load() for monitor in self.monitors]
+        drain_rates: list[float] = [load.drain_rate for load in loads
+                                    if load.drain_rate is not None]
+        return dtos.QueueLoad(depth=sum(load.depth for load in loads),
+                              consumers=max(load.consumers for load in loads),
+                              drain_rate=sum(drain_rates) if drain_rates else None)
+
+    # -----------------------------------------------------------------------------------
+    # Масштабирование
+    # -----------------------------------------------------------------------------------
+    def step(self) -> None:
+        """
+        Одна итерация: заменяет завершившихся потребителей, выбирает их
+        число по нагрузке и обновляет метрики.
+        """
+        now: float = self.clock()
+        self._reap(now)
+
+        load: dtos.QueueLoad = self.get_load()
+        current: int = len(self._workers)
+        desired: int = self.policy.get_desired_workers(load, current)
+
+        if desired > current:
+            self._scale_down_since = None
+            self._start(desired - current)
+            self.metrics.scale_ups += 1
+            self._log_decision('Scaling up', current, desired, load)
+        elif desired < current:
+            if self._scale_down_since is None:
+                self._scale_down_since = now
+            if now - self._scale_down_since >= self.scale_down_delay:
+                self._scale_down_since = None
+                self._stop(current - desired, now)
+                self.metrics.scale_downs += 1
+                self._log_decision('Scaling down', current, desired, load)
+        else:
+            self._scale_down_since = None
+
+        latency: float | None = self.policy.get_latency(load)
+        self.metrics.workers = len(self._workers)
+        self.metrics.desired_workers = desired
+        self.metrics.stopping_workers = len(self._stopping)
+        self.metrics.queue_depth = load.depth
+        self.metrics.queue_latency = round(latency, 3) if latency is not None else -1
+        self._write_metrics()
+
+    def _start(self, count: int) -> None:
+        for _ in range(count):
+            self._workers.append(self.start_worker())
+
+    def _stop(self, count: int, now: float) -> None:
+        # Первыми останавливаются запущенные последними
+        for _ in range(count):
+            worker: Worker = self._workers.pop()
+            worker.stop()
+            self._stopping.append((worker, now + self.shutdown_timeout))
+
+    def _reap(self, now: float) -> None:
+        for worker in self._workers:
+            if not worker.is_alive():
+                self.metrics.restarts += 1
+                logger.warning('%s exited unexpectedly, it will be replaced',
+                               self.name)
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+
+        stopping: list[tuple[Worker, float]] = []
+        for worker, kill_at in self._stopping:
+            if not worker.is_alive():
+                continue
+            if now >= kill_at:
+                logger.warning('%s did not stop in %s s, killing it',
+                               self.name, self.shutdown_timeout)
+                worker.kill()
+                continue
+            stopping.append((worker, kill_at))
+        self._stopping = stopping
+
+    def _log_decision(self,
+                      action: str,
+                      current: int,
+                      desired: int,
+                      load: dtos.QueueLoad
+                      ) -> None:
+        logger.info('%s %s: %d -> %d', action, self.name, current, desired,
+                    extra={'worker': self.name,
+                           'current_workers': current,
+                           'desired_workers': desired,
+                           'queue_depth': load.depth,
+                           'queue_drain_rate': load.drain_rate})
+
+    def _write_metrics(self) -> None:
+        if self.metrics_path is None:
+            return None
+        text: str = self.metrics.to_prometheus('med_sharing_supervisor',
+                                               {'worker': self.name})
+        temp_path: Path = self.metrics_path.with_name(
+            f'{self.metrics_path.name}.{os.getpid()}.tmp'
+        )
+        try:
+            temp_path.write_text(text)
+            os.replace(temp_path, self.metrics_path)
+        except OSError:
+            logger.exception('Failed to write supervisor metrics',
+                             extra={'path': str(self.metrics_path)})
+
+    # -----------------------------------------------------------------------------------
+    # Жизненный цикл
+    # -----------------------------------------------------------------------------------
+    def run(self) -> None:
+        logger.info('Supervisor of %s started', self.name)
+        while not self._should_stop.is_set():
+            try:
+                self.step()
+            except Exception:
+                # Например, брокер недоступен: потребители продолжают работать
+                logger.exception('Supervisor step failed')
+            self._should_stop.wait(self.interval)
+        self.shutdown()
+
+    def stop(self) -> None:
+        """
+        Просит супервизор завершиться. Можно вызывать из обработчика сигнала.
+        """
+        self._should_stop.set()
+
+    def shutdown(self) -> None:
+        """
+        Мягко останавливает всех потребителей и дожидается их завершения.
+        """
+        now: float = self.clock()
+        self._stop(len(self._workers), now)
+        deadline: float = time.monotonic() + self.shutdown_timeout
+        while self._stopping and time.monotonic() < deadline:
+            self._reap(self.clock())
+            time.sleep(0.1)
+        for worker, _ in self._stopping:
+            worker.kill()
+        self._stopping.clear()
+        logger.info('Supervisor of %s stopped', self.name)
@@ -1,16 +1,22 @@
 from kombu import Connection
 
 from med_sharing_system.application import services
-from .messaging_kombu import KombuConsumer
+from med_sharing_system.application.interfaces import MessageDeduplicationStore
+from .messaging_kombu import ExecutionMode, KombuConsumer
 from .scheme import broker_scheme
 
 
 def create_delivery_consumer(connection: Connection,
-                             patient_matcher: services.PatientMatcher
+                             patient_matcher: services.PatientMatcher,
+                             execution_mode: ExecutionMode = 'inline',
+                             concurrency: int = 1,
+                             deduplication: MessageDeduplicationStore | None = None
                              ) -> KombuConsumer:
     consumer = KombuConsumer(connection=connection,
                              scheme=broker_scheme,
-                             prefetch_count=1)
+                             execution_mode=execution_mode,
+                             concurrency=concurrency,
+                             deduplication=deduplication)
 
     consumer.register_function(
         patient_matcher.send_message_to_client,
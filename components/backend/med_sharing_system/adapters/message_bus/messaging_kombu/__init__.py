@@ -1,8 +1,23 @@
 from .consumer import KombuConsumer
+from .deduplication import MessageDeduplicationCache
+from .executors import ExecutionMode
 from .handlers import (
+    BatchMessageHandler,
+    BatchMessageHandlerWithRetries,
     MessageHandler,
     MessageHandlerWithRetries,
     SimpleMessageHandler,
 )
-from .publisher import KombuPublisher
-from .scheme import BrokerDurableScheme, BrokerScheme
+from .publisher import (
+    ConfirmingKombuPublisher,
+    KombuPublisher,
+    MessageNotConfirmed,
+)
+from .scheduling import WeightedFairQueue
+from .scheme import BrokerDurableScheme, BrokerScheme, PriorityLanes
+from .serialization import (
+    COMPACT_CONTENT_TYPE,
+    COMPACT_SERIALIZER,
+    CompactCodec,
+    MessageSerializer,
+)
@@ -12,3 +12,13 @@ ERROR_ROUTING_KEY_PREFIX = 'error.'
 DEFAULT_ERROR_MAX_RETRY_ATTEMPTS = 5
 DEFAULT_ERROR_RETRY_TTL_MSECONDS = 30_000
 MIN_ERROR_RETRY_TTL_MSECONDS = 1_000
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BATCH_TIMEOUT_MSECONDS = 100
+
+DEFAULT_PUBLISH_BATCH_SIZE = 100
+DEFAULT_CONFIRM_TIMEOUT_SECONDS = 30
+DEFAULT_COMPRESSION_THRESHOLD_BYTES = 1024
+
+DEFAULT_DEDUPLICATION_MAX_SIZE = 100_000
+DEFAULT_DEDUPLICATION_TTL_SECONDS = 3600
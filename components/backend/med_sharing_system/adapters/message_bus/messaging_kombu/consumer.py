@@ -1,30 +1,168 @@
 import logging
+import queue
+import socket
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from functools import partial
-from typing import Any, Callable, Iterable
+from typing import Any, Callable, Iterable, Mapping
 
-from kombu import Connection
+from kombu import Connection, Message
 from kombu.mixins import ConsumerMixin
 
+from med_sharing_system.application.interfaces.message_publishing import (
+    MessageDeduplicationStore
+)
 from . import constants
-from .handlers import MessageHandler, MessageHandlerFactory
+from .executors import (
+    ExecutionMode,
+    ProcessFunction,
+    create_executor,
+    create_process_pool
+)
+from .handlers import (
+    BatchMessageHandler,
+    BatchResult,
+    MessageBody,
+    MessageHandler,
+    MessageHandlerFactory
+)
+from .scheduling import WeightedFairQueue
 from .scheme import BaseBrokerScheme
 
 AnyCallable = Callable[[Any], None]
+BatchCallable = Callable[[list[MessageBody]], BatchResult]
+
+
+class _DeferredAckMessage:
+    """
+    Сообщение, которое обрабатывается вне потока соединения. Канал kombu
+    не потокобезопасен, поэтому ack/reject/requeue не выполняются сразу,
+    а передаются в поток соединения через очередь.
+    """
+
+    def __init__(self, message: Message, acks: queue.SimpleQueue) -> None:
+        self._message = message
+        self._acks = acks
+
+    def ack(self, multiple: bool = False) -> None:
+        self._acks.put(partial(self._message.ack, multiple=multiple))
+
+    def reject(self, requeue: bool = False) -> None:
+        self._acks.put(partial(self._message.reject, requeue=requeue))
+
+    def requeue(self) -> None:
+        self._acks.put(self._message.requeue)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._message, name)
+
+
+class _DeduplicatedMessage:
+    """
+    Сообщение, идентификатор которого отмечается как обработанный при
+    подтверждении. Отклоненное сообщение (например, для повтора) будет
+    обработано при следующей доставке.
+
+    Оборачивает `_DeferredAckMessage`, поэтому отметка выполняется в потоке
+    обработчика, а в поток соединения передается только подтверждение.
+    """
+
+    def __init__(self,
+                 message: Message,
+                 message_id: str,
+                 store: MessageDeduplicationStore
+                 ) -> None:
+        self._message = message
+        self._message_id = message_id
+        self._store = store
+
+    def ack(self, multiple: bool = False) -> None:
+        self._message.ack(multiple=multiple)
+        try:
+            self._store.add(self._message_id)
+        except Exception:
+            # Сообщение уже подтверждено, повторная доставка маловероятна
+            logging.getLogger(constants.LOGGER_PREFIX).exception(
+                'Failed to mark message %s as processed', self._message_id
+            )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._message, name)
 
 
 @dataclass(kw_only=True)
 class KombuConsumer(ConsumerMixin):
+    """
+    Потребитель сообщений. В режиме 'inline' сообщения обрабатываются по одному
+    прямо в потоке соединения. В режимах 'thread', 'greenlet' и 'process'
+    одновременно обрабатывается до `concurrency` сообщений (см. `executors`),
+    а подтверждения выполняются в потоке соединения.
+
+    По умолчанию `prefetch_count` равен `concurrency`: брокер не выдает
+    потребителю больше сообщений, чем тот может обрабатывать одновременно.
+
+    После `stop` потребитель перестает принимать сообщения, обрабатывает
+    накопленные пачки и до `shutdown_timeout` секунд ждет завершения уже
+    начатой обработки.
+
+    Если задано хранилище `deduplication`, сообщения, идентификатор которых
+    (`message_id`, его проставляет `KombuPublisher`) уже отмечен как
+    обработанный, подтверждаются без вызова обработчика. Идентификатор
+    отмечается при подтверждении сообщения обработчиком. Копии одного
+    сообщения, которые обрабатываются одновременно, не отбрасываются.
+    Проверка и отметка выполняются в потоке обработчика, а не в потоке
+    соединения: хранилище может обращаться к БД.
+
+    Функции, зарегистрированные через `register_weighted_function`, получают
+    сообщения нескольких очередей в порядке взвешенной справедливой очереди:
+    полученные сообщения ждут своей очереди в потоке соединения, пока
+    обрабатывается не больше `concurrency` сообщений.
+    """
     connection: Connection
     scheme: BaseBrokerScheme
     prefetch_count: int = None
+    execution_mode: ExecutionMode = 'inline'
+    concurrency: int = 1
+    shutdown_timeout: float = 30
+    # Как часто (с) поток соединения отправляет накопленные подтверждения,
+    # пока от брокера нет новых сообщений
+    ack_interval: float = 0.01
+    # Выполняется в каждом дочернем процессе режима 'process', например,
+    # чтобы не использовать соединения с БД, унаследованные от родителя
+    process_initializer: Callable[[], None] | None = None
+    deduplication: MessageDeduplicationStore | None = None
 
     def __post_init__(self):
+        assert self.concurrency >= 1, 'Concurrency should be positive'
+        assert self.execution_mode != 'inline' or self.concurrency == 1, \
+            'Inline execution mode processes one message at a time'
+
+        if self.prefetch_count is None:
+            self.prefetch_count = self.concurrency
+
         self._handlers = defaultdict(list)
+        self._schedulers: dict[MessageHandler, WeightedFairQueue] = {}
         self.message_handler_factory = MessageHandlerFactory(connection=self.connection)
         self.logger = logging.getLogger(constants.LOGGER_PREFIX)
 
+        self._executor: Executor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+        # Пул запрашивают одновременно несколько потоков обработки
+        self._process_pool_lock = threading.Lock()
+        self._process_pool_broken = False
+        self._stop_requested = False
+        self._acks: queue.SimpleQueue = queue.SimpleQueue()
+        self._in_flight: set[Future] = set()
+        self._consuming_connection: Connection | None = None
+
+    @property
+    def is_concurrent(self) -> bool:
+        return self.execution_mode != 'inline'
+
     def _get_queues(self, queue_names: Iterable[str]):
         queues = []
         for name in queue_names:
@@ -33,6 +171,57 @@ class KombuConsumer(ConsumerMixin):
             queues.append(self.scheme.queues[name])
         return queues
 
+    @property
+    def _batch_handlers(self) -> list[BatchMessageHandler]:
+        return [handler for handler in self._handlers
+                if isinstance(handler, BatchMessageHandler)]
+
+    def _start_process_pool(self) -> None:
+        """
+        Создает пул режима 'process' и сразу запускает дочерние процессы.
+
+        Процессы создаются через fork, поэтому пул запускается в `run` до
+        потоков обработки и соединения потребителя: fork процесса, в котором
+        другой поток держит блокировку (kombu, SQLAlchemy, logging), может
+        оставить ее захваченной в дочернем процессе навсегда. Процессы
+        наследуют состояние, подготовленное к запуску (например, индекс).
+        """
+        pool: ProcessPoolExecutor = create_process_pool(self.concurrency,
+                                                        self.process_initializer)
+        # Пул с fork создает все процессы при первой задаче
+        pool.submit(int).result()
+        with self._process_pool_lock:
+            self._process_pool = pool
+            self._process_pool_broken = False
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                raise BrokenProcessPool('Process pool is not running')
+            return self._process_pool
+
+    def _discard_process_pool(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Закрывает сломанный пул и останавливает прием сообщений: новый пул
+        создается в `run`, когда потоки обработки завершатся.
+        """
+        with self._process_pool_lock:
+            # Пул мог быть уже закрыт по ошибке другого сообщения
+            if self._process_pool is not pool:
+                return None
+            self._process_pool = None
+            self._process_pool_broken = True
+        self.logger.warning('Process pool is broken, it will be recreated')
+        self.should_stop = True
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _wrap_function(self, function: AnyCallable) -> AnyCallable:
+        if self.execution_mode == 'process':
+            return ProcessFunction(function,
+                                   self._get_process_pool,
+                                   self._discard_process_pool)
+        return function
+
     def register_handler(self, handler: MessageHandler, *queue_names: str):
         queues = self._get_queues(queue_names)
         self._handlers[handler].extend(queues)
@@ -41,10 +230,28 @@ class KombuConsumer(ConsumerMixin):
         """
         Сообщение подтверждается сразу при принятии.
         """
-        handler = self.message_handler_factory.create_simple(function=function)
+        handler = self.message_handler_factory.create_simple(
+            function=self._wrap_function(function)
+        )
         queues = self._get_queues(queue_names)
         self._handlers[handler].extend(queues)
 
+    def register_weighted_function(self,
+                                   function: AnyCallable,
+                                   weights: Mapping[str, float]):
+        """
+        Как `register_function`, но сообщения очередей `weights` обрабатываются
+        по взвешенной справедливой очереди: пока сообщения есть во всех
+        очередях, очередь получает долю обработок, пропорциональную весу.
+        Сообщения каждой очереди брокер выдает отдельно, до `prefetch_count`.
+        """
+        handler = self.message_handler_factory.create_simple(
+            function=self._wrap_function(function)
+        )
+        queues = self._get_queues(weights)
+        self._handlers[handler].extend(queues)
+        self._schedulers[handler] = WeightedFairQueue(weights)
+
     def register_function_with_retries(
         self,
         function: AnyCallable,
@@ -57,31 +264,304 @@ class KombuConsumer(ConsumerMixin):
         """
         assert self.scheme.is_durable(), 'Scheme should be durable'
         handler = self.message_handler_factory.create_with_retries(
-            function=function,
+            function=self._wrap_function(function),
+            max_retry_attempts=max_retry_attempts,
+        )
+        queues = self._get_queues(queue_names)
+        self._handlers[handler].extend(queues)
+
+    def register_batch_function(
+        self,
+        function: BatchCallable,
+        *queue_names: str,
+        batch_size: int = constants.DEFAULT_BATCH_SIZE,
+        batch_timeout_ms: int = constants.DEFAULT_BATCH_TIMEOUT_MSECONDS,
+    ):
+        """
+        Функция получает список тел: до `batch_size` сообщений или все,
+        что пришло за `batch_timeout_ms`. Сообщения подтверждаются или
+        отклоняются по результату функции для каждого тела.
+        """
+        handler = self.message_handler_factory.create_batch(
+            function=self._wrap_function(function),
+            batch_size=batch_size,
+            batch_timeout_ms=batch_timeout_ms,
+        )
+        queues = self._get_queues(queue_names)
+        self._handlers[handler].extend(queues)
+
+    def register_batch_function_with_retries(
+        self,
+        function: BatchCallable,
+        *queue_names: str,
+        batch_size: int = constants.DEFAULT_BATCH_SIZE,
+        batch_timeout_ms: int = constants.DEFAULT_BATCH_TIMEOUT_MSECONDS,
+        max_retry_attempts: int = constants.DEFAULT_ERROR_MAX_RETRY_ATTEMPTS,
+    ):
+        """
+        Как `register_batch_function`, но необработанные сообщения
+        повторяются и при достижении максимального числа попыток
+        передаются в "мертвую" очередь.
+        """
+        assert self.scheme.is_durable(), 'Scheme should be durable'
+        handler = self.message_handler_factory.create_batch_with_retries(
+            function=self._wrap_function(function),
+            batch_size=batch_size,
+            batch_timeout_ms=batch_timeout_ms,
             max_retry_attempts=max_retry_attempts,
         )
         queues = self._get_queues(queue_names)
         self._handlers[handler].extend(queues)
 
+    def _get_prefetch_count(self, handler: MessageHandler) -> int:
+        # Иначе брокер не выдаст столько сообщений, чтобы пачка заполнилась
+        if isinstance(handler, BatchMessageHandler):
+            return max(self.prefetch_count, handler.batch_size * self.concurrency)
+        return self.prefetch_count
+
     def get_consumers(self, consumer_cls, channel):
         consumers = []
         for handler, queues in self._handlers.items():
+            if handler in self._schedulers:
+                # Отдельный потребитель на каждую очередь, чтобы брокер
+                # выдавал сообщения всех очередей независимо
+                consumers.extend(
+                    consumer_cls(queues=[queue],
+                                 callbacks=[partial(self.on_message, handler=handler,
+                                                    lane=queue.name)],
+                                 prefetch_count=self.prefetch_count)
+                    for queue in queues
+                )
+                continue
+
             on_message = partial(self.on_message, handler=handler)
             c = consumer_cls(
                 queues=queues,
                 callbacks=[on_message],
-                prefetch_count=self.prefetch_count
+                prefetch_count=self._get_prefetch_count(handler)
             )
             consumers.append(c)
         return consumers
 
-    def on_message(self, body, message, handler):
+    def on_message(self, body, message, handler, lane=None):
+        if handler in self._schedulers:
+            # Сообщение будет обработано в `_dispatch_scheduled`
+            self._schedulers[handler].put(lane, (message, body))
+            return None
+
+        if not isinstance(handler, BatchMessageHandler):
+            return self._dispatch(handler, [message], [body])
+
+        batch = handler.add(message, body)
+        if batch is not None:
+            self._dispatch(handler, *batch)
+
+    def _deduplicate(self, messages, bodies):
+        """
+        Подтверждает уже обработанные сообщения и возвращает остальные.
+        Выполняется в потоке обработчика: хранилище может обращаться к БД.
+        """
+        unique_messages, unique_bodies = [], []
+        for message, body in zip(messages, bodies):
+            message = self._deduplicate_message(message)
+            if message is not None:
+                unique_messages.append(message)
+                unique_bodies.append(body)
+        return unique_messages, unique_bodies
+
+    def _deduplicate_message(self, message: Message) -> Message | None:
+        """
+        Подтверждает уже обработанное сообщение и возвращает `None`.
+        """
+        message_id: str | None = message.properties.get('message_id')
+        if self.deduplication is None or not message_id:
+            return message
+
         try:
+            is_duplicate: bool = self.deduplication.contains(message_id)
+        except Exception:
+            # Лучше обработать сообщение повторно, чем не обработать
+            self.logger.exception('Failed to check message for duplicate')
+            return message
+
+        if is_duplicate:
+            self.logger.info('Message %s has already been processed, acked',
+                             message_id)
+            message.ack()
+            return None
+        return _DeduplicatedMessage(message, message_id, self.deduplication)
+
+    def _dispatch(self, handler, messages, bodies):
+        if not self.is_concurrent:
+            return self._handle(handler, messages, bodies)
+
+        deferred_messages = [_DeferredAckMessage(message, self._acks)
+                             for message in messages]
+        future: Future = self._executor.submit(
+            self._handle, handler, deferred_messages, bodies
+        )
+        self._in_flight.add(future)
+        future.add_done_callback(self._in_flight.discard)
+
+    def _handle(self, handler, messages, bodies):
+        try:
+            messages, bodies = self._deduplicate(messages, bodies)
+            if not messages:
+                return None
+
             self.logger.info('Trying to call: %s', handler)
-            handler.handle(message, body)
+            if isinstance(handler, BatchMessageHandler):
+                handler.handle_batch(messages, bodies)
+            else:
+                handler.handle(messages[0], bodies[0])
         except Exception:
             self.logger.exception('Unexpected error occurred')
 
+    def _dispatch_batches(self, expired_only: bool) -> None:
+        for handler in self._batch_handlers:
+            batch = handler.pop_expired() if expired_only else handler.pop_all()
+            if batch is not None:
+                self._dispatch(handler, *batch)
+
+    def _has_capacity(self) -> bool:
+        return not self.is_concurrent or len(self._in_flight) < self.concurrency
+
+    def _receive_pending(self) -> None:
+        """
+        Принимает сообщения, которые уже пришли от брокера, не дожидаясь
+        новых: следующее сообщение выбирается среди всех полученных.
+        """
+        if self._consuming_connection is None:
+            return None
+        limit: int = self.prefetch_count * sum(len(self._handlers[handler])
+                                               for handler in self._schedulers)
+        for _ in range(limit):
+            try:
+                self._consuming_connection.drain_events(timeout=0)
+            except socket.timeout:
+                return None
+
+    def _dispatch_scheduled(self) -> None:
+        # Неподтвержденные сообщения, не обработанные до остановки,
+        # брокер доставит повторно
+        while self._schedulers and self._has_capacity() and not self.should_stop:
+            self._receive_pending()
+            is_dispatched: bool = False
+            for handler, scheduler in self._schedulers.items():
+                if not self._has_capacity():
+                    break
+                item = scheduler.pop()
+                if item is not None:
+                    message, body = item
+                    self._dispatch(handler, [message], [body])
+                    is_dispatched = True
+            if not is_dispatched:
+                return None
+            if self._consuming_connection is not None:
+                self._consuming_connection.heartbeat_check()
+
+    def _flush_acks(self) -> None:
+        while True:
+            try:
+                ack: Callable[[], None] = self._acks.get_nowait()
+            except queue.Empty:
+                return None
+
+            try:
+                ack()
+            except Exception:
+                # Например, канал закрылся при потере соединения: брокер
+                # сам вернет неподтвержденное сообщение в очередь
+                self.logger.exception('Failed to acknowledge message')
+
+    def on_iteration(self):
+        self._dispatch_batches(expired_only=True)
+        self._flush_acks()
+        self._dispatch_scheduled()
+        # ConsumerMixin проверяет heartbeat, только когда за время ожидания
+        # не пришло ни одного события, а под нагрузкой это не происходит
+        if self._consuming_connection is not None:
+            self._consuming_connection.heartbeat_check()
+
+    def on_consume_ready(self, connection, channel, consumers, **kwargs):
+        self._consuming_connection = connection
+        # Сообщения из пачек, не обработанных до потери соединения,
+        # брокер доставит повторно
+        for handler in self._batch_handlers:
+            handler.discard()
+        for scheduler in self._schedulers.values():
+            scheduler.clear()
+
+    def on_consume_end(self, connection, channel):
+        """
+        Вызывается после отмены подписок. Пока соединение открыто,
+        обрабатывает накопленные пачки, дожидается уже начатой обработки
+        и отправляет ее подтверждения.
+        """
+        self._consuming_connection = None
+        if not self.should_stop:
+            return None
+
+        self._dispatch_batches(expired_only=False)
+        if not self.is_concurrent:
+            return None
+
+        self.logger.info('Waiting for %d in-flight messages', len(self._in_flight))
+        deadline: float = time.monotonic() + self.shutdown_timeout
+        while self._in_flight and time.monotonic() < deadline:
+            self._flush_acks()
+            try:
+                connection.drain_events(timeout=self.ack_interval)
+            except TimeoutError:
+                connection.heartbeat_check()
+        self._flush_acks()
+
+        if self._in_flight:
+            self.logger.warning('%d messages were not processed before shutdown, '
+                                'they will be redelivered', len(self._in_flight))
+
+    def stop(self) -> None:
+        """
+        Просит потребителя завершиться после текущей итерации.
+        Можно вызывать из обработчика сигнала или другого потока.
+        """
+        self._stop_requested = True
+        self.should_stop = True
+
     def run(self, *args, **kwargs):
         self.logger.info('Worker started')
-        return super().run(*args, **kwargs)
+        # Подтверждения и пачки, время ожидания которых истекло,
+        # отправляются между ожиданиями событий соединения (по умолчанию
+        # kombu ждет события до 1 с)
+        intervals: list[float] = [1, *(handler.batch_timeout
+                                       for handler in self._batch_handlers)]
+        if self.is_concurrent:
+            intervals.append(self.ack_interval)
+        kwargs.setdefault('safety_interval', min(intervals))
+
+        if not self.is_concurrent:
+            return super().run(*args, **kwargs)
+
+        try:
+            while True:
+                if self.execution_mode == 'process':
+                    self._start_process_pool()
+                self._executor = create_executor(self.execution_mode,
+                                                 self.concurrency)
+                try:
+                    super().run(*args, **kwargs)
+                finally:
+                    # Перед созданием нового пула потоки обработки должны
+                    # завершиться: ожидающие сломанного пула получают ошибку сразу
+                    restart: bool = (self._process_pool_broken
+                                     and not self._stop_requested)
+                    self._executor.shutdown(wait=restart, cancel_futures=True)
+                    with self._process_pool_lock:
+                        process_pool, self._process_pool = self._process_pool, None
+                    if process_pool is not None:
+                        process_pool.shutdown(wait=False, cancel_futures=True)
+                if not restart:
+                    return None
+                self.should_stop = False
+        finally:
+            self.logger.info('Worker stopped')
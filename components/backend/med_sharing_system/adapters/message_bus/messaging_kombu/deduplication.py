@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from med_sharing_system.application.interfaces.message_publishing import (
+    MessageDeduplicationStore
+)
+from . import constants
+
+
+class MessageDeduplicationCache(MessageDeduplicationStore):
+    """
+    Идентификаторы обработанных сообщений в памяти процесса. Хранится
+    не больше `max_size` идентификаторов (вытесняются самые старые),
+    каждый - не дольше `ttl` секунд.
+
+    Повторные доставки после `reject` или перезапуска потребителя приходят
+    тому же процессу не всегда: если потребителей несколько, нужно общее
+    хранилище (например, `database.repositories.ProcessedMessagesRepo`).
+    """
+
+    def __init__(self,
+                 max_size: int = constants.DEFAULT_DEDUPLICATION_MAX_SIZE,
+                 ttl: float = constants.DEFAULT_DEDUPLICATION_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic
+                 ) -> None:
+        assert max_size >= 1, 'Max size should be positive'
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Идентификатор и время, до которого он хранится, в порядке добавления
+        self._expires_at: OrderedDict[str, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expires_at)
+
+    def contains(self, message_id: str) -> bool:
+        with self._lock:
+            self._remove_expired()
+            return message_id in self._expires_at
+
+    def add(self, message_id: str) -> None:
+        with self._lock:
+            self._expires_at.pop(message_id, None)
+            self._expires_at[message_id] = self.clock() + self.ttl
+            self._remove_expired()
+            while len(self._expires_at) > self.max_size:
+                self._expires_at.popitem(last=False)
+
+    def _remove_expired(self) -> None:
+        # Время жизни у всех одинаковое, поэтому устаревшие - в начале
+        now: float = self.clock()
+        while self._expires_at:
+            message_id, expires_at = next(iter(self._expires_at.items()))
+            if expires_at > now:
+                return None
+            del self._expires_at[message_id]
@@ -0,0 +1,122 @@
+"""
+Пулы, в которых `KombuConsumer` выполняет обработку сообщений.
+
+В режимах 'thread' и 'greenlet' обработчик целиком выполняется в пуле.
+В режиме 'process' обработчик (подтверждение, повторы, "мертвая" очередь)
+выполняется в потоке родительского процесса, а в дочерний процесс
+передается только вызов функции с телом сообщения (или списком тел).
+"""
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Literal
+
+ExecutionMode = Literal['inline', 'thread', 'greenlet', 'process']
+
+# Функции, которые выполняются в дочерних процессах. Процессы создаются
+# через fork и получают словарь вместе с остальной памятью родителя, поэтому
+# сами функции (и связанные с ними объекты, например индексы) не сериализуются.
+# Пул запускается, пока в процессе нет других потоков
+# (см. `KombuConsumer._start_process_pool`).
+_process_functions: dict[int, Callable[..., Any]] = {}
+
+
+def _call_process_function(function_id: int,
+                           args: tuple[Any, ...],
+                           kwargs: dict[str, Any]) -> Any:
+    return _process_functions[function_id](*args, **kwargs)
+
+
+class ProcessFunction:
+    """
+    Функция обработчика, вызов которой выполняется в пуле процессов.
+
+    Если дочерний процесс аварийно завершился, пул становится непригодным
+    (`BrokenProcessPool`): он передается в `discard_pool`, чтобы следующий
+    вызов получил новый пул, а ошибка передается обработчику сообщения.
+    """
+
+    def __init__(self,
+                 function: Callable[..., Any],
+                 get_pool: Callable[[], ProcessPoolExecutor],
+                 discard_pool: Callable[[ProcessPoolExecutor], None] | None = None
+                 ) -> None:
+        self.function = function
+        self.get_pool = get_pool
+        self.discard_pool = discard_pool
+        _process_functions[id(function)] = function
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        pool: ProcessPoolExecutor = self.get_pool()
+        try:
+            return pool.submit(_call_process_function,
+                               id(self.function),
+                               args,
+                               kwargs).result()
+        except BrokenProcessPool:
+            if self.discard_pool is not None:
+                self.discard_pool(pool)
+            raise
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.function!r})'
+
+
+class GreenletExecutor(Executor):
+    """
+    Пул гринлетов gevent с интерфейсом `concurrent.futures.Executor`.
+    Переключение между гринлетами происходит только на операциях
+    ввода-вывода, поэтому процесс должен быть пропатчен
+    (`gevent.monkey.patch_all()`) до импорта остальных модулей, см.
+    launchers/gevent_settings/consumer_patch.py.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        # gevent нужен только в этом режиме
+        from gevent.pool import Pool
+
+        self._pool = Pool(max_workers)
+
+    def submit(self, fn: Callable[..., Any], /, *args, **kwargs) -> Future:
+        future: Future = Future()
+
+        def run() -> None:
+            if not future.set_running_or_notify_cancel():
+                return None
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as error:
+                future.set_exception(error)
+
+        self._pool.spawn(run)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if cancel_futures:
+            self._pool.kill(block=wait)
+        elif wait:
+            self._pool.join()
+
+
+def create_executor(execution_mode: ExecutionMode, concurrency: int) -> Executor:
+    if execution_mode == 'greenlet':
+        import gevent.monkey
+
+        # Без патчинга `drain_events` не отдает управление gevent,
+        # и гринлеты с обработкой сообщений никогда не выполняются
+        if not gevent.monkey.is_module_patched('socket'):
+            raise RuntimeError("'greenlet' execution mode requires "
+                               "a gevent-patched process")
+        return GreenletExecutor(max_workers=concurrency)
+
+    # В режиме 'process' потоки только ждут результатов дочерних процессов
+    return ThreadPoolExecutor(max_workers=concurrency,
+                              thread_name_prefix=f'kombu-consumer-{execution_mode}')
+
+
+def create_process_pool(concurrency: int,
+                        initializer: Callable[[], None] | None = None
+                        ) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=concurrency,
+                               mp_context=multiprocessing.get_context('fork'),
+                               initializer=initializer)
@@ -1,8 +1,9 @@
 import logging
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 from kombu import Connection, Message
 
@@ -10,6 +11,10 @@ from . import constants
 from .publisher import ThreadSafePublisher
 
 MessageBody = Dict[str, Any]
+MessageBatch = Tuple[List[Message], List[MessageBody]]
+# Результат обработки каждого тела пачки (`True` - обработано)
+# или `None`, если обработаны все
+BatchResult = Optional[Sequence[bool]]
 
 
 class MessageHandler(ABC):
@@ -43,8 +48,39 @@ class SimpleMessageHandler(MessageHandler):
         return id(self) == id(other)
 
 
+class _RetriesMixin:
+    """
+    Логика повторов: сообщение отклоняется и через обменник повторов
+    возвращается в очередь, а при достижении лимита повторов
+    отправляется в "мертвую" очередь.
+    """
+    error_publisher: ThreadSafePublisher
+    max_retry_attempts: int
+
+    def _get_attempts_number(self, message: Message) -> Optional[int]:
+        if 'x-death' in message.headers:
+            headers = message.headers['x-death']
+            for header in headers:
+                if header['exchange'] == constants.ERROR_RETRY_EXCHANGE:
+                    return header['count']
+        return None
+
+    def _is_exhausted(self, message: Message) -> bool:
+        attempts_number = self._get_attempts_number(message)
+        return bool(attempts_number and attempts_number >= self.max_retry_attempts)
+
+    def _send_to_dead_queue(self, message: Message, body: MessageBody):
+        with self.error_publisher as publisher:
+            publisher.publish(
+                body=body,
+                exchange=constants.ERROR_DEAD_EXCHANGE,
+                routing_key=message.delivery_info['routing_key'],
+            )
+        message.ack()
+
+
 @dataclass
-class MessageHandlerWithRetries(MessageHandler):
+class MessageHandlerWithRetries(_RetriesMixin, MessageHandler):
     """
     Этот обработчик отклоняет сообщения при ошибках,
     что позволяет использовать логику повторов.
@@ -58,31 +94,16 @@ class MessageHandlerWithRetries(MessageHandler):
     def __post_init__(self):
         self.logger = logging.getLogger(constants.LOGGER_PREFIX)
 
-    def _get_attempts_number(self, message: Message) -> Optional[int]:
-        if 'x-death' in message.headers:
-            headers = message.headers['x-death']
-            for header in headers:
-                if header['exchange'] == constants.ERROR_RETRY_EXCHANGE:
-                    return header['count']
-        return None
-
     def handle(self, message: Message, body: MessageBody):
         try:
             self.function(**body)
         except Exception:
-            attempts_number = self._get_attempts_number(message)
-            if attempts_number and attempts_number >= self.max_retry_attempts:
+            if self._is_exhausted(message):
                 self.logger.exception(
                     'Got an error, all attempts have been exhausted, '
                     'message will be sent to the dead queue'
                 )
-                with self.error_publisher as publisher:
-                    publisher.publish(
-                        body=body,
-                        exchange=constants.ERROR_DEAD_EXCHANGE,
-                        routing_key=message.delivery_info['routing_key'],
-                    )
-                message.ack()
+                self._send_to_dead_queue(message, body)
                 return
             self.logger.exception('Got an error, message will be retried')
             message.reject()
@@ -96,6 +117,122 @@ class MessageHandlerWithRetries(MessageHandler):
         return id(self) == id(other)
 
 
+@dataclass
+class BatchMessageHandler(MessageHandler):
+    """
+    Этот обработчик копит сообщения и вызывает функцию со списком тел,
+    когда набралось `batch_size` сообщений или прошло `batch_timeout_ms`
+    с момента получения первого сообщения пачки.
+
+    Функция возвращает по результату на каждое тело (`True` - обработано)
+    или `None`, если обработаны все. Исключение означает, что не обработано
+    ни одно тело. Обработанные сообщения подтверждаются, остальные
+    отклоняются.
+
+    Пачки собирает `KombuConsumer` в потоке соединения (`add`, `pop_expired`,
+    `pop_all`), обрабатываются они в `handle_batch`.
+    """
+    function: Callable[[List[MessageBody]], BatchResult]
+    batch_size: int
+    batch_timeout_ms: int
+
+    def __post_init__(self):
+        assert self.batch_size >= 1, 'Batch size should be positive'
+        self.logger = logging.getLogger(constants.LOGGER_PREFIX)
+        self._messages: List[Message] = []
+        self._bodies: List[MessageBody] = []
+        self._deadline: Optional[float] = None
+
+    @property
+    def batch_timeout(self) -> float:
+        return self.batch_timeout_ms / 1000
+
+    def add(self, message: Message, body: MessageBody) -> Optional[MessageBatch]:
+        """
+        Добавляет сообщение в пачку. Возвращает пачку, если она заполнена.
+        """
+        if not self._messages:
+            self._deadline = time.monotonic() + self.batch_timeout
+        self._messages.append(message)
+        self._bodies.append(body)
+        if len(self._messages) >= self.batch_size:
+            return self.pop_all()
+        return None
+
+    def pop_expired(self) -> Optional[MessageBatch]:
+        if self._messages and time.monotonic() >= self._deadline:
+            return self.pop_all()
+        return None
+
+    def pop_all(self) -> Optional[MessageBatch]:
+        if not self._messages:
+            return None
+        batch: MessageBatch = (self._messages, self._bodies)
+        self.discard()
+        return batch
+
+    def discard(self):
+        """
+        Забывает накопленные сообщения, например, после потери соединения:
+        неподтвержденные сообщения брокер доставит повторно.
+        """
+        self._messages, self._bodies, self._deadline = [], [], None
+
+    def handle(self, message: Message, body: MessageBody):
+        self.handle_batch([message], [body])
+
+    def handle_batch(self, messages: List[Message], bodies: List[MessageBody]):
+        try:
+            results: BatchResult = self.function(bodies)
+        except Exception:
+            self.logger.exception('Got an error, batch of %d messages failed',
+                                  len(messages))
+            results = [False] * len(messages)
+        else:
+            if results is None:
+                results = [True] * len(messages)
+            elif len(results) != len(messages):
+                self.logger.error('Got %d results for batch of %d messages, '
+                                  'batch failed', len(results), len(messages))
+                results = [False] * len(messages)
+
+        failed = 0
+        for message, body, is_processed in zip(messages, bodies, results):
+            if is_processed:
+                message.ack()
+            else:
+                failed += 1
+                self._on_failure(message, body)
+        if failed:
+            self.logger.warning('%d of %d messages in batch were not processed',
+                                failed, len(messages))
+
+    def _on_failure(self, message: Message, body: MessageBody):
+        message.reject()
+
+    def __hash__(self):
+        return hash(id(self))
+
+    def __eq__(self, other):
+        return id(self) == id(other)
+
+
+@dataclass
+class BatchMessageHandlerWithRetries(_RetriesMixin, BatchMessageHandler):
+    """
+    Пакетный обработчик, в котором необработанные сообщения повторяются,
+    как в `MessageHandlerWithRetries`.
+    """
+    error_publisher: ThreadSafePublisher
+    max_retry_attempts: int = constants.DEFAULT_ERROR_MAX_RETRY_ATTEMPTS
+
+    def _on_failure(self, message: Message, body: MessageBody):
+        if self._is_exhausted(message):
+            self._send_to_dead_queue(message, body)
+            return
+        message.reject()
+
+
 @dataclass
 class MessageHandlerFactory:
     connection: Connection
@@ -117,3 +254,28 @@ class MessageHandlerFactory:
             max_retry_attempts=max_retry_attempts,
             error_publisher=self._error_publisher,
         )
+
+    def create_batch(self,
+                     function: Callable[[List[MessageBody]], BatchResult],
+                     batch_size: int,
+                     batch_timeout_ms: int):
+        return BatchMessageHandler(
+            function=function,
+            batch_size=batch_size,
+            batch_timeout_ms=batch_timeout_ms,
+        )
+
+    def create_batch_with_retries(
+        self,
+        function: Callable[[List[MessageBody]], BatchResult],
+        batch_size: int,
+        batch_timeout_ms: int,
+        max_retry_attempts: int,
+    ):
+        return BatchMessageHandlerWithRetries(
+            function=function,
+            batch_size=batch_size,
+            batch_timeout_ms=batch_timeout_ms,
+            max_retry_attempts=max_retry_attempts,
+            error_publisher=self._error_publisher,
+        )
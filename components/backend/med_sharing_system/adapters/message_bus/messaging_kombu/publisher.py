@@ -1,15 +1,22 @@
+import logging
+import queue
 import threading
+import time
+import uuid
+from concurrent.futures import Future
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-from kombu import Connection
+from kombu import Connection, Producer
 from kombu.pools import producers
 
 from med_sharing_system.application.interfaces.message_publishing import (
     QueueMessage,
     Publisher
 )
-from .scheme import BrokerScheme
+from . import constants
+from .scheme import BrokerScheme, PriorityLanes
+from .serialization import MessageSerializer
 
 # Словарь параметров для продюсера, таких как exchange, routing_key и др.
 ProducerParams = Dict[str, Any]
@@ -52,6 +59,10 @@ class KombuPublisher(Publisher):
     scheme: BrokerScheme
     params_for_target: Optional[ProducerParamsStrategy] = None
     messages_params: Dict[str, Any] = field(default_factory=dict)
+    # Без сериализатора тела сериализуются продюсером kombu (JSON)
+    serializer: Optional[MessageSerializer] = None
+    # Полосы по приоритету сообщений для таргетов (обменников)
+    priority_lanes: Dict[str, PriorityLanes] = field(default_factory=dict)
 
     def __post_init__(self):
         self.thread_safe_publisher = ThreadSafePublisher(connection=self.connection)
@@ -63,9 +74,24 @@ class KombuPublisher(Publisher):
 
     def publish(self, *messages: QueueMessage):
         for message in messages:
-            self.thread_safe_publisher.publish(
-                message.body, **self.params_for_target(message.target)
-            )
+            self.thread_safe_publisher.publish(**self.params_for_message(message))
+
+    def params_for_message(self, message: QueueMessage) -> ProducerParams:
+        body_params: ProducerParams = (
+            self.serializer.params_for_body(message.body)
+            if self.serializer is not None else dict(body=message.body)
+        )
+        # По идентификатору потребители отбрасывают повторные доставки
+        message_id: str = message.message_id or uuid.uuid4().hex
+        params: ProducerParams = {**self.params_for_target(message.target),
+                                  **body_params,
+                                  'message_id': message_id}
+        if message.priority is not None:
+            params['priority'] = message.priority
+        lanes: Optional[PriorityLanes] = self.priority_lanes.get(message.target)
+        if lanes is not None:
+            params['routing_key'] = lanes.routing_key(message.priority)
+        return params
 
     def params_from_mapping(self, target: str) -> ProducerParams:
         return self.messages_params.get(target)
@@ -79,3 +105,251 @@ class KombuPublisher(Publisher):
         if params:
             return params
         return self.params_from_scheme(target)
+
+
+class MessageNotConfirmed(Exception):
+    """
+    Брокер отклонил сообщение (basic.nack) или не подтвердил его вовремя.
+    """
+
+
+class _PublisherConfirms:
+    """
+    Подтверждения публикаций на канале в режиме publisher confirms
+    (расширение RabbitMQ). Номера публикаций на канале идут подряд с 1,
+    брокер подтверждает их по одному или сразу все до номера (`multiple`).
+    """
+
+    def __init__(self, channel) -> None:
+        self.channel = channel
+        self.last_tag: int = 0
+        self.pending: Set[int] = set()
+        self.nacked: Set[int] = set()
+        channel.confirm_select()
+        channel.events['basic_ack'].add(self.on_ack)
+        channel.events['basic_nack'].add(self.on_nack)
+
+    def on_publish(self) -> int:
+        self.last_tag += 1
+        self.pending.add(self.last_tag)
+        return self.last_tag
+
+    def _pop(self, delivery_tag: int, multiple: bool) -> Set[int]:
+        if not multiple:
+            self.pending.discard(delivery_tag)
+            return {delivery_tag}
+        confirmed = {tag for tag in self.pending if tag <= delivery_tag}
+        self.pending -= confirmed
+        return confirmed
+
+    def on_ack(self, delivery_tag: int, multiple: bool) -> None:
+        self._pop(delivery_tag, multiple)
+
+    def on_nack(self, delivery_tag: int, multiple: bool) -> None:
+        self.nacked |= self._pop(delivery_tag, multiple)
+
+    def wait(self, connection: Connection, timeout: float) -> None:
+        """
+        Ждет подтверждения всех отправленных сообщений не дольше `timeout`.
+        """
+        deadline: float = time.monotonic() + timeout
+        while self.pending:
+            remaining: float = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                connection.drain_events(timeout=remaining)
+            except TimeoutError:
+                return None
+
+
+@dataclass
+class _PendingMessage:
+    params: ProducerParams
+    future: Future = field(default_factory=Future)
+
+
+@dataclass
+class ConfirmingKombuPublisher(KombuPublisher):
+    """
+    Публикует сообщения в режиме publisher confirms.
+
+    Сообщения отправляются пачками до `batch_size` штук без ожидания
+    подтверждений, а подтверждения брокера ожидаются один раз на пачку.
+    В пачку попадают сообщения всех потоков, которые вызвали `publish`
+    в течение `linger_ms` после первого сообщения пачки, а также все, что
+    накопилось, пока ожидались подтверждения предыдущей пачки.
+
+    Публикацией занимается один фоновый поток на отдельном соединении.
+    `publish` возвращает управление, когда брокер подтвердил все переданные
+    сообщения, и выбрасывает `MessageNotConfirmed`, если хотя бы одно из них
+    отклонено или не подтверждено за `confirm_timeout` секунд. Транспорты
+    без publisher confirms (например, 'memory') публикуют синхронно,
+    и сообщение считается подтвержденным после отправки.
+    """
+    batch_size: int = constants.DEFAULT_PUBLISH_BATCH_SIZE
+    linger_ms: int = 0
+    confirm_timeout: float = constants.DEFAULT_CONFIRM_TIMEOUT_SECONDS
+
+    def __post_init__(self):
+        super().__post_init__()
+        assert self.batch_size >= 1, 'Batch size should be positive'
+        self.logger = logging.getLogger(constants.LOGGER_PREFIX)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._publishing_connection: Optional[Connection] = None
+        self._producer: Optional[Producer] = None
+        self._confirms: Optional[_PublisherConfirms] = None
+
+    def on_finish(self):
+        # Продюсеры из пула не используются, публикует фоновый поток
+        pass
+
+    def publish(self, *messages: QueueMessage):
+        for message in self._submit(messages):
+            message.future.result()
+
+    def publish_each(self, *messages: QueueMessage) -> List[bool]:
+        """
+        Как `publish`, но не выбрасывает ошибку, а для каждого сообщения
+        возвращает, подтвердил ли его брокер.
+        """
+        return [message.future.exception() is None
+                for message in self._submit(messages)]
+
+    def _submit(self, messages: Tuple[QueueMessage, ...]) -> List[_PendingMessage]:
+        pending: List[_PendingMessage] = [
+            _PendingMessage(self.params_for_message(message)) for message in messages
+        ]
+        if not pending:
+            return pending
+
+        for message in pending:
+            self._queue.put(message)
+        self._ensure_thread()
+        return pending
+
+    def close(self):
+        """
+        Публикует уже переданные сообщения и останавливает фоновый поток.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='kombu-confirming-publisher',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                batch, is_closed = self._collect_batch()
+                if batch:
+                    self._publish_batch(batch)
+                if is_closed:
+                    return None
+        finally:
+            self._reset_connection()
+
+    def _collect_batch(self) -> Tuple[List[_PendingMessage], bool]:
+        first: Optional[_PendingMessage] = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch: List[_PendingMessage] = [first]
+        deadline: float = time.monotonic() + self.linger_ms / 1000
+        while len(batch) < self.batch_size:
+            remaining: float = deadline - time.monotonic()
+            try:
+                message = (self._queue.get(timeout=remaining) if remaining > 0
+                           else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if message is None:
+                return batch, True
+            batch.append(message)
+        return batch, False
+
+    def _ensure_producer(self) -> Producer:
+        if self._producer is None:
+            # Поток читает соединение только в ожидании подтверждений, поэтому
+            # heartbeat отключен: иначе после простоя дольше двух интервалов
+            # брокер закрыл бы соединение
+            connection: Connection = self.connection.clone(heartbeat=0)
+            try:
+                channel = connection.channel()
+                self._confirms = (_PublisherConfirms(channel)
+                                  if hasattr(channel, 'confirm_select') else None)
+                self._producer = Producer(channel)
+            except Exception:
+                connection.release()
+                self._confirms = None
+                raise
+            self._publishing_connection = connection
+        return self._producer
+
+    def _reset_connection(self):
+        if self._publishing_connection is not None:
+            self._publishing_connection.release()
+        self._publishing_connection = None
+        self._producer = None
+        self._confirms = None
+
+    def _send_batch(self, batch: List[_PendingMessage]) -> Dict[int, _PendingMessage]:
+        tags: Dict[int, _PendingMessage] = {}
+        producer: Producer = self._ensure_producer()
+        for message in batch:
+            producer.publish(**message.params)
+            if self._confirms is not None:
+                tags[self._confirms.on_publish()] = message
+        if self._confirms is not None:
+            self._confirms.wait(self._publishing_connection, self.confirm_timeout)
+        return tags
+
+    def _publish_batch(self, batch: List[_PendingMessage]):
+        try:
+            try:
+                tags: Dict[int, _PendingMessage] = self._send_batch(batch)
+            except self.connection.connection_errors:
+                # Соединение могло быть разорвано, пока поток простаивал:
+                # пачка один раз отправляется заново на новом соединении.
+                # Повторы отбрасываются потребителями по `message_id`
+                self.logger.warning('Publishing connection was lost, '
+                                    'resending batch of %d messages', len(batch))
+                self._reset_connection()
+                tags = self._send_batch(batch)
+        except Exception as error:
+            # Соединение будет открыто заново для следующей пачки
+            self.logger.exception('Failed to publish batch of %d messages',
+                                  len(batch))
+            self._reset_connection()
+            for message in batch:
+                message.future.set_exception(error)
+            return None
+
+        if self._confirms is None:
+            for message in batch:
+                message.future.set_result(None)
+            return None
+
+        not_confirmed: Set[int] = self._confirms.nacked | self._confirms.pending
+        self._confirms.nacked.clear()
+        if self._confirms.pending:
+            # Опоздавшие подтверждения не должны относиться к следующей пачке
+            self.logger.warning('%d messages were not confirmed in %s s',
+                                len(self._confirms.pending), self.confirm_timeout)
+            self._reset_connection()
+
+        for tag, message in tags.items():
+            if tag in not_confirmed:
+                message.future.set_exception(MessageNotConfirmed())
+            else:
+                message.future.set_result(None)
@@ -0,0 +1,53 @@
+from collections import deque
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+
+class WeightedFairQueue:
+    """
+    Сообщения нескольких полос (очередей), которые выдаются в порядке
+    взвешенной справедливой очереди (start-time fair queueing).
+
+    Пока сообщения есть во всех полосах, полоса с весом `w` получает долю
+    `w / sum(weights)` выдач. Полоса, в которой сообщений не было,
+    не накапливает "кредит": ее новые сообщения не вытесняют остальные
+    полосы надолго. При равенстве выдается сообщение полосы, указанной
+    в `weights` раньше.
+    """
+
+    def __init__(self, weights: Mapping[str, float]) -> None:
+        assert weights, 'At least one lane is required'
+        assert all(weight > 0 for weight in weights.values()), \
+            'Weights should be positive'
+        self.weights: Dict[str, float] = dict(weights)
+        self.clear()
+
+    def clear(self) -> None:
+        # Сообщения полос с виртуальным временем начала их обслуживания
+        self._items: Dict[str, Deque[Tuple[float, Any]]] = {
+            lane: deque() for lane in self.weights
+        }
+        self._last_finish: Dict[str, float] = dict.fromkeys(self.weights, 0.0)
+        self._virtual_time: float = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._items.values())
+
+    def put(self, lane: str, item: Any) -> None:
+        start: float = max(self._virtual_time, self._last_finish[lane])
+        self._last_finish[lane] = start + 1 / self.weights[lane]
+        self._items[lane].append((start, item))
+
+    def pop(self) -> Optional[Any]:
+        """
+        Возвращает следующее сообщение или None, если полосы пусты.
+        """
+        lane: Optional[str] = None
+        for candidate, items in self._items.items():
+            if items and (lane is None or items[0][0] < self._items[lane][0][0]):
+                lane = candidate
+        if lane is None:
+            return None
+
+        start, item = self._items[lane].popleft()
+        self._virtual_time = start
+        return item
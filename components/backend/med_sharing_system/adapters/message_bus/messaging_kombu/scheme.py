@@ -1,6 +1,7 @@
 from abc import abstractmethod
+from dataclasses import dataclass
 from functools import cached_property
-from typing import Optional
+from typing import Mapping, Optional
 
 from amqp import Channel
 from kombu import Connection, Exchange, Queue
@@ -8,6 +9,31 @@ from kombu import Connection, Exchange, Queue
 from . import constants
 
 
+@dataclass(frozen=True)
+class PriorityLanes:
+    """
+    Полосы обменника - очереди, между которыми сообщения распределяются
+    по приоритету (`QueueMessage.priority`) через ключ маршрутизации.
+
+    `lanes` сопоставляет ключу маршрутизации полосы минимальный приоритет
+    ее сообщений. Сообщение попадает в полосу с наибольшим минимальным
+    приоритетом, не превышающим приоритет сообщения (или в полосу
+    с наименьшим, если такой нет). Сообщение без приоритета распределяется
+    как сообщение с приоритетом `default_priority`.
+    """
+    lanes: Mapping[str, int]
+    default_priority: int = 0
+
+    def routing_key(self, priority: Optional[int]) -> str:
+        if priority is None:
+            priority = self.default_priority
+        lanes = sorted(self.lanes.items(), key=lambda lane: lane[1], reverse=True)
+        for routing_key, min_priority in lanes:
+            if min_priority <= priority:
+                return routing_key
+        return lanes[-1][0]
+
+
 class BaseBrokerScheme:
 
     def __init__(self, *queues: Queue):
@@ -0,0 +1,223 @@
+"""
+Сериализация тел сообщений.
+
+Формат тела определяется заголовком content-type, а сжатие - заголовком
+'compression', поэтому потребители (`Message.decode` в kombu) разбирают
+сообщения любого зарегистрированного формата без изменений в коде.
+Форматы регистрируются в kombu при импорте модуля:
+    * 'compact' - компактный двоичный формат `CompactCodec`;
+    * 'msgpack' - включается, если установлен пакет msgpack.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from kombu import serialization
+
+from . import constants
+
+COMPACT_SERIALIZER = 'compact'
+COMPACT_CONTENT_TYPE = 'application/x-med-sharing-compact'
+
+
+class CompactCodec:
+    """
+    Двоичный формат для JSON-совместимых значений. Каждое значение
+    начинается с байта типа:
+        * None, False, True - только байт типа;
+        * int - zigzag-varint, float - double (little-endian);
+        * str, bytes - длина (varint) и байты (str в UTF-8);
+        * list, dict - число элементов (varint) и элементы (пары ключ/значение);
+        * список целых чисел - число элементов и значения в zigzag-varint
+          без байтов типа (векторы симптомов, списки id пациентов).
+    """
+    _NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _BYTES, _LIST, _DICT, _INTS = range(10)
+    _DOUBLE = struct.Struct('<d')
+
+    # -----------------------------------------------------------------------------------
+    # Кодирование
+    # -----------------------------------------------------------------------------------
+    def encode(self, value: Any) -> bytes:
+        buffer = bytearray()
+        self._encode(value, buffer)
+        return bytes(buffer)
+
+    def _encode(self, value: Any, buffer: bytearray) -> None:
+        # bool - подкласс int, поэтому проверяется раньше
+        if value is None:
+            buffer.append(self._NONE)
+        elif value is True:
+            buffer.append(self._TRUE)
+        elif value is False:
+            buffer.append(self._FALSE)
+        elif isinstance(value, int):
+            buffer.append(self._INT)
+            self._write_varint(buffer, self._zigzag(value))
+        elif isinstance(value, float):
+            buffer.append(self._FLOAT)
+            buffer += self._DOUBLE.pack(value)
+        elif isinstance(value, str):
+            data: bytes = value.encode('utf-8')
+            buffer.append(self._STR)
+            self._write_varint(buffer, len(data))
+            buffer += data
+        elif isinstance(value, (bytes, bytearray)):
+            buffer.append(self._BYTES)
+            self._write_varint(buffer, len(value))
+            buffer += value
+        elif isinstance(value, (list, tuple)):
+            self._encode_list(value, buffer)
+        elif isinstance(value, dict):
+            buffer.append(self._DICT)
+            self._write_varint(buffer, len(value))
+            for key, item in value.items():
+                self._encode(key, buffer)
+                self._encode(item, buffer)
+        else:
+            raise TypeError(f'Object of type {type(value).__name__} '
+                            f'is not serializable')
+
+    def _encode_list(self, values: list | tuple, buffer: bytearray) -> None:
+        is_ints: bool = bool(values) and all(
+            type(value) is int for value in values
+        )
+        buffer.append(self._INTS if is_ints else self._LIST)
+        self._write_varint(buffer, len(values))
+        if is_ints:
+            for value in values:
+                self._write_varint(buffer, self._zigzag(value))
+        else:
+            for value in values:
+                self._encode(value, buffer)
+
+    @staticmethod
+    def _zigzag(value: int) -> int:
+        return value << 1 if value >= 0 else (-value << 1) - 1
+
+    @staticmethod
+    def _write_varint(buffer: bytearray, value: int) -> None:
+        while value > 0x7F:
+            buffer.append(value & 0x7F | 0x80)
+            value >>= 7
+        buffer.append(value)
+
+    # -----------------------------------------------------------------------------------
+    # Декодирование
+    # -----------------------------------------------------------------------------------
+    def decode(self, data: bytes) -> Any:
+        value, position = self._decode(memoryview(data), 0)
+        if position != len(data):
+            raise ValueError('Unexpected data after the end of value')
+        return value
+
+    def _decode(self, data: memoryview, position: int) -> tuple[Any, int]:
+        kind: int = data[position]
+        position += 1
+        if kind == self._NONE:
+            return None, position
+        if kind == self._TRUE:
+            return True, position
+        if kind == self._FALSE:
+            return False, position
+        if kind == self._INT:
+            value, position = self._read_varint(data, position)
+            return self._unzigzag(value), position
+        if kind == self._FLOAT:
+            (value,) = self._DOUBLE.unpack_from(data, position)
+            return value, position + self._DOUBLE.size
+        if kind in (self._STR, self._BYTES):
+            length, position = self._read_varint(data, position)
+            if position + length > len(data):
+                raise ValueError('Data is truncated')
+            raw: bytes = bytes(data[position:position + length])
+            return (raw.decode('utf-8') if kind == self._STR else raw,
+                    position + length)
+        if kind == self._INTS:
+            length, position = self._read_varint(data, position)
+            values: list[int] = []
+            for _ in range(length):
+                value, position = self._read_varint(data, position)
+                values.append(self._unzigzag(value))
+            return values, position
+        if kind == self._LIST:
+            length, position = self._read_varint(data, position)
+            items: list[Any] = []
+            for _ in range(length):
+                item, position = self._decode(data, position)
+                items.append(item)
+            return items, position
+        if kind == self._DICT:
+            length, position = self._read_varint(data, position)
+            mapping: dict[Any, Any] = {}
+            for _ in range(length):
+                key, position = self._decode(data, position)
+                mapping[key], position = self._decode(data, position)
+            return mapping, position
+        raise ValueError(f'Unknown value type {kind}')
+
+    @staticmethod
+    def _unzigzag(value: int) -> int:
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+    @staticmethod
+    def _read_varint(data: memoryview, position: int) -> tuple[int, int]:
+        value: int = 0
+        shift: int = 0
+        while True:
+            byte: int = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value, position
+            shift += 7
+
+
+def register_serializers() -> None:
+    """
+    Регистрирует форматы в kombu. Вызывается при импорте модуля.
+    """
+    codec = CompactCodec()
+    serialization.register(COMPACT_SERIALIZER, codec.encode, codec.decode,
+                           content_type=COMPACT_CONTENT_TYPE,
+                           content_encoding='binary')
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return None
+    # kombu регистрирует msgpack сам, но по умолчанию не принимает его
+    # у потребителей без явного списка `accept`
+    serialization.enable_insecure_serializers(['msgpack'])
+
+
+register_serializers()
+
+
+@dataclass(frozen=True)
+class MessageSerializer:
+    """
+    Сериализует тела публикуемых сообщений в формате `serializer`
+    ('json', 'compact', 'msgpack' или другом зарегистрированном в kombu)
+    и сжимает их (`compression` - 'zlib', 'bzip2', 'lzma'), если
+    сериализованное тело занимает не меньше `compression_threshold` байт.
+    Сжимать маленькие тела бессмысленно: заголовки и служебные данные
+    алгоритма сжатия съедают выигрыш.
+    """
+    serializer: str = 'json'
+    compression: Optional[str] = None
+    compression_threshold: int = constants.DEFAULT_COMPRESSION_THRESHOLD_BYTES
+
+    def params_for_body(self, body: Any) -> Dict[str, Any]:
+        """
+        Параметры `Producer.publish`: сериализованное тело, content-type
+        и, если тело нужно сжать, алгоритм сжатия.
+        """
+        content_type, content_encoding, data = serialization.dumps(
+            body, serializer=self.serializer
+        )
+        params: Dict[str, Any] = dict(body=data,
+                                      content_type=content_type,
+                                      content_encoding=content_encoding)
+        if self.compression and len(data) >= self.compression_threshold:
+            params['compression'] = self.compression
+        return params
+
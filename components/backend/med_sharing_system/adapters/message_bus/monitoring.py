@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+from kombu import Connection
+
+from med_sharing_system.application import dtos, interfaces
+
+logger = logging.getLogger(__name__)
+
+
+class QueueLoadMonitor(interfaces.SearchQueueMonitor):
+    """
+    Измеряет глубину очереди и число потребителей пассивным объявлением
+    очереди (`queue.declare` с passive=True) не чаще раза в `interval`
+    секунд, между измерениями возвращает последнее.
+
+    Скорость разбора очереди оценивается по уменьшению глубины между
+    измерениями (экспоненциальное сглаживание с коэффициентом `smoothing`).
+    Пока в очередь продолжают поступать сообщения, это оценка снизу. Если
+    непустая очередь между измерениями не уменьшилась, оценка сглаживается
+    к нулю; пустая очередь оценку не меняет.
+
+    Если брокер недоступен, возвращается последнее измерение: публикация
+    в этом случае все равно завершится ошибкой.
+    """
+
+    def __init__(self,
+                 connection: Connection,
+                 queue_name: str,
+                 interval: float = 0.5,
+                 smoothing: float = 0.3,
+                 clock: Callable[[], float] = time.monotonic
+                 ) -> None:
+        self.connection = connection
+        self.queue_name = queue_name
+        self.interval = interval
+        self.smoothing = smoothing
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._monitoring_connection: Connection | None = None
+        self._channel = None
+        self._load = dtos.QueueLoad(depth=0, consumers=0)
+        self._sampled_at: float | None = None
+
+    def get_load(self) -> dtos.QueueLoad:
+        with self._lock:
+            now: float = self.clock()
+            if self._sampled_at is None or now - self._sampled_at >= self.interval:
+                self._sample(now)
+            return self._load
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset_channel()
+
+    def _sample(self, now: float) -> None:
+        try:
+            depth, consumers = self._declare_passive()
+        except Exception:
+            logger.exception('Failed to measure queue %s', self.queue_name)
+            self._reset_channel()
+            return None
+
+        drain_rate: float | None = self._load.drain_rate
+        if self._sampled_at is not None and depth < self._load.depth:
+            rate: float = (self._load.depth - depth) / (now - self._sampled_at)
+            drain_rate = (rate if drain_rate is None
+                          else self.smoothing * rate + (1 - self.smoothing) * drain_rate)
+        elif self._sampled_at is not None and depth and drain_rate is not None:
+            # Очередь не уменьшается (например, потребители остановились):
+            # оценка стремится к нулю, а не остается прежней
+            drain_rate *= 1 - self.smoothing
+
+        self._load = dtos.QueueLoad(depth=depth, consumers=consumers,
+                                    drain_rate=drain_rate)
+        self._sampled_at = now
+
+    def _declare_passive(self) -> tuple[int, int]:
+        if self._channel is None:
+            self._monitoring_connection = self.connection.clone()
+            self._channel = self._monitoring_connection.channel()
+        _, depth, consumers = self._channel.queue_declare(queue=self.queue_name,
+                                                          passive=True)
+        return depth, consumers
+
+    def _reset_channel(self) -> None:
+        if self._monitoring_connection is not None:
+            self._monitoring_connection.release()
+        self._monitoring_connection = None
+        self._channel = None
@@ -1,14 +1,39 @@
 from kombu import Exchange, Queue
 
-from .messaging_kombu import BrokerScheme
+from med_sharing_system.application import dtos
+from .messaging_kombu import BrokerScheme, PriorityLanes
 
 EXCHANGE_TO_MATCHING: str = 'PatientMatching'
 EXCHANGE_TO_DELIVERY: str = 'PatientDelivery'
 
 QUEUE_TO_MATCHING: str = 'PatientSearchQueue'
+QUEUE_TO_BULK_MATCHING: str = 'PatientBulkSearchQueue'
 QUEUE_TO_DELIVERY: str = 'PatientsDeliveryQueue'
 
+# Запросы подбора распределяются по полосам по приоритету: интерактивные
+# запросы из UI идут в QUEUE_TO_MATCHING (ключ маршрутизации по умолчанию),
+# массовый повторный подбор - в QUEUE_TO_BULK_MATCHING
+MATCHING_PRIORITY_LANES = PriorityLanes(
+    lanes={'': dtos.MatchPriorityEnum.INTERACTIVE,
+           'bulk': dtos.MatchPriorityEnum.BULK},
+    default_priority=dtos.MatchPriorityEnum.INTERACTIVE
+)
+# Доли обработок полос у match worker, пока в обеих есть сообщения
+MATCHING_LANE_WEIGHTS: dict[str, float] = {
+    QUEUE_TO_MATCHING: 9,
+    QUEUE_TO_BULK_MATCHING: 1,
+}
+
+matching_exchange = Exchange(EXCHANGE_TO_MATCHING)
+
+# Переполненная очередь подбора отклоняет новые сообщения (публикатор получает
+# basic.nack, поэтому нужны publisher confirms), а не удаляет самые старые.
+# Очереди, объявленные на брокере с другими аргументами, нужно пересоздать:
+# deployment/backend/manage/recreate_matching_queues.sh
 broker_scheme = BrokerScheme(
-    Queue(QUEUE_TO_MATCHING, Exchange(EXCHANGE_TO_MATCHING), max_length=100),
+    Queue(QUEUE_TO_MATCHING, matching_exchange, max_length=100,
+          queue_arguments={'x-overflow': 'reject-publish'}),
+    Queue(QUEUE_TO_BULK_MATCHING, matching_exchange, routing_key='bulk',
+          max_length=100_000, queue_arguments={'x-overflow': 'reject-publish'}),
     Queue(QUEUE_TO_DELIVERY, Exchange(EXCHANGE_TO_DELIVERY), max_length=1000),
 )
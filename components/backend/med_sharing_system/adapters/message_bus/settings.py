@@ -1,6 +1,10 @@
 from pathlib import Path
+from typing import Literal, Optional
 
-from pydantic import BaseSettings, Field
+from pydantic import BaseSettings, Field, root_validator
+
+from .messaging_kombu import ExecutionMode, MessageSerializer
+from .scheme import QUEUE_TO_BULK_MATCHING, QUEUE_TO_MATCHING
 
 
 class Settings(BaseSettings):
@@ -9,12 +13,120 @@ class Settings(BaseSettings):
     RABBITMQ_USER: str = Field(..., env='RABBITMQ_USER')
     RABBITMQ_PASSWORD: str = Field(..., env='RABBITMQ_PASSWORD')
     RABBITMQ_VHOST: str = '/'
+    # Интервал heartbeat AMQP (с), 0 - heartbeat отключен. Match worker
+    # в режиме 'inline' работает без heartbeat (см. MATCH_WORKER_HEARTBEAT_SECONDS)
+    RABBITMQ_HEARTBEAT_SECONDS: int = 60
+
+    # Режим обработки сообщений и количество одновременно обрабатываемых
+    # сообщений: 'inline' - по одному в потоке соединения, 'thread',
+    # 'greenlet' (лаунчер патчит процесс gevent при старте) или 'process'
+    MATCH_WORKER_EXECUTION_MODE: ExecutionMode = 'inline'
+    MATCH_WORKER_CONCURRENCY: int = 1
+    DELIVERY_CONSUMER_EXECUTION_MODE: ExecutionMode = 'inline'
+    DELIVERY_CONSUMER_CONCURRENCY: int = 1
+
+    # Число процессов, в которых match worker выполняет поиск похожих
+    # пациентов (0 - поиск в потоке обработчика), и время (с) на подбор
+    # по одному сообщению (0 - без ограничения)
+    MATCH_WORKER_SEARCH_PROCESSES: int = 0
+    MATCH_WORKER_DEADLINE_SECONDS: float = 0
+
+    # Доли обработок интерактивных запросов подбора и массового подбора,
+    # пока в очередях обеих полос есть сообщения
+    MATCH_WORKER_INTERACTIVE_WEIGHT: int = 9
+    MATCH_WORKER_BULK_WEIGHT: int = 1
+
+    # Сообщения публикуются с подтверждениями брокера (publisher confirms):
+    # переполненные очереди подбора отклоняют сообщения (см. scheme.py).
+    # Сообщения отправляются пачками до PUBLISHER_BATCH_SIZE штук, пачка
+    # дополнительно ждет новые сообщения PUBLISHER_LINGER_MS (мс)
+    PUBLISHER_BATCH_SIZE: int = 100
+    PUBLISHER_LINGER_MS: int = 0
+
+    # Запросы API сохраняются в таблицу outbox в транзакции запроса, а в брокер
+    # их переносит отдельный процесс (launchers/outbox_relay.py) пачками
+    # по OUTBOX_RELAY_BATCH_SIZE, проверяя таблицу каждые
+    # OUTBOX_RELAY_INTERVAL_MS (мс). Сообщения, которые брокер не подтвердил,
+    # откладываются: задержка (с) удваивается с каждой попыткой от
+    # OUTBOX_RELAY_RETRY_DELAY_SECONDS до OUTBOX_RELAY_MAX_RETRY_DELAY_SECONDS
+    PUBLISHER_OUTBOX: bool = False
+    OUTBOX_RELAY_BATCH_SIZE: int = 100
+    OUTBOX_RELAY_INTERVAL_MS: int = 200
+    OUTBOX_RELAY_RETRY_DELAY_SECONDS: float = 1
+    OUTBOX_RELAY_MAX_RETRY_DELAY_SECONDS: float = 300
+
+    # Формат тел публикуемых сообщений ('json', 'compact', 'msgpack')
+    # и сжатие тел от MESSAGE_COMPRESSION_THRESHOLD байт ('zlib', 'bzip2',
+    # 'lzma'). Потребители определяют формат по заголовкам сообщения
+    MESSAGE_SERIALIZER: str = 'json'
+    MESSAGE_COMPRESSION: Optional[str] = None
+    MESSAGE_COMPRESSION_THRESHOLD: int = 1024
+
+    # Потребители подтверждают повторно доставленные сообщения без обработки.
+    # Идентификаторы обработанных сообщений хранятся MESSAGE_DEDUPLICATION_TTL_SECONDS
+    # (с): 'memory' - в памяти процесса (не больше MESSAGE_DEDUPLICATION_MAX_SIZE),
+    # 'database' - в БД, общей для всех потребителей, '' - проверка отключена
+    MESSAGE_DEDUPLICATION: Literal['', 'memory', 'database'] = 'memory'
+    MESSAGE_DEDUPLICATION_MAX_SIZE: int = 100_000
+    MESSAGE_DEDUPLICATION_TTL_SECONDS: int = 3600
+
+    # Супервизор (launchers/supervisor.py) держит от MIN до MAX процессов
+    # потребителя: один процесс на MESSAGES_PER_PROCESS сообщений в очереди,
+    # больше - если сообщения ждут в очереди дольше MAX_LATENCY_SECONDS (с)
+    MATCH_WORKER_MIN_PROCESSES: int = 1
+    MATCH_WORKER_MAX_PROCESSES: int = 4
+    MATCH_WORKER_MESSAGES_PER_PROCESS: int = 50
+    MATCH_WORKER_MAX_LATENCY_SECONDS: float = 5
+    DELIVERY_CONSUMER_MIN_PROCESSES: int = 1
+    DELIVERY_CONSUMER_MAX_PROCESSES: int = 2
+    DELIVERY_CONSUMER_MESSAGES_PER_PROCESS: int = 200
+    DELIVERY_CONSUMER_MAX_LATENCY_SECONDS: float = 2
+
+    # Супервизор проверяет очереди каждые SUPERVISOR_INTERVAL_SECONDS (с),
+    # останавливает лишние процессы, если нагрузка не требовала их
+    # SUPERVISOR_SCALE_DOWN_DELAY_SECONDS (с), и ждет их мягкой остановки
+    # SUPERVISOR_SHUTDOWN_TIMEOUT_SECONDS (с). Метрики пишутся в файл
+    # SUPERVISOR_METRICS_PATH в формате Prometheus (None - не пишутся)
+    SUPERVISOR_INTERVAL_SECONDS: float = 2
+    SUPERVISOR_SCALE_DOWN_DELAY_SECONDS: float = 60
+    SUPERVISOR_SHUTDOWN_TIMEOUT_SECONDS: float = 30
+    SUPERVISOR_METRICS_PATH: Optional[Path] = None
     LOGGING_LEVEL: str = 'INFO'
 
     class Config:
         env_file = Path(__file__).parent.parent.parent.parent.joinpath(".env")
         env_file_encoding = 'utf-8'
 
+    @root_validator(skip_on_failure=True)
+    def check_search_processes(cls, values):
+        # Поток соединения не должен ждать результата поиска, а дочерние
+        # процессы режима 'process' не должны создавать свои пулы
+        if (values['MATCH_WORKER_SEARCH_PROCESSES']
+                and values['MATCH_WORKER_EXECUTION_MODE'] in ('inline', 'process')):
+            raise ValueError('MATCH_WORKER_SEARCH_PROCESSES requires '
+                             "'thread' or 'greenlet' MATCH_WORKER_EXECUTION_MODE")
+        return values
+
+    @property
+    def MATCH_WORKER_HEARTBEAT_SECONDS(self) -> int:
+        # В режиме 'inline' подбор выполняется в потоке соединения, который
+        # в это время не отправляет heartbeat: брокер разорвал бы соединение
+        # на подборе дольше двух интервалов
+        if self.MATCH_WORKER_EXECUTION_MODE == 'inline':
+            return 0
+        return self.RABBITMQ_HEARTBEAT_SECONDS
+
+    @property
+    def MATCH_WORKER_LANE_WEIGHTS(self) -> dict[str, float]:
+        return {QUEUE_TO_MATCHING: self.MATCH_WORKER_INTERACTIVE_WEIGHT,
+                QUEUE_TO_BULK_MATCHING: self.MATCH_WORKER_BULK_WEIGHT}
+
+    @property
+    def MESSAGE_SERIALIZATION(self) -> MessageSerializer:
+        return MessageSerializer(serializer=self.MESSAGE_SERIALIZER,
+                                 compression=self.MESSAGE_COMPRESSION,
+                                 compression_threshold=self.MESSAGE_COMPRESSION_THRESHOLD)
+
     @property
     def RABBITMQ_URL(self):
         url = 'amqp://{user}:{password}@{host}:{port}/{vhost}'
@@ -1,18 +1,32 @@
+from typing import Callable, Mapping
+
 from kombu import Connection
 
 from med_sharing_system.application import services
-from .messaging_kombu import KombuConsumer
-from .scheme import broker_scheme
+from med_sharing_system.application.interfaces import MessageDeduplicationStore
+from .messaging_kombu import ExecutionMode, KombuConsumer
+from .scheme import MATCHING_LANE_WEIGHTS, broker_scheme
 
 
 def create_match_worker(connection: Connection,
-                        patient_matcher: services.PatientMatcher
+                        patient_matcher: services.PatientMatcher,
+                        execution_mode: ExecutionMode = 'inline',
+                        concurrency: int = 1,
+                        process_initializer: Callable[[], None] | None = None,
+                        deduplication: MessageDeduplicationStore | None = None,
+                        lane_weights: Mapping[str, float] = MATCHING_LANE_WEIGHTS
                         ) -> KombuConsumer:
-    worker = KombuConsumer(connection=connection, scheme=broker_scheme)
+    worker = KombuConsumer(connection=connection,
+                           scheme=broker_scheme,
+                           execution_mode=execution_mode,
+                           concurrency=concurrency,
+                           process_initializer=process_initializer,
+                           deduplication=deduplication)
 
-    worker.register_function(
+    # Массовый подбор не задерживает интерактивные запросы
+    worker.register_weighted_function(
         patient_matcher.find_matching_patient,
-        'PatientSearchQueue',
+        lane_weights,
     )
 
     return worker
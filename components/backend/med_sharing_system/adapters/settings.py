@@ -1,6 +1,26 @@
+from pathlib import Path
+from typing import Literal
+
 from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
     IS_DEV_MODE: bool = False
     IS_HEALTH_CHECK: bool = True
+
+    # Индекс подбора похожих пациентов: 'exact' - точный поиск по всем
+    # пациентам с общими симптомами или диагнозом, 'minhash' - приближенный
+    # поиск кандидатов (MinHash + LSH)
+    PATIENT_MATCHING_INDEX: Literal['exact', 'minhash'] = 'exact'
+    # Количество полос и строк в полосе для 'minhash'
+    MINHASH_BANDS: int = 16
+    MINHASH_ROWS: int = 2
+
+    # Файл снимка индекса подбора. Если задан, match worker при старте читает
+    # индекс из снимка и догоняет изменения в БД, а при остановке сохраняет его
+    PATIENT_INDEX_SNAPSHOT_PATH: Path | None = None
+
+    # Кэш результатов подбора: время жизни записи (с) и количество записей.
+    # 0 - кэш отключен
+    MATCH_CACHE_TTL_SECONDS: float = 60
+    MATCH_CACHE_MAX_SIZE: int = 10_000
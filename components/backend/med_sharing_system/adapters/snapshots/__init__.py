@@ -0,0 +1,8 @@
+from .patient_index import PatientIndexSnapshotStorage, PatientProfilesCodec
+from .shared_memory import SharedPatientProfiles
+
+__all__ = (
+    'PatientIndexSnapshotStorage',
+    'PatientProfilesCodec',
+    'SharedPatientProfiles',
+)
@@ -0,0 +1,253 @@
+import gc
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from med_sharing_system.application import entities, interfaces
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Приостанавливает сборщик мусора: при создании сотен тысяч объектов без
+    циклических ссылок он многократно и безрезультатно обходит их.
+    """
+    was_enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+@dataclass
+class EncodedProfiles:
+    """
+    Профили пациентов, подготовленные к записи в формате
+    `PatientProfilesCodec`. `size` - итоговый размер в байтах.
+    """
+    prefix: bytes
+    data_start: int
+    layout: dict[str, tuple[int, int]]
+    arrays: dict[str, array]
+    size: int
+
+    def write_to(self, buffer: memoryview) -> None:
+        """
+        Записывает профили в буфер размером не меньше `size`.
+        """
+        buffer[:len(self.prefix)] = self.prefix
+        for name, values in self.arrays.items():
+            start: int = self.data_start + self.layout[name][0]
+            with memoryview(values) as view, view.cast('B') as data:
+                buffer[start:start + len(data)] = data
+
+
+class PatientProfilesCodec:
+    """
+    Двоичный формат профилей пациентов из индекса подбора:
+        * сигнатура `MAGIC` и длина заголовка (uint32, little-endian);
+        * заголовок в JSON: отметка журнала изменений, число пациентов,
+          таблицы значений пола и типа кожи, смещения и длины массивов;
+        * массивы int32, выровненные по 8 байт: id, возраст, коды пола
+          и типа кожи, а также симптомы и диагнозы в виде
+          "смещения + значения" (CSR).
+
+    Массивы разбираются прямо из буфера (отображенного файла или
+    разделяемой памяти) без промежуточных буферов.
+    """
+    MAGIC: bytes = b'PATIDX01'
+    _HEADER_LENGTH = struct.Struct('<I')
+    _ALIGNMENT: int = 8
+    _TYPECODE: str = 'i'
+
+    def encode(self,
+               profiles: Iterable[entities.PatientProfile],
+               change_mark: int
+               ) -> EncodedProfiles:
+        genders: dict[str | None, int] = {}
+        skin_types: dict[str | None, int] = {}
+        arrays: dict[str, array] = {
+            name: array(self._TYPECODE)
+            for name in ('patient_ids', 'ages', 'genders', 'skin_types',
+                         'symptom_offsets', 'symptom_ids',
+                         'diagnosis_offsets', 'diagnosis_ids')
+        }
+        arrays['symptom_offsets'].append(0)
+        arrays['diagnosis_offsets'].append(0)
+
+        for profile in profiles:
+            arrays['patient_ids'].append(profile.patient_id)
+            arrays['ages'].append(profile.age)
+            arrays['genders'].append(genders.setdefault(profile.gender, len(genders)))
+            arrays['skin_types'].append(
+                skin_types.setdefault(profile.skin_type, len(skin_types))
+            )
+            arrays['symptom_ids'].extend(sorted(profile.symptom_ids))
+            arrays['symptom_offsets'].append(len(arrays['symptom_ids']))
+            arrays['diagnosis_ids'].extend(sorted(profile.diagnosis_ids))
+            arrays['diagnosis_offsets'].append(len(arrays['diagnosis_ids']))
+
+        layout: dict[str, tuple[int, int]] = {}
+        offset: int = 0
+        for name, values in arrays.items():
+            layout[name] = (offset, len(values))
+            offset = self._align(offset + len(values) * values.itemsize)
+
+        header: bytes = json.dumps({
+            'change_mark': change_mark,
+            'count': len(arrays['patient_ids']),
+            'byteorder': sys.byteorder,
+            'itemsize': array(self._TYPECODE).itemsize,
+            'genders': list(genders),
+            'skin_types': list(skin_types),
+            'arrays': layout,
+        }).encode('utf-8')
+        data_start: int = self._align(len(self.MAGIC)
+                                      + self._HEADER_LENGTH.size
+                                      + len(header))
+
+        return EncodedProfiles(
+            prefix=self.MAGIC + self._HEADER_LENGTH.pack(len(header)) + header,
+            data_start=data_start,
+            layout=layout,
+            arrays=arrays,
+            size=data_start + offset
+        )
+
+    def decode(self,
+               mapped: mmap.mmap | memoryview
+               ) -> tuple[list[entities.PatientProfile], int]:
+        """
+        Возвращает профили и отметку журнала изменений.
+        """
+        if bytes(mapped[:len(self.MAGIC)]) != self.MAGIC:
+            raise ValueError('Unknown snapshot format')
+
+        header_start: int = len(self.MAGIC) + self._HEADER_LENGTH.size
+        (header_length,) = self._HEADER_LENGTH.unpack_from(mapped, len(self.MAGIC))
+        header: dict = json.loads(
+            bytes(mapped[header_start:header_start + header_length])
+        )
+        if (header['byteorder'] != sys.byteorder
+                or header['itemsize'] != array(self._TYPECODE).itemsize):
+            raise ValueError('Snapshot was written on an incompatible platform')
+
+        data_start: int = self._align(header_start + header_length)
+        genders: list[str] = header['genders']
+        skin_types: list[str] = header['skin_types']
+
+        with memoryview(mapped) as buffer:
+            views: dict[str, memoryview] = {}
+            try:
+                for name, (offset, length) in header['arrays'].items():
+                    start: int = data_start + offset
+                    end: int = start + length * header['itemsize']
+                    if end > len(buffer):
+                        raise ValueError('Snapshot is truncated')
+                    views[name] = buffer[start:end].cast(self._TYPECODE)
+
+                # Разбор выполняется над списками: поэлементный доступ к
+                # memoryview заметно медленнее
+                columns: dict[str, list[int]] = {
+                    name: view.tolist() for name, view in views.items()
+                }
+            finally:
+                # Пока существуют срезы буфера, mmap (или разделяемую
+                # память) невозможно закрыть
+                for view in views.values():
+                    view.release()
+
+        symptom_ids: list[int] = columns['symptom_ids']
+        symptom_offsets: list[int] = columns['symptom_offsets']
+        diagnosis_ids: list[int] = columns['diagnosis_ids']
+        diagnosis_offsets: list[int] = columns['diagnosis_offsets']
+        with _gc_paused():
+            profiles: list[entities.PatientProfile] = [
+                entities.PatientProfile(
+                    patient_id=patient_id,
+                    gender=genders[gender],
+                    age=age,
+                    skin_type=skin_types[skin_type],
+                    symptom_ids=frozenset(symptom_ids[symptom_offsets[index]:
+                                                      symptom_offsets[index + 1]]),
+                    diagnosis_ids=frozenset(diagnosis_ids[diagnosis_offsets[index]:
+                                                          diagnosis_offsets[index + 1]])
+                )
+                for index, (patient_id, age, gender, skin_type) in enumerate(zip(
+                    columns['patient_ids'], columns['ages'],
+                    columns['genders'], columns['skin_types']
+                ))
+            ]
+        return profiles, header['change_mark']
+
+    def _align(self, offset: int) -> int:
+        return -(-offset // self._ALIGNMENT) * self._ALIGNMENT
+
+
+class PatientIndexSnapshotStorage(interfaces.PatientIndexSnapshotStorage):
+    """
+    Хранит профили пациентов из индекса подбора в компактном двоичном файле
+    (формат описан в `PatientProfilesCodec`).
+
+    Файл читается через `mmap`: массивы разбираются прямо из отображенных
+    страниц без промежуточных буферов, а несколько процессов на одном хосте
+    используют одни и те же страницы кэша ОС.
+    Запись выполняется во временный файл, который затем атомарно заменяет
+    прежний снимок.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.codec = PatientProfilesCodec()
+
+    # -----------------------------------------------------------------------------------
+    # Запись
+    # -----------------------------------------------------------------------------------
+    def save(self,
+             profiles: Iterable[entities.PatientProfile],
+             change_mark: int
+             ) -> None:
+        encoded: EncodedProfiles = self.codec.encode(profiles, change_mark)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path: Path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(encoded.prefix)
+                for name, values in encoded.arrays.items():
+                    file.seek(encoded.data_start + encoded.layout[name][0])
+                    values.tofile(file)
+                file.truncate(encoded.size)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    # -----------------------------------------------------------------------------------
+    # Чтение
+    # -----------------------------------------------------------------------------------
+    def load(self) -> tuple[list[entities.PatientProfile], int] | None:
+        try:
+            with open(self.path, 'rb') as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self.codec.decode(mapped)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, struct.error):
+            # Поврежденный или несовместимый снимок - индекс будет построен по БД
+            logger.exception('Failed to load patient index snapshot',
+                             extra={'path': str(self.path)})
+            return None
@@ -0,0 +1,55 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable
+
+from med_sharing_system.application import entities
+from .patient_index import EncodedProfiles, PatientProfilesCodec
+
+
+class SharedPatientProfiles:
+    """
+    Профили пациентов в сегменте разделяемой памяти (формат
+    `PatientProfilesCodec`). Процесс, который ведет индекс, публикует
+    профили (`create`), а рабочие процессы читают их по имени сегмента
+    (`read`): профили не передаются через каналы между процессами
+    и не копируются в каждый процесс при его создании.
+
+    Сегмент существует, пока создавший его процесс не вызовет `unlink`.
+    """
+    codec = PatientProfilesCodec()
+
+    def __init__(self, memory: SharedMemory) -> None:
+        self._memory = memory
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    @classmethod
+    def create(cls,
+               profiles: Iterable[entities.PatientProfile],
+               change_mark: int = 0
+               ) -> 'SharedPatientProfiles':
+        encoded: EncodedProfiles = cls.codec.encode(profiles, change_mark)
+        memory = SharedMemory(create=True, size=encoded.size)
+        try:
+            encoded.write_to(memory.buf)
+        except BaseException:
+            memory.close()
+            memory.unlink()
+            raise
+        return cls(memory)
+
+    @classmethod
+    def read(cls, name: str) -> tuple[list[entities.PatientProfile], int]:
+        """
+        Возвращает профили и отметку журнала изменений из сегмента.
+        """
+        memory = SharedMemory(name=name)
+        try:
+            return cls.codec.decode(memory.buf)
+        finally:
+            memory.close()
+
+    def unlink(self) -> None:
+        self._memory.close()
+        self._memory.unlink()
@@ -5,6 +5,7 @@ from .diagnosis import (
 )
 from .item import (
     NewTreatmentItemInfo,
+    RelatedItem,
     TreatmentItem,
     TreatmentItemWithReviews,
     UpdatedTreatmentItemInfo,
@@ -41,6 +42,14 @@ from .patient import (
     GenderEnum,
     SkinTypeEnum
 )
+from .patient_matching import (
+    MatchedPatient,
+    MatchPriorityEnum,
+    QueueLoad,
+)
+from .treatment_recommendation import (
+    RecommendedItem,
+)
 from .symptom import (
     NewSymptomInfo,
     Symptom,
@@ -37,6 +37,12 @@ class TreatmentItemWithReviews(TreatmentItem):
     reviews: list[ItemReview]
 
 
+class RelatedItem(DTO):
+    item_id: int = Field(ge=1)
+    # Количество медицинских карт, в которых оба товара упоминаются в отзывах
+    med_books_count: int = Field(ge=1)
+
+
 class NewTreatmentItemInfo(DTO):
     title: str = Field(min_length=1, max_length=255)
     price: Decimal | None = Field(max_digits=12, decimal_places=2)
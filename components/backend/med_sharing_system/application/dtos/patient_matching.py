@@ -0,0 +1,30 @@
+from enum import IntEnum
+
+from pydantic import Field
+
+from .base import DTO
+
+
+class MatchPriorityEnum(IntEnum):
+    """
+    Приоритет запроса подбора: интерактивные запросы из UI обрабатываются
+    раньше массового повторного подбора.
+    """
+    BULK = 0
+    INTERACTIVE = 5
+
+
+class MatchedPatient(DTO):
+    patient_id: int = Field(ge=1)
+    score: float = Field(ge=0, le=1)
+
+
+class QueueLoad(DTO):
+    """
+    Состояние очереди подбора: число сообщений, потребителей и оценка
+    скорости, с которой потребители разбирают очередь (сообщений в секунду,
+    None - оценки еще нет).
+    """
+    depth: int = Field(ge=0)
+    consumers: int = Field(ge=0)
+    drain_rate: float | None = Field(default=None, ge=0)
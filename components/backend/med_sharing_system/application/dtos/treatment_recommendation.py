@@ -0,0 +1,12 @@
+from pydantic import Field
+
+from .base import DTO
+
+
+class RecommendedItem(DTO):
+    item_id: int = Field(ge=1)
+    score: float = Field(ge=0, le=1)
+    helped_ratio: float = Field(ge=0, le=1)
+    avg_rating: float = Field(ge=0, le=10)
+    # Количество отзывов о товаре среди похожих карт с учетом их сходства
+    support: float = Field(ge=0)
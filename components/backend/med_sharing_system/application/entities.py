@@ -161,6 +161,42 @@ class MedicalBook:
              if item_review in self.item_reviews else None)
 
 
+@dataclass(kw_only=True, frozen=True)
+class PatientProfile:
+    """
+    Сводные данные пациента для подбора похожих пациентов: признаки самого
+    пациента и симптомы и диагнозы из всех его медицинских карт.
+    """
+    patient_id: int
+    gender: str
+    age: int
+    skin_type: str
+    symptom_ids: frozenset[int] = frozenset()
+    diagnosis_ids: frozenset[int] = frozenset()
+
+
+@dataclass(kw_only=True, frozen=True)
+class ItemOutcome:
+    """
+    Итог применения товара по отзыву из медицинской карты.
+    """
+    item_id: int
+    is_helped: bool
+    item_rating: float
+
+
+@dataclass(kw_only=True, frozen=True)
+class TreatmentOutcome:
+    """
+    Медицинская карта в виде, нужном для рекомендаций лечения: диагноз,
+    симптомы и итоги применения товаров.
+    """
+    med_book_id: int
+    diagnosis_id: int | None
+    symptom_ids: frozenset[int] = frozenset()
+    item_outcomes: tuple[ItemOutcome, ...] = ()
+
+
 # Хранит все сущности из текущего модуля, формируя кортеж
 _ENTITIES = tuple(
     [
@@ -4,6 +4,7 @@ from .diagnosis import (
     DiagnosisAlreadyExists,
 )
 from .item import (
+    ItemCooccurrenceIndexError,
     TreatmentItemNotFound,
     TreatmentItemAlreadyExists,
     TreatmentItemExcludeAllFields,
@@ -38,10 +39,17 @@ from .patient import (
 )
 from .patient_matching import (
     PublisherError,
-    TargetNamesError
+    TargetNamesError,
+    SimilarityIndexError,
+    MatchingDeadlineExceeded,
+    MatchingQueueOverloaded
 )
 from .symptom import (
     SymptomNotFound,
     SymptomAlreadyExists,
     SymptomExcludeAllFields
 )
+from .treatment_recommendation import (
+    EmptyTreatmentProfile,
+    RecommendationIndexError
+)
@@ -9,6 +9,10 @@ class TreatmentItemAlreadyExists(Error):
     message_template = 'Treatment item with id {id} already exists'
 
 
+class ItemCooccurrenceIndexError(Error):
+    message_template = 'Item co-occurrence index is not initialized or is not built.'
+
+
 class TreatmentItemExcludeAllFields(Error):
     message_template = "You can't exclude all columns."
     context = {'excluded_columns': list}
@@ -7,3 +7,16 @@ class PublisherError(Error):
 
 class TargetNamesError(Error):
     message_template = 'The name of the publication queues is not specified.'
+
+
+class SimilarityIndexError(Error):
+    message_template = 'Patient similarity index is not initialized or is None.'
+
+
+class MatchingDeadlineExceeded(Error):
+    message_template = 'Patient matching did not finish before the deadline.'
+
+
+class MatchingQueueOverloaded(Error):
+    message_template = ('Patient matching queue is overloaded. '
+                        'Retry after {retry_after} seconds.')
@@ -0,0 +1,9 @@
+from .base import Error
+
+
+class EmptyTreatmentProfile(Error):
+    message_template = 'Specify `diagnosis_id` or `symptom_ids`.'
+
+
+class RecommendationIndexError(Error):
+    message_template = 'Treatment recommendation index is not initialized or is None.'
@@ -2,9 +2,21 @@ from .diagnoses import DiagnosesRepo
 from .item_categories import ItemCategoriesRepo
 from .item_reviews import ItemReviewsRepo
 from .item_types import ItemTypesRepo
-from .items import TreatmentItemsRepo
+from .items import ItemCooccurrenceIndex, TreatmentItemsRepo
 from .medical_books import MedicalBooksRepo
 from .message_delivery import MessageSender
-from .message_publishing import Publisher
+from .message_publishing import MessageDeduplicationStore, OutboxRepo, Publisher
+from .patient_matching import (
+    MatchResultCache,
+    PatientChangesRepo,
+    PatientIndexSnapshotStorage,
+    PatientProfilesRepo,
+    PatientSimilarityIndex,
+    SearchQueueMonitor
+)
 from .patients import PatientsRepo
 from .symptoms import SymptomsRepo
+from .treatment_recommendation import (
+    TreatmentOutcomesRepo,
+    TreatmentRecommendationIndex
+)
@@ -22,6 +22,12 @@ class ItemReviewsRepo(ABC):
                        ) -> Sequence[entities.ItemReview | None]:
         ...
 
+    @abstractmethod
+    def fetch_top_by_items(self,
+                           filter_params: schemas.FindItemReviews,
+                           ) -> dict[int, list[entities.ItemReview]]:
+        ...
+
     @abstractmethod
     def fetch_by_patient(self,
                          filter_params: schemas.FindItemReviews,
@@ -38,3 +38,11 @@ class TreatmentItemsRepo(ABC):
     @abstractmethod
     def remove(self, item: entities.TreatmentItem) -> entities.TreatmentItem:
         ...
+
+
+class ItemCooccurrenceIndex(ABC):
+    is_built: bool
+
+    @abstractmethod
+    def get_related_items(self, item_id: int, limit: int) -> list[dtos.RelatedItem]:
+        ...
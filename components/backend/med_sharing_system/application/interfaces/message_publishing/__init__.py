@@ -1,2 +1,4 @@
+from .deduplication import MessageDeduplicationStore
 from .message import QueueMessage
+from .outbox import OutboxPublisher, OutboxRepo
 from .publisher import Publisher
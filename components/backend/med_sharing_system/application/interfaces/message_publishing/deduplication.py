@@ -0,0 +1,22 @@
+from abc import ABC, abstractmethod
+
+
+class MessageDeduplicationStore(ABC):
+    """
+    Идентификаторы уже обработанных сообщений. Потребитель подтверждает
+    повторно доставленное сообщение, не обрабатывая его еще раз.
+    """
+
+    @abstractmethod
+    def contains(self, message_id: str) -> bool:
+        """
+        Проверяет, обработано ли сообщение.
+        """
+        ...
+
+    @abstractmethod
+    def add(self, message_id: str) -> None:
+        """
+        Отмечает сообщение как обработанное.
+        """
+        ...
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 
@@ -6,3 +6,8 @@ from typing import Any
 class QueueMessage:
     target: str  # В RabbitMQ это Exchange
     body: Any
+    # Идентификатор для дедупликации у потребителей. Если не задан,
+    # публикатор создает новый
+    message_id: str | None = field(default=None, compare=False)
+    # Приоритет сообщения (больше - важнее), None - приоритет по умолчанию
+    priority: int | None = None
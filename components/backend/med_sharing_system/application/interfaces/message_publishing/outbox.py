@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Sequence
+
+from .message import QueueMessage
+from .publisher import Publisher
+
+
+class OutboxRepo(ABC):
+    """
+    Хранилище сообщений, которые публикуются в брокер после фиксации
+    транзакции (transactional outbox).
+    """
+
+    @abstractmethod
+    def add(self, messages: Sequence[QueueMessage]) -> None:
+        """
+        Сохраняет сообщения в текущей транзакции.
+        """
+        ...
+
+    @abstractmethod
+    def take(self, limit: int) -> list[QueueMessage]:
+        """
+        Забирает не больше `limit` самых старых сообщений, время отправки
+        которых наступило. Сообщения блокируются до конца текущей транзакции
+        и должны быть удалены (`remove`) или отложены (`postpone`) в ней же.
+        Сообщения, которые забрала другая незавершенная транзакция,
+        пропускаются.
+        """
+        ...
+
+    @abstractmethod
+    def remove(self, messages: Sequence[QueueMessage]) -> None:
+        """
+        Удаляет опубликованные сообщения, полученные из `take`.
+        """
+        ...
+
+    @abstractmethod
+    def postpone(self,
+                 messages: Sequence[QueueMessage],
+                 retry_delay: float,
+                 max_retry_delay: float
+                 ) -> None:
+        """
+        Откладывает неопубликованные сообщения, полученные из `take`:
+        задержка (с) начинается с `retry_delay` и удваивается с каждой
+        неудачной попыткой, но не превышает `max_retry_delay`.
+        """
+        ...
+
+
+@dataclass
+class OutboxPublisher(Publisher):
+    """
+    Вместо брокера сохраняет сообщения в outbox в текущей транзакции.
+    Сообщения попадают в брокер, только если транзакция зафиксирована:
+    их отправляет `services.OutboxRelay`.
+    """
+    outbox_repo: OutboxRepo
+
+    def publish(self, *messages: QueueMessage):
+        if messages:
+            self.outbox_repo.add(messages)
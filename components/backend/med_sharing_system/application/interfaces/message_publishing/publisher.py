@@ -21,12 +21,24 @@ class Publisher(ContextDecorator, ABC):
     def publish(self, *messages: QueueMessage):
         pass
 
+    def publish_each(self, *messages: QueueMessage) -> list[bool]:
+        """
+        Публикует сообщения и для каждого возвращает, принял ли его брокер.
+        По умолчанию сообщения публикуются вместе: ошибка относится ко всем
+        и выбрасывается.
+        """
+        self.publish(*messages)
+        return [True] * len(messages)
+
     def plan(self, *messages: QueueMessage):
         self.deferred.extend(messages)
 
     def flush(self):
-        for entity in self.deferred:
-            self.publish(entity)
+        # Все отложенные сообщения передаются одним вызовом, чтобы реализация
+        # могла отправить их пачкой
+        messages = list(self.deferred)
+        if messages:
+            self.publish(*messages)
         self.reset()
 
     def reset(self):
@@ -0,0 +1,157 @@
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from med_sharing_system.application import dtos, entities, schemas
+
+
+class PatientProfilesRepo(ABC):
+
+    @abstractmethod
+    def fetch_all(self) -> Iterable[entities.PatientProfile]:
+        ...
+
+    @abstractmethod
+    def fetch_by_patient_ids(self,
+                             patient_ids: Iterable[int]
+                             ) -> Iterable[entities.PatientProfile]:
+        ...
+
+
+class PatientSimilarityIndex(ABC):
+    is_built: bool
+
+    @abstractmethod
+    def rebuild(self, profiles: Iterable[entities.PatientProfile]) -> None:
+        ...
+
+    @abstractmethod
+    def upsert(self, profiles: Iterable[entities.PatientProfile]) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, patient_ids: Iterable[int]) -> None:
+        ...
+
+    @abstractmethod
+    def search(self,
+               match_params: schemas.MatchPatients,
+               deadline: float | None = None
+               ) -> list[dtos.MatchedPatient]:
+        ...
+
+    @abstractmethod
+    def get_profiles(self) -> list[entities.PatientProfile]:
+        ...
+
+
+class PatientChangesRepo(ABC):
+
+    @abstractmethod
+    def get_change_mark(self) -> int:
+        """
+        Отметка в журнале изменений, начиная с которой нужно читать изменения,
+        чтобы не пропустить ни одного после текущего момента.
+        """
+        ...
+
+    @abstractmethod
+    def fetch_changed_patient_ids(self, since_mark: int) -> tuple[set[int], int]:
+        """
+        Возвращает пациентов, измененных начиная с отметки, и новую отметку.
+        """
+        ...
+
+    @abstractmethod
+    def save_change_mark(self, consumer: str, change_mark: int) -> None:
+        """
+        Сохраняет отметку, до которой потребитель прочитал журнал.
+        """
+        ...
+
+    @abstractmethod
+    def fetch_saved_change_mark(self, consumer: str) -> int | None:
+        """
+        Возвращает сохраненную отметку потребителя или None, если потребитель
+        не сохранял отметку или забыт (см. `prune`).
+        """
+        ...
+
+    @abstractmethod
+    def prune(self, consumer_ttl: float) -> int:
+        """
+        Забывает потребителей, не сохранявших отметку `consumer_ttl` секунд,
+        удаляет записи журнала, прочитанные всеми остальными, и возвращает
+        количество удаленных записей.
+        """
+        ...
+
+
+class PatientIndexSnapshotStorage(ABC):
+
+    @abstractmethod
+    def save(self,
+             profiles: Iterable[entities.PatientProfile],
+             change_mark: int
+             ) -> None:
+        """
+        Сохраняет профили пациентов из индекса вместе с отметкой в журнале
+        изменений, до которой они актуальны.
+        """
+        ...
+
+    @abstractmethod
+    def load(self) -> tuple[list[entities.PatientProfile], int] | None:
+        """
+        Возвращает сохраненные профили и отметку или None, если снимка нет
+        или его невозможно прочитать.
+        """
+        ...
+
+
+class MatchResultCache(ABC):
+    version: int
+
+    @abstractmethod
+    def get(self,
+            match_params: schemas.MatchPatients
+            ) -> list[dtos.MatchedPatient] | None:
+        ...
+
+    @abstractmethod
+    def put(self,
+            match_params: schemas.MatchPatients,
+            found_patients: Iterable[dtos.MatchedPatient],
+            version: int | None = None
+            ) -> None:
+        """
+        Сохраняет результат подбора. Если передана версия и кэш с тех пор
+        инвалидировался, результат не сохраняется.
+        """
+        ...
+
+    @abstractmethod
+    def invalidate(self,
+                   patient_ids: Iterable[int],
+                   profiles: Iterable[entities.PatientProfile]
+                   ) -> None:
+        """
+        Удаляет результаты, на которые могли повлиять изменения пациентов.
+
+        :param patient_ids: Все измененные пациенты, в том числе удаленные.
+        :param profiles: Актуальные профили измененных пациентов.
+        """
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class SearchQueueMonitor(ABC):
+
+    @abstractmethod
+    def get_load(self) -> dtos.QueueLoad:
+        """
+        Текущее (или недавно измеренное) состояние очереди подбора.
+        """
+        ...
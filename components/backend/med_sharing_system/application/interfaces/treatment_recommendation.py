@@ -0,0 +1,25 @@
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from med_sharing_system.application import dtos, entities, schemas
+
+
+class TreatmentOutcomesRepo(ABC):
+
+    @abstractmethod
+    def fetch_all(self) -> Iterable[entities.TreatmentOutcome]:
+        ...
+
+
+class TreatmentRecommendationIndex(ABC):
+    is_built: bool
+
+    @abstractmethod
+    def rebuild(self, outcomes: Iterable[entities.TreatmentOutcome]) -> None:
+        ...
+
+    @abstractmethod
+    def recommend(self,
+                  params: schemas.RecommendTreatmentItems
+                  ) -> list[dtos.RecommendedItem]:
+        ...
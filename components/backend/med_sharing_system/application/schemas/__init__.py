@@ -1,5 +1,6 @@
 from .diagnosis import FindDiagnoses
 from .item import (
+    GetRelatedItems,
     GetTreatmentItem,
     GetTreatmentItemWithReviews,
     FindTreatmentItems,
@@ -8,6 +9,13 @@ from .item import (
 from .item_categories import FindItemCategories
 from .item_review import FindItemReviews
 from .item_types import FindItemTypes
-from .medical_book import FindMedicalBooks
+from .medical_book import (
+    FindMedicalBooks,
+    FindMedicalBooksWithSymptoms,
+    FindMedicalBooksWithItemReviews,
+    FindMedicalBooksWithSymptomsAndItemReviews
+)
 from .patient import FindPatients
+from .patient_matching import MatchPatients
 from .symptom import FindSymptoms
+from .treatment_recommendation import RecommendTreatmentItems
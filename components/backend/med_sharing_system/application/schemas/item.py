@@ -9,6 +9,10 @@ class GetTreatmentItem(BaseSchema):
     item_id: int = Field(ge=1)
 
 
+class GetRelatedItems(GetTreatmentItem):
+    limit: int = Field(10, ge=1, le=100)
+
+
 class GetTreatmentItemWithReviews(GetTreatmentItem):
     reviews_sort_field: (
         Literal['id', 'item_id', 'is_helped', 'item_rating', 'item_count', 'usage_period']
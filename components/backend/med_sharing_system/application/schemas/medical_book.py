@@ -47,3 +47,23 @@ class FindMedicalBooks(BaseSchema):
             return values
 
         return values
+
+
+class FindMedicalBooksWithSymptoms(FindMedicalBooks):
+    symptoms_limit: int | None = Field(ge=1, description='Максимальное количество '
+                                                         'симптомов в каждой карте')
+
+
+class FindMedicalBooksWithItemReviews(FindMedicalBooks):
+    reviews_sort_field: (
+        Literal['id', 'item_id', 'is_helped', 'item_rating', 'item_count', 'usage_period']
+        | None
+    ) = None
+    reviews_sort_direction: Literal['asc', 'desc'] | None = None
+    reviews_limit: int | None = Field(ge=1, description='Максимальное количество '
+                                                        'отзывов в каждой карте')
+
+
+class FindMedicalBooksWithSymptomsAndItemReviews(FindMedicalBooksWithSymptoms,
+                                                 FindMedicalBooksWithItemReviews):
+    pass
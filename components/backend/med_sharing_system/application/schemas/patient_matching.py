@@ -0,0 +1,22 @@
+from pydantic import BaseModel as BaseSchema, Field, validator
+
+from med_sharing_system.application import dtos
+
+
+class MatchPatients(BaseSchema):
+    symptom_ids: list[int] = Field(min_items=1)
+    diagnosis_id: int | None = Field(ge=1)
+    gender: dtos.GenderEnum | None
+    age: int | None = Field(ge=10, le=120)
+    skin_type: dtos.SkinTypeEnum | None
+    limit: int = Field(10, ge=1, le=100)
+
+    @validator('symptom_ids', pre=True)
+    def fix_symptom_ids(cls, value):
+        if value is not None and not isinstance(value, list):
+            return [value]
+
+        if isinstance(value, list):
+            return sorted(set(value))
+
+        return value
@@ -0,0 +1,26 @@
+from pydantic import BaseModel as BaseSchema, Field, validator, root_validator
+
+from med_sharing_system.application import errors
+
+
+class RecommendTreatmentItems(BaseSchema):
+    diagnosis_id: int | None = Field(ge=1)
+    symptom_ids: list[int] | None = Field(ge=1)
+    limit: int = Field(10, ge=1, le=100)
+
+    @validator('symptom_ids', pre=True)
+    def fix_symptom_ids(cls, value):
+        if value is not None and not isinstance(value, list):
+            return [value]
+
+        if isinstance(value, list):
+            return sorted(set(value))
+
+        return value
+
+    @root_validator
+    def check_profile(cls, values):
+        if values.get('diagnosis_id') is None and not values.get('symptom_ids'):
+            raise errors.EmptyTreatmentProfile()
+
+        return values
@@ -22,6 +22,10 @@ from .medical_book import (
     MedicalBook,
     decorated_function_registry as medical_book_decorated_function_registry
 )
+from .outbox_relay import (
+    OutboxRelay,
+    decorated_function_registry as outbox_relay_decorated_function_registry
+)
 from .patient import (
     Patient,
     decorated_function_registry as patient_decorated_function_registry
@@ -34,3 +38,7 @@ from .symptom import (
     Symptom,
     decorated_function_registry as symptom_decorated_function_registry
 )
+from .treatment_recommendation import (
+    TreatmentRecommender,
+    decorated_function_registry as treatment_recommendation_decorated_function_registry
+)
@@ -17,11 +17,13 @@ class TreatmentItemCatalog:
                  item_reviews_repo: interfaces.ItemReviewsRepo,
                  item_categories_repo: interfaces.ItemCategoriesRepo,
                  item_types_repo: interfaces.ItemTypesRepo,
+                 cooccurrence_index: interfaces.ItemCooccurrenceIndex | None = None,
                  ) -> None:
         self.items_repo = items_repo
         self.reviews_repo = item_reviews_repo
         self.categories_repo = item_categories_repo
         self.types_repo = item_types_repo
+        self.cooccurrence_index = cooccurrence_index
 
     @register_method
     @validate_arguments
@@ -69,6 +71,20 @@ class TreatmentItemCatalog:
         )
         return dtos.TreatmentItemWithReviews(**item_info.dict(), reviews=reviews)
 
+    @validate_arguments
+    def get_related_items(self,
+                          filter_params: schemas.GetRelatedItems
+                          ) -> list[dtos.RelatedItem]:
+        """
+        Товары, которые чаще всего упоминаются в тех же медицинских картах,
+        что и заданный. Ответ строится по индексу в памяти, без запросов к БД.
+        """
+        if self.cooccurrence_index is None or not self.cooccurrence_index.is_built:
+            raise errors.ItemCooccurrenceIndexError
+
+        return self.cooccurrence_index.get_related_items(filter_params.item_id,
+                                                         filter_params.limit)
+
     @register_method
     @validate_arguments
     def find_items(self,
@@ -200,21 +216,27 @@ class TreatmentItemCatalog:
                               items: list[dtos.TreatmentItem],
                               filter_params: schemas.FindTreatmentItemsWithReviews
                               ) -> list[dtos.TreatmentItemWithReviews | None]:
+        if not items:
+            return []
+
+        review_filter_params: schemas.FindItemReviews = (
+            schemas.FindItemReviews(
+                item_ids=[item.id for item in items],
+                sort_field=filter_params.reviews_sort_field,
+                sort_direction=filter_params.reviews_sort_direction,
+                limit=filter_params.reviews_limit,
+                offset=filter_params.reviews_offset,
+                exclude_review_fields=filter_params.exclude_review_fields
+            )
+        )
+        reviews_by_items: dict[int, list[entities.ItemReview | dtos.ItemReview]] = (
+            self.reviews_repo.fetch_top_by_items(review_filter_params)
+        )
 
         items_with_reviews: list[dtos.TreatmentItemWithReviews] = []
         for item in items:
-            review_filter_params: schemas.FindItemReviews = (
-                schemas.FindItemReviews(
-                    item_ids=[item.id],
-                    sort_field=filter_params.reviews_sort_field,
-                    sort_direction=filter_params.reviews_sort_direction,
-                    limit=filter_params.reviews_limit,
-                    offset=filter_params.reviews_offset,
-                    exclude_review_fields=filter_params.exclude_review_fields
-                )
-            )
-            reviews: Sequence[entities.ItemReview | dtos.ItemReview | None] = (
-                self.reviews_repo.fetch_by_items(review_filter_params)
+            reviews: list[entities.ItemReview | dtos.ItemReview] = (
+                reviews_by_items.get(item.id, [])
             )
             if reviews and isinstance(reviews[0], entities.ItemReview):
                 reviews = [dtos.ItemReview.from_orm(review) for review in reviews]
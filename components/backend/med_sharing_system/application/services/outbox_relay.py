@@ -0,0 +1,63 @@
+from med_sharing_system.application import interfaces
+from med_sharing_system.application.interfaces.message_publishing import QueueMessage
+from med_sharing_system.application.utils import DecoratedFunctionRegistry
+
+decorated_function_registry = DecoratedFunctionRegistry()
+register_method = decorated_function_registry.register_function
+
+
+class OutboxRelay:
+    """
+    Переносит сообщения из outbox в брокер пачками по `batch_size`.
+
+    Сообщения удаляются из outbox в той же транзакции, в которой
+    публикуются, но только подтвержденные брокером. Сообщения, которые
+    брокер отклонил, откладываются с растущей задержкой (от `retry_delay`
+    до `max_retry_delay` секунд), и остальная пачка не публикуется повторно.
+    Если процесс остановится после публикации, но до фиксации транзакции,
+    сообщения будут опубликованы повторно - доставка "как минимум один раз".
+    """
+
+    def __init__(self,
+                 outbox_repo: interfaces.OutboxRepo,
+                 publisher: interfaces.Publisher,
+                 batch_size: int = 100,
+                 retry_delay: float = 1,
+                 max_retry_delay: float = 300
+                 ) -> None:
+        self.outbox_repo = outbox_repo
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    @register_method
+    def relay_batch(self) -> int:
+        """
+        Публикует одну пачку и возвращает число забранных из outbox
+        сообщений (опубликованных и отложенных).
+        """
+        messages: list[QueueMessage] = self.outbox_repo.take(self.batch_size)
+        if not messages:
+            return 0
+
+        confirmed: list[bool] = self.publisher.publish_each(*messages)
+        self.outbox_repo.remove([message for message, is_confirmed
+                                 in zip(messages, confirmed) if is_confirmed])
+        rejected: list[QueueMessage] = [message for message, is_confirmed
+                                        in zip(messages, confirmed) if not is_confirmed]
+        if rejected:
+            self.outbox_repo.postpone(rejected, self.retry_delay, self.max_retry_delay)
+        return len(messages)
+
+    def relay_pending(self) -> int:
+        """
+        Публикует пачки, пока в outbox не останется сообщений, готовых
+        к отправке.
+        """
+        relayed: int = 0
+        while True:
+            count: int = self.relay_batch()
+            relayed += count
+            if count < self.batch_size:
+                return relayed
@@ -1,10 +1,13 @@
-import random
+import threading
 import time
 from typing import TypedDict
 
-from med_sharing_system.application import interfaces, dtos, errors
+from med_sharing_system.application import interfaces, dtos, entities, errors, schemas
 from med_sharing_system.application.interfaces.message_publishing import QueueMessage
-from med_sharing_system.application.utils import DecoratedFunctionRegistry
+from med_sharing_system.application.utils import (
+    DecoratedFunctionRegistry,
+    QueueAdmissionControl
+)
 
 decorated_function_registry = DecoratedFunctionRegistry()
 register_method = decorated_function_registry.register_function
@@ -20,35 +23,309 @@ class PublicationTargets(TypedDict, total=False):
 
 
 class PatientMatcher:
+    # Потребитель журнала изменений, отметка которого - отметка снимка индекса
+    SNAPSHOT_CHANGE_CONSUMER: str = 'patient_index_snapshot'
+
     def __init__(self,
                  publisher: interfaces.Publisher | None = None,
                  targets: PublicationTargets | None = None,
                  message_deliverer: interfaces.MessageSender | None = None,
+                 similarity_index: interfaces.PatientSimilarityIndex | None = None,
+                 patient_profiles_repo: interfaces.PatientProfilesRepo | None = None,
+                 patient_changes_repo: interfaces.PatientChangesRepo | None = None,
+                 snapshot_storage: interfaces.PatientIndexSnapshotStorage | None = None,
+                 match_cache: interfaces.MatchResultCache | None = None,
+                 match_timeout: float | None = None,
+                 admission_control: QueueAdmissionControl | None = None,
+                 change_consumer: str | None = None,
+                 change_consumer_ttl: float = 7 * 24 * 3600,
+                 prune_interval: float = 60,
                  ) -> None:
         self.publisher = publisher
         self.message_deliverer = message_deliverer
         self.targets = targets
+        self.similarity_index = similarity_index
+        self.patient_profiles_repo = patient_profiles_repo
+        self.patient_changes_repo = patient_changes_repo
+        self.snapshot_storage = snapshot_storage
+        self.match_cache = match_cache
+        # Время (с) на подбор в `find_matching_patient`, None - без ограничения
+        self.match_timeout = match_timeout
+        # Отметка в журнале изменений, до которой индекс и кэш актуальны
+        self.change_mark: int | None = None
+        # Допуск запросов в очередь подбора, None - запросы принимаются всегда
+        self.admission_control = admission_control
+        # Имя процесса в журнале изменений: его отметка сохраняется не чаще
+        # `prune_interval` секунд, и записи, прочитанные всеми потребителями,
+        # удаляются. None - журнал не очищается этим процессом
+        self.change_consumer = change_consumer
+        self.change_consumer_ttl = change_consumer_ttl
+        self.prune_interval = prune_interval
+        self._pruned_at: float | None = None
+        # Индекс догоняют обработчики подбора и фоновый поток API
+        self._catch_up_lock = threading.Lock()
+
+    @register_method
+    def publish_request_for_search_patients(
+        self,
+        client_id: str,
+        match_params: schemas.MatchPatients,
+        priority: dtos.MatchPriorityEnum = dtos.MatchPriorityEnum.INTERACTIVE
+    ) -> list[dtos.MatchedPatient] | None:
+        """
+        Публикует запрос в очередь подбора и возвращает None. Если такой же
+        запрос уже есть в кэше результатов, возвращает результат из кэша
+        без публикации.
+
+        Метод выполняется в транзакции, поэтому публикатор может сохранить
+        запрос в outbox (`OutboxPublisher`) вместо ожидания брокера.
+
+        Если очередь подбора перегружена, интерактивный запрос отклоняется
+        ошибкой `MatchingQueueOverloaded` (см. `QueueAdmissionControl`).
+        Запросы массового подбора (`MatchPriorityEnum.BULK`) попадают
+        в отдельную полосу очереди и не мешают интерактивным.
+
+        Журнал изменений в запросе не читается: кэш очищается от устаревших
+        результатов в фоне (см. `catch_up_similarity_index`), поэтому
+        результат из кэша может отставать от БД на период фонового обновления.
+        """
+        if self.match_cache is not None:
+            found_patients: list[dtos.MatchedPatient] | None = (
+                self.match_cache.get(match_params)
+            )
+            if found_patients is not None:
+                return found_patients
 
-    def publish_request_for_search_patients(self, client_id: str) -> None:
         if not self.publisher:
             raise errors.PublisherError
 
         if not self.targets.get('publish_request_for_search_patients'):
             raise errors.TargetNamesError
 
+        if (self.admission_control is not None
+                and priority >= dtos.MatchPriorityEnum.INTERACTIVE):
+            self.admission_control.check()
+
         with self.publisher:
             self.publisher.plan(
                 QueueMessage(
                     self.targets['publish_request_for_search_patients'],
-                    {'client_id': client_id, 'symptoms': 1}
+                    {'client_id': client_id,
+                     **match_params.dict(exclude_none=True)},
+                    priority=int(priority)
                 )
             )
+        return None
+
+    def match_patients(self,
+                       client_id: str,
+                       match_params: schemas.MatchPatients,
+                       timeout: float | None = None
+                       ) -> list[dtos.MatchedPatient] | None:
+        """
+        Подбирает похожих пациентов сразу, если индекс построен и поиск
+        укладывается в `timeout` секунд. Иначе публикует запрос в очередь
+        подбора (см. `publish_request_for_search_patients`) и возвращает
+        None - результат придет клиенту сообщением.
+
+        Журнал изменений в запросе не читается: его объем не ограничен
+        `timeout`, поэтому индекс догоняет изменения в фоне (см.
+        `catch_up_similarity_index`), и результат может отставать от БД
+        на период фонового обновления.
+        """
+        if (timeout
+                and self.similarity_index is not None
+                and self.similarity_index.is_built):
+            deadline: float = time.monotonic() + timeout
+            try:
+                return self._search(match_params, deadline=deadline)
+            except errors.MatchingDeadlineExceeded:
+                pass
+
+        return self.publish_request_for_search_patients(client_id, match_params)
+
+    def _search(self,
+                match_params: schemas.MatchPatients,
+                deadline: float | None = None
+                ) -> list[dtos.MatchedPatient]:
+        if self.match_cache is None:
+            return self.similarity_index.search(match_params, deadline=deadline)
+
+        found_patients: list[dtos.MatchedPatient] | None = (
+            self.match_cache.get(match_params)
+        )
+        if found_patients is not None:
+            return found_patients
+
+        # Версия запоминается до поиска: если во время поиска кэш будет
+        # инвалидирован, устаревший результат не сохранится
+        version: int = self.match_cache.version
+        found_patients = self.similarity_index.search(match_params, deadline=deadline)
+        self.match_cache.put(match_params, found_patients, version)
+        return found_patients
+
+    @register_method
+    def rebuild_similarity_index(self) -> None:
+        """
+        Заново строит индекс похожих пациентов по данным БД.
+        """
+        if self.similarity_index is None or self.patient_profiles_repo is None:
+            raise errors.SimilarityIndexError
+
+        # Отметка берется до чтения профилей: изменения, сделанные во время
+        # построения, будут применены повторно, а не потеряны
+        change_mark: int | None = (self.patient_changes_repo.get_change_mark()
+                                   if self.patient_changes_repo else None)
+        self.similarity_index.rebuild(self.patient_profiles_repo.fetch_all())
+        self.change_mark = change_mark
+        if self.match_cache is not None:
+            self.match_cache.clear()
 
     @register_method
-    def find_matching_patient(self, client_id: str, symptoms: int) -> int:
-        # Имитация сложной работы
-        time.sleep(5)
-        found_patients = random.randint(1, 10)
+    def load_similarity_index(self) -> None:
+        """
+        Загружает индекс похожих пациентов из снимка и применяет изменения,
+        сделанные после него. Если снимка нет, индекс строится по БД и
+        сохраняется в новый снимок.
+        """
+        if self.similarity_index is None:
+            raise errors.SimilarityIndexError
+
+        # Без журнала изменений снимок невозможно актуализировать
+        snapshot = (self.snapshot_storage.load()
+                    if self.snapshot_storage and self.patient_changes_repo
+                    else None)
+        if snapshot is None:
+            self.rebuild_similarity_index()
+            self.save_similarity_index_snapshot()
+            return None
+
+        # Записи журнала после отметки снимка хранятся, пока отметка снимка
+        # не забыта (см. `save_similarity_index_snapshot`)
+        profiles, change_mark = snapshot
+        saved_mark: int | None = self.patient_changes_repo.fetch_saved_change_mark(
+            self.SNAPSHOT_CHANGE_CONSUMER
+        )
+        if saved_mark is None or saved_mark > change_mark:
+            self.rebuild_similarity_index()
+            self.save_similarity_index_snapshot()
+            return None
+
+        # Отметка устанавливается после построения, чтобы параллельный
+        # `catch_up_similarity_index` не применил изменения к прежнему индексу
+        self.similarity_index.rebuild(profiles)
+        self.change_mark = change_mark
+        if self.match_cache is not None:
+            self.match_cache.clear()
+        self.catch_up_similarity_index()
+
+    @register_method
+    def save_similarity_index_snapshot(self) -> bool:
+        """
+        Сохраняет текущее состояние индекса в снимок. Возвращает False, если
+        хранилище снимков не задано или индекс еще не построен.
+
+        Отметка снимка сохраняется в журнале как отметка потребителя, чтобы
+        записи после нее не были удалены, пока снимок можно загрузить.
+        """
+        if (self.snapshot_storage is None
+                or self.similarity_index is None
+                or not self.similarity_index.is_built
+                or self.change_mark is None):
+            return False
+
+        # Отметка читается до профилей: изменения, примененные между этими
+        # действиями, после загрузки снимка будут применены повторно
+        change_mark: int = self.change_mark
+        self.snapshot_storage.save(self.similarity_index.get_profiles(), change_mark)
+        if self.patient_changes_repo is not None:
+            self.patient_changes_repo.save_change_mark(self.SNAPSHOT_CHANGE_CONSUMER,
+                                                       change_mark)
+        return True
+
+    @register_method
+    def catch_up_similarity_index(self) -> set[int]:
+        """
+        Применяет к индексу изменения пациентов и их медицинских карт,
+        сделанные после его построения, и удаляет из кэша результаты, на
+        которые они могли повлиять. Возвращает id обновленных пациентов.
+        """
+        if self.patient_changes_repo is None:
+            return set()
+
+        with self._catch_up_lock:
+            return self._catch_up()
+
+    def _catch_up(self) -> set[int]:
+        if self.change_mark is None:
+            # Кэш без индекса следит за изменениями с момента первого вызова
+            if self.match_cache is not None:
+                self.change_mark = self.patient_changes_repo.get_change_mark()
+                self.match_cache.clear()
+            return set()
+
+        changed_patient_ids, self.change_mark = (
+            self.patient_changes_repo.fetch_changed_patient_ids(self.change_mark)
+        )
+        self._prune_changes()
+        if not changed_patient_ids:
+            return set()
+
+        profiles: list[entities.PatientProfile] = list(
+            self.patient_profiles_repo.fetch_by_patient_ids(changed_patient_ids)
+        )
+        if self.similarity_index is not None and self.similarity_index.is_built:
+            self.similarity_index.upsert(profiles)
+            self.similarity_index.remove(
+                changed_patient_ids - {profile.patient_id for profile in profiles}
+            )
+        if self.match_cache is not None:
+            self.match_cache.invalidate(changed_patient_ids, profiles)
+        return changed_patient_ids
+
+    def _prune_changes(self) -> None:
+        """
+        Сохраняет отметку процесса в журнале изменений и удаляет записи,
+        прочитанные всеми потребителями.
+        """
+        now: float = time.monotonic()
+        if (self.change_consumer is None
+                or (self._pruned_at is not None
+                    and now - self._pruned_at < self.prune_interval)):
+            return None
+
+        self._pruned_at = now
+        self.patient_changes_repo.save_change_mark(self.change_consumer,
+                                                   self.change_mark)
+        self.patient_changes_repo.prune(self.change_consumer_ttl)
+
+    @register_method
+    def find_matching_patient(self,
+                              client_id: str,
+                              **match_params
+                              ) -> list[dtos.MatchedPatient]:
+        """
+        Подбирает пациентов, похожих на клиента, и публикует их вместе
+        с оценками сходства. Индекс строится при первом обращении,
+        а затем перед каждым поиском догоняет изменения в БД.
+
+        Если подбор не укладывается в `match_timeout`, поиск прерывается
+        ошибкой `MatchingDeadlineExceeded`.
+        """
+        if self.similarity_index is None:
+            raise errors.SimilarityIndexError
+
+        deadline: float | None = (time.monotonic() + self.match_timeout
+                                  if self.match_timeout else None)
+
+        params = schemas.MatchPatients(**match_params)
+        if not self.similarity_index.is_built:
+            self.rebuild_similarity_index()
+        else:
+            self.catch_up_similarity_index()
+
+        found_patients: list[dtos.MatchedPatient] = self._search(params,
+                                                                 deadline=deadline)
 
         if self.publisher:
             if not self.targets or not self.targets.get('find_matching_patient'):
@@ -59,18 +336,28 @@ class PatientMatcher:
                     QueueMessage(
                         self.targets['find_matching_patient'],
                         {'client_id': client_id,
-                         'found_patients': found_patients}
+                         'found_patients': [patient.dict()
+                                            for patient in found_patients]}
                     )
                 )
         return found_patients
 
     @register_method
-    def send_message_to_client(self, client_id: str, found_patients: int) -> str:
+    def send_message_to_client(self,
+                               client_id: str,
+                               found_patients: list[dict]
+                               ) -> str:
+        patients = [dtos.MatchedPatient(**patient) for patient in found_patients]
+        body = f"Found {len(patients)} similar patients"
+        if patients:
+            body += ': ' + ', '.join(f"#{patient.patient_id} ({patient.score:.2f})"
+                                     for patient in patients)
+
         if self.message_deliverer:
             message = dtos.Message(
                 target=client_id,
                 title=f"Found similar patients",
-                body=f"Found {found_patients} similar patients"
+                body=body
             )
             self.message_deliverer.send(message)
-        return f"Found {found_patients} similar patients"
+        return body
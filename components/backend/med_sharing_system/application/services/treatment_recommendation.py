@@ -0,0 +1,48 @@
+import threading
+
+from med_sharing_system.application import dtos, errors, interfaces, schemas
+from med_sharing_system.application.utils import DecoratedFunctionRegistry
+
+decorated_function_registry = DecoratedFunctionRegistry()
+register_method = decorated_function_registry.register_function
+
+
+class TreatmentRecommender:
+    def __init__(
+            self,
+            recommendation_index: interfaces.TreatmentRecommendationIndex | None = None,
+            treatment_outcomes_repo: interfaces.TreatmentOutcomesRepo | None = None,
+    ) -> None:
+        self.recommendation_index = recommendation_index
+        self.treatment_outcomes_repo = treatment_outcomes_repo
+        self._build_lock = threading.RLock()
+
+    @register_method
+    def rebuild_index(self) -> None:
+        """
+        Заново строит индекс рекомендаций по медицинским картам из БД.
+        """
+        if self.recommendation_index is None or self.treatment_outcomes_repo is None:
+            raise errors.RecommendationIndexError
+
+        with self._build_lock:
+            self.recommendation_index.rebuild(self.treatment_outcomes_repo.fetch_all())
+
+    def recommend(self,
+                  params: schemas.RecommendTreatmentItems
+                  ) -> list[dtos.RecommendedItem]:
+        """
+        Товары, которые чаще всего помогали и получали высокие оценки
+        в медицинских картах, похожих на заданный профиль. Если индекс еще
+        не построен, он строится при первом запросе.
+        """
+        if self.recommendation_index is None:
+            raise errors.RecommendationIndexError
+
+        if not self.recommendation_index.is_built:
+            # Параллельные запросы дожидаются одного построения
+            with self._build_lock:
+                if not self.recommendation_index.is_built:
+                    self.rebuild_index()
+
+        return self.recommendation_index.recommend(params)
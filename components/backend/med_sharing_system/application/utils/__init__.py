@@ -1 +1,9 @@
+from .admission import QueueAdmissionControl
 from .aspect_points import DecoratedFunctionRegistry
+from .patient_similarity import (
+    ExactPatientSimilarityIndex,
+    MinHashPatientSimilarityIndex,
+    SimilarityWeights
+)
+from .match_cache import TTLMatchResultCache
+from .treatment_recommendations import ItemRecommendationIndex
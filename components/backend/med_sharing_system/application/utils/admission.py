@@ -0,0 +1,56 @@
+import math
+
+from med_sharing_system.application import dtos, errors, interfaces
+
+
+class QueueAdmissionControl:
+    """
+    Допуск запросов в очередь подбора по ее глубине.
+
+    Когда в очереди `high_watermark` сообщений и больше, новые запросы
+    отклоняются ошибкой `MatchingQueueOverloaded`, пока глубина не опустится
+    до `low_watermark`: разрыв между порогами не дает допуску переключаться
+    на каждом запросе.
+
+    В ошибке передается время (с), через которое стоит повторить запрос:
+    за него потребители должны разобрать очередь до `low_watermark`
+    с измеренной скоростью. Если скорость еще неизвестна, используется
+    `retry_after`, если потребителей нет - `max_retry_after`.
+    """
+
+    def __init__(self,
+                 monitor: interfaces.SearchQueueMonitor,
+                 high_watermark: int,
+                 low_watermark: int | None = None,
+                 retry_after: int = 5,
+                 max_retry_after: int = 60
+                 ) -> None:
+        if low_watermark is None:
+            low_watermark = high_watermark * 3 // 4
+        assert 0 <= low_watermark <= high_watermark, \
+            'Low watermark should not exceed high watermark'
+        self.monitor = monitor
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self.is_overloaded: bool = False
+
+    def check(self) -> None:
+        load: dtos.QueueLoad = self.monitor.get_load()
+        if load.depth >= self.high_watermark:
+            self.is_overloaded = True
+        elif load.depth <= self.low_watermark:
+            self.is_overloaded = False
+
+        if self.is_overloaded:
+            raise errors.MatchingQueueOverloaded(retry_after=self._get_retry_after(load))
+
+    def _get_retry_after(self, load: dtos.QueueLoad) -> int:
+        if not load.consumers:
+            return self.max_retry_after
+        if not load.drain_rate:
+            return self.retry_after
+
+        excess: int = max(load.depth - self.low_watermark, 1)
+        return min(max(math.ceil(excess / load.drain_rate), 1), self.max_retry_after)
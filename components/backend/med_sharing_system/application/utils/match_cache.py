@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable
+
+from med_sharing_system.application import dtos, entities, interfaces, schemas
+
+
+@dataclass(frozen=True)
+class _CacheEntry:
+    match_params: schemas.MatchPatients
+    found_patients: tuple[dtos.MatchedPatient, ...]
+    expires_at: float
+
+
+class TTLMatchResultCache(interfaces.MatchResultCache):
+    """
+    Кэш результатов подбора похожих пациентов с ограничением по времени
+    жизни записей и по их количеству (вытесняются давно не использованные).
+
+    Ключ - нормализованные параметры запроса: симптомы уже отсортированы
+    и без повторов (см. `schemas.MatchPatients`), поэтому одинаковые по смыслу
+    запросы попадают в одну запись.
+
+    При изменении пациентов удаляются записи, в результатах которых есть
+    эти пациенты, и записи, запросы которых пересекаются с их новыми
+    симптомами или диагнозами - в них пациенты могли бы попасть теперь.
+    """
+
+    def __init__(self,
+                 ttl: float,
+                 max_size: int,
+                 clock: Callable[[], float] = time.monotonic
+                 ) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+            self._by_symptom: dict[int, set[Hashable]] = {}
+            self._by_diagnosis: dict[int, set[Hashable]] = {}
+            self._by_patient: dict[int, set[Hashable]] = {}
+            # Увеличивается при каждой инвалидации, чтобы не сохранить
+            # результат, вычисленный по данным до нее
+            self.version: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def get_key(match_params: schemas.MatchPatients) -> Hashable:
+        return (tuple(match_params.symptom_ids),
+                match_params.diagnosis_id,
+                match_params.gender and match_params.gender.value,
+                match_params.age,
+                match_params.skin_type and match_params.skin_type.value,
+                match_params.limit)
+
+    def get(self,
+            match_params: schemas.MatchPatients
+            ) -> list[dtos.MatchedPatient] | None:
+        key: Hashable = self.get_key(match_params)
+        with self._lock:
+            entry: _CacheEntry | None = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if entry.expires_at <= self.clock():
+                self._pop(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return list(entry.found_patients)
+
+    def put(self,
+            match_params: schemas.MatchPatients,
+            found_patients: Iterable[dtos.MatchedPatient],
+            version: int | None = None
+            ) -> None:
+        key: Hashable = self.get_key(match_params)
+        with self._lock:
+            if version is not None and version != self.version:
+                return None
+
+            self._pop(key)
+            entry = _CacheEntry(match_params,
+                                tuple(found_patients),
+                                self.clock() + self.ttl)
+            self._entries[key] = entry
+            for symptom_id in match_params.symptom_ids:
+                self._by_symptom.setdefault(symptom_id, set()).add(key)
+            if match_params.diagnosis_id is not None:
+                self._by_diagnosis.setdefault(match_params.diagnosis_id, set()).add(key)
+            for patient in entry.found_patients:
+                self._by_patient.setdefault(patient.patient_id, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self,
+                   patient_ids: Iterable[int],
+                   profiles: Iterable[entities.PatientProfile]
+                   ) -> None:
+        with self._lock:
+            self.version += 1
+            keys: set[Hashable] = set()
+            for patient_id in patient_ids:
+                keys |= self._by_patient.get(patient_id, set())
+            for profile in profiles:
+                for symptom_id in profile.symptom_ids:
+                    keys |= self._by_symptom.get(symptom_id, set())
+                for diagnosis_id in profile.diagnosis_ids:
+                    keys |= self._by_diagnosis.get(diagnosis_id, set())
+
+            for key in keys:
+                self._pop(key)
+
+    def _pop(self, key: Hashable) -> None:
+        entry: _CacheEntry | None = self._entries.pop(key, None)
+        if entry is None:
+            return None
+
+        match_params = entry.match_params
+        for symptom_id in match_params.symptom_ids:
+            self._discard(self._by_symptom, symptom_id, key)
+        if match_params.diagnosis_id is not None:
+            self._discard(self._by_diagnosis, match_params.diagnosis_id, key)
+        for patient in entry.found_patients:
+            self._discard(self._by_patient, patient.patient_id, key)
+
+    @staticmethod
+    def _discard(keys_by_value: dict, value: int, key: Hashable) -> None:
+        keys: set[Hashable] | None = keys_by_value.get(value)
+        if keys is None:
+            return None
+
+        keys.discard(key)
+        if not keys:
+            del keys_by_value[value]
@@ -0,0 +1,439 @@
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Hashable, Iterable, NamedTuple
+
+from med_sharing_system.application import dtos, entities, errors, interfaces, schemas
+
+
+@dataclass(frozen=True)
+class SimilarityWeights:
+    """
+    Вклад признаков в итоговую оценку сходства. Оценка нормируется на сумму
+    весов признаков, указанных в запросе, поэтому всегда лежит в [0, 1].
+    """
+    symptoms: float = 0.6
+    diagnosis: float = 0.2
+    age: float = 0.1
+    gender: float = 0.05
+    skin_type: float = 0.05
+    # Разница в возрасте (в годах), при которой сходство по возрасту равно нулю
+    age_scale: int = 20
+
+
+@dataclass
+class _CandidateGroup:
+    """
+    Кандидаты с одинаковым набором общих с запросом симптомов и одинаковым
+    совпадением диагноза, пола и типа кожи.
+    """
+    patient_ids: set[int]
+    common_symptoms_weight: float = 0.0
+    attributes_score: float = 0.0
+    # Номер следующего признака, по которому группа еще не поделена
+    split_index: int = 0
+
+
+class _Split(NamedTuple):
+    """
+    Признак, по которому делится группа кандидатов.
+    """
+    patient_ids: set[int]
+    symptom_weight: float
+    attribute_score: float
+    # Наибольшая прибавка к оценке, которую дает совпадение признака
+    max_gain: float
+
+
+class _Scorer:
+    """
+    Оценивает сходство пациентов с одним запросом. Все, что зависит только
+    от запроса, считается один раз при создании.
+    """
+    PRECISION: int = 6
+
+    def __init__(self,
+                 match_params: schemas.MatchPatients,
+                 weights: SimilarityWeights,
+                 symptom_weights: dict[int, float],
+                 unknown_symptom_weight: float
+                 ) -> None:
+        self.match_params = match_params
+        self.weights = weights
+        self.symptom_weights = symptom_weights
+        self.query_weight: float = sum(
+            symptom_weights.get(symptom_id, unknown_symptom_weight)
+            for symptom_id in match_params.symptom_ids
+        )
+        self.age_weight: float = weights.age if match_params.age is not None else 0.0
+        self.max_score: float = (
+            weights.symptoms
+            + self.age_weight
+            + (weights.diagnosis if match_params.diagnosis_id is not None else 0.0)
+            + (weights.gender if match_params.gender is not None else 0.0)
+            + (weights.skin_type if match_params.skin_type is not None else 0.0)
+        )
+
+    def get_symptoms_score_bound(self, common_symptoms_weight: float) -> float:
+        """
+        Объединение симптомов пациента и запроса не меньше симптомов запроса,
+        поэтому коэффициент Жаккара не больше доли веса общих симптомов.
+        """
+        if not self.query_weight:
+            return 0.0
+        return self.weights.symptoms * common_symptoms_weight / self.query_weight
+
+    def get_upper_bound(self, group: _CandidateGroup, remaining_gain: float) -> float:
+        """
+        Максимально возможная оценка пациента из группы, если он совпадет
+        со всеми признаками, по которым группа еще не поделена.
+        """
+        return (self.get_symptoms_score_bound(group.common_symptoms_weight)
+                + group.attributes_score
+                + self.age_weight
+                + remaining_gain) / self.max_score
+
+    def round(self, score: float) -> float:
+        return round(score, self.PRECISION)
+
+    def __call__(self, profile: entities.PatientProfile, group: _CandidateGroup) -> float:
+        # Взвешенный коэффициент Жаккара по симптомам
+        union_weight: float = (self.query_weight
+                               + sum(map(self.symptom_weights.__getitem__,
+                                         profile.symptom_ids))
+                               - group.common_symptoms_weight)
+        score: float = group.attributes_score + (
+            self.weights.symptoms * group.common_symptoms_weight / union_weight
+            if union_weight else 0.0
+        )
+
+        if self.age_weight:
+            age_difference: int = abs(self.match_params.age - profile.age)
+            score += self.age_weight * max(
+                0.0, 1 - age_difference / self.weights.age_scale
+            )
+
+        # Округление убирает погрешность порядка суммирования,
+        # чтобы равные оценки сравнивались по id
+        return round(min(score / self.max_score, 1.0), self.PRECISION)
+
+
+class ExactPatientSimilarityIndex(interfaces.PatientSimilarityIndex):
+    """
+    Точный подбор похожих пациентов в памяти процесса.
+
+    Сходство по симптомам - взвешенный коэффициент Жаккара, где вес симптома
+    равен его IDF: редкий общий симптом говорит о сходстве больше, чем частый.
+    К нему добавляются совпадение диагноза, пола, типа кожи и близость
+    возраста (см. `SimilarityWeights`).
+
+    Кандидаты отбираются по инвертированному индексу "симптом -> пациенты",
+    поэтому оцениваются только пациенты, у которых есть хотя бы один общий
+    с запросом симптом или тот же диагноз.
+    """
+
+    def __init__(self, weights: SimilarityWeights = SimilarityWeights()) -> None:
+        self.weights = weights
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._profiles: dict[int, entities.PatientProfile] = {}
+        self._by_symptom: dict[int, set[int]] = {}
+        self._by_diagnosis: dict[int, set[int]] = {}
+        self._by_gender: dict[str, set[int]] = {}
+        self._by_skin_type: dict[str, set[int]] = {}
+        self._symptom_weights: dict[int, float] | None = None
+        self.is_built: bool = False
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    # -----------------------------------------------------------------------------------
+    # Построение и обновление
+    # -----------------------------------------------------------------------------------
+    def rebuild(self, profiles: Iterable[entities.PatientProfile]) -> None:
+        with self._lock:
+            self._clear()
+            for profile in profiles:
+                self._add(profile)
+            self.is_built = True
+
+    def upsert(self, profiles: Iterable[entities.PatientProfile]) -> None:
+        with self._lock:
+            for profile in profiles:
+                self._remove(profile.patient_id)
+                self._add(profile)
+
+    def remove(self, patient_ids: Iterable[int]) -> None:
+        with self._lock:
+            for patient_id in patient_ids:
+                self._remove(patient_id)
+
+    def get_profiles(self) -> list[entities.PatientProfile]:
+        with self._lock:
+            return list(self._profiles.values())
+
+    def _add(self, profile: entities.PatientProfile) -> None:
+        self._profiles[profile.patient_id] = profile
+        for symptom_id in profile.symptom_ids:
+            self._by_symptom.setdefault(symptom_id, set()).add(profile.patient_id)
+        for diagnosis_id in profile.diagnosis_ids:
+            self._by_diagnosis.setdefault(diagnosis_id, set()).add(profile.patient_id)
+        self._by_gender.setdefault(profile.gender, set()).add(profile.patient_id)
+        self._by_skin_type.setdefault(profile.skin_type, set()).add(profile.patient_id)
+        self._symptom_weights = None
+
+    def _remove(self, patient_id: int) -> entities.PatientProfile | None:
+        profile: entities.PatientProfile | None = self._profiles.pop(patient_id, None)
+        if profile is None:
+            return None
+
+        for symptom_id in profile.symptom_ids:
+            self._discard(self._by_symptom, symptom_id, patient_id)
+        for diagnosis_id in profile.diagnosis_ids:
+            self._discard(self._by_diagnosis, diagnosis_id, patient_id)
+        self._discard(self._by_gender, profile.gender, patient_id)
+        self._discard(self._by_skin_type, profile.skin_type, patient_id)
+        self._symptom_weights = None
+        return profile
+
+    @staticmethod
+    def _discard(postings: dict, key: Hashable, patient_id: int) -> None:
+        patient_ids: set[int] = postings[key]
+        patient_ids.discard(patient_id)
+        if not patient_ids:
+            del postings[key]
+
+    # -----------------------------------------------------------------------------------
+    # Поиск
+    # -----------------------------------------------------------------------------------
+    def _idf(self, document_frequency: int) -> float:
+        return math.log((1 + len(self._profiles)) / (1 + document_frequency)) + 1
+
+    def _get_symptom_weights(self) -> dict[int, float]:
+        if self._symptom_weights is None:
+            self._symptom_weights = {
+                symptom_id: self._idf(len(patient_ids))
+                for symptom_id, patient_ids in self._by_symptom.items()
+            }
+        return self._symptom_weights
+
+    def _find_candidates(self, match_params: schemas.MatchPatients) -> set[int]:
+        candidates: set[int] = set().union(*(
+            self._by_symptom.get(symptom_id, ())
+            for symptom_id in match_params.symptom_ids
+        ))
+        if match_params.diagnosis_id is not None:
+            candidates |= self._by_diagnosis.get(match_params.diagnosis_id, set())
+        return candidates
+
+    def _get_splits(self,
+                    match_params: schemas.MatchPatients,
+                    score: _Scorer
+                    ) -> list[_Split]:
+        """
+        Признаки, по которым делятся группы кандидатов. Самые весомые идут
+        первыми, чтобы неперспективные группы отсекались раньше.
+        """
+        splits: list[tuple[set[int] | None, float, float]] = [
+            (self._by_symptom.get(symptom_id), score.symptom_weights.get(symptom_id), 0.0)
+            for symptom_id in match_params.symptom_ids
+        ]
+        if match_params.diagnosis_id is not None:
+            splits.append((self._by_diagnosis.get(match_params.diagnosis_id),
+                           0.0, self.weights.diagnosis))
+        if match_params.gender is not None:
+            splits.append((self._by_gender.get(match_params.gender.value),
+                           0.0, self.weights.gender))
+        if match_params.skin_type is not None:
+            splits.append((self._by_skin_type.get(match_params.skin_type.value),
+                           0.0, self.weights.skin_type))
+
+        return sorted(
+            (
+                _Split(patient_ids,
+                       symptom_weight,
+                       attribute_score,
+                       score.get_symptoms_score_bound(symptom_weight) + attribute_score)
+                for patient_ids, symptom_weight, attribute_score in splits
+                if patient_ids
+            ),
+            key=lambda split: split.max_gain,
+            reverse=True
+        )
+
+    @staticmethod
+    def _split_group(group: _CandidateGroup, split: _Split) -> list[_CandidateGroup]:
+        """
+        Делит группу на пациентов с признаком и без него. Выполняется
+        пересечением и разностью множеств, без обхода пациентов в цикле Python.
+        """
+        groups: list[_CandidateGroup] = []
+        matched: set[int] = group.patient_ids & split.patient_ids
+        if matched:
+            groups.append(_CandidateGroup(
+                matched,
+                group.common_symptoms_weight + split.symptom_weight,
+                group.attributes_score + split.attribute_score,
+                group.split_index + 1
+            ))
+        if len(matched) < len(group.patient_ids):
+            groups.append(_CandidateGroup(group.patient_ids - matched,
+                                          group.common_symptoms_weight,
+                                          group.attributes_score,
+                                          group.split_index + 1))
+        return groups
+
+    def search(self,
+               match_params: schemas.MatchPatients,
+               deadline: float | None = None
+               ) -> list[dtos.MatchedPatient]:
+        """
+        Возвращает не более `match_params.limit` пациентов по убыванию
+        сходства (при равенстве - по возрастанию id).
+
+        :param deadline: Момент по `time.monotonic()`, после которого поиск
+            прерывается ошибкой `MatchingDeadlineExceeded`.
+
+        Кандидаты делятся на группы по совпадающим признакам (метод ветвей
+        и границ): первой всегда обрабатывается группа с наибольшей верхней
+        границей оценки, и делится она только тогда, когда до нее дошла
+        очередь. Как только граница становится ниже худшего из уже
+        найденных результатов, поиск заканчивается.
+        """
+        with self._lock:
+            symptom_weights: dict[int, float] = self._get_symptom_weights()
+            score = _Scorer(match_params,
+                            weights=self.weights,
+                            symptom_weights=symptom_weights,
+                            unknown_symptom_weight=self._idf(0))
+            splits: list[_Split] = self._get_splits(match_params, score)
+            # Наибольшая прибавка к оценке от признаков, начиная с i-го
+            remaining_gains: list[float] = list(itertools.accumulate(
+                reversed([split.max_gain for split in splits]), initial=0.0
+            ))[::-1]
+
+            def get_bound(group: _CandidateGroup) -> float:
+                return score.round(
+                    score.get_upper_bound(group, remaining_gains[group.split_index])
+                )
+
+            # Очередь из (-граница, порядковый номер, группа)
+            sequence = itertools.count()
+            root = _CandidateGroup(self._find_candidates(match_params))
+            queue: list[tuple[float, int, _CandidateGroup]] = [
+                (-get_bound(root), next(sequence), root)
+            ]
+            # Куча из (оценка, -id): в вершине худший из найденных результатов
+            found: list[tuple[float, int]] = []
+
+            while queue:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise errors.MatchingDeadlineExceeded
+
+                negative_bound, _, group = heapq.heappop(queue)
+                if len(found) == match_params.limit and -negative_bound < found[0][0]:
+                    break
+
+                if group.split_index < len(splits):
+                    for child in self._split_group(group, splits[group.split_index]):
+                        heapq.heappush(queue, (-get_bound(child), next(sequence), child))
+                    continue
+
+                for patient_id in group.patient_ids:
+                    scored = (score(self._profiles[patient_id], group), -patient_id)
+                    if len(found) < match_params.limit:
+                        heapq.heappush(found, scored)
+                    elif scored > found[0]:
+                        heapq.heapreplace(found, scored)
+
+        return [dtos.MatchedPatient(patient_id=-negative_id, score=similarity)
+                for similarity, negative_id in sorted(found, reverse=True)
+                if similarity > 0]
+
+
+class MinHashPatientSimilarityIndex(ExactPatientSimilarityIndex):
+    """
+    Приближенный подбор похожих пациентов (MinHash + LSH).
+
+    Для симптомов каждого пациента считается MinHash-сигнатура из
+    `bands * rows` значений, она делится на `bands` полос по `rows` значений.
+    Кандидатами становятся пациенты, у которых хотя бы одна полоса совпала
+    с полосой запроса; затем кандидаты оцениваются так же, как в
+    `ExactPatientSimilarityIndex`.
+
+    Пациент с коэффициентом Жаккара `s` попадает в кандидаты с вероятностью
+    `1 - (1 - s ** rows) ** bands`: больше полос и меньше строк в полосе -
+    выше полнота и больше кандидатов, и наоборот. Пациенты, у которых
+    совпадает только диагноз, в кандидаты не попадают.
+    """
+    # Простое число Мерсенна 2^61 - 1 для универсального хеширования
+    _PRIME: int = (1 << 61) - 1
+
+    def __init__(self,
+                 bands: int = 16,
+                 rows: int = 2,
+                 seed: int = 0,
+                 weights: SimilarityWeights = SimilarityWeights()
+                 ) -> None:
+        self.bands = bands
+        self.rows = rows
+        randomizer = random.Random(seed)
+        self._hash_params: list[tuple[int, int]] = [
+            (randomizer.randrange(1, self._PRIME), randomizer.randrange(self._PRIME))
+            for _ in range(bands * rows)
+        ]
+        # Значения хеш-функций для каждого симптома. Симптомов немного, поэтому
+        # сигнатура пациента - это поэлементный минимум уже готовых кортежей
+        self._symptom_hashes: dict[int, tuple[int, ...]] = {}
+        super().__init__(weights)
+
+    def _clear(self) -> None:
+        super()._clear()
+        self._buckets: list[dict[tuple[int, ...], set[int]]] = [
+            {} for _ in range(self.bands)
+        ]
+
+    def _hash_symptom(self, symptom_id: int) -> tuple[int, ...]:
+        hashes: tuple[int, ...] | None = self._symptom_hashes.get(symptom_id)
+        if hashes is None:
+            hashes = tuple((a * symptom_id + b) % self._PRIME
+                           for a, b in self._hash_params)
+            self._symptom_hashes[symptom_id] = hashes
+        return hashes
+
+    def _get_band_keys(self, symptom_ids: Iterable[int]) -> list[tuple[int, ...]]:
+        hashes: list[tuple[int, ...]] = [self._hash_symptom(symptom_id)
+                                         for symptom_id in symptom_ids]
+        if not hashes:
+            return []
+
+        signature: list[int] = list(map(min, *hashes)) if len(hashes) > 1 else hashes[0]
+        return [tuple(signature[band * self.rows:(band + 1) * self.rows])
+                for band in range(self.bands)]
+
+    def _add(self, profile: entities.PatientProfile) -> None:
+        super()._add(profile)
+        for bucket, key in zip(self._buckets, self._get_band_keys(profile.symptom_ids)):
+            bucket.setdefault(key, set()).add(profile.patient_id)
+
+    def _remove(self, patient_id: int) -> entities.PatientProfile | None:
+        profile: entities.PatientProfile | None = super()._remove(patient_id)
+        if profile is None:
+            return None
+
+        for bucket, key in zip(self._buckets, self._get_band_keys(profile.symptom_ids)):
+            self._discard(bucket, key, patient_id)
+        return profile
+
+    def _find_candidates(self, match_params: schemas.MatchPatients) -> set[int]:
+        return set().union(*(
+            bucket.get(key, ())
+            for bucket, key in zip(self._buckets,
+                                   self._get_band_keys(match_params.symptom_ids))
+        ))
@@ -0,0 +1,211 @@
+import heapq
+import math
+import threading
+from dataclasses import dataclass
+from typing import Iterable
+
+from med_sharing_system.application import dtos, entities, interfaces, schemas
+
+
+@dataclass(slots=True)
+class _ItemStats:
+    """
+    Итоги применения товара: количество отзывов, в скольких из них
+    помогло и сумма оценок. Складываются с весом сходства карт.
+    """
+    reviews: float = 0.0
+    helped: float = 0.0
+    rating_sum: float = 0.0
+
+    def add(self, other: '_ItemStats', weight: float) -> None:
+        self.reviews += other.reviews * weight
+        self.helped += other.helped * weight
+        self.rating_sum += other.rating_sum * weight
+
+
+class ItemRecommendationIndex(interfaces.TreatmentRecommendationIndex):
+    """
+    Рекомендации товаров по профилю "диагноз + симптомы".
+
+    Сходство карты с профилем раскладывается в сумму по признакам:
+
+        sim(profile, book) = symptoms_weight * sum(idf(s) for s in profile & book)
+                                              / idf_sum(book) / idf_sum(profile)
+                             + diagnosis_weight * [diagnosis совпадает]
+
+    то есть доля "веса" симптомов карты, которую покрывает профиль (редкий
+    общий симптом значит больше частого), плюс совпадение диагноза.
+    Поэтому итоги товаров по похожим картам - это произведение заранее
+    посчитанных разреженных матриц "симптом x товар" и "диагноз x товар"
+    на разреженный вектор профиля: запрос обходит только строки своих
+    симптомов и диагноза, а не карты.
+
+    Оценка товара - сглаженная доля "помогло" (к отзывам добавляется
+    `prior_strength` отзывов со средней по всем картам долей) и средняя
+    оценка среди похожих карт.
+    """
+
+    def __init__(self,
+                 symptoms_weight: float = 0.7,
+                 diagnosis_weight: float = 0.3,
+                 helped_weight: float = 0.7,
+                 rating_weight: float = 0.3,
+                 prior_strength: float = 2.0
+                 ) -> None:
+        self.symptoms_weight = symptoms_weight
+        self.diagnosis_weight = diagnosis_weight
+        self.helped_weight = helped_weight
+        self.rating_weight = rating_weight
+        self.prior_strength = prior_strength
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._by_symptom: dict[int, dict[int, _ItemStats]] = {}
+        self._by_diagnosis: dict[int, dict[int, _ItemStats]] = {}
+        self._symptom_weights: dict[int, float] = {}
+        self._prior_helped_ratio: float = 0.0
+        self._med_books_count: int = 0
+        self.is_built: bool = False
+
+    def __len__(self) -> int:
+        return self._med_books_count
+
+    # -----------------------------------------------------------------------------------
+    # Построение
+    # -----------------------------------------------------------------------------------
+    def rebuild(self, outcomes: Iterable[entities.TreatmentOutcome]) -> None:
+        outcomes: list[entities.TreatmentOutcome] = list(outcomes)
+        symptom_frequencies: dict[int, int] = {}
+        for outcome in outcomes:
+            for symptom_id in outcome.symptom_ids:
+                symptom_frequencies[symptom_id] = (
+                    symptom_frequencies.get(symptom_id, 0) + 1
+                )
+        symptom_weights: dict[int, float] = {
+            symptom_id: self._idf(len(outcomes), frequency)
+            for symptom_id, frequency in symptom_frequencies.items()
+        }
+
+        by_symptom: dict[int, dict[int, _ItemStats]] = {}
+        by_diagnosis: dict[int, dict[int, _ItemStats]] = {}
+        reviews: int = 0
+        helped: int = 0
+        for outcome in outcomes:
+            if not outcome.item_outcomes:
+                continue
+
+            book_items: dict[int, _ItemStats] = {}
+            for item_outcome in outcome.item_outcomes:
+                stats: _ItemStats = book_items.setdefault(item_outcome.item_id,
+                                                          _ItemStats())
+                stats.reviews += 1
+                stats.helped += item_outcome.is_helped
+                stats.rating_sum += item_outcome.item_rating
+                reviews += 1
+                helped += item_outcome.is_helped
+
+            book_weight: float = sum(symptom_weights[symptom_id]
+                                     for symptom_id in outcome.symptom_ids)
+            for symptom_id in outcome.symptom_ids:
+                self._add_row(by_symptom.setdefault(symptom_id, {}),
+                              book_items,
+                              symptom_weights[symptom_id] / book_weight)
+            if outcome.diagnosis_id is not None:
+                self._add_row(by_diagnosis.setdefault(outcome.diagnosis_id, {}),
+                              book_items,
+                              1.0)
+
+        with self._lock:
+            self._by_symptom = by_symptom
+            self._by_diagnosis = by_diagnosis
+            self._symptom_weights = symptom_weights
+            self._prior_helped_ratio = helped / reviews if reviews else 0.0
+            self._med_books_count = len(outcomes)
+            self.is_built = True
+
+    @staticmethod
+    def _idf(med_books_count: int, frequency: int) -> float:
+        return math.log((1 + med_books_count) / (1 + frequency)) + 1
+
+    @staticmethod
+    def _add_row(row: dict[int, _ItemStats],
+                 book_items: dict[int, _ItemStats],
+                 weight: float
+                 ) -> None:
+        for item_id, stats in book_items.items():
+            item_stats: _ItemStats | None = row.get(item_id)
+            if item_stats is None:
+                item_stats = row[item_id] = _ItemStats()
+            item_stats.add(stats, weight)
+
+    # -----------------------------------------------------------------------------------
+    # Рекомендации
+    # -----------------------------------------------------------------------------------
+    def recommend(self,
+                  params: schemas.RecommendTreatmentItems
+                  ) -> list[dtos.RecommendedItem]:
+        with self._lock:
+            rows: list[tuple[dict[int, _ItemStats], float]] = self._get_rows(params)
+            prior_helped_ratio: float = self._prior_helped_ratio
+
+        items: dict[int, list[float]] = {}
+        for row, weight in rows:
+            for item_id, stats in row.items():
+                item_stats: list[float] | None = items.get(item_id)
+                if item_stats is None:
+                    items[item_id] = [stats.reviews * weight,
+                                      stats.helped * weight,
+                                      stats.rating_sum * weight]
+                else:
+                    item_stats[0] += stats.reviews * weight
+                    item_stats[1] += stats.helped * weight
+                    item_stats[2] += stats.rating_sum * weight
+
+        # DTO создаются только для итоговой выборки
+        prior_helped: float = self.prior_strength * prior_helped_ratio
+        scored: list[tuple[float, int, float, float, float]] = []
+        for item_id, (reviews, helped, rating_sum) in items.items():
+            helped_ratio: float = ((helped + prior_helped)
+                                   / (reviews + self.prior_strength))
+            avg_rating: float = rating_sum / reviews
+            score: float = round(self.helped_weight * helped_ratio
+                                 + self.rating_weight * avg_rating / 10, 6)
+            scored.append((score, -item_id, helped_ratio, avg_rating, reviews))
+
+        return [
+            dtos.RecommendedItem(item_id=-negative_item_id,
+                                 score=score,
+                                 helped_ratio=round(helped_ratio, 6),
+                                 avg_rating=round(avg_rating, 2),
+                                 support=round(reviews, 6))
+            for score, negative_item_id, helped_ratio, avg_rating, reviews
+            in heapq.nlargest(params.limit, scored)
+        ]
+
+    def _get_rows(self,
+                  params: schemas.RecommendTreatmentItems
+                  ) -> list[tuple[dict[int, _ItemStats], float]]:
+        """
+        Строки матриц, которые нужно сложить, и их веса - разреженный
+        вектор профиля.
+        """
+        symptom_ids: list[int] = params.symptom_ids or []
+        max_score: float = ((self.symptoms_weight if symptom_ids else 0.0)
+                            + (self.diagnosis_weight if params.diagnosis_id else 0.0))
+        # Строки симптомов уже содержат их вес, а вектор профиля нормирует
+        # сумму на вес профиля. Неизвестный симптом весит как самый редкий.
+        query_weight: float = sum(
+            self._symptom_weights.get(symptom_id, self._idf(self._med_books_count, 0))
+            for symptom_id in symptom_ids
+        )
+        rows: list[tuple[dict[int, _ItemStats], float]] = [
+            (self._by_symptom[symptom_id],
+             self.symptoms_weight / query_weight / max_score)
+            for symptom_id in symptom_ids
+            if symptom_id in self._by_symptom
+        ]
+        if params.diagnosis_id is not None and params.diagnosis_id in self._by_diagnosis:
+            rows.append((self._by_diagnosis[params.diagnosis_id],
+                         self.diagnosis_weight / max_score))
+        return rows
@@ -1,8 +1,14 @@
+import logging
+import threading
+import time
+
 from sqlalchemy import create_engine
 
 from med_sharing_system.adapters import med_sharing_api, database, log
-from med_sharing_system.adapters.database import TransactionContext
+from med_sharing_system.adapters.database import QueryProfiler, TransactionContext
+from med_sharing_system.adapters.database.utils import change_journal
 from med_sharing_system.application import services
+from med_sharing_system.application.utils import ItemRecommendationIndex
 
 
 class Settings:
@@ -16,6 +22,7 @@ class Logger:
 
 class DB:
     engine = create_engine(Settings.db.DATABASE_URL)
+    query_profiler = QueryProfiler(engine) if Settings.db.SA_PROFILING else None
 
     context = TransactionContext(bind=engine, expire_on_commit=False)
 
@@ -24,9 +31,45 @@ class DB:
     item_categories_repo = database.repositories.ItemCategoriesRepo(context=context)
     item_reviews_repo = database.repositories.ItemReviewsRepo(context=context)
     item_types_repo = database.repositories.ItemTypesRepo(context=context)
-    medical_books_repo = database.repositories.MedicalBooksRepo(context=context)
+    medical_books_index = database.MedicalBooksBitmapIndex()
+    item_cooccurrence_index = database.ItemCooccurrenceIndex()
+    medical_books_repo = (
+        database.repositories.BitmapMedicalBooksRepo(context=context,
+                                                     index=medical_books_index)
+        if Settings.db.MEDICAL_BOOKS_SEARCH_ENGINE == 'bitmap'
+        else database.repositories.MedicalBooksRepo(context=context)
+    )
     patients_repo = database.repositories.PatientsRepo(context=context)
     symptoms_repo = database.repositories.SymptomsRepo(context=context)
+    treatment_outcomes_repo = database.repositories.TreatmentOutcomesRepo(context=context)
+
+
+
+class MedicalBooksIndex:
+    """
+    Индексы медицинских карт (битовый индекс поиска, индекс связанных
+    товаров) строятся в каждом воркере (`start_worker`). Свои изменения
+    воркер применяет после commit, изменения других воркеров и процессов -
+    по журналу `medical_book_changes`.
+    """
+    indexes = []
+    if Settings.db.MEDICAL_BOOKS_SEARCH_ENGINE == 'bitmap':
+        indexes.append(DB.medical_books_index)
+    if Settings.db.ITEM_COOCCURRENCE_INDEX:
+        indexes.append(DB.item_cooccurrence_index)
+
+    synchronizers = [database.MedicalBooksIndexSynchronizer(index, bind=DB.engine)
+                     for index in indexes]
+    for synchronizer in synchronizers:
+        synchronizer.attach(DB.context.create_session)
+
+    change_feed = database.MedicalBooksChangeFeed(
+        indexes,
+        bind=DB.engine,
+        interval=Settings.db.MEDICAL_BOOKS_INDEX_REFRESH_MS / 1000,
+        consumer_ttl=Settings.db.CHANGE_JOURNAL_CONSUMER_TTL_SECONDS,
+        prune_interval=Settings.db.CHANGE_JOURNAL_PRUNE_INTERVAL_SECONDS
+    )
 
 
 class Application:
@@ -35,7 +78,8 @@ class Application:
         items_repo=DB.item_catalog_repo,
         item_categories_repo=DB.item_categories_repo,
         item_types_repo=DB.item_types_repo,
-        item_reviews_repo=DB.item_reviews_repo
+        item_reviews_repo=DB.item_reviews_repo,
+        cooccurrence_index=DB.item_cooccurrence_index
     )
     item_category = services.ItemCategory(categories_repo=DB.item_categories_repo)
     item_review = services.ItemReview(item_reviews_repo=DB.item_reviews_repo,
@@ -51,6 +95,10 @@ class Application:
     patient = services.Patient(patients_repo=DB.patients_repo,
                                medical_books_repo=DB.medical_books_repo)
     symptom = services.Symptom(symptoms_repo=DB.symptoms_repo)
+    treatment_recommender = services.TreatmentRecommender(
+        recommendation_index=ItemRecommendationIndex(),
+        treatment_outcomes_repo=DB.treatment_outcomes_repo
+    )
 
 
 class Decorators:
@@ -62,6 +110,30 @@ class Decorators:
     services.medical_book_decorated_function_registry.apply_decorators(DB.context)
     services.patient_decorated_function_registry.apply_decorators(DB.context)
     services.symptom_decorated_function_registry.apply_decorators(DB.context)
+    services.treatment_recommendation_decorated_function_registry.apply_decorators(
+        DB.context
+    )
+
+
+class TreatmentRecommendationsIndex:
+    """
+    Строит индекс рекомендаций в фоне и периодически перестраивает его,
+    чтобы учитывать новые медицинские карты и отзывы. Поток запускается
+    в каждом воркере (`start_worker`).
+    """
+
+    @staticmethod
+    def refresh_forever() -> None:
+        while True:
+            try:
+                Application.treatment_recommender.rebuild_index()
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    'Failed to rebuild treatment recommendations index'
+                )
+            if not Settings.api.RECOMMENDATIONS_REFRESH_SECONDS:
+                return None
+            time.sleep(Settings.api.RECOMMENDATIONS_REFRESH_SECONDS)
 
 
 app = med_sharing_api.create_app(swagger_settings=Settings.api.SWAGGER,
@@ -74,14 +146,43 @@ app = med_sharing_api.create_app(swagger_settings=Settings.api.SWAGGER,
                                  catalog=Application.item_catalog,
                                  item_category=Application.item_category,
                                  item_type=Application.item_type,
-                                 medical_book=Application.medical_book)
+                                 medical_book=Application.medical_book,
+                                 treatment_recommender=(
+                                     Application.treatment_recommender
+                                 ),
+                                 query_profiler=DB.query_profiler,
+                                 query_repeats_threshold=(
+                                     Settings.db.SA_PROFILING_REPEATS_THRESHOLD
+                                 ))
+
+
+def start_worker() -> None:
+    """
+    Запускается в процессе воркера gunicorn до приема запросов
+    (`post_worker_init`, см. launchers/gunicorn_hooks.py), в том числе при
+    `--preload`. Соединения пула, открытые в мастер-процессе, не должны
+    использоваться воркерами, а индексы в памяти строятся в каждом воркере.
+    """
+    DB.engine.dispose(close=False)
+    MedicalBooksIndex.change_feed.consumer = change_journal.get_consumer_name('api')
+
+    if MedicalBooksIndex.indexes:
+        MedicalBooksIndex.change_feed.rebuild()
+        threading.Thread(target=MedicalBooksIndex.change_feed.run,
+                         name='medical-books-change-feed',
+                         daemon=True).start()
+
+    threading.Thread(target=TreatmentRecommendationsIndex.refresh_forever,
+                     name='treatment-recommendations-index',
+                     daemon=True).start()
+
 
 if __name__ == '__main__':
-    import logging
     from wsgiref import simple_server
 
     logger = logging.getLogger('wsgi')
 
+    start_worker()
     httpd = simple_server.make_server('localhost', 8000, app)
     logger.info('Serving on port 8000...')
     httpd.serve_forever()
@@ -0,0 +1,9 @@
+"""
+Конфиг gunicorn для запуска API без gevent. Используй опцию
+"--config=[путь к файлу конфига]" для передачи данного конфига gunicorn.
+"""
+from med_sharing_system.launchers.gunicorn_hooks import post_worker_init
+
+__all__ = [
+    'post_worker_init',
+]
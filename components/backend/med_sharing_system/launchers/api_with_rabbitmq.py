@@ -1,18 +1,40 @@
+import logging
+import threading
+import time
+
 from kombu import Connection
 from sqlalchemy import create_engine
 
-from med_sharing_system.adapters import med_sharing_api, database, log, message_bus
-from med_sharing_system.adapters.database import TransactionContext
+from med_sharing_system.adapters import (
+    med_sharing_api,
+    database,
+    log,
+    message_bus,
+    settings,
+    snapshots
+)
+from med_sharing_system.adapters.database import QueryProfiler, TransactionContext
+from med_sharing_system.adapters.database.utils import change_journal
 from med_sharing_system.adapters.message_bus.messaging_kombu import (
-    KombuPublisher
+    ConfirmingKombuPublisher,
+    MessageNotConfirmed
 )
 from med_sharing_system.application import services
+from med_sharing_system.application.interfaces.message_publishing import OutboxPublisher
+from med_sharing_system.application.utils import (
+    ExactPatientSimilarityIndex,
+    ItemRecommendationIndex,
+    MinHashPatientSimilarityIndex,
+    QueueAdmissionControl,
+    TTLMatchResultCache
+)
 
 
 class Settings:
     db = database.Settings()
     api = med_sharing_api.Settings()
     message_bus = message_bus.Settings()
+    common_settings = settings.Settings()
 
 
 class Logger:
@@ -23,6 +45,7 @@ class Logger:
 
 class DB:
     engine = create_engine(Settings.db.DATABASE_URL)
+    query_profiler = QueryProfiler(engine) if Settings.db.SA_PROFILING else None
 
     context = TransactionContext(bind=engine, expire_on_commit=False)
 
@@ -31,17 +54,76 @@ class DB:
     item_categories_repo = database.repositories.ItemCategoriesRepo(context=context)
     item_reviews_repo = database.repositories.ItemReviewsRepo(context=context)
     item_types_repo = database.repositories.ItemTypesRepo(context=context)
-    medical_books_repo = database.repositories.MedicalBooksRepo(context=context)
+    medical_books_index = database.MedicalBooksBitmapIndex()
+    item_cooccurrence_index = database.ItemCooccurrenceIndex()
+    medical_books_repo = (
+        database.repositories.BitmapMedicalBooksRepo(context=context,
+                                                     index=medical_books_index)
+        if Settings.db.MEDICAL_BOOKS_SEARCH_ENGINE == 'bitmap'
+        else database.repositories.MedicalBooksRepo(context=context)
+    )
     patients_repo = database.repositories.PatientsRepo(context=context)
     symptoms_repo = database.repositories.SymptomsRepo(context=context)
+    treatment_outcomes_repo = database.repositories.TreatmentOutcomesRepo(context=context)
+    patient_profiles_repo = database.repositories.PatientProfilesRepo(context=context)
+    patient_changes_repo = database.repositories.PatientChangesRepo(context=context)
+    outbox_repo = database.repositories.OutboxRepo(context=context)
 
 
 class MessageBus:
     connection = Connection(Settings.message_bus.RABBITMQ_URL)
     message_bus.broker_scheme.declare(connection)
     exchange_to_publish = message_bus.EXCHANGE_TO_MATCHING
+    # Запросы подбора попадают в полосу очереди по приоритету
+    priority_lanes = {exchange_to_publish: message_bus.MATCHING_PRIORITY_LANES}
+
+    publisher = ConfirmingKombuPublisher(
+        connection=connection,
+        scheme=message_bus.broker_scheme,
+        serializer=Settings.message_bus.MESSAGE_SERIALIZATION,
+        priority_lanes=priority_lanes,
+        batch_size=Settings.message_bus.PUBLISHER_BATCH_SIZE,
+        linger_ms=Settings.message_bus.PUBLISHER_LINGER_MS
+    )
+    # Запросы подбора сохраняются в outbox в транзакции запроса,
+    # а в брокер их переносит отдельный процесс (launchers/outbox_relay.py)
+    request_publisher = (
+        OutboxPublisher(outbox_repo=DB.outbox_repo)
+        if Settings.message_bus.PUBLISHER_OUTBOX
+        else publisher
+    )
+    search_queue_monitor = message_bus.QueueLoadMonitor(
+        connection,
+        message_bus.QUEUE_TO_MATCHING,
+        interval=Settings.api.PATIENT_MATCHING_QUEUE_CHECK_INTERVAL_MS / 1000
+    )
+
 
-    publisher = KombuPublisher(connection=connection, scheme=message_bus.broker_scheme)
+class MedicalBooksIndex:
+    """
+    Индексы медицинских карт (битовый индекс поиска, индекс связанных
+    товаров) строятся в каждом воркере (`start_worker`). Свои изменения
+    воркер применяет после commit, изменения других воркеров и процессов -
+    по журналу `medical_book_changes`.
+    """
+    indexes = []
+    if Settings.db.MEDICAL_BOOKS_SEARCH_ENGINE == 'bitmap':
+        indexes.append(DB.medical_books_index)
+    if Settings.db.ITEM_COOCCURRENCE_INDEX:
+        indexes.append(DB.item_cooccurrence_index)
+
+    synchronizers = [database.MedicalBooksIndexSynchronizer(index, bind=DB.engine)
+                     for index in indexes]
+    for synchronizer in synchronizers:
+        synchronizer.attach(DB.context.create_session)
+
+    change_feed = database.MedicalBooksChangeFeed(
+        indexes,
+        bind=DB.engine,
+        interval=Settings.db.MEDICAL_BOOKS_INDEX_REFRESH_MS / 1000,
+        consumer_ttl=Settings.db.CHANGE_JOURNAL_CONSUMER_TTL_SECONDS,
+        prune_interval=Settings.db.CHANGE_JOURNAL_PRUNE_INTERVAL_SECONDS
+    )
 
 
 class Application:
@@ -50,7 +132,8 @@ class Application:
         items_repo=DB.item_catalog_repo,
         item_categories_repo=DB.item_categories_repo,
         item_types_repo=DB.item_types_repo,
-        item_reviews_repo=DB.item_reviews_repo
+        item_reviews_repo=DB.item_reviews_repo,
+        cooccurrence_index=DB.item_cooccurrence_index
     )
     item_category = services.ItemCategory(categories_repo=DB.item_categories_repo)
     item_review = services.ItemReview(item_reviews_repo=DB.item_reviews_repo,
@@ -66,9 +149,57 @@ class Application:
     patient = services.Patient(patients_repo=DB.patients_repo,
                                medical_books_repo=DB.medical_books_repo)
     symptom = services.Symptom(symptoms_repo=DB.symptoms_repo)
+    treatment_recommender = services.TreatmentRecommender(
+        recommendation_index=ItemRecommendationIndex(),
+        treatment_outcomes_repo=DB.treatment_outcomes_repo
+    )
+    # Индекс нужен только для подбора прямо в запросе
+    if Settings.api.PATIENT_MATCHING_INLINE_TIMEOUT_MS:
+        similarity_index = (
+            MinHashPatientSimilarityIndex(
+                bands=Settings.common_settings.MINHASH_BANDS,
+                rows=Settings.common_settings.MINHASH_ROWS
+            )
+            if Settings.common_settings.PATIENT_MATCHING_INDEX == 'minhash'
+            else ExactPatientSimilarityIndex()
+        )
+    else:
+        similarity_index = None
+    snapshot_storage = (
+        snapshots.PatientIndexSnapshotStorage(
+            Settings.common_settings.PATIENT_INDEX_SNAPSHOT_PATH
+        )
+        if Settings.common_settings.PATIENT_INDEX_SNAPSHOT_PATH
+        else None
+    )
+    match_cache = (
+        TTLMatchResultCache(ttl=Settings.common_settings.MATCH_CACHE_TTL_SECONDS,
+                            max_size=Settings.common_settings.MATCH_CACHE_MAX_SIZE)
+        if (Settings.common_settings.MATCH_CACHE_TTL_SECONDS
+            and Settings.common_settings.MATCH_CACHE_MAX_SIZE)
+        else None
+    )
+    admission_control = (
+        QueueAdmissionControl(
+            monitor=MessageBus.search_queue_monitor,
+            high_watermark=Settings.api.PATIENT_MATCHING_QUEUE_HIGH_WATERMARK,
+            low_watermark=Settings.api.PATIENT_MATCHING_QUEUE_LOW_WATERMARK or None,
+            retry_after=Settings.api.PATIENT_MATCHING_RETRY_AFTER_SECONDS
+        )
+        if Settings.api.PATIENT_MATCHING_QUEUE_HIGH_WATERMARK
+        else None
+    )
     patient_matcher = services.PatientMatcher(
-        publisher=MessageBus.publisher,
-        targets={'publish_request_for_search_patients': MessageBus.exchange_to_publish}
+        publisher=MessageBus.request_publisher,
+        targets={'publish_request_for_search_patients': MessageBus.exchange_to_publish},
+        similarity_index=similarity_index,
+        patient_profiles_repo=DB.patient_profiles_repo,
+        patient_changes_repo=DB.patient_changes_repo,
+        snapshot_storage=snapshot_storage,
+        match_cache=match_cache,
+        admission_control=admission_control,
+        change_consumer_ttl=Settings.db.CHANGE_JOURNAL_CONSUMER_TTL_SECONDS,
+        prune_interval=Settings.db.CHANGE_JOURNAL_PRUNE_INTERVAL_SECONDS
     )
 
 
@@ -81,18 +212,116 @@ class Decorators:
     services.medical_book_decorated_function_registry.apply_decorators(DB.context)
     services.patient_decorated_function_registry.apply_decorators(DB.context)
     services.symptom_decorated_function_registry.apply_decorators(DB.context)
+    services.treatment_recommendation_decorated_function_registry.apply_decorators(
+        DB.context
+    )
     services.patient_matching_decorated_function_registry.apply_decorators(DB.context)
 
 
+class PatientMatchingIndex:
+    """
+    Загружает индекс подбора в фоне, а затем периодически применяет к нему
+    и к кэшу результатов изменения из БД, чтобы запросы подбора не читали
+    журнал изменений. Поток запускается в каждом воркере (`start_worker`).
+    """
+
+    @staticmethod
+    def load_and_catch_up_forever() -> None:
+        # Пока индекс строится, запросы подбора уходят в очередь
+        try:
+            if Application.similarity_index is not None:
+                Application.patient_matcher.load_similarity_index()
+            else:
+                Application.patient_matcher.catch_up_similarity_index()
+        except Exception:
+            logging.getLogger(__name__).exception('Failed to load patient matching index')
+        while True:
+            time.sleep(Settings.api.PATIENT_MATCHING_INDEX_REFRESH_MS / 1000)
+            try:
+                if (Application.similarity_index is None
+                        or Application.similarity_index.is_built):
+                    Application.patient_matcher.catch_up_similarity_index()
+                else:
+                    Application.patient_matcher.load_similarity_index()
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    'Failed to catch up patient matching index'
+                )
+
+
+class TreatmentRecommendationsIndex:
+    """
+    Строит индекс рекомендаций в фоне и периодически перестраивает его,
+    чтобы учитывать новые медицинские карты и отзывы. Поток запускается
+    в каждом воркере (`start_worker`).
+    """
+
+    @staticmethod
+    def refresh_forever() -> None:
+        while True:
+            try:
+                Application.treatment_recommender.rebuild_index()
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    'Failed to rebuild treatment recommendations index'
+                )
+            if not Settings.api.RECOMMENDATIONS_REFRESH_SECONDS:
+                return None
+            time.sleep(Settings.api.RECOMMENDATIONS_REFRESH_SECONDS)
+
+
 app = med_sharing_api.create_app(swagger_settings=Settings.api.SWAGGER,
                                  allow_origins=Settings.api.ALLOW_ORIGINS,
                                  api_prefix=Settings.api.API_PREFIX,
                                  diagnosis=Application.diagnosis,
                                  patient_matcher=Application.patient_matcher,
+                                 patient_matching_timeout=(
+                                     Settings.api.PATIENT_MATCHING_INLINE_TIMEOUT_MS
+                                     / 1000
+                                 ),
+                                 publication_errors=(MessageNotConfirmed,),
+                                 patient_matching_retry_after=(
+                                     Settings.api.PATIENT_MATCHING_RETRY_AFTER_SECONDS
+                                 ),
                                  patient=Application.patient,
                                  symptom=Application.symptom,
                                  item_review=Application.item_review,
                                  catalog=Application.item_catalog,
                                  item_category=Application.item_category,
                                  item_type=Application.item_type,
-                                 medical_book=Application.medical_book)
+                                 medical_book=Application.medical_book,
+                                 treatment_recommender=(
+                                     Application.treatment_recommender
+                                 ),
+                                 query_profiler=DB.query_profiler,
+                                 query_repeats_threshold=(
+                                     Settings.db.SA_PROFILING_REPEATS_THRESHOLD
+                                 ))
+
+
+def start_worker() -> None:
+    """
+    Запускается в процессе воркера gunicorn до приема запросов
+    (`post_worker_init`, см. launchers/gunicorn_hooks.py), в том числе при
+    `--preload`. Соединения пула, открытые в мастер-процессе, не должны
+    использоваться воркерами, а индексы в памяти строятся в каждом воркере.
+    """
+    DB.engine.dispose(close=False)
+    Application.patient_matcher.change_consumer = change_journal.get_consumer_name('api')
+    MedicalBooksIndex.change_feed.consumer = change_journal.get_consumer_name('api')
+
+    if MedicalBooksIndex.indexes:
+        MedicalBooksIndex.change_feed.rebuild()
+        threading.Thread(target=MedicalBooksIndex.change_feed.run,
+                         name='medical-books-change-feed',
+                         daemon=True).start()
+
+    if (Application.similarity_index is not None
+            or Application.match_cache is not None):
+        threading.Thread(target=PatientMatchingIndex.load_and_catch_up_forever,
+                         name='patient-matching-index',
+                         daemon=True).start()
+
+    threading.Thread(target=TreatmentRecommendationsIndex.refresh_forever,
+                     name='treatment-recommendations-index',
+                     daemon=True).start()
@@ -1,3 +1,12 @@
+# Патчинг gevent должен выполниться до импорта kombu и драйверов БД
+from med_sharing_system.launchers.gevent_settings.consumer_patch import (
+    patch_greenlet_mode
+)
+
+patch_greenlet_mode('DELIVERY_CONSUMER_EXECUTION_MODE')
+
+import signal
+
 from kombu import Connection
 from sqlalchemy import create_engine
 
@@ -8,6 +17,9 @@ from med_sharing_system.adapters import (
     settings
 )
 from med_sharing_system.adapters.database import TransactionContext
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    MessageDeduplicationCache
+)
 from med_sharing_system.adapters.message_delivery import WebsocketNotifier
 from med_sharing_system.application import services
 
@@ -51,8 +63,26 @@ class Decorators:
 class MessageBus:
     connection = Connection(Settings.message_bus.RABBITMQ_URL)
 
+    deduplication = (
+        database.repositories.ProcessedMessagesRepo(
+            context=DB.context,
+            ttl=Settings.message_bus.MESSAGE_DEDUPLICATION_TTL_SECONDS
+        )
+        if Settings.message_bus.MESSAGE_DEDUPLICATION == 'database'
+        else MessageDeduplicationCache(
+            max_size=Settings.message_bus.MESSAGE_DEDUPLICATION_MAX_SIZE,
+            ttl=Settings.message_bus.MESSAGE_DEDUPLICATION_TTL_SECONDS
+        )
+        if Settings.message_bus.MESSAGE_DEDUPLICATION == 'memory'
+        else None
+    )
+
     delivery_consumer = message_bus.create_delivery_consumer(
-        connection, Application.patient_matcher
+        connection,
+        Application.patient_matcher,
+        execution_mode=Settings.message_bus.DELIVERY_CONSUMER_EXECUTION_MODE,
+        concurrency=Settings.message_bus.DELIVERY_CONSUMER_CONCURRENCY,
+        deduplication=deduplication
     )
 
     @staticmethod
@@ -62,6 +92,9 @@ class MessageBus:
 
 def run_delivery_consumer():
     MessageBus.declare_scheme()
+    # Начатая обработка завершается до остановки
+    signal.signal(signal.SIGTERM, lambda *_: MessageBus.delivery_consumer.stop())
+    signal.signal(signal.SIGINT, lambda *_: MessageBus.delivery_consumer.stop())
     MessageBus.delivery_consumer.run()
 
 
@@ -9,6 +9,7 @@
 from med_sharing_system.launchers.gevent_settings.db_patch import (
     set_wait_callback
 )
+from med_sharing_system.launchers.gunicorn_hooks import post_worker_init
 
 
 def post_fork(server, worker):
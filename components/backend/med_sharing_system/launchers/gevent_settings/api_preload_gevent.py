@@ -13,8 +13,9 @@ from med_sharing_system.launchers.gevent_settings.db_patch import (
 
 set_wait_callback()
 
-from med_sharing_system.launchers.api import app
+from med_sharing_system.launchers.api import app, start_worker
 
 __all__ = [
     'app',
+    'start_worker',
 ]
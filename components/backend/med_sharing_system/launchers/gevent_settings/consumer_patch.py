@@ -0,0 +1,44 @@
+"""
+gevent патчинг для потребителей сообщений (launchers/match_worker.py,
+launchers/delivery_consumer.py) в режиме обработки 'greenlet'.
+
+Без патчинга ожидание сообщений в `drain_events` блокирует процесс и не
+отдает управление gevent, поэтому гринлеты обработчиков никогда не
+выполняются. Модуль импортируется лаунчером первым, до kombu и драйверов БД,
+поэтому режим читается отдельными настройками, а не `message_bus.Settings`.
+"""
+from pathlib import Path
+
+from pydantic import BaseSettings
+
+
+class _ExecutionModes(BaseSettings):
+    MATCH_WORKER_EXECUTION_MODE: str = 'inline'
+    DELIVERY_CONSUMER_EXECUTION_MODE: str = 'inline'
+
+    class Config:
+        env_file = Path(__file__).parent.parent.parent.parent.joinpath(".env")
+        env_file_encoding = 'utf-8'
+
+
+def patch_greenlet_mode(execution_mode_setting: str) -> bool:
+    """
+    Патчит процесс gevent и подключение к БД, если в настройке
+    `execution_mode_setting` выбран режим 'greenlet'. Возвращает True,
+    если процесс пропатчен.
+    """
+    if getattr(_ExecutionModes(), execution_mode_setting) != 'greenlet':
+        return False
+
+    # Добавьте зависимость gevent в setup.cfg вашего проекта
+    import gevent.monkey
+
+    gevent.monkey.patch_all()
+
+    # Патчим подключение к БД
+    from med_sharing_system.launchers.gevent_settings.db_patch import (
+        set_wait_callback
+    )
+
+    set_wait_callback()
+    return True
@@ -0,0 +1,15 @@
+"""
+Хуки gunicorn для композитов API. Подключаются конфигами gunicorn
+(api_gunicorn_config.py, gevent_settings/api_gevent_config.py).
+"""
+import importlib
+
+
+def post_worker_init(worker):
+    """
+    Вызывается в процессе воркера после загрузки приложения и до приема
+    запросов - и с опцией "--preload", и без нее. Вызывает `start_worker`
+    композита, из которого загружено приложение.
+    """
+    module_name, _, _ = worker.app.app_uri.partition(':')
+    importlib.import_module(module_name).start_worker()
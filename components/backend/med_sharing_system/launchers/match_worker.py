@@ -1,15 +1,36 @@
+# Патчинг gevent должен выполниться до импорта kombu и драйверов БД
+from med_sharing_system.launchers.gevent_settings.consumer_patch import (
+    patch_greenlet_mode
+)
+
+patch_greenlet_mode('MATCH_WORKER_EXECUTION_MODE')
+
+import signal
+from functools import partial
+
 from kombu import Connection
 from sqlalchemy import create_engine
 
 from med_sharing_system.adapters import (
     database,
     log,
+    matching,
     message_bus,
-    settings
+    settings,
+    snapshots
 )
 from med_sharing_system.adapters.database import TransactionContext
-from med_sharing_system.adapters.message_bus.messaging_kombu import KombuPublisher
+from med_sharing_system.adapters.database.utils import change_journal
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    ConfirmingKombuPublisher,
+    MessageDeduplicationCache
+)
 from med_sharing_system.application import services
+from med_sharing_system.application.utils import (
+    ExactPatientSimilarityIndex,
+    MinHashPatientSimilarityIndex,
+    TTLMatchResultCache
+)
 
 
 class Settings:
@@ -32,10 +53,68 @@ class DB:
 
     medical_books_repo = database.repositories.MedicalBooksRepo(context=context)
     patients_repo = database.repositories.PatientsRepo(context=context)
+    patient_profiles_repo = database.repositories.PatientProfilesRepo(context=context)
+    patient_changes_repo = database.repositories.PatientChangesRepo(context=context)
 
 
 class Application:
-    patient_matcher = services.PatientMatcher()
+    if Settings.common_settings.PATIENT_MATCHING_INDEX == 'minhash':
+        create_similarity_index = partial(
+            MinHashPatientSimilarityIndex,
+            bands=Settings.common_settings.MINHASH_BANDS,
+            rows=Settings.common_settings.MINHASH_ROWS
+        )
+    else:
+        create_similarity_index = ExactPatientSimilarityIndex
+
+    # Поиск в отдельных процессах не блокирует поток соединения с брокером
+    search_processes = (
+        matching.ProcessPoolPatientSimilarityIndex(
+            create_similarity_index,
+            processes=Settings.message_bus.MATCH_WORKER_SEARCH_PROCESSES
+        )
+        if Settings.message_bus.MATCH_WORKER_SEARCH_PROCESSES
+        else None
+    )
+    similarity_index = (search_processes
+                        if search_processes is not None
+                        else create_similarity_index())
+
+    snapshot_storage = (
+        snapshots.PatientIndexSnapshotStorage(
+            Settings.common_settings.PATIENT_INDEX_SNAPSHOT_PATH
+        )
+        if Settings.common_settings.PATIENT_INDEX_SNAPSHOT_PATH
+        else None
+    )
+
+    match_cache = (
+        TTLMatchResultCache(ttl=Settings.common_settings.MATCH_CACHE_TTL_SECONDS,
+                            max_size=Settings.common_settings.MATCH_CACHE_MAX_SIZE)
+        if (Settings.common_settings.MATCH_CACHE_TTL_SECONDS
+            and Settings.common_settings.MATCH_CACHE_MAX_SIZE)
+        else None
+    )
+
+    patient_matcher = services.PatientMatcher(
+        similarity_index=similarity_index,
+        patient_profiles_repo=DB.patient_profiles_repo,
+        patient_changes_repo=DB.patient_changes_repo,
+        snapshot_storage=snapshot_storage,
+        match_cache=match_cache,
+        match_timeout=Settings.message_bus.MATCH_WORKER_DEADLINE_SECONDS or None,
+        change_consumer_ttl=Settings.db.CHANGE_JOURNAL_CONSUMER_TTL_SECONDS,
+        prune_interval=Settings.db.CHANGE_JOURNAL_PRUNE_INTERVAL_SECONDS
+    )
+
+    @staticmethod
+    def init_process():
+        # Дочерние процессы не должны использовать соединения родителя,
+        # а их отметки в журнале изменений не должны совпадать
+        DB.engine.dispose(close=False)
+        Application.patient_matcher.change_consumer = (
+            change_journal.get_consumer_name('match_worker')
+        )
 
 
 class Decorators:
@@ -43,9 +122,16 @@ class Decorators:
 
 
 class MessageBus:
-    connection = Connection(Settings.message_bus.RABBITMQ_URL)
+    connection = Connection(Settings.message_bus.RABBITMQ_URL,
+                            heartbeat=Settings.message_bus.MATCH_WORKER_HEARTBEAT_SECONDS)
     message_bus.broker_scheme.declare(connection)
-    publisher = KombuPublisher(connection=connection, scheme=message_bus.broker_scheme)
+    publisher = ConfirmingKombuPublisher(
+        connection=connection,
+        scheme=message_bus.broker_scheme,
+        serializer=Settings.message_bus.MESSAGE_SERIALIZATION,
+        batch_size=Settings.message_bus.PUBLISHER_BATCH_SIZE,
+        linger_ms=Settings.message_bus.PUBLISHER_LINGER_MS
+    )
     exchange_to_publishing = message_bus.EXCHANGE_TO_DELIVERY
 
     Application.patient_matcher.publisher = publisher
@@ -53,8 +139,28 @@ class MessageBus:
         'find_matching_patient': exchange_to_publishing
     }
 
+    deduplication = (
+        database.repositories.ProcessedMessagesRepo(
+            context=DB.context,
+            ttl=Settings.message_bus.MESSAGE_DEDUPLICATION_TTL_SECONDS
+        )
+        if Settings.message_bus.MESSAGE_DEDUPLICATION == 'database'
+        else MessageDeduplicationCache(
+            max_size=Settings.message_bus.MESSAGE_DEDUPLICATION_MAX_SIZE,
+            ttl=Settings.message_bus.MESSAGE_DEDUPLICATION_TTL_SECONDS
+        )
+        if Settings.message_bus.MESSAGE_DEDUPLICATION == 'memory'
+        else None
+    )
+
     match_worker = message_bus.create_match_worker(
-        connection, Application.patient_matcher
+        connection,
+        Application.patient_matcher,
+        execution_mode=Settings.message_bus.MATCH_WORKER_EXECUTION_MODE,
+        concurrency=Settings.message_bus.MATCH_WORKER_CONCURRENCY,
+        process_initializer=Application.init_process,
+        deduplication=deduplication,
+        lane_weights=Settings.message_bus.MATCH_WORKER_LANE_WEIGHTS
     )
 
     @staticmethod
@@ -63,5 +169,18 @@ class MessageBus:
 
 
 if __name__ == '__main__':
+    Application.patient_matcher.change_consumer = (
+        change_journal.get_consumer_name('match_worker')
+    )
     MessageBus.declare_scheme()
-    MessageBus.match_worker.run()
+    Application.patient_matcher.load_similarity_index()
+    # Начатая обработка завершается до остановки
+    signal.signal(signal.SIGTERM, lambda *_: MessageBus.match_worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: MessageBus.match_worker.stop())
+    try:
+        MessageBus.match_worker.run()
+    finally:
+        Application.patient_matcher.save_similarity_index_snapshot()
+        if Application.search_processes is not None:
+            Application.search_processes.close()
+        MessageBus.publisher.close()
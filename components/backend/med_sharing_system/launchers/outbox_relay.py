@@ -0,0 +1,99 @@
+import logging
+import signal
+import threading
+
+from kombu import Connection
+from sqlalchemy import create_engine
+
+from med_sharing_system.adapters import (
+    database,
+    log,
+    message_bus
+)
+from med_sharing_system.adapters.database import TransactionContext
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    ConfirmingKombuPublisher
+)
+from med_sharing_system.application import services
+
+
+class Settings:
+    db = database.Settings()
+    message_bus = message_bus.Settings()
+
+
+class Logger:
+    log.configure(Settings.db.LOGGING_CONFIG,
+                  Settings.message_bus.LOGGING_CONFIG)
+
+
+class DB:
+    engine = create_engine(Settings.db.DATABASE_URL)
+
+    context = TransactionContext(bind=engine, expire_on_commit=False)
+
+    outbox_repo = database.repositories.OutboxRepo(context=context)
+
+
+class MessageBus:
+    connection = Connection(Settings.message_bus.RABBITMQ_URL)
+    exchange_to_publish = message_bus.EXCHANGE_TO_MATCHING
+    # Запросы подбора попадают в полосу очереди по приоритету
+    priority_lanes = {exchange_to_publish: message_bus.MATCHING_PRIORITY_LANES}
+
+    publisher = ConfirmingKombuPublisher(
+        connection=connection,
+        scheme=message_bus.broker_scheme,
+        serializer=Settings.message_bus.MESSAGE_SERIALIZATION,
+        priority_lanes=priority_lanes,
+        batch_size=Settings.message_bus.PUBLISHER_BATCH_SIZE,
+        linger_ms=Settings.message_bus.PUBLISHER_LINGER_MS
+    )
+
+    @staticmethod
+    def declare_scheme():
+        message_bus.broker_scheme.declare(MessageBus.connection)
+
+
+class Application:
+    relay = services.OutboxRelay(
+        outbox_repo=DB.outbox_repo,
+        publisher=MessageBus.publisher,
+        batch_size=Settings.message_bus.OUTBOX_RELAY_BATCH_SIZE,
+        retry_delay=Settings.message_bus.OUTBOX_RELAY_RETRY_DELAY_SECONDS,
+        max_retry_delay=Settings.message_bus.OUTBOX_RELAY_MAX_RETRY_DELAY_SECONDS
+    )
+
+
+class Decorators:
+    services.outbox_relay_decorated_function_registry.apply_decorators(DB.context)
+
+
+class Outbox:
+    """
+    Переносит сообщения из outbox в брокер. Запускается отдельным процессом,
+    а не потоком в воркерах API: потоки не переживают fork при `--preload`,
+    а без него каждый воркер запускал бы свою копию.
+    """
+    stopped = threading.Event()
+
+    @staticmethod
+    def relay_forever() -> None:
+        while not Outbox.stopped.is_set():
+            try:
+                Application.relay.relay_pending()
+            except Exception:
+                logging.getLogger(__name__).exception('Failed to relay outbox messages')
+            Outbox.stopped.wait(Settings.message_bus.OUTBOX_RELAY_INTERVAL_MS / 1000)
+
+
+def run_outbox_relay():
+    MessageBus.declare_scheme()
+    # Начатая пачка публикуется до остановки
+    signal.signal(signal.SIGTERM, lambda *_: Outbox.stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: Outbox.stopped.set())
+    Outbox.relay_forever()
+
+
+if __name__ == '__main__':
+    run_outbox_relay()
@@ -0,0 +1,102 @@
+import signal
+import sys
+from functools import partial
+
+from kombu import Connection
+
+from med_sharing_system.adapters import log, message_bus
+from med_sharing_system.adapters.message_bus.autoscaling import run_module
+
+
+class Settings:
+    message_bus = message_bus.Settings()
+
+
+class Logger:
+    log.configure(
+        Settings.message_bus.LOGGING_CONFIG,
+    )
+
+
+class MessageBus:
+    connection = Connection(Settings.message_bus.RABBITMQ_URL,
+                            heartbeat=Settings.message_bus.RABBITMQ_HEARTBEAT_SECONDS)
+
+    # Match worker разбирает обе полосы подбора
+    match_worker_monitors = (
+        message_bus.QueueLoadMonitor(connection, message_bus.QUEUE_TO_MATCHING),
+        message_bus.QueueLoadMonitor(connection, message_bus.QUEUE_TO_BULK_MATCHING),
+    )
+    delivery_consumer_monitors = (
+        message_bus.QueueLoadMonitor(connection, message_bus.QUEUE_TO_DELIVERY),
+    )
+
+    @staticmethod
+    def declare_scheme():
+        message_bus.broker_scheme.declare(MessageBus.connection)
+
+
+class Supervisors:
+    common = dict(
+        interval=Settings.message_bus.SUPERVISOR_INTERVAL_SECONDS,
+        scale_down_delay=Settings.message_bus.SUPERVISOR_SCALE_DOWN_DELAY_SECONDS,
+        shutdown_timeout=Settings.message_bus.SUPERVISOR_SHUTDOWN_TIMEOUT_SECONDS,
+        metrics_path=Settings.message_bus.SUPERVISOR_METRICS_PATH
+    )
+
+    # Каждый потребитель - отдельный процесс, запущенный как
+    # `python -m med_sharing_system.launchers.<name>`
+    match_worker = message_bus.WorkerSupervisor(
+        start_worker=partial(
+            message_bus.ProcessWorker,
+            partial(run_module, 'med_sharing_system.launchers.match_worker'),
+            name='match_worker'
+        ),
+        monitors=MessageBus.match_worker_monitors,
+        policy=message_bus.ScalingPolicy(
+            min_workers=Settings.message_bus.MATCH_WORKER_MIN_PROCESSES,
+            max_workers=Settings.message_bus.MATCH_WORKER_MAX_PROCESSES,
+            messages_per_worker=Settings.message_bus.MATCH_WORKER_MESSAGES_PER_PROCESS,
+            max_latency=Settings.message_bus.MATCH_WORKER_MAX_LATENCY_SECONDS
+        ),
+        name='match_worker',
+        **common
+    )
+
+    delivery_consumer = message_bus.WorkerSupervisor(
+        start_worker=partial(
+            message_bus.ProcessWorker,
+            partial(run_module, 'med_sharing_system.launchers.delivery_consumer'),
+            name='delivery_consumer'
+        ),
+        monitors=MessageBus.delivery_consumer_monitors,
+        policy=message_bus.ScalingPolicy(
+            min_workers=Settings.message_bus.DELIVERY_CONSUMER_MIN_PROCESSES,
+            max_workers=Settings.message_bus.DELIVERY_CONSUMER_MAX_PROCESSES,
+            messages_per_worker=Settings.message_bus.DELIVERY_CONSUMER_MESSAGES_PER_PROCESS,
+            max_latency=Settings.message_bus.DELIVERY_CONSUMER_MAX_LATENCY_SECONDS
+        ),
+        name='delivery_consumer',
+        **common
+    )
+
+
+def run_supervisor(name: str):
+    supervisor: message_bus.WorkerSupervisor = getattr(Supervisors, name)
+    # Мониторы очередей объявляют их пассивно
+    MessageBus.declare_scheme()
+    # Потребители дообрабатывают начатые сообщения до остановки
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+    signal.signal(signal.SIGINT, lambda *_: supervisor.stop())
+    try:
+        supervisor.run()
+    finally:
+        for monitor in supervisor.monitors:
+            monitor.close()
+
+
+if __name__ == '__main__':
+    # python -m med_sharing_system.launchers.supervisor match_worker
+    assert len(sys.argv) == 2 and sys.argv[1] in ('match_worker', 'delivery_consumer'), \
+        'Usage: supervisor (match_worker | delivery_consumer)'
+    run_supervisor(sys.argv[1])
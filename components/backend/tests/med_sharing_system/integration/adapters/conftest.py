@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from typing import Callable, ContextManager
+
+import pytest
+
+from med_sharing_system.adapters.database import QueryProfiler, QueryStatistics
+
+
+def assert_query_budget(statistics: QueryStatistics, max_statements: int) -> None:
+    """
+    Проверяет, что количество выполненных SQL-запросов не превышает бюджет.
+    При превышении в сообщение об ошибке выводятся отпечатки запросов.
+    """
+    if statistics.statements_count <= max_statements:
+        return None
+
+    fingerprints = '\n'.join(
+        f'{count} x {fingerprint}'
+        for fingerprint, count in statistics.fingerprints.most_common()
+    )
+    raise AssertionError(
+        f'Query budget exceeded: {statistics.statements_count} statements '
+        f'executed, {max_statements} allowed.\n{fingerprints}'
+    )
+
+
+@pytest.fixture(scope='function')
+def query_budget(
+    query_profiler: QueryProfiler
+) -> Callable[[int], ContextManager[QueryStatistics]]:
+    """
+    Фабрика контекстных менеджеров, проверяющих, что внутри блока выполнено
+    не больше `max_statements` SQL-запросов.
+
+    Пример:
+        with query_budget(1):
+            repo.fetch_all(...)
+    """
+
+    @contextmanager
+    def check(max_statements: int):
+        with query_profiler.profile() as statistics:
+            yield statistics
+        assert_query_budget(statistics, max_statements)
+
+    return check
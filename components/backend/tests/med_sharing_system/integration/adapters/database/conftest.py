@@ -6,6 +6,8 @@ from sqlalchemy import create_engine
 from med_sharing_system.adapters.database import (
     Settings,
     metadata,
+    raise_on_lazy_load,
+    QueryProfiler,
     TransactionContext,
 )
 
@@ -23,9 +25,21 @@ def create_test_db():
     metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(scope='session')
+def query_profiler(create_test_db):
+    profiler = QueryProfiler(create_test_db)
+    yield profiler
+    profiler.detach()
+
+
 @pytest.fixture(scope='session')
 def transaction_context(create_test_db):
-    return TransactionContext(bind=create_test_db, expire_on_commit=False)
+    context = TransactionContext(bind=create_test_db, expire_on_commit=False)
+
+    # Неожиданные ленивые загрузки связей вызывают ошибку
+    raise_on_lazy_load(context.create_session)
+
+    return context
 
 
 @pytest.fixture(scope='function')
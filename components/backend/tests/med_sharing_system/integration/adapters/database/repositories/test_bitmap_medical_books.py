@@ -0,0 +1,227 @@
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from med_sharing_system.adapters.database import (
+    MedicalBooksBitmapIndex,
+    MedicalBooksIndexSynchronizer,
+    repositories,
+)
+from med_sharing_system.application import entities, schemas
+from med_sharing_system.application.services.medical_book import (
+    _MedBookSearchStrategySelector
+)
+from .. import test_data
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+def _fill_db(session) -> dict[str, list[int]]:
+    patient_ids: list[int] = test_data.insert_patients(session)
+    diagnosis_ids: list[int] = test_data.insert_diagnoses(session)
+    symptom_ids: list[int] = test_data.insert_symptoms(session)
+    category_ids: list[int] = test_data.insert_categories(session)
+    type_ids: list[int] = test_data.insert_types(session)
+    item_ids: list[int] = test_data.insert_items(type_ids, category_ids, session)
+    review_ids: list[int] = test_data.insert_reviews(item_ids, session)
+    med_book_ids: list[int] = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                             session)
+    test_data.insert_medical_book_reviews(med_book_ids, review_ids, session)
+    test_data.insert_medical_book_symptoms(med_book_ids, symptom_ids, session)
+    return {
+        'patient_ids': patient_ids,
+        'diagnosis_ids': diagnosis_ids,
+        'symptom_ids': symptom_ids,
+        'item_ids': item_ids,
+        'med_book_ids': med_book_ids
+    }
+
+
+@pytest.fixture(scope='function')
+def fill_db(session) -> dict[str, list[int]]:
+    return _fill_db(session)
+
+
+@pytest.fixture(scope='function')
+def index(session, fill_db) -> MedicalBooksBitmapIndex:
+    index = MedicalBooksBitmapIndex()
+    index.rebuild(session.connection())
+    return index
+
+
+@pytest.fixture(scope='function')
+def sql_repo(transaction_context):
+    return repositories.MedicalBooksRepo(context=transaction_context)
+
+
+@pytest.fixture(scope='function')
+def bitmap_repo(transaction_context, index):
+    return repositories.BitmapMedicalBooksRepo(context=transaction_context,
+                                               index=index)
+
+
+def _build_filter_params(key: tuple[bool, ...],
+                         fill_db: dict[str, list[int]],
+                         **kwargs) -> schemas.FindMedicalBooks:
+    patient_id, is_helped, diagnosis_id, symptom_ids, match_all, item_ids = key
+    return schemas.FindMedicalBooks(
+        patient_id=fill_db['patient_ids'][0] if patient_id else None,
+        is_helped=True if is_helped else None,
+        diagnosis_id=fill_db['diagnosis_ids'][0] if diagnosis_id else None,
+        symptom_ids=fill_db['symptom_ids'][:2] if symptom_ids else None,
+        match_all_symptoms=True if match_all else None,
+        item_ids=fill_db['item_ids'][:3] if item_ids else None,
+        **kwargs
+    )
+
+
+STRATEGY_KEYS: list[tuple[bool, ...]] = [
+    tuple(key) for key in _MedBookSearchStrategySelector(Mock()).strategies
+]
+PAGINATION_PARAMS: list[dict] = [
+    dict(),
+    dict(sort_field='id', sort_direction='desc'),
+    dict(sort_field='patient_id', sort_direction='asc'),
+    dict(sort_field='diagnosis_id', sort_direction='desc', limit=2),
+    dict(sort_field='title_history', sort_direction='asc', offset=1),
+    dict(limit=1, offset=1),
+]
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestSearch:
+
+    @pytest.mark.parametrize('key', STRATEGY_KEYS)
+    @pytest.mark.parametrize('pagination', PAGINATION_PARAMS)
+    def test__same_result_as_sql(self, key, pagination, fill_db, sql_repo, bitmap_repo):
+        # Setup
+        filter_params = _build_filter_params(key, fill_db, **pagination)
+        sql_method = _MedBookSearchStrategySelector(sql_repo).get_method(filter_params)
+        bitmap_method = (
+            _MedBookSearchStrategySelector(bitmap_repo).get_method(filter_params)
+        )
+
+        # Call
+        expected = sql_method(filter_params, include_symptoms=True,
+                              include_reviews=False)
+        result = bitmap_method(filter_params, include_symptoms=True,
+                               include_reviews=False)
+
+        # Assert
+        assert [med_book.id for med_book in result] == [
+            med_book.id for med_book in expected
+        ]
+
+    def test__hydrates_only_the_page(self, fill_db, bitmap_repo, query_budget):
+        # Setup
+        filter_params = schemas.FindMedicalBooks(symptom_ids=fill_db['symptom_ids'][:1],
+                                                 limit=2)
+
+        # Call
+        with query_budget(1):
+            result = bitmap_repo.fetch_by_symptoms(filter_params,
+                                                   include_symptoms=True,
+                                                   include_reviews=True)
+
+        # Assert
+        assert len(result) == 2
+
+    def test__falls_back_to_sql_until_built(self, transaction_context, fill_db):
+        # Setup
+        repo = repositories.BitmapMedicalBooksRepo(context=transaction_context,
+                                                   index=MedicalBooksBitmapIndex())
+
+        # Call
+        result = repo.fetch_all(schemas.FindMedicalBooks(),
+                                include_symptoms=False,
+                                include_reviews=False)
+
+        # Assert
+        assert len(result) == len(fill_db['med_book_ids'])
+
+
+class TestRefresh:
+
+    def test__removed_and_changed_books(self, session, fill_db, index):
+        # Setup
+        removed_id, changed_id = fill_db['med_book_ids'][:2]
+        new_diagnosis_id = fill_db['diagnosis_ids'][-1]
+        session.query(entities.MedicalBook).filter_by(id=removed_id).delete()
+        (session.query(entities.MedicalBook)
+         .filter_by(id=changed_id)
+         .update({'diagnosis_id': new_diagnosis_id}))
+
+        # Call
+        index.refresh(session.connection(), [removed_id, changed_id])
+
+        # Assert
+        found = index.get_page(
+            index.search(schemas.FindMedicalBooks(diagnosis_id=new_diagnosis_id,
+                                                  limit=None)),
+            schemas.FindMedicalBooks(limit=None)
+        )
+        assert changed_id in found
+        assert removed_id not in index.get_page(index.search(schemas.FindMedicalBooks()),
+                                                schemas.FindMedicalBooks(limit=None))
+
+
+class TestSynchronizer:
+
+    @pytest.fixture
+    def connection(self, create_test_db):
+        connection = create_test_db.connect()
+        transaction = connection.begin()
+        yield connection
+        transaction.rollback()
+        connection.close()
+
+    def test__index_follows_commits(self, connection):
+        # Setup
+        create_session = sessionmaker(bind=connection,
+                                      join_transaction_mode='create_savepoint',
+                                      expire_on_commit=False)
+        index = MedicalBooksBitmapIndex()
+        synchronizer = MedicalBooksIndexSynchronizer(index, bind=connection)
+        synchronizer.attach(create_session)
+
+        with create_session() as session:
+            ids = _fill_db(session)
+            session.commit()
+        index.rebuild(connection)
+        symptom_id = ids['symptom_ids'][-1]
+        filter_params = schemas.FindMedicalBooks(symptom_ids=[symptom_id], limit=None)
+
+        # Call
+        with create_session() as session:
+            symptom = session.get(entities.Symptom, symptom_id)
+            med_book = entities.MedicalBook(title_history='История',
+                                            patient_id=ids['patient_ids'][0],
+                                            diagnosis_id=ids['diagnosis_ids'][0],
+                                            symptoms=[symptom])
+            session.add(med_book)
+            session.commit()
+        found_after_add = index.get_page(index.search(filter_params), filter_params)
+
+        with create_session() as session:
+            session.delete(session.get(entities.Symptom, symptom_id))
+            session.commit()
+        found_after_symptom_removal = index.get_page(index.search(filter_params),
+                                                     filter_params)
+
+        with create_session() as session:
+            session.delete(session.get(entities.MedicalBook, med_book.id))
+            session.rollback()
+        found_after_rollback = index.get_page(
+            index.search(schemas.FindMedicalBooks()),
+            schemas.FindMedicalBooks(limit=None)
+        )
+
+        # Assert
+        assert med_book.id in found_after_add
+        assert found_after_symptom_removal == []
+        assert med_book.id in found_after_rollback
+        synchronizer.detach(create_session)
@@ -1,9 +1,9 @@
 import pytest
 from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
 from med_sharing_system.adapters.database import repositories
-from med_sharing_system.application import entities, schemas
+from med_sharing_system.application import dtos, entities, schemas
 from .. import test_data
 
 
@@ -149,7 +149,7 @@ class TestFetchAll:
 
 class TestFetchByItems:
 
-    def test__fetch_by_item(self, repo, session, fill_db):
+    def test__fetch_by_item(self, repo, session, fill_db, query_budget):
         # Setup
         item_id: int = (
             session.query(entities.TreatmentItem)
@@ -164,7 +164,8 @@ class TestFetchByItems:
         ).scalar()
 
         # Call
-        result = repo.fetch_by_items(filter_params)
+        with query_budget(1):
+            result = repo.fetch_by_items(filter_params)
 
         # Assert
         assert len(result) == review_count_by_item
@@ -292,6 +293,66 @@ class TestFetchByItems:
         assert len(result) == review_count_by_item - filter_params.offset
 
 
+class TestFetchTopByItems:
+
+    @pytest.mark.parametrize('sort_field, sort_direction, limit, offset', [
+        ('item_rating', 'desc', 10, 0),
+        ('item_rating', 'asc', 1, 0),
+        ('usage_period', 'desc', 2, 1),
+        ('item_count', 'asc', None, 1),
+        (None, None, 2, 0),
+    ])
+    def test__same_as_fetch_by_items(self, sort_field, sort_direction, limit, offset,
+                                     repo, fill_db, query_budget):
+        # Setup
+        item_ids: list[int] = fill_db['item_ids']
+        filter_params = schemas.FindItemReviews(item_ids=item_ids,
+                                                sort_field=sort_field,
+                                                sort_direction=sort_direction,
+                                                limit=limit,
+                                                offset=offset)
+
+        # Call
+        with query_budget(1):
+            result = repo.fetch_top_by_items(filter_params)
+
+        # Assert
+        assert list(result) == sorted(result)
+        for item_id in item_ids:
+            item_filter_params = filter_params.copy(update={'item_ids': [item_id]})
+            expected = repo.fetch_by_items(item_filter_params)
+            reviews = result.get(item_id, [])
+
+            assert len(reviews) == len(expected)
+            assert all(review.item_id == item_id for review in reviews)
+            if sort_field is not None:
+                assert ([getattr(review, sort_field) for review in reviews] ==
+                        [getattr(review, sort_field) for review in expected])
+
+    def test__with_excluded_fields(self, repo, fill_db):
+        # Setup
+        item_ids: list[int] = fill_db['item_ids']
+        filter_params = schemas.FindItemReviews(
+            item_ids=item_ids,
+            limit=2,
+            exclude_review_fields=['item_id', 'usage_period']
+        )
+
+        # Call
+        result = repo.fetch_top_by_items(filter_params)
+
+        # Assert
+        assert len(result) > 0
+        for item_id, reviews in result.items():
+            assert item_id in item_ids
+            assert 0 < len(reviews) <= filter_params.limit
+            for review in reviews:
+                assert isinstance(review, dtos.ItemReview)
+                assert review.item_id is None
+                assert review.usage_period is None
+                assert review.item_rating is not None
+
+
 class TestFetchReviewsByPatient:
     def test__fetch_by_patient(self, repo, session, fill_db):
         # Setup
@@ -880,6 +941,7 @@ class TestAdd:
         item_after_update: entities.ItemReview = session.execute(
             select(entities.TreatmentItem)
             .where(entities.TreatmentItem.id == review_before_update.item_id)
+            .options(selectinload(entities.TreatmentItem.reviews))
         ).scalars().first()
         review_after_update: entities.ItemReview = next(
             (review for review in item_after_update.reviews if review.id == review_id),
@@ -916,6 +978,7 @@ class TestAdd:
             .where(entities.MedicalBook.item_reviews.any(
                 entities.ItemReview.id == review_id)
             )
+            .options(selectinload(entities.MedicalBook.item_reviews))
         ).scalars().first()
         review_after_update: entities.ItemReview = next(
             (review for review in med_book_after_update.item_reviews
@@ -958,6 +1021,7 @@ class TestRemove:
             .where(entities.TreatmentItem.reviews.any(
                 entities.ItemReview.id == review_id_to_remove)
             )
+            .options(selectinload(entities.TreatmentItem.reviews))
         ).scalars().one_or_none()
 
         # Assert
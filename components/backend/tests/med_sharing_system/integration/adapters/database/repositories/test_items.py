@@ -2,6 +2,7 @@ from itertools import product
 
 import pytest
 from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload
 
 from med_sharing_system.adapters.database import repositories
 from med_sharing_system.application import entities, schemas
@@ -136,6 +137,8 @@ def pytest_generate_tests(metafunc):
 class _BaseMixin:
     TEST_METHOD: str
     TEST_KWARGS: list[dict]
+    # Максимальное количество SQL-запросов на один вызов метода репозитория
+    QUERY_BUDGET: int = 1
     MIXIN_KWARGS: dict[str, list[dict]] = dict(
         test__order_is_asc=[
             dict(filter_params=schemas.FindTreatmentItems(sort_field='title',
@@ -232,9 +235,10 @@ class _TestPaginationMixin(_BaseMixin):
 
 class _TestUniquenessMixin(_BaseMixin):
 
-    def test__unique_check(self, kwargs_factory, repo):
+    def test__unique_check(self, kwargs_factory, repo, query_budget):
         # Call
-        result = getattr(repo, self.TEST_METHOD)(**kwargs_factory)
+        with query_budget(self.QUERY_BUDGET):
+            result = getattr(repo, self.TEST_METHOD)(**kwargs_factory)
 
         # Assert
         assert len(result) > 0
@@ -277,12 +281,13 @@ class TestFetchById:
 
 
 class TestFetchByIdWithReviews:
-    def test__fetch_by_id(self, repo, session, fill_db):
+    def test__fetch_by_id(self, repo, session, fill_db, query_budget):
         # Setup
         expected_item_id: int = fill_db['item_ids'][0]
 
         # Call
-        result = repo.fetch_by_id(expected_item_id, True)
+        with query_budget(1):
+            result = repo.fetch_by_id(expected_item_id, True)
 
         # Assert
         assert isinstance(result, entities.TreatmentItem)
@@ -813,6 +818,7 @@ class TestAdd:
             select(entities.TreatmentItem)
             .join(entities.TreatmentItem.reviews)
             .where(entities.TreatmentItem.reviews is not None)
+            .options(selectinload(entities.TreatmentItem.reviews))
         ).scalar()
 
         # Assert
@@ -829,6 +835,7 @@ class TestAdd:
         updated_item: entities.TreatmentItem = session.execute(
             select(entities.TreatmentItem)
             .where(entities.TreatmentItem.id == existing_item.id)
+            .options(selectinload(entities.TreatmentItem.reviews))
         ).scalar()
 
         # Assert
@@ -866,6 +873,7 @@ class TestRemove:
                 select(entities.TreatmentItem)
                 .join(entities.TreatmentItem.reviews)
                 .where(entities.TreatmentItem.reviews is not None)
+                .options(selectinload(entities.TreatmentItem.reviews))
             ).scalar()
         )
         orphaned_review_ids: list[int] = [review.id for review in item_to_remove.reviews]
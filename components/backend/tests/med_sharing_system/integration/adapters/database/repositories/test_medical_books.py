@@ -151,6 +151,9 @@ def pytest_generate_tests(metafunc):
 class _BaseMixin:
     TEST_METHOD: str
     TEST_KWARGS: list[dict]
+    # Максимальное количество SQL-запросов на один вызов метода репозитория:
+    # выборка страницы идентификаторов и загрузка карт по ним
+    QUERY_BUDGET: int = 2
     MIXIN_KWARGS: dict[str, list[dict]] = dict(
         test__order_is_asc=[
             dict(filter_params=schemas.FindMedicalBooks(sort_field='patient_id',
@@ -246,9 +249,10 @@ class _TestPaginationMixin(_BaseMixin):
 
 class _TestUniquenessMixin(_BaseMixin):
 
-    def test__unique_check(self, kwargs_factory, repo):
+    def test__unique_check(self, kwargs_factory, repo, query_budget):
         # Call
-        result = getattr(repo, self.TEST_METHOD)(**kwargs_factory)
+        with query_budget(self.QUERY_BUDGET):
+            result = getattr(repo, self.TEST_METHOD)(**kwargs_factory)
 
         # Assert
         assert len(result) > 0
@@ -263,14 +267,16 @@ class TestFetchById:
         (False, True),
         (True, True),
     ])
-    def test__fetch_by_id(self, include_symptoms, include_reviews, repo, session):
+    def test__fetch_by_id(self, include_symptoms, include_reviews, repo, session,
+                          query_budget):
         # Setup
         med_book = session.query(entities.MedicalBook).first()
 
         # Call
-        result = repo.fetch_by_id(med_book_id=med_book.id,
-                                  include_symptoms=include_symptoms,
-                                  include_reviews=include_reviews)
+        with query_budget(1):
+            result = repo.fetch_by_id(med_book_id=med_book.id,
+                                      include_symptoms=include_symptoms,
+                                      include_reviews=include_reviews)
 
         # Assert
         assert isinstance(result, entities.MedicalBook)
@@ -306,6 +312,151 @@ class TestFetchAll(_TestOrderMixin, _TestPaginationMixin, _TestUniquenessMixin):
         assert all(isinstance(med_book, entities.MedicalBook) for med_book in result)
 
 
+class TestTwoPhasePagination:
+
+    @pytest.mark.parametrize('include_symptoms, include_reviews', [
+        (False, False),
+        (True, True),
+    ])
+    def test__page_is_selected_by_narrow_query(self, include_symptoms, include_reviews,
+                                               repo, query_budget):
+        # Setup
+        filter_params = schemas.FindMedicalBooks(sort_field='patient_id',
+                                                 sort_direction='desc',
+                                                 limit=3,
+                                                 offset=1)
+
+        # Call
+        with query_budget(2) as statistics:
+            result = repo.fetch_all(filter_params=filter_params,
+                                    include_symptoms=include_symptoms,
+                                    include_reviews=include_reviews)
+
+        # Assert
+        page_query, = [fingerprint for fingerprint in statistics.fingerprints
+                       if 'LIMIT' in fingerprint]
+        assert 'medical_books.history' not in page_query
+        assert len(result) == 3
+        assert result == sorted(result, key=lambda med_book: (-med_book.patient_id,
+                                                              med_book.id))
+
+    def test__pages_do_not_overlap(self, repo):
+        # Setup
+        pages: list[list[int]] = []
+
+        # Call
+        for offset in range(0, 6, 2):
+            filter_params = schemas.FindMedicalBooks(sort_field='diagnosis_id',
+                                                     sort_direction='asc',
+                                                     limit=2,
+                                                     offset=offset)
+            pages.append([med_book.id for med_book in
+                          repo.fetch_all(filter_params=filter_params,
+                                         include_symptoms=True,
+                                         include_reviews=False)])
+
+        # Assert
+        all_ids = [med_book_id for page in pages for med_book_id in page]
+        assert len(all_ids) == len(set(all_ids))
+
+    def test__empty_page(self, repo, query_budget):
+        # Call
+        with query_budget(1):
+            result = repo.fetch_all(filter_params=schemas.FindMedicalBooks(offset=1000),
+                                    include_symptoms=True,
+                                    include_reviews=True)
+
+        # Assert
+        assert result == []
+
+
+class TestFetchWithNestedLimits:
+
+    def test__symptoms_limit(self, repo, query_budget):
+        # Setup
+        full_symptoms: dict[int, list[str]] = {
+            med_book.id: [symptom.name for symptom in med_book.symptoms]
+            for med_book in repo.fetch_all(filter_params=schemas.FindMedicalBooks(),
+                                           include_symptoms=True,
+                                           include_reviews=False)
+        }
+        filter_params = schemas.FindMedicalBooksWithSymptoms(symptoms_limit=2)
+
+        # Call
+        with query_budget(3):
+            result = repo.fetch_all(filter_params=filter_params,
+                                    include_symptoms=True,
+                                    include_reviews=False)
+
+        # Assert
+        assert len(result) == len(full_symptoms)
+        assert any(len(symptoms) > 2 for symptoms in full_symptoms.values())
+        for med_book in result:
+            assert ([symptom.name for symptom in med_book.symptoms] ==
+                    full_symptoms[med_book.id][:2])
+
+    @pytest.mark.parametrize('sort_field, sort_direction', [
+        ('item_rating', 'asc'),
+        ('item_rating', 'desc'),
+        ('usage_period', 'asc'),
+        ('id', 'desc'),
+    ])
+    def test__reviews_limit_and_order(self, sort_field, sort_direction, repo,
+                                      query_budget):
+        # Setup
+        # NULL-значения при любом направлении сортировки идут последними
+        full_values: dict[int, list] = {
+            med_book.id: sorted(
+                (getattr(review, sort_field) for review in med_book.item_reviews
+                 if getattr(review, sort_field) is not None),
+                reverse=sort_direction == 'desc'
+            ) + [None] * sum(getattr(review, sort_field) is None
+                             for review in med_book.item_reviews)
+            for med_book in repo.fetch_all(filter_params=schemas.FindMedicalBooks(),
+                                           include_symptoms=False,
+                                           include_reviews=True)
+        }
+        filter_params = schemas.FindMedicalBooksWithItemReviews(
+            reviews_sort_field=sort_field,
+            reviews_sort_direction=sort_direction,
+            reviews_limit=1
+        )
+
+        # Call
+        with query_budget(3):
+            result = repo.fetch_all(filter_params=filter_params,
+                                    include_symptoms=False,
+                                    include_reviews=True)
+
+        # Assert
+        assert len(result) == len(full_values)
+        for med_book in result:
+            values = [getattr(review, sort_field) for review in med_book.item_reviews]
+            assert values == full_values[med_book.id][:1]
+
+    def test__symptoms_and_reviews_limits_with_pagination(self, repo, query_budget):
+        # Setup
+        filter_params = schemas.FindMedicalBooksWithSymptomsAndItemReviews(
+            sort_field='title_history',
+            sort_direction='asc',
+            limit=2,
+            offset=1,
+            symptoms_limit=1,
+            reviews_limit=1
+        )
+
+        # Call
+        with query_budget(4):
+            result = repo.fetch_all(filter_params=filter_params,
+                                    include_symptoms=True,
+                                    include_reviews=True)
+
+        # Assert
+        assert len(result) == 2
+        assert all(len(med_book.symptoms) <= 1 for med_book in result)
+        assert all(len(med_book.item_reviews) <= 1 for med_book in result)
+
+
 class TestFetchBySymptoms(_TestOrderMixin, _TestPaginationMixin, _TestUniquenessMixin):
     TEST_METHOD = 'fetch_by_symptoms'
     TEST_KWARGS = [dict(include_symptoms=False, include_reviews=False,
@@ -3230,3 +3381,90 @@ class TestRemove:
         # Assert
         assert before_count - 1 == after_count
         assert isinstance(result, entities.MedicalBook)
+
+
+class TestSymptomIdsSync:
+
+    @staticmethod
+    def _get_symptom_ids(session) -> dict[int, list[int]]:
+        return dict(
+            session.execute(
+                select(tables.medical_books.c.id, tables.medical_books.c.symptom_ids)
+            ).all()
+        )
+
+    @staticmethod
+    def _get_linked_symptom_ids(session) -> dict[int, list[int]]:
+        linked_symptom_ids: dict[int, list[int]] = {
+            med_book_id: [] for med_book_id in
+            session.execute(select(tables.medical_books.c.id)).scalars()
+        }
+        for med_book_id, symptom_id in session.execute(
+            select(tables.medical_books_symptoms)
+            .order_by(tables.medical_books_symptoms.c.symptom_id)
+        ):
+            linked_symptom_ids[med_book_id].append(symptom_id)
+        return linked_symptom_ids
+
+    def test__filled_on_insert(self, session):
+        # Assert
+        assert self._get_symptom_ids(session) == self._get_linked_symptom_ids(session)
+
+    def test__synced_on_add_and_change(self, repo, session, fill_db):
+        # Setup
+        symptoms: list[entities.Symptom] = (
+            session.query(entities.Symptom)
+            .filter(entities.Symptom.id.in_(fill_db['symptom_ids'][:3]))
+            .all()
+        )
+
+        # Call
+        med_book = repo.add(
+            entities.MedicalBook(title_history='История 1',
+                                 patient_id=fill_db['patient_ids'][0],
+                                 diagnosis_id=fill_db['diagnosis_ids'][0],
+                                 symptoms=symptoms)
+        )
+        session.flush()
+        symptom_ids_after_add = self._get_symptom_ids(session)[med_book.id]
+
+        med_book.remove_symptoms(symptoms[:1])
+        session.flush()
+        symptom_ids_after_change = self._get_symptom_ids(session)[med_book.id]
+
+        # Assert
+        assert symptom_ids_after_add == sorted(fill_db['symptom_ids'][:3])
+        assert symptom_ids_after_change == sorted(
+            symptom.id for symptom in symptoms[1:]
+        )
+
+    @pytest.mark.parametrize('symptoms_slice', [
+        slice(0, 1),
+        slice(0, 2),
+        slice(1, 3),
+        slice(0, 5),
+    ])
+    def test__array_and_link_table_filters_match(self, symptoms_slice, session,
+                                                 fill_db):
+        # Setup
+        filter_params = schemas.FindMedicalBooks(
+            symptom_ids=fill_db['symptom_ids'][symptoms_slice]
+        )
+        filter_pairs = [
+            (repositories.medical_books._has_symptoms,
+             repositories.medical_books._has_symptoms_in_link_table),
+            (repositories.medical_books._has_all_symptoms,
+             repositories.medical_books._has_all_symptoms_in_link_table),
+        ]
+
+        for array_filter, link_table_filter in filter_pairs:
+            # Call
+            by_array = set(session.execute(
+                select(entities.MedicalBook.id).where(array_filter(filter_params))
+            ).scalars())
+            by_link_table = set(session.execute(
+                select(entities.MedicalBook.id).where(link_table_filter(filter_params))
+            ).scalars())
+
+            # Assert
+            assert by_array == by_link_table
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, func, insert, select, update
+
+from med_sharing_system.adapters.database import repositories, tables
+from med_sharing_system.application.interfaces.message_publishing import QueueMessage
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def repo(transaction_context):
+    return repositories.OutboxRepo(context=transaction_context)
+
+
+@pytest.fixture(scope='function')
+def messages() -> list[QueueMessage]:
+    return [QueueMessage(target='exchange', body={'client_id': f'client_{number}',
+                                                  'symptom_ids': [number]})
+            for number in range(5)]
+
+
+@pytest.fixture(scope='function')
+def committed_messages(create_test_db, messages) -> list[QueueMessage]:
+    """
+    Зафиксированные сообщения: другие соединения видят и блокируют их.
+    После теста таблица очищается.
+    """
+    with create_test_db.begin() as connection:
+        connection.execute(insert(tables.outbox_messages),
+                           [{'target': message.target, 'body': message.body}
+                            for message in messages])
+    yield messages
+
+    with create_test_db.begin() as connection:
+        connection.execute(delete(tables.outbox_messages))
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestAddAndTake:
+    def test__take_in_order(self, repo, messages):
+        # Setup
+        repo.add(messages)
+
+        # Call
+        first = repo.take(3)
+        repo.remove(first)
+        rest = repo.take(3)
+
+        # Assert
+        assert first == messages[:3]
+        assert rest == messages[3:]
+        assert len({message.message_id for message in first + rest}) == 5
+
+    def test__remove(self, repo, session, messages):
+        # Setup
+        repo.add(messages)
+        taken = repo.take(5)
+
+        # Call
+        repo.remove(taken[1:])
+
+        # Assert
+        assert session.execute(select(tables.outbox_messages.c.body)).scalars().all() == [
+            messages[0].body
+        ]
+
+    def test__postponed_messages_are_skipped(self, repo, session, messages):
+        # Setup
+        repo.add(messages)
+        taken = repo.take(2)
+
+        # Call
+        repo.postpone(taken, retry_delay=60, max_retry_delay=300)
+        result = repo.take(5)
+
+        # Assert
+        assert result == messages[2:]
+        assert session.execute(
+            select(tables.outbox_messages.c.attempts)
+            .where(tables.outbox_messages.c.attempts > 0)
+        ).scalars().all() == [1, 1]
+
+    def test__delay_is_capped_for_many_attempts(self, repo, session, messages):
+        # Setup
+        outbox = tables.outbox_messages
+        repo.add(messages[:1])
+        taken = repo.take(1)
+        session.execute(update(outbox).values(attempts=100_000))
+
+        # Call
+        repo.postpone(taken, retry_delay=1, max_retry_delay=300)
+
+        # Assert
+        attempts, delay = session.execute(
+            select(outbox.c.attempts, outbox.c.available_at - func.now())
+        ).one()
+        assert attempts == 100_001
+        assert delay == timedelta(seconds=300)
+
+    def test__locked_messages_are_skipped(self, committed_messages, create_test_db,
+                                          repo, session):
+        # `committed_messages` очищает таблицу после отката `session`,
+        # иначе очистка ждала бы блокировок этой транзакции
+        # Setup
+        with create_test_db.connect() as connection, connection.begin():
+            outbox = tables.outbox_messages
+            connection.execute(
+                select(outbox.c.id).order_by(outbox.c.id).limit(2).with_for_update()
+            )
+
+            # Call
+            result = repo.take(10)
+
+        # Assert
+        assert result == committed_messages[2:]
@@ -0,0 +1,178 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, func, select, update
+
+from med_sharing_system.adapters.database import repositories, tables
+from .. import test_data
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def repo(transaction_context):
+    return repositories.PatientChangesRepo(context=transaction_context)
+
+
+@pytest.fixture(scope='function')
+def committed_connection(create_test_db):
+    """
+    Соединение, изменения которого фиксируются: журнал отдает только
+    завершенные транзакции. После теста все данные удаляются.
+    """
+    with create_test_db.connect() as connection:
+        yield connection
+
+    with create_test_db.begin() as connection:
+        connection.execute(delete(tables.medical_books))
+        connection.execute(delete(tables.patients))
+        connection.execute(delete(tables.diagnoses))
+        connection.execute(delete(tables.patient_changes))
+
+
+def _logged_patient_ids(session) -> list[int]:
+    query = select(tables.patient_changes.c.patient_id).order_by(
+        tables.patient_changes.c.id
+    )
+    return list(session.execute(query).scalars())
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestTriggers:
+    def test__changes_are_logged(self, session):
+        # Setup
+        patient_ids = test_data.insert_patients(session)
+        diagnosis_ids = test_data.insert_diagnoses(session)
+        med_book_ids = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                      session)
+
+        # Call
+        session.execute(
+            update(tables.medical_books)
+            .where(tables.medical_books.c.id == med_book_ids[0])
+            .values(patient_id=patient_ids[1])
+        )
+        session.execute(
+            update(tables.medical_books)
+            .where(tables.medical_books.c.id == med_book_ids[1])
+            .values(title_history='Без изменения профиля')
+        )
+
+        # Assert
+        assert _logged_patient_ids(session) == [
+            *patient_ids,
+            *(patient_ids[index % len(patient_ids)]
+              for index in range(len(med_book_ids))),
+            patient_ids[0],
+            patient_ids[1],
+        ]
+
+
+    def test__symptoms_are_logged_once_per_medical_book(self, session):
+        # Setup
+        patient_ids = test_data.insert_patients(session)
+        diagnosis_ids = test_data.insert_diagnoses(session)
+        symptom_ids = test_data.insert_symptoms(session)
+        med_book_ids = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                      session)[:3]
+        session.execute(delete(tables.patient_changes))
+
+        # Call
+        # Карты получают 1, 2 и 3 симптома одним оператором
+        test_data.insert_medical_book_symptoms(med_book_ids, symptom_ids, session)
+
+        # Assert
+        assert sorted(_logged_patient_ids(session)) == sorted(patient_ids[:3])
+        assert session.execute(
+            select(tables.medical_books.c.symptom_ids)
+            .where(tables.medical_books.c.id == med_book_ids[2])
+        ).scalar_one() == sorted(symptom_ids[:3])
+
+
+class TestFetchChangedPatientIds:
+    def test__committed_changes(self, repo, committed_connection):
+        # Setup
+        since_mark = repo.get_change_mark()
+        with committed_connection.begin():
+            patient_ids = test_data.insert_patients(committed_connection)
+
+        # Call
+        result, change_mark = repo.fetch_changed_patient_ids(since_mark)
+        repeated, repeated_mark = repo.fetch_changed_patient_ids(change_mark)
+
+        # Assert
+        assert result == set(patient_ids)
+        assert change_mark > since_mark
+        assert repeated == set()
+        assert repeated_mark >= change_mark
+
+    def test__uncommitted_changes_are_deferred(self, repo, session):
+        # Setup
+        since_mark = repo.get_change_mark()
+        test_data.insert_patients(session)
+
+        # Call
+        result, change_mark = repo.fetch_changed_patient_ids(since_mark)
+
+        # Assert
+        assert result == set()
+        assert change_mark <= session.execute(
+            select(tables.patient_changes.c.xact_id).limit(1)
+        ).scalar_one()
+
+
+class TestPrune:
+    @pytest.fixture(scope='function')
+    def xact_id(self, session) -> int:
+        """
+        Номер транзакции теста, в которой в журнал записаны пациенты.
+        """
+        test_data.insert_patients(session)
+        return session.execute(
+            select(tables.patient_changes.c.xact_id).limit(1)
+        ).scalar_one()
+
+    def test__changes_read_by_all_consumers(self, repo, session, xact_id):
+        # Setup
+        repo.save_change_mark('first', xact_id + 1)
+        repo.save_change_mark('second', xact_id)
+
+        # Call
+        deleted_before_second = repo.prune(consumer_ttl=60)
+        repo.save_change_mark('second', xact_id + 1)
+        deleted = repo.prune(consumer_ttl=60)
+
+        # Assert
+        assert deleted_before_second == 0
+        assert deleted == len(test_data.PATIENTS_DATA)
+        assert _logged_patient_ids(session) == []
+        assert repo.fetch_saved_change_mark('second') == xact_id + 1
+
+    def test__stale_consumers_are_forgotten(self, repo, session, xact_id):
+        # Setup
+        repo.save_change_mark('stopped', 0)
+        repo.save_change_mark('live', xact_id + 1)
+        consumers = tables.change_journal_consumers
+        session.execute(
+            update(consumers)
+            .where(consumers.c.consumer == 'stopped')
+            .values(updated_at=func.now() - timedelta(hours=2))
+        )
+
+        # Call
+        deleted = repo.prune(consumer_ttl=3600)
+
+        # Assert
+        assert deleted == len(test_data.PATIENTS_DATA)
+        assert repo.fetch_saved_change_mark('stopped') is None
+
+    def test__without_consumers(self, repo, session, xact_id):
+        # Call
+        deleted = repo.prune(consumer_ttl=60)
+
+        # Assert
+        assert deleted == 0
+        assert len(_logged_patient_ids(session)) == len(test_data.PATIENTS_DATA)
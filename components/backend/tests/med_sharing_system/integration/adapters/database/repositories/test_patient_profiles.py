@@ -0,0 +1,73 @@
+import pytest
+
+from med_sharing_system.adapters.database import repositories
+from med_sharing_system.application import entities
+from .. import test_data
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function', autouse=True)
+def fill_db(session) -> dict[str, list[int]]:
+    patient_ids: list[int] = test_data.insert_patients(session)
+    diagnosis_ids: list[int] = test_data.insert_diagnoses(session)
+    symptom_ids: list[int] = test_data.insert_symptoms(session)
+    med_book_ids: list[int] = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                             session)
+    test_data.insert_medical_book_symptoms(med_book_ids, symptom_ids, session)
+    return {'patient_ids': patient_ids,
+            'diagnosis_ids': diagnosis_ids,
+            'symptom_ids': symptom_ids}
+
+
+@pytest.fixture(scope='function')
+def repo(transaction_context):
+    return repositories.PatientProfilesRepo(context=transaction_context)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestFetchAll:
+    def test__fetch_all(self, repo, session, fill_db):
+        # Setup
+        patient_ids = fill_db['patient_ids']
+        diagnosis_ids = fill_db['diagnosis_ids']
+        symptom_ids = fill_db['symptom_ids']
+
+        # Call
+        result = {profile.patient_id: profile for profile in repo.fetch_all()}
+
+        # Assert
+        assert set(result) == set(patient_ids)
+        # У первого пациента первая и четвертая карты
+        assert result[patient_ids[0]].symptom_ids == frozenset(symptom_ids)
+        assert result[patient_ids[0]].diagnosis_ids == frozenset(diagnosis_ids[:1])
+        assert result[patient_ids[1]].symptom_ids == frozenset(symptom_ids[:2])
+        assert result[patient_ids[2]].symptom_ids == frozenset(symptom_ids[:3])
+
+        patient = session.get(entities.Patient, patient_ids[0])
+        assert result[patient_ids[0]].gender == patient.gender
+        assert result[patient_ids[0]].age == patient.age
+        assert result[patient_ids[0]].skin_type == patient.skin_type
+
+
+class TestFetchByPatientIds:
+    def test__fetch_by_patient_ids(self, repo, fill_db):
+        # Setup
+        patient_ids = fill_db['patient_ids'][1:]
+
+        # Call
+        result = repo.fetch_by_patient_ids(patient_ids)
+
+        # Assert
+        assert {profile.patient_id for profile in result} == set(patient_ids)
+
+    def test__empty_ids(self, repo, query_budget):
+        # Call
+        with query_budget(0):
+            result = repo.fetch_by_patient_ids([])
+
+        # Assert
+        assert result == []
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import delete, select
+
+from med_sharing_system.adapters.database import repositories, tables
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def clean_table(create_test_db):
+    """
+    Репозиторий фиксирует транзакции сам, поэтому таблица очищается после теста.
+    """
+    yield create_test_db
+
+    with create_test_db.begin() as connection:
+        connection.execute(delete(tables.processed_messages))
+
+
+def _stored_ids(engine) -> set[str]:
+    with engine.connect() as connection:
+        return set(connection.execute(
+            select(tables.processed_messages.c.message_id)
+        ).scalars())
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestProcessedMessagesRepo:
+    def test__add_and_contains(self, clean_table, transaction_context):
+        # Setup
+        repo = repositories.ProcessedMessagesRepo(context=transaction_context,
+                                                  ttl=3600)
+
+        # Call
+        repo.add('message_1')
+        repo.add('message_1')
+
+        # Assert
+        assert repo.contains('message_1')
+        assert not repo.contains('message_2')
+        assert _stored_ids(clean_table) == {'message_1'}
+
+    def test__expired(self, clean_table, transaction_context):
+        # Setup
+        repo = repositories.ProcessedMessagesRepo(context=transaction_context,
+                                                  ttl=0, purge_interval=2)
+
+        # Call
+        repo.add('message_1')
+        is_contained = repo.contains('message_1')
+        repo.add('message_2')
+
+        # Assert
+        assert not is_contained
+        assert _stored_ids(clean_table) == {'message_2'}
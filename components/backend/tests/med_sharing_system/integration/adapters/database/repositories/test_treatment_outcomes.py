@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import select
+
+from med_sharing_system.adapters.database import repositories, tables
+from .. import test_data
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function', autouse=True)
+def fill_db(session) -> dict[str, list[int]]:
+    patient_ids: list[int] = test_data.insert_patients(session)
+    diagnosis_ids: list[int] = test_data.insert_diagnoses(session)
+    symptom_ids: list[int] = test_data.insert_symptoms(session)
+    category_ids: list[int] = test_data.insert_categories(session)
+    type_ids: list[int] = test_data.insert_types(session)
+    item_ids: list[int] = test_data.insert_items(type_ids, category_ids, session)
+    review_ids: list[int] = test_data.insert_reviews(item_ids, session)
+    med_book_ids: list[int] = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                             session)
+    test_data.insert_medical_book_reviews(med_book_ids, review_ids, session)
+    test_data.insert_medical_book_symptoms(med_book_ids, symptom_ids, session)
+    return {'med_book_ids': med_book_ids, 'review_ids': review_ids}
+
+
+@pytest.fixture(scope='function')
+def repo(transaction_context):
+    return repositories.TreatmentOutcomesRepo(context=transaction_context)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestFetchAll:
+    def test__fetch_all(self, repo, session, query_budget):
+        # Setup
+        medical_books = tables.medical_books
+        med_books_reviews = tables.medical_books_item_reviews
+        reviews = tables.item_reviews
+        expected = {}
+        for med_book_id, diagnosis_id, symptom_ids, item_id, is_helped, rating in (
+            session.execute(
+                select(medical_books.c.id,
+                       medical_books.c.diagnosis_id,
+                       medical_books.c.symptom_ids,
+                       reviews.c.item_id,
+                       reviews.c.is_helped,
+                       reviews.c.item_rating)
+                .join_from(medical_books, med_books_reviews,
+                           med_books_reviews.c.med_book_id == medical_books.c.id)
+                .join(reviews, reviews.c.id == med_books_reviews.c.item_review_id)
+            )
+        ):
+            book = expected.setdefault(med_book_id,
+                                       (diagnosis_id, frozenset(symptom_ids), []))
+            book[2].append((item_id, is_helped, rating))
+
+        # Call
+        with query_budget(1):
+            result = list(repo.fetch_all())
+
+        # Assert
+        assert expected
+        assert {
+            outcome.med_book_id: (
+                outcome.diagnosis_id,
+                outcome.symptom_ids,
+                sorted((item.item_id, item.is_helped, item.item_rating)
+                       for item in outcome.item_outcomes)
+            )
+            for outcome in result
+        } == {
+            med_book_id: (diagnosis_id, symptom_ids, sorted(items))
+            for med_book_id, (diagnosis_id, symptom_ids, items) in expected.items()
+        }
+
+    def test__skips_books_without_reviews(self, repo, session, fill_db):
+        # Setup
+        session.execute(tables.medical_books_item_reviews.delete())
+
+        # Call
+        result = list(repo.fetch_all())
+
+        # Assert
+        assert result == []
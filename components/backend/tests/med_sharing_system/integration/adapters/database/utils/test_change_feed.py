@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import delete, update
+
+from med_sharing_system.adapters.database import (
+    ItemCooccurrenceIndex,
+    MedicalBooksBitmapIndex,
+    MedicalBooksChangeFeed,
+    tables,
+)
+from med_sharing_system.adapters.database.utils.bitmap_index import bitmaps
+from med_sharing_system.application import schemas
+from .. import test_data
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def committed_db(create_test_db):
+    """
+    Журнал отдает только завершенные транзакции, поэтому данные фиксируются.
+    После теста все данные удаляются.
+    """
+    yield create_test_db
+
+    with create_test_db.begin() as connection:
+        connection.execute(delete(tables.medical_books))
+        connection.execute(delete(tables.item_reviews))
+        connection.execute(delete(tables.treatment_items))
+        connection.execute(delete(tables.item_categories))
+        connection.execute(delete(tables.item_types))
+        connection.execute(delete(tables.patients))
+        connection.execute(delete(tables.diagnoses))
+        connection.execute(delete(tables.patient_changes))
+        connection.execute(delete(tables.medical_book_changes))
+
+
+@pytest.fixture(scope='function')
+def index() -> MedicalBooksBitmapIndex:
+    return MedicalBooksBitmapIndex()
+
+
+@pytest.fixture(scope='function')
+def feed(index, committed_db) -> MedicalBooksChangeFeed:
+    return MedicalBooksChangeFeed([index], bind=committed_db, interval=0)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestMedicalBooksChangeFeed:
+    def test__catches_up_changes_of_other_processes(self, index, feed, committed_db):
+        # Setup
+        with committed_db.begin() as connection:
+            patient_ids = test_data.insert_patients(connection)
+            diagnosis_ids = test_data.insert_diagnoses(connection)
+            med_book_ids = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                          connection)
+        feed.rebuild()
+        changed_id, deleted_id = med_book_ids[:2]
+
+        # Изменения в обход ORM: синхронизатор их бы не увидел
+        with committed_db.begin() as connection:
+            connection.execute(
+                update(tables.medical_books)
+                .where(tables.medical_books.c.id == changed_id)
+                .values(diagnosis_id=diagnosis_ids[-1])
+            )
+            connection.execute(
+                delete(tables.medical_books)
+                .where(tables.medical_books.c.id == deleted_id)
+            )
+
+        # Call
+        result = feed.catch_up()
+        repeated = feed.catch_up()
+
+        # Assert
+        found = index.search(schemas.FindMedicalBooks(diagnosis_id=diagnosis_ids[-1]))
+        assert result == {changed_id, deleted_id}
+        assert repeated == set()
+        assert changed_id in set(bitmaps.iter_ids(found))
+        assert len(index) == len(med_book_ids) - 1
+
+    def test__not_built(self, index, feed):
+        # Call
+        result = feed.catch_up()
+
+        # Assert
+        assert result == set()
+        assert not index.is_built
+
+    def test__catches_up_item_cooccurrence(self, committed_db):
+        # Setup
+        with committed_db.begin() as connection:
+            patient_ids = test_data.insert_patients(connection)
+            diagnosis_ids = test_data.insert_diagnoses(connection)
+            item_ids = test_data.insert_items(test_data.insert_types(connection),
+                                              test_data.insert_categories(connection),
+                                              connection)
+            review_ids = test_data.insert_reviews(item_ids, connection)
+            med_book_ids = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                          connection)
+            test_data.insert_medical_book_reviews(med_book_ids, review_ids, connection)
+        index = ItemCooccurrenceIndex()
+        feed = MedicalBooksChangeFeed([index], bind=committed_db, interval=0)
+        feed.rebuild()
+        indexed_before = len(index)
+
+        with committed_db.begin() as connection:
+            connection.execute(delete(tables.medical_books_item_reviews))
+
+        # Call
+        feed.catch_up()
+
+        # Assert
+        assert indexed_before > 0
+        assert len(index) == 0
@@ -0,0 +1,192 @@
+from itertools import permutations
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from med_sharing_system.adapters.database import (
+    ItemCooccurrenceIndex,
+    MedicalBooksIndexSynchronizer,
+    tables,
+)
+from med_sharing_system.application import entities
+from .. import test_data
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+def _fill_db(session) -> dict[str, list[int]]:
+    patient_ids: list[int] = test_data.insert_patients(session)
+    diagnosis_ids: list[int] = test_data.insert_diagnoses(session)
+    category_ids: list[int] = test_data.insert_categories(session)
+    type_ids: list[int] = test_data.insert_types(session)
+    item_ids: list[int] = test_data.insert_items(type_ids, category_ids, session)
+    review_ids: list[int] = test_data.insert_reviews(item_ids, session)
+    med_book_ids: list[int] = test_data.insert_medical_books(patient_ids, diagnosis_ids,
+                                                             session)
+    test_data.insert_medical_book_reviews(med_book_ids, review_ids, session)
+    return {
+        'patient_ids': patient_ids,
+        'diagnosis_ids': diagnosis_ids,
+        'item_ids': item_ids,
+        'review_ids': review_ids,
+        'med_book_ids': med_book_ids
+    }
+
+
+@pytest.fixture(scope='function')
+def fill_db(session) -> dict[str, list[int]]:
+    return _fill_db(session)
+
+
+@pytest.fixture(scope='function')
+def index(session, fill_db) -> ItemCooccurrenceIndex:
+    index = ItemCooccurrenceIndex()
+    index.rebuild(session.connection())
+    return index
+
+
+def _count_pairs(session) -> dict[tuple[int, int], int]:
+    """
+    Считает пары товаров по определению - перебором отзывов каждой карты.
+    """
+    book_items: dict[int, set[int]] = {}
+    for med_book_id, item_id in session.execute(
+        select(tables.medical_books_item_reviews.c.med_book_id,
+               tables.item_reviews.c.item_id)
+        .join_from(tables.medical_books_item_reviews, tables.item_reviews,
+                   tables.item_reviews.c.id
+                   == tables.medical_books_item_reviews.c.item_review_id)
+    ):
+        book_items.setdefault(med_book_id, set()).add(item_id)
+
+    pairs: dict[tuple[int, int], int] = {}
+    for item_ids in book_items.values():
+        for pair in permutations(item_ids, 2):
+            pairs[pair] = pairs.get(pair, 0) + 1
+    return pairs
+
+
+def _index_pairs(index: ItemCooccurrenceIndex,
+                 item_ids: list[int]
+                 ) -> dict[tuple[int, int], int]:
+    return {
+        (item_id, related.item_id): related.med_books_count
+        for item_id in item_ids
+        for related in index.get_related_items(item_id, limit=len(item_ids))
+    }
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestRebuild:
+    def test__same_counts_as_brute_force(self, session, fill_db, index):
+        # Call
+        result = _index_pairs(index, fill_db['item_ids'])
+
+        # Assert
+        assert result
+        assert result == _count_pairs(session)
+
+
+class TestGetRelatedItems:
+    def test__ordered_by_count_and_id(self, fill_db, index):
+        # Setup
+        item_id = fill_db['item_ids'][0]
+
+        # Call
+        result = index.get_related_items(item_id, limit=2)
+
+        # Assert
+        assert len(result) <= 2
+        assert result == sorted(result, key=lambda item: (-item.med_books_count,
+                                                          item.item_id))
+
+    def test__unknown_item(self, index):
+        # Call
+        result = index.get_related_items(10 ** 9, limit=10)
+
+        # Assert
+        assert result == []
+
+
+class TestRefresh:
+    def test__removed_reviews_and_books(self, session, fill_db, index):
+        # Setup
+        first_id, second_id = fill_db['med_book_ids'][:2]
+        session.execute(
+            tables.medical_books_item_reviews.delete()
+            .where(tables.medical_books_item_reviews.c.med_book_id == first_id)
+            .where(tables.medical_books_item_reviews.c.item_review_id
+                   == fill_db['review_ids'][0])
+        )
+        session.query(entities.MedicalBook).filter_by(id=second_id).delete()
+
+        # Call
+        index.refresh(session.connection(), [first_id, second_id])
+
+        # Assert
+        assert _index_pairs(index, fill_db['item_ids']) == _count_pairs(session)
+
+
+class TestSynchronizer:
+
+    @pytest.fixture
+    def connection(self, create_test_db):
+        connection = create_test_db.connect()
+        transaction = connection.begin()
+        yield connection
+        transaction.rollback()
+        connection.close()
+
+    def test__index_follows_commits(self, connection):
+        # Setup
+        create_session = sessionmaker(bind=connection,
+                                      join_transaction_mode='create_savepoint',
+                                      expire_on_commit=False)
+        index = ItemCooccurrenceIndex()
+        synchronizer = MedicalBooksIndexSynchronizer(index, bind=connection)
+        synchronizer.attach(create_session)
+
+        with create_session() as session:
+            ids = _fill_db(session)
+            session.commit()
+        index.rebuild(connection)
+        first_item_id, second_item_id = ids['item_ids'][-2:]
+        count_before = {
+            item.item_id: item.med_books_count
+            for item in index.get_related_items(first_item_id, limit=100)
+        }.get(second_item_id, 0)
+
+        # Call
+        with create_session() as session:
+            reviews = [
+                entities.ItemReview(item_id=item_id, is_helped=True, item_rating=8,
+                                    item_count=1)
+                for item_id in (first_item_id, second_item_id)
+            ]
+            med_book = entities.MedicalBook(title_history='История',
+                                            patient_id=ids['patient_ids'][0],
+                                            diagnosis_id=ids['diagnosis_ids'][0],
+                                            item_reviews=reviews)
+            session.add(med_book)
+            session.commit()
+        count_after_add = {
+            item.item_id: item.med_books_count
+            for item in index.get_related_items(first_item_id, limit=100)
+        }.get(second_item_id, 0)
+
+        with create_session() as session:
+            session.delete(session.get(entities.MedicalBook, med_book.id))
+            session.commit()
+        count_after_removal = {
+            item.item_id: item.med_books_count
+            for item in index.get_related_items(first_item_id, limit=100)
+        }.get(second_item_id, 0)
+
+        # Assert
+        assert count_after_add == count_before + 1
+        assert count_after_removal == count_before
+        synchronizer.detach(create_session)
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import ProgrammingError
+
+from med_sharing_system.adapters.database import QueryProfiler
+from med_sharing_system.adapters.database.utils.profiling import get_fingerprint
+from med_sharing_system.application import entities
+from ..conftest import session
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def profiler(create_test_db):
+    profiler = QueryProfiler(create_test_db)
+    yield profiler
+    profiler.detach()
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestGetFingerprint:
+    @pytest.mark.parametrize('statement, expected', [
+        ('SELECT  *\n FROM symptoms WHERE id = %(id_1)s',
+         'SELECT * FROM symptoms WHERE id = ?'),
+        ("SELECT * FROM symptoms WHERE name = 'a''b' LIMIT 10",
+         'SELECT * FROM symptoms WHERE name = ? LIMIT ?'),
+        ('SELECT * FROM symptoms WHERE id IN (%(id_1_1)s, %(id_1_2)s)',
+         'SELECT * FROM symptoms WHERE id IN (...)'),
+        ('SELECT anon_1.id FROM anon_1 WHERE anon_1.id = ?',
+         'SELECT anon_1.id FROM anon_1 WHERE anon_1.id = ?'),
+    ])
+    def test__get_fingerprint(self, statement, expected):
+        assert get_fingerprint(statement) == expected
+
+    def test__same_fingerprint_for_different_params(self):
+        assert (
+            get_fingerprint('SELECT * FROM t WHERE id IN (%(p_1)s, %(p_2)s)') ==
+            get_fingerprint('SELECT * FROM t WHERE id IN (%(p_1)s)')
+        )
+
+
+class TestQueryProfiler:
+    def test__profile(self, profiler, session):
+        with profiler.profile() as statistics:
+            session.execute(text('SELECT 1'))
+            session.execute(text('SELECT pg_sleep(0.01)'))
+
+        assert statistics.statements_count == 2
+        assert statistics.total_duration >= statistics.slowest_duration >= 0.01
+        assert statistics.slowest_fingerprint == 'SELECT pg_sleep(?)'
+        assert len(statistics.slowest_fingerprint_hash) == 12
+
+    def test__statements_outside_profiling_are_ignored(self, profiler, session):
+        session.execute(text('SELECT 1'))
+
+        with profiler.profile() as statistics:
+            pass
+
+        session.execute(text('SELECT 1'))
+
+        assert statistics.statements_count == 0
+        assert statistics.slowest_fingerprint is None
+        assert statistics.slowest_fingerprint_hash is None
+
+    def test__nested_profiling(self, profiler, session):
+        with profiler.profile() as outer:
+            session.execute(text('SELECT 1'))
+
+            with profiler.profile() as inner:
+                session.execute(text('SELECT 2'))
+
+        assert outer.statements_count == 2
+        assert inner.statements_count == 1
+
+    def test__repeated_fingerprints(self, profiler, session):
+        with profiler.profile() as statistics:
+            for symptom_id in range(3):
+                session.execute(
+                    select(entities.Symptom).where(entities.Symptom.id == symptom_id)
+                )
+            session.execute(select(entities.Diagnosis))
+
+        repeats = statistics.get_repeated_fingerprints(threshold=3)
+
+        assert statistics.statements_count == 4
+        assert list(repeats.values()) == [3]
+        assert 'FROM symptoms' in list(repeats)[0]
+        assert statistics.get_repeated_fingerprints(threshold=4) == {}
+
+    def test__failed_statement_leaves_nothing_on_connection(self, profiler, session):
+        savepoint = session.begin_nested()
+        with pytest.raises(ProgrammingError):
+            session.execute(text('SELECT * FROM missing_table'))
+        savepoint.rollback()
+
+        with profiler.profile() as statistics:
+            session.execute(text('SELECT 1'))
+
+        assert statistics.statements_count == 1
+        assert 'query_start_time' not in session.connection().info
@@ -0,0 +1,126 @@
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+from med_sharing_system.adapters.matching import ProcessPoolPatientSimilarityIndex
+from med_sharing_system.application import entities, errors, schemas
+from med_sharing_system.application.utils import ExactPatientSimilarityIndex
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+PROFILES: list[entities.PatientProfile] = [
+    entities.PatientProfile(patient_id=patient_id, gender=gender, age=age,
+                            skin_type='сухая', symptom_ids=frozenset(symptom_ids),
+                            diagnosis_ids=frozenset({diagnosis_id}))
+    for patient_id, gender, age, symptom_ids, diagnosis_id in [
+        (1, 'female', 30, {1, 2, 3}, 1),
+        (2, 'male', 45, {1, 2}, 2),
+        (3, 'female', 60, {3, 4}, 1),
+        (4, 'male', 25, {5}, 3),
+    ]
+]
+MATCH_PARAMS = schemas.MatchPatients(symptom_ids=[1, 2, 3], gender='female', age=35)
+
+
+@pytest.fixture(scope='module')
+def index() -> ProcessPoolPatientSimilarityIndex:
+    # Пул процессов создается один раз: запуск процессов занимает время
+    index = ProcessPoolPatientSimilarityIndex(ExactPatientSimilarityIndex,
+                                              processes=1,
+                                              max_pending_changes=2)
+    yield index
+    index.close()
+
+
+@pytest.fixture(scope='function')
+def expected_index() -> ExactPatientSimilarityIndex:
+    index = ExactPatientSimilarityIndex()
+    index.rebuild(PROFILES)
+    return index
+
+
+def _is_unlinked(name: str) -> bool:
+    try:
+        SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestSearch:
+    def test__same_result_as_local_index(self, index, expected_index):
+        # Setup
+        index.rebuild(PROFILES)
+        changed = entities.PatientProfile(patient_id=4, gender='female', age=35,
+                                          skin_type='сухая',
+                                          symptom_ids=frozenset({1, 2, 3}))
+
+        # Call
+        after_rebuild = index.search(MATCH_PARAMS)
+        index.upsert([changed])
+        index.remove([1])
+        after_changes = index.search(MATCH_PARAMS)
+
+        # Assert
+        assert after_rebuild == expected_index.search(MATCH_PARAMS)
+        expected_index.upsert([changed])
+        expected_index.remove([1])
+        assert after_changes == expected_index.search(MATCH_PARAMS)
+        assert len(index) == len(expected_index)
+
+    def test__changes_are_republished(self, index, expected_index):
+        # Setup
+        index.rebuild(PROFILES)
+        first_name = index._profiles.name
+        removed_ids = [1, 2, 3]
+
+        # Call
+        index.remove(removed_ids)
+        result = index.search(MATCH_PARAMS)
+
+        # Assert
+        expected_index.remove(removed_ids)
+        assert result == expected_index.search(MATCH_PARAMS)
+        assert index._profiles.name != first_name
+        assert _is_unlinked(first_name)
+
+    def test__deadline(self, index):
+        # Setup
+        index.rebuild(PROFILES)
+
+        # Call and Assert
+        with pytest.raises(errors.MatchingDeadlineExceeded):
+            index.search(MATCH_PARAMS, deadline=time.monotonic() - 1)
+
+    def test__not_built(self):
+        # Setup
+        index = ProcessPoolPatientSimilarityIndex(ExactPatientSimilarityIndex,
+                                                  processes=1)
+
+        # Call
+        result = index.search(MATCH_PARAMS)
+
+        # Assert
+        assert result == []
+        assert index._pool is None
+
+
+class TestClose:
+    def test__segments_are_unlinked(self):
+        # Setup
+        index = ProcessPoolPatientSimilarityIndex(ExactPatientSimilarityIndex,
+                                                  processes=1)
+        index.rebuild(PROFILES)
+        name = index._profiles.name
+
+        # Call
+        index.close()
+
+        # Assert
+        assert _is_unlinked(name)
@@ -2,12 +2,41 @@ from unittest.mock import Mock
 
 import pytest
 from falcon import testing
+from sqlalchemy import Engine
 
+from med_sharing_system.adapters.database import QueryProfiler
 from med_sharing_system.adapters.med_sharing_api import SwaggerSettings
 from med_sharing_system.adapters.med_sharing_api.app import create_app
 from med_sharing_system.application import services
 
 
+# Сервисы замоканы, поэтому по умолчанию эндпоинт не должен выполнять SQL-запросов
+ENDPOINT_QUERY_BUDGET = 0
+
+
+class _QueryBudgetClient(testing.TestClient):
+    """
+    Тестовый клиент, проверяющий бюджет SQL-запросов каждого вызова эндпоинта.
+    """
+
+    def __init__(self, app, query_budget, max_statements: int):
+        super().__init__(app)
+        self.query_budget = query_budget
+        self.max_statements = max_statements
+
+    def simulate_request(self, *args, **kwargs) -> testing.Result:
+        with self.query_budget(self.max_statements):
+            return super().simulate_request(*args, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def query_profiler():
+    # Профилировщик подписан на класс Engine и учитывает запросы любого движка
+    profiler = QueryProfiler(Engine)
+    yield profiler
+    profiler.detach()
+
+
 @pytest.fixture(scope='function')
 def catalog_service() -> Mock:
     return Mock(services.TreatmentItemCatalog)
@@ -53,6 +82,11 @@ def medical_book_service() -> Mock:
     return Mock(services.MedicalBook)
 
 
+@pytest.fixture(scope='function')
+def treatment_recommendation_service() -> Mock:
+    return Mock(services.TreatmentRecommender)
+
+
 @pytest.fixture(scope='function')
 def client(diagnosis_service,
            patient_service,
@@ -62,7 +96,10 @@ def client(diagnosis_service,
            item_review_service,
            item_type_service,
            item_category_service,
-           medical_book_service):
+           medical_book_service,
+           treatment_recommendation_service,
+           query_budget,
+           request):
     swagger_settings = Mock(SwaggerSettings)
     swagger_settings.ON = False
 
@@ -77,5 +114,12 @@ def client(diagnosis_service,
                      item_review=item_review_service,
                      item_type=item_type_service,
                      item_category=item_category_service,
-                     medical_book=medical_book_service)
-    return testing.TestClient(app)
+                     medical_book=medical_book_service,
+                     treatment_recommender=treatment_recommendation_service)
+
+    # Бюджет проверяется профилировщиком движков, поэтому middleware
+    # профилирования в тестируемом приложении не нужен
+    marker = request.node.get_closest_marker('query_budget')
+    max_statements = marker.args[0] if marker else ENDPOINT_QUERY_BUDGET
+
+    return _QueryBudgetClient(app, query_budget, max_statements)
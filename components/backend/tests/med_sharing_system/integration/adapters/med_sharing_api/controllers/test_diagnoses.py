@@ -1,5 +1,8 @@
 from unittest.mock import call
 
+import pytest
+from sqlalchemy import create_engine, text
+
 from med_sharing_system.application import dtos, schemas
 
 # ---------------------------------------------------------------------------------------
@@ -127,3 +130,31 @@ class TestOnDeleteById:
         assert response.status_code == 200
         assert response.json == service_output.dict(exclude_none=True, exclude_unset=True)
         assert diagnosis_service.method_calls == [call.delete(f'{service_output.id}')]
+
+
+class TestQueryBudget:
+    @staticmethod
+    def _find_with_queries(statements_count: int):
+        engine = create_engine('sqlite://')
+
+        def find(filter_params):
+            with engine.connect() as connection:
+                for _ in range(statements_count):
+                    connection.execute(text('SELECT 1'))
+            return []
+
+        return find
+
+    def test__query_budget_exceeded(self, diagnosis_service, client):
+        diagnosis_service.find.side_effect = self._find_with_queries(1)
+
+        with pytest.raises(AssertionError, match='Query budget exceeded'):
+            client.simulate_get('/diagnoses')
+
+    @pytest.mark.query_budget(2)
+    def test__query_budget_marker(self, diagnosis_service, client):
+        diagnosis_service.find.side_effect = self._find_with_queries(2)
+
+        response = client.simulate_get('/diagnoses')
+
+        assert response.status_code == 200
@@ -109,6 +109,24 @@ class TestOnGetByIdWithReviews:
         assert catalog_service.method_calls == [call.get_item_with_reviews(filter_params)]
 
 
+class TestOnGetRelated:
+    def test__on_get_related(self, catalog_service, client):
+        # Setup
+        catalog_service.get_related_items.return_value = [
+            dtos.RelatedItem(item_id=2, med_books_count=3)
+        ]
+
+        # Call
+        response = client.simulate_get('/items/1/related', params={'limit': 5})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json == [{'item_id': 2, 'med_books_count': 3}]
+        assert catalog_service.method_calls == [
+            call.get_related_items(schemas.GetRelatedItems(item_id=1, limit=5))
+        ]
+
+
 class TestOnGet:
     def test__on_get(self, catalog_service, client):
         # Setup
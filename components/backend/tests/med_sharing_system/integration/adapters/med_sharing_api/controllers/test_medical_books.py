@@ -89,7 +89,8 @@ FILTER_PARAMS_WITH_SYMPTOMS_EXCLUSION = api_schemas.SearchMedicalBooksWithSympto
     sort_field='diagnosis_id',
     sort_direction='desc',
     limit=10,
-    offset=0
+    offset=0,
+    symptoms_limit=5
 )
 FILTER_PARAMS_WITH_REVIEWS_EXCLUSION = api_schemas.SearchMedicalBooksWithItemReviews(
     patient_id=1,
@@ -103,7 +104,10 @@ FILTER_PARAMS_WITH_REVIEWS_EXCLUSION = api_schemas.SearchMedicalBooksWithItemRev
     sort_field='diagnosis_id',
     sort_direction='desc',
     limit=10,
-    offset=0
+    offset=0,
+    reviews_sort_field='item_rating',
+    reviews_sort_direction='desc',
+    reviews_limit=3
 )
 FILTER_PARAMS_WITH_SYMPTOMS_AND_REVIEWS_EXCLUSION = (
     api_schemas.SearchMedicalBooksWithSymptomsAndItemReviews(
@@ -119,7 +123,11 @@ FILTER_PARAMS_WITH_SYMPTOMS_AND_REVIEWS_EXCLUSION = (
         sort_field='diagnosis_id',
         sort_direction='desc',
         limit=10,
-        offset=0
+        offset=0,
+        symptoms_limit=5,
+        reviews_sort_field='item_rating',
+        reviews_sort_direction='desc',
+        reviews_limit=3
     )
 )
 
@@ -0,0 +1,55 @@
+from unittest.mock import call
+
+from med_sharing_system.application import dtos, errors, schemas
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+MATCH_REQUEST = dict(client_id='client_1', symptom_ids=[2, 1], gender='female', age=30)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestOnPost:
+    def test__matched_inline(self, patient_matching_service, client):
+        # Setup
+        found_patients = [dtos.MatchedPatient(patient_id=3, score=0.75)]
+        patient_matching_service.match_patients.return_value = found_patients
+
+        # Call
+        response = client.simulate_post('/patients/match', json=MATCH_REQUEST)
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json == [{'patient_id': 3, 'score': 0.75}]
+
+    def test__queued(self, patient_matching_service, client):
+        # Setup
+        patient_matching_service.match_patients.return_value = None
+
+        # Call
+        response = client.simulate_post('/patients/match', json=MATCH_REQUEST)
+
+        # Assert
+        assert response.status_code == 202
+        assert patient_matching_service.method_calls == [
+            call.match_patients('client_1',
+                                schemas.MatchPatients(symptom_ids=[1, 2],
+                                                      gender='female',
+                                                      age=30),
+                                timeout=None)
+        ]
+
+    def test__queue_overloaded(self, patient_matching_service, client):
+        # Setup
+        patient_matching_service.match_patients.side_effect = (
+            errors.MatchingQueueOverloaded(retry_after=7)
+        )
+
+        # Call
+        response = client.simulate_post('/patients/match', json=MATCH_REQUEST)
+
+        # Assert
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '7'
@@ -0,0 +1,39 @@
+from unittest.mock import call
+
+from med_sharing_system.application import dtos, schemas
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestOnGet:
+    def test__on_get(self, treatment_recommendation_service, client):
+        # Setup
+        treatment_recommendation_service.recommend.return_value = [
+            dtos.RecommendedItem(item_id=3, score=0.8, helped_ratio=0.9,
+                                 avg_rating=7.5, support=2.5)
+        ]
+
+        # Call
+        response = client.simulate_get('/items/recommendations',
+                                       params={'diagnosis_id': 1,
+                                               'symptom_ids': [2, 1],
+                                               'limit': 5})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json == [{'item_id': 3, 'score': 0.8, 'helped_ratio': 0.9,
+                                  'avg_rating': 7.5, 'support': 2.5}]
+        assert treatment_recommendation_service.method_calls == [
+            call.recommend(schemas.RecommendTreatmentItems(diagnosis_id=1,
+                                                           symptom_ids=[1, 2],
+                                                           limit=5))
+        ]
+
+    def test__empty_profile(self, treatment_recommendation_service, client):
+        # Call
+        response = client.simulate_get('/items/recommendations')
+
+        # Assert
+        assert response.status_code == 400
+        assert treatment_recommendation_service.method_calls == []
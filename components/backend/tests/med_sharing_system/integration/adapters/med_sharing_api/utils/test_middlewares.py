@@ -0,0 +1,69 @@
+import logging
+
+import falcon
+import pytest
+from falcon import testing
+from sqlalchemy import create_engine, text
+
+from med_sharing_system.adapters.database import QueryProfiler
+from med_sharing_system.adapters.med_sharing_api.utils.middlewares import (
+    QueryProfilingMiddleware
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+class Resource:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def on_get(self, req, resp):
+        with self.engine.connect() as connection:
+            for number in range(3):
+                connection.execute(text('SELECT :number'), {'number': number})
+
+        resp.media = {}
+
+
+@pytest.fixture(scope='function')
+def engine():
+    return create_engine('sqlite://')
+
+
+@pytest.fixture(scope='function')
+def client(engine):
+    middleware = QueryProfilingMiddleware(profiler=QueryProfiler(engine),
+                                          repeats_threshold=3)
+    app = falcon.App(middleware=[middleware])
+    app.add_route('/resource', Resource(engine))
+    return testing.TestClient(app)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestQueryProfilingMiddleware:
+    def test__server_timing_header(self, client):
+        response = client.simulate_get('/resource')
+
+        db_metric, slowest_metric = response.headers['Server-Timing'].split(', ')
+
+        assert response.status_code == 200
+        assert db_metric.startswith('db;dur=')
+        assert db_metric.endswith(';desc="3 statements"')
+        assert slowest_metric.startswith('db-slowest;dur=')
+
+    def test__logs(self, client, caplog):
+        logging.getLogger('query_profiling').disabled = False
+
+        with caplog.at_level(logging.INFO, logger='query_profiling'):
+            client.simulate_get('/resource')
+
+        info, warning = caplog.records
+
+        assert info.levelname == 'INFO'
+        assert info.statements_count == 3
+        assert info.slowest_fingerprint == 'SELECT ?'
+        assert warning.levelname == 'WARNING'
+        assert warning.repeated_statements == [{'fingerprint': 'SELECT ?', 'count': 3}]
@@ -0,0 +1,226 @@
+import time
+import uuid
+from typing import Callable
+
+import pytest
+from kombu import Connection, Exchange, Queue
+
+from med_sharing_system.adapters.message_bus import (
+    QueueLoadMonitor,
+    ScalingPolicy,
+    ThreadWorker,
+    WorkerSupervisor
+)
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    BrokerScheme,
+    KombuConsumer
+)
+from med_sharing_system.application import dtos
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def queue_name() -> str:
+    # Очереди транспорта 'memory' общие для всего процесса
+    return f'TestQueue_{uuid.uuid4().hex}'
+
+
+@pytest.fixture(scope='function')
+def scheme(queue_name) -> BrokerScheme:
+    return BrokerScheme(Queue(queue_name, Exchange(f'{queue_name}_exchange')))
+
+
+@pytest.fixture(scope='function')
+def connection(scheme) -> Connection:
+    connection = Connection('memory://')
+    scheme.declare(connection)
+    yield connection
+    connection.release()
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope='function')
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture(scope='function')
+def monitor(connection, queue_name, clock) -> QueueLoadMonitor:
+    monitor = QueueLoadMonitor(connection, queue_name, interval=0, clock=clock)
+    yield monitor
+    monitor.close()
+
+
+@pytest.fixture(scope='function')
+def processed() -> list[int]:
+    return []
+
+
+@pytest.fixture(scope='function')
+def start_worker(connection, scheme, queue_name, processed) -> Callable[[], ThreadWorker]:
+    def start() -> ThreadWorker:
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 shutdown_timeout=5)
+        consumer.register_function(lambda number: processed.append(number),
+                                   queue_name)
+        return ThreadWorker(consumer)
+
+    return start
+
+
+@pytest.fixture(scope='function')
+def supervisor(start_worker, monitor, clock, tmp_path) -> WorkerSupervisor:
+    supervisor = WorkerSupervisor(
+        start_worker=start_worker,
+        monitors=[monitor],
+        policy=ScalingPolicy(min_workers=1, max_workers=3, messages_per_worker=10),
+        scale_down_delay=60,
+        shutdown_timeout=5,
+        metrics_path=tmp_path / 'supervisor.prom',
+        clock=clock
+    )
+    yield supervisor
+    supervisor.shutdown()
+
+
+def _publish(connection: Connection, queue_name: str, count: int) -> None:
+    with connection.Producer() as producer:
+        for number in range(count):
+            producer.publish({'number': number}, exchange=f'{queue_name}_exchange')
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestScalingPolicy:
+    @pytest.mark.parametrize('depth, expected', [(0, 1), (25, 3), (1000, 4)])
+    def test__depth(self, depth, expected):
+        # Setup
+        policy = ScalingPolicy(min_workers=1, max_workers=4, messages_per_worker=10)
+        load = dtos.QueueLoad(depth=depth, consumers=1)
+
+        # Call and Assert
+        assert policy.get_desired_workers(load, current=1) == expected
+
+    def test__latency(self):
+        # Setup
+        policy = ScalingPolicy(min_workers=1, max_workers=8,
+                               messages_per_worker=100, max_latency=5)
+        # Очередь разбирается 20 с
+        load = dtos.QueueLoad(depth=40, consumers=2, drain_rate=2)
+
+        # Call
+        desired = policy.get_desired_workers(load, current=2)
+
+        # Assert
+        assert desired == 8
+
+    def test__invalid_bounds(self):
+        # Call and Assert
+        with pytest.raises(AssertionError):
+            ScalingPolicy(min_workers=3, max_workers=2)
+
+
+class TestWorkerSupervisor:
+    def test__starts_min_workers(self, supervisor):
+        # Call
+        supervisor.step()
+
+        # Assert
+        assert supervisor.workers == 1
+        assert supervisor.metrics.scale_ups == 1
+
+    def test__scales_up_by_queue_depth(self, supervisor, connection, queue_name):
+        # Setup
+        _publish(connection, queue_name, 25)
+
+        # Call
+        supervisor.step()
+
+        # Assert
+        assert supervisor.workers == 3
+        assert supervisor.metrics.desired_workers == 3
+        assert supervisor.metrics.queue_depth == 25
+
+    def test__scales_down_after_delay(self, supervisor, connection, queue_name,
+                                      clock, processed):
+        # Setup
+        _publish(connection, queue_name, 25)
+        supervisor.step()
+        _wait_for(lambda: len(processed) == 25)
+
+        # Call
+        clock.now = 30
+        supervisor.step()
+        workers_before_delay = supervisor.workers
+        clock.now = 90
+        supervisor.step()
+
+        # Assert
+        assert workers_before_delay == 3
+        assert supervisor.workers == 1
+        assert supervisor.metrics.scale_downs == 1
+        assert sorted(processed) == list(range(25))
+
+    def test__stopped_workers_drain(self, supervisor, connection, queue_name,
+                                    clock, processed):
+        # Setup
+        _publish(connection, queue_name, 25)
+        supervisor.step()
+        stopping = supervisor._workers[1:]
+        _wait_for(lambda: len(processed) == 25)
+        clock.now = 30
+        supervisor.step()
+        clock.now = 90
+        supervisor.step()
+
+        # Call
+        _wait_for(lambda: not any(worker.is_alive() for worker in stopping))
+        supervisor.step()
+
+        # Assert
+        assert not any(worker.is_alive() for worker in stopping)
+        assert supervisor.metrics.stopping_workers == 0
+
+    def test__replaces_exited_workers(self, supervisor):
+        # Setup
+        supervisor.step()
+        worker = supervisor._workers[0]
+        worker.stop()
+        _wait_for(lambda: not worker.is_alive())
+
+        # Call
+        supervisor.step()
+
+        # Assert
+        assert supervisor.workers == 1
+        assert supervisor._workers[0] is not worker
+        assert supervisor.metrics.restarts == 1
+
+    def test__writes_metrics(self, supervisor, connection, queue_name, tmp_path):
+        # Setup
+        _publish(connection, queue_name, 25)
+
+        # Call
+        supervisor.step()
+
+        # Assert
+        text = (tmp_path / 'supervisor.prom').read_text()
+        assert 'med_sharing_supervisor_workers{worker="worker"} 3' in text
+        assert 'med_sharing_supervisor_queue_depth{worker="worker"} 25' in text
+        assert '# TYPE med_sharing_supervisor_scale_ups_total counter' in text
@@ -0,0 +1,594 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import uuid
+from typing import Callable
+
+import pytest
+from kombu import Connection, Exchange, Message, Queue
+
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    BrokerScheme,
+    KombuConsumer,
+    MessageDeduplicationCache
+)
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    consumer as consumer_module
+)
+from med_sharing_system.adapters.message_bus.messaging_kombu.executors import (
+    GreenletExecutor,
+    create_executor
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def queue_name() -> str:
+    # Очереди транспорта 'memory' общие для всего процесса
+    return f'TestQueue_{uuid.uuid4().hex}'
+
+
+@pytest.fixture(scope='function')
+def scheme(queue_name) -> BrokerScheme:
+    return BrokerScheme(Queue(queue_name, Exchange(f'{queue_name}_exchange')))
+
+
+@pytest.fixture(scope='function')
+def connection(scheme) -> Connection:
+    connection = Connection('memory://')
+    scheme.declare(connection)
+    yield connection
+    connection.release()
+
+
+@pytest.fixture(scope='function')
+def acks(monkeypatch) -> list[int]:
+    """
+    Идентификаторы потоков, в которых подтверждались сообщения.
+    """
+    thread_ids: list[int] = []
+    ack = Message.ack
+
+    def spy(self, *args, **kwargs):
+        thread_ids.append(threading.get_ident())
+        return ack(self, *args, **kwargs)
+
+    monkeypatch.setattr(Message, 'ack', spy)
+    return thread_ids
+
+
+@pytest.fixture(scope='function')
+def rejects(monkeypatch) -> list[int]:
+    """
+    Идентификаторы потоков, в которых отклонялись сообщения.
+    """
+    thread_ids: list[int] = []
+    reject = Message.reject
+
+    def spy(self, *args, **kwargs):
+        thread_ids.append(threading.get_ident())
+        return reject(self, *args, **kwargs)
+
+    monkeypatch.setattr(Message, 'reject', spy)
+    return thread_ids
+
+
+def _publish(connection: Connection, queue_name: str, *bodies: dict,
+             **properties) -> None:
+    with connection.Producer() as producer:
+        for body in bodies:
+            producer.publish(body, exchange=f'{queue_name}_exchange', **properties)
+
+
+def _queue_size(connection: Connection, queue_name: str) -> int:
+    with connection.channel() as channel:
+        return channel.queue_declare(queue_name, passive=True).message_count
+
+
+def _run_in_thread(consumer: KombuConsumer) -> threading.Thread:
+    thread = threading.Thread(target=consumer.run, daemon=True)
+    thread.start()
+    return thread
+
+
+class _AckAfterCallHandler:
+    """
+    Подтверждает сообщение только после завершения функции.
+    """
+
+    def __init__(self, function) -> None:
+        self.function = function
+
+    def handle(self, message, body) -> None:
+        self.function(**body)
+        message.ack()
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _write_pid(path: str, number: int) -> None:
+    with open(os.path.join(path, str(number)), 'w') as file:
+        file.write(str(os.getpid()))
+
+
+def _write_pid_and_crash(path: str, number: int, crash: bool = False) -> None:
+    _write_pid(path, number)
+    if crash:
+        os._exit(1)
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestConcurrency:
+    def test__prefetch_count_follows_concurrency(self, connection, scheme):
+        # Call
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=4)
+
+        # Assert
+        assert consumer.prefetch_count == 4
+
+    def test__inline_mode_is_sequential(self, connection, scheme):
+        # Call and Assert
+        with pytest.raises(AssertionError):
+            KombuConsumer(connection=connection, scheme=scheme, concurrency=2)
+
+    def test__thread_mode(self, connection, scheme, queue_name, acks):
+        # Setup
+        concurrency = 3
+        # Барьер пройдет, только если все сообщения обрабатываются одновременно
+        barrier = threading.Barrier(concurrency, timeout=5)
+        processed: list[int] = []
+
+        def handle(number: int) -> None:
+            barrier.wait()
+            processed.append(number)
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=concurrency)
+        consumer.register_function(handle, queue_name)
+        _publish(connection, queue_name, *[{'number': i} for i in range(concurrency)])
+
+        # Call
+        thread = _run_in_thread(consumer)
+        deadline = time.monotonic() + 5
+        while len(processed) < concurrency and time.monotonic() < deadline:
+            time.sleep(0.01)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert sorted(processed) == list(range(concurrency))
+        assert len(acks) == concurrency
+        assert set(acks) == {thread.ident}
+        assert _queue_size(connection, queue_name) == 0
+
+    def test__process_mode(self, connection, scheme, queue_name, tmp_path):
+        # Setup
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='process', concurrency=2)
+        consumer.register_function(_write_pid, queue_name)
+        _publish(connection, queue_name,
+                 *[{'path': str(tmp_path), 'number': i} for i in range(4)])
+
+        # Call
+        thread = _run_in_thread(consumer)
+        deadline = time.monotonic() + 10
+        while len(os.listdir(tmp_path)) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        consumer.stop()
+        thread.join(timeout=10)
+
+        # Assert
+        pids = {(tmp_path / str(i)).read_text() for i in range(4)}
+        assert str(os.getpid()) not in pids
+        assert _queue_size(connection, queue_name) == 0
+
+    def test__process_pool_is_started_before_threads(self, connection, scheme,
+                                                     monkeypatch):
+        # Setup
+        started: list[bool] = []
+
+        def spy(*args):
+            started.append(bool(consumer._process_pool._processes))
+            return create_executor(*args)
+
+        monkeypatch.setattr(consumer_module, 'create_executor', spy)
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='process', concurrency=2)
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: bool(started))
+        consumer.stop()
+        thread.join(timeout=10)
+
+        # Assert
+        assert started == [True]
+        assert consumer._process_pool is None
+
+    def test__broken_process_pool_is_recreated(self, connection, scheme, queue_name,
+                                               tmp_path):
+        # Setup
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='process', concurrency=1)
+        consumer.register_function(_write_pid_and_crash, queue_name)
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: consumer._process_pool is not None)
+        broken_pool = consumer._process_pool
+        _publish(connection, queue_name,
+                 {'path': str(tmp_path), 'number': 0, 'crash': True})
+        _wait_for(lambda: (tmp_path / '0').exists())
+        _wait_for(lambda: consumer._process_pool not in (None, broken_pool))
+
+        # Call
+        _publish(connection, queue_name, {'path': str(tmp_path), 'number': 1})
+        _wait_for(lambda: (tmp_path / '1').exists())
+        consumer.stop()
+        thread.join(timeout=10)
+
+        # Assert
+        crashed_pid = (tmp_path / '0').read_text()
+        pid = (tmp_path / '1').read_text()
+        assert pid not in {crashed_pid, str(os.getpid())}
+        assert not thread.is_alive()
+        assert _queue_size(connection, queue_name) == 0
+
+
+class TestStop:
+    def test__drains_in_flight_messages(self, connection, scheme, queue_name, acks):
+        # Setup
+        started = threading.Semaphore(0)
+        finished: list[int] = []
+
+        def handle(number: int) -> None:
+            started.release()
+            time.sleep(0.2)
+            finished.append(number)
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=2)
+        consumer.register_function(handle, queue_name)
+        _publish(connection, queue_name, {'number': 1}, {'number': 2})
+        thread = _run_in_thread(consumer)
+        assert started.acquire(timeout=5) and started.acquire(timeout=5)
+
+        # Call
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert not thread.is_alive()
+        assert sorted(finished) == [1, 2]
+        assert len(acks) == 2
+        assert _queue_size(connection, queue_name) == 0
+
+    def test__unfinished_messages_are_not_acked(self, connection, scheme, queue_name,
+                                                acks):
+        # Setup
+        started = threading.Event()
+        release = threading.Event()
+
+        def handle(number: int) -> None:
+            started.set()
+            release.wait(timeout=5)
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=1,
+                                 shutdown_timeout=0.1)
+        # Простой обработчик подтверждает сообщение сразу при принятии
+        consumer.register_handler(_AckAfterCallHandler(handle), queue_name)
+        _publish(connection, queue_name, {'number': 1})
+        thread = _run_in_thread(consumer)
+        assert started.wait(timeout=5)
+
+        # Call
+        consumer.stop()
+        thread.join(timeout=5)
+        release.set()
+        time.sleep(0.05)
+
+        # Assert
+        # Неподтвержденное сообщение брокер вернет в очередь после закрытия канала
+        assert not thread.is_alive()
+        assert acks == []
+
+
+class TestHeartbeat:
+    def test__checked_while_messages_keep_arriving(self, connection, scheme,
+                                                   queue_name, acks, monkeypatch):
+        # Setup
+        checks: list[int] = []
+        monkeypatch.setattr(Connection, 'heartbeat_check',
+                            lambda self, *args, **kwargs: checks.append(1))
+        consumer = KombuConsumer(connection=connection, scheme=scheme)
+        consumer.register_function(lambda number: None, queue_name)
+        _publish(connection, queue_name, *[{'number': i} for i in range(20)])
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) == 20)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert len(checks) >= 20
+
+
+class TestBatchFunction:
+    def test__batches_by_size_and_timeout(self, connection, scheme, queue_name, acks):
+        # Setup
+        batches: list[list[int]] = []
+
+        def handle(bodies: list[dict]) -> None:
+            batches.append([body['number'] for body in bodies])
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme)
+        consumer.register_batch_function(handle, queue_name,
+                                         batch_size=2, batch_timeout_ms=50)
+        _publish(connection, queue_name, *[{'number': i} for i in range(5)])
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) == 5)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert batches == [[0, 1], [2, 3], [4]]
+        assert _queue_size(connection, queue_name) == 0
+
+    def test__per_item_results(self, connection, scheme, queue_name, acks, rejects):
+        # Setup
+        def handle(bodies: list[dict]) -> list[bool]:
+            return [body['number'] % 2 == 0 for body in bodies]
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=2)
+        consumer.register_batch_function(handle, queue_name,
+                                         batch_size=3, batch_timeout_ms=50)
+        _publish(connection, queue_name, *[{'number': i} for i in range(6)])
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) + len(rejects) == 6)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert len(acks) == 3
+        assert len(rejects) == 3
+        assert set(acks + rejects) == {thread.ident}
+
+    def test__pending_batch_is_processed_on_stop(self, connection, scheme, queue_name,
+                                                 acks):
+        # Setup
+        batches: list[list[int]] = []
+
+        def handle(bodies: list[dict]) -> None:
+            batches.append([body['number'] for body in bodies])
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme)
+        consumer.register_batch_function(handle, queue_name,
+                                         batch_size=10, batch_timeout_ms=60_000)
+        _publish(connection, queue_name, *[{'number': i} for i in range(3)])
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: _queue_size(connection, queue_name) == 0)
+
+        # Call
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert not thread.is_alive()
+        assert batches == [[0, 1, 2]]
+        assert len(acks) == 3
+
+
+class TestDeduplication:
+    def test__duplicates_are_acked(self, connection, scheme, queue_name, acks):
+        # Setup
+        numbers: list[int] = []
+        deduplication = MessageDeduplicationCache()
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=2,
+                                 deduplication=deduplication)
+        consumer.register_handler(
+            _AckAfterCallHandler(lambda number: numbers.append(number)), queue_name
+        )
+        _publish(connection, queue_name, {'number': 1}, message_id='message_1')
+        _publish(connection, queue_name, {'number': 2})
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) == 2)
+        _publish(connection, queue_name, {'number': 1}, message_id='message_1')
+        _publish(connection, queue_name, {'number': 2})
+        _wait_for(lambda: len(acks) == 4)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert sorted(numbers) == [1, 2, 2]
+        assert deduplication.contains('message_1')
+        assert _queue_size(connection, queue_name) == 0
+
+    def test__store_is_used_off_connection_thread(self, connection, scheme,
+                                                 queue_name, acks):
+        # Setup
+        store_thread_ids: list[int] = []
+
+        class SpyStore(MessageDeduplicationCache):
+            def contains(self, message_id: str) -> bool:
+                store_thread_ids.append(threading.get_ident())
+                return super().contains(message_id)
+
+            def add(self, message_id: str) -> None:
+                store_thread_ids.append(threading.get_ident())
+                super().add(message_id)
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='thread', concurrency=2,
+                                 deduplication=SpyStore())
+        consumer.register_handler(_AckAfterCallHandler(lambda number: None), queue_name)
+        _publish(connection, queue_name, {'number': 1}, message_id='message_1')
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) == 1)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert len(store_thread_ids) == 2
+        assert thread.ident not in store_thread_ids
+        assert set(acks) == {thread.ident}
+
+    def test__rejected_message_is_handled_again(self, connection, scheme, queue_name,
+                                                 acks):
+        # Setup
+        attempts: list[int] = []
+
+        class RejectFirstHandler:
+            def handle(self, message, body) -> None:
+                attempts.append(body['number'])
+                if len(attempts) == 1:
+                    message.reject(requeue=True)
+                else:
+                    message.ack()
+
+        deduplication = MessageDeduplicationCache()
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 deduplication=deduplication)
+        consumer.register_handler(RejectFirstHandler(), queue_name)
+        _publish(connection, queue_name, {'number': 1}, message_id='message_1')
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) == 1)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert attempts == [1, 1]
+        assert deduplication.contains('message_1')
+
+
+class TestWeightedFunction:
+    def test__lanes_share_by_weights(self, connection, queue_name, acks):
+        # Setup
+        exchange = Exchange(f'{queue_name}_exchange')
+        scheme = BrokerScheme(Queue(queue_name, exchange),
+                              Queue(f'{queue_name}_bulk', exchange, routing_key='bulk'))
+        scheme.declare(connection)
+        lanes: list[str] = []
+        # У транспорта 'memory' prefetch_count общий для канала, а не для
+        # потребителя очереди, поэтому он рассчитан на все сообщения
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 prefetch_count=16)
+        consumer.register_weighted_function(
+            lambda lane: lanes.append(lane),
+            {queue_name: 3, f'{queue_name}_bulk': 1}
+        )
+        _publish(connection, queue_name, *[{'lane': 'bulk'}] * 8, routing_key='bulk')
+        _publish(connection, queue_name, *[{'lane': 'interactive'}] * 8)
+
+        # Call
+        thread = _run_in_thread(consumer)
+        _wait_for(lambda: len(acks) == 16)
+        consumer.stop()
+        thread.join(timeout=5)
+
+        # Assert
+        assert lanes[:8].count('interactive') == 6
+        assert len(lanes) == 16
+
+
+class TestGreenletMode:
+    # Патчинг gevent необратим, поэтому потребитель запускается в отдельном
+    # процессе так же, как в лаунчере
+    CONSUMER_SCRIPT = textwrap.dedent("""
+        import gevent.monkey
+        gevent.monkey.patch_all()
+
+        import threading
+        import time
+        import uuid
+
+        from kombu import Connection, Exchange, Queue
+
+        from med_sharing_system.adapters.message_bus.messaging_kombu import (
+            BrokerScheme,
+            KombuConsumer
+        )
+
+        queue_name = f'TestQueue_{uuid.uuid4().hex}'
+        scheme = BrokerScheme(Queue(queue_name, Exchange(f'{queue_name}_exchange')))
+        connection = Connection('memory://')
+        scheme.declare(connection)
+        processed = []
+
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='greenlet', concurrency=3)
+        consumer.register_function(lambda number: processed.append(number),
+                                   queue_name)
+        with connection.Producer() as producer:
+            for number in range(3):
+                producer.publish({'number': number},
+                                 exchange=f'{queue_name}_exchange')
+
+        thread = threading.Thread(target=consumer.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while len(processed) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        consumer.stop()
+        thread.join(timeout=5)
+        print(sorted(processed))
+    """)
+
+    def test__messages_are_handled_through_drain_events(self):
+        # Call
+        result = subprocess.run(
+            [sys.executable, '-c', self.CONSUMER_SCRIPT],
+            capture_output=True, text=True, timeout=60,
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+        )
+
+        # Assert
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == '[0, 1, 2]'
+
+    def test__unpatched_process_is_rejected(self, connection, scheme):
+        # Setup
+        consumer = KombuConsumer(connection=connection, scheme=scheme,
+                                 execution_mode='greenlet', concurrency=2)
+
+        # Call and Assert
+        with pytest.raises(RuntimeError, match='gevent-patched'):
+            consumer.run()
+
+
+class TestGreenletExecutor:
+    def test__submit(self):
+        # Setup
+        executor = GreenletExecutor(max_workers=2)
+
+        # Call
+        futures = [executor.submit(pow, 2, power) for power in range(3)]
+        failed = executor.submit(int, 'not a number')
+        executor.shutdown(wait=True)
+
+        # Assert
+        assert [future.result() for future in futures] == [1, 2, 4]
+        assert isinstance(failed.exception(), ValueError)
@@ -0,0 +1,49 @@
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    MessageDeduplicationCache
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestMessageDeduplicationCache:
+    def test__max_size(self):
+        # Setup
+        cache = MessageDeduplicationCache(max_size=2)
+
+        # Call
+        for message_id in ('message_1', 'message_2', 'message_1', 'message_3'):
+            cache.add(message_id)
+
+        # Assert
+        assert len(cache) == 2
+        assert not cache.contains('message_2')
+        assert cache.contains('message_1')
+        assert cache.contains('message_3')
+
+    def test__ttl(self):
+        # Setup
+        clock = FakeClock()
+        cache = MessageDeduplicationCache(ttl=10, clock=clock)
+        cache.add('message_1')
+        clock.now = 5
+        cache.add('message_2')
+
+        # Call
+        clock.now = 10
+
+        # Assert
+        assert not cache.contains('message_1')
+        assert cache.contains('message_2')
+        assert len(cache) == 1
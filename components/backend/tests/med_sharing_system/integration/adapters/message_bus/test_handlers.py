@@ -0,0 +1,142 @@
+from unittest.mock import MagicMock, Mock
+
+import pytest
+
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    BatchMessageHandler,
+    BatchMessageHandlerWithRetries,
+    MessageHandlerWithRetries,
+    constants
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+def _create_message(attempts_number: int | None = None) -> Mock:
+    headers = {}
+    if attempts_number is not None:
+        headers['x-death'] = [{'exchange': constants.ERROR_RETRY_EXCHANGE,
+                               'count': attempts_number}]
+    return Mock(headers=headers, delivery_info={'routing_key': 'key'})
+
+
+@pytest.fixture(scope='function')
+def error_publisher() -> MagicMock:
+    publisher = MagicMock()
+    publisher.__enter__.return_value = publisher
+    return publisher
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestMessageHandlerWithRetries:
+    def test__handle(self, error_publisher):
+        # Setup
+        handler = MessageHandlerWithRetries(function=Mock(side_effect=ValueError),
+                                            error_publisher=error_publisher,
+                                            max_retry_attempts=2)
+        retried, exhausted = _create_message(), _create_message(attempts_number=2)
+
+        # Call
+        handler.handle(retried, {'number': 1})
+        handler.handle(exhausted, {'number': 2})
+
+        # Assert
+        retried.reject.assert_called_once()
+        exhausted.ack.assert_called_once()
+        error_publisher.publish.assert_called_once_with(
+            body={'number': 2},
+            exchange=constants.ERROR_DEAD_EXCHANGE,
+            routing_key='key'
+        )
+
+
+class TestBatchMessageHandler:
+    def test__add(self):
+        # Setup
+        handler = BatchMessageHandler(function=Mock(), batch_size=2,
+                                      batch_timeout_ms=60_000)
+        messages = [_create_message() for _ in range(3)]
+
+        # Call
+        first = handler.add(messages[0], {'number': 0})
+        full = handler.add(messages[1], {'number': 1})
+        handler.add(messages[2], {'number': 2})
+        expired = handler.pop_expired()
+        rest = handler.pop_all()
+
+        # Assert
+        assert first is None
+        assert full == (messages[:2], [{'number': 0}, {'number': 1}])
+        assert expired is None
+        assert rest == (messages[2:], [{'number': 2}])
+        assert handler.pop_all() is None
+
+    def test__pop_expired(self):
+        # Setup
+        handler = BatchMessageHandler(function=Mock(), batch_size=10,
+                                      batch_timeout_ms=0)
+        message = _create_message()
+        handler.add(message, {'number': 0})
+
+        # Call
+        expired = handler.pop_expired()
+
+        # Assert
+        assert expired == ([message], [{'number': 0}])
+
+    @pytest.mark.parametrize('results, expected_acks', [
+        (None, [True, True, True]),
+        ([True, False, True], [True, False, True]),
+        ([True], [False, False, False]),
+        (ValueError(), [False, False, False]),
+    ])
+    def test__handle_batch(self, results, expected_acks):
+        # Setup
+        function = Mock(side_effect=[results])
+        handler = BatchMessageHandler(function=function, batch_size=3,
+                                      batch_timeout_ms=100)
+        messages = [_create_message() for _ in range(3)]
+        bodies = [{'number': number} for number in range(3)]
+
+        # Call
+        handler.handle_batch(messages, bodies)
+
+        # Assert
+        function.assert_called_once_with(bodies)
+        assert [message.ack.called for message in messages] == expected_acks
+        assert [message.reject.called for message in messages] == [
+            not is_acked for is_acked in expected_acks
+        ]
+
+
+class TestBatchMessageHandlerWithRetries:
+    def test__handle_batch(self, error_publisher):
+        # Setup
+        handler = BatchMessageHandlerWithRetries(
+            function=Mock(return_value=[True, False, False]),
+            batch_size=3,
+            batch_timeout_ms=100,
+            error_publisher=error_publisher,
+            max_retry_attempts=2
+        )
+        processed, retried = _create_message(), _create_message(attempts_number=1)
+        exhausted = _create_message(attempts_number=2)
+        bodies = [{'number': number} for number in range(3)]
+
+        # Call
+        handler.handle_batch([processed, retried, exhausted], bodies)
+
+        # Assert
+        processed.ack.assert_called_once()
+        retried.reject.assert_called_once()
+        retried.ack.assert_not_called()
+        exhausted.ack.assert_called_once()
+        exhausted.reject.assert_not_called()
+        error_publisher.publish.assert_called_once_with(
+            body={'number': 2},
+            exchange=constants.ERROR_DEAD_EXCHANGE,
+            routing_key='key'
+        )
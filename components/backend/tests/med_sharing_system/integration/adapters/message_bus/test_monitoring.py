@@ -0,0 +1,143 @@
+import uuid
+
+import pytest
+from kombu import Connection, Exchange, Queue
+
+from med_sharing_system.adapters.message_bus import QueueLoadMonitor
+from med_sharing_system.adapters.message_bus.messaging_kombu import BrokerScheme
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def queue_name() -> str:
+    # Очереди транспорта 'memory' общие для всего процесса
+    return f'TestQueue_{uuid.uuid4().hex}'
+
+
+@pytest.fixture(scope='function')
+def connection(queue_name) -> Connection:
+    connection = Connection('memory://')
+    queue = Queue(queue_name, Exchange(f'{queue_name}_exchange'))
+    BrokerScheme(queue).declare(connection)
+    yield connection
+    connection.release()
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope='function')
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture(scope='function')
+def monitor(connection, queue_name, clock) -> QueueLoadMonitor:
+    monitor = QueueLoadMonitor(connection, queue_name, interval=1, smoothing=0.5,
+                               clock=clock)
+    yield monitor
+    monitor.close()
+
+
+def _publish(connection: Connection, queue_name: str, count: int) -> None:
+    with connection.Producer() as producer:
+        for number in range(count):
+            producer.publish({'number': number}, exchange=f'{queue_name}_exchange')
+
+
+def _consume(connection: Connection, queue_name: str, count: int) -> None:
+    with connection.SimpleQueue(queue_name) as queue:
+        for _ in range(count):
+            queue.get(timeout=1).ack()
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestQueueLoadMonitor:
+    def test__depth(self, monitor, connection, queue_name):
+        # Setup
+        _publish(connection, queue_name, 3)
+
+        # Call
+        load = monitor.get_load()
+
+        # Assert
+        assert load.depth == 3
+        assert load.drain_rate is None
+
+    def test__interval(self, monitor, connection, queue_name, clock):
+        # Setup
+        monitor.get_load()
+        _publish(connection, queue_name, 3)
+
+        # Call
+        cached = monitor.get_load()
+        clock.now = 1
+        measured = monitor.get_load()
+
+        # Assert
+        assert cached.depth == 0
+        assert measured.depth == 3
+
+    def test__drain_rate(self, monitor, connection, queue_name, clock):
+        # Setup
+        _publish(connection, queue_name, 10)
+        monitor.get_load()
+
+        # Call
+        _consume(connection, queue_name, 4)
+        clock.now = 2
+        first = monitor.get_load()
+        _consume(connection, queue_name, 6)
+        clock.now = 3
+        second = monitor.get_load()
+
+        # Assert
+        assert first.drain_rate == 2
+        assert second.drain_rate == 4
+
+    def test__drain_rate_decays_when_queue_stalls(self, monitor, connection, queue_name,
+                                                  clock):
+        # Setup
+        _publish(connection, queue_name, 10)
+        monitor.get_load()
+        _consume(connection, queue_name, 4)
+        clock.now = 2
+        drained = monitor.get_load()
+
+        # Call
+        clock.now = 3
+        stalled = monitor.get_load()
+        _publish(connection, queue_name, 2)
+        clock.now = 4
+        growing = monitor.get_load()
+
+        # Assert
+        assert drained.drain_rate == 2
+        assert stalled.drain_rate == 1
+        assert growing.drain_rate == 0.5
+
+    def test__empty_queue_keeps_drain_rate(self, monitor, connection, queue_name,
+                                           clock):
+        # Setup
+        _publish(connection, queue_name, 4)
+        monitor.get_load()
+        _consume(connection, queue_name, 4)
+        clock.now = 1
+
+        # Call
+        drained = monitor.get_load()
+        clock.now = 2
+        idle = monitor.get_load()
+
+        # Assert
+        assert drained.drain_rate == 4
+        assert idle.drain_rate == 4
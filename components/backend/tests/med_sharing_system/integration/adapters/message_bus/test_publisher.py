@@ -0,0 +1,265 @@
+import socket
+import uuid
+from unittest.mock import MagicMock, Mock
+
+import pytest
+from amqp.exceptions import ConnectionForced
+from kombu import Connection, Exchange, Queue
+
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    BrokerScheme,
+    ConfirmingKombuPublisher,
+    MessageNotConfirmed,
+    PriorityLanes
+)
+from med_sharing_system.adapters.message_bus.messaging_kombu.publisher import (
+    _PublisherConfirms
+)
+from med_sharing_system.application.interfaces.message_publishing import QueueMessage
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def queue_name() -> str:
+    # Очереди транспорта 'memory' общие для всего процесса
+    return f'TestQueue_{uuid.uuid4().hex}'
+
+
+@pytest.fixture(scope='function')
+def scheme(queue_name) -> BrokerScheme:
+    return BrokerScheme(Queue(queue_name, Exchange(f'{queue_name}_exchange')))
+
+
+@pytest.fixture(scope='function')
+def connection(scheme) -> Connection:
+    connection = Connection('memory://')
+    scheme.declare(connection)
+    yield connection
+    connection.release()
+
+
+@pytest.fixture(scope='function')
+def publisher(connection, scheme) -> ConfirmingKombuPublisher:
+    publisher = ConfirmingKombuPublisher(connection=connection, scheme=scheme,
+                                         batch_size=100)
+    yield publisher
+    publisher.close()
+
+
+@pytest.fixture(scope='function')
+def batches(monkeypatch, publisher) -> list[int]:
+    """
+    Размеры пачек, отправленных публикатором.
+    """
+    sizes: list[int] = []
+    publish_batch = publisher._publish_batch
+
+    def spy(batch):
+        sizes.append(len(batch))
+        return publish_batch(batch)
+
+    monkeypatch.setattr(publisher, '_publish_batch', spy)
+    return sizes
+
+
+def _messages(queue_name: str, count: int) -> list[QueueMessage]:
+    return [QueueMessage(target=f'{queue_name}_exchange', body={'number': number})
+            for number in range(count)]
+
+
+def _read_bodies(connection: Connection, queue_name: str) -> list[dict]:
+    bodies: list[dict] = []
+    with connection.SimpleQueue(queue_name) as queue:
+        while queue.qsize():
+            message = queue.get(timeout=1)
+            bodies.append(message.payload)
+            message.ack()
+    return bodies
+
+
+def _with_confirms(publisher: ConfirmingKombuPublisher,
+                   drain_events: Mock
+                   ) -> _PublisherConfirms:
+    """
+    Подменяет соединение публикатора соединением с подтверждениями,
+    которые приходят при вызове `drain_events`.
+    """
+    confirms = _PublisherConfirms(MagicMock())
+    publisher._ensure_producer = Mock(return_value=Mock())
+    publisher._confirms = confirms
+    publisher._publishing_connection = Mock(drain_events=drain_events)
+    return confirms
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestConfirmingPublisher:
+    def test__publish(self, publisher, connection, queue_name):
+        # Call
+        publisher.publish(*_messages(queue_name, 250))
+
+        # Assert
+        assert _read_bodies(connection, queue_name) == [
+            {'number': number} for number in range(250)
+        ]
+
+    def test__flush_by_batches(self, publisher, batches, connection, queue_name):
+        # Call
+        with publisher:
+            publisher.plan(*_messages(queue_name, 250))
+
+        # Assert
+        assert batches == [100, 100, 50]
+        assert len(_read_bodies(connection, queue_name)) == 250
+
+    def test__flush_in_one_call(self, publisher, queue_name):
+        # Setup
+        publisher.publish = Mock()
+        messages = _messages(queue_name, 3)
+
+        # Call
+        with publisher:
+            publisher.plan(*messages[:2])
+            with publisher:
+                publisher.plan(messages[2])
+
+        # Assert
+        publisher.publish.assert_called_once_with(*messages)
+
+    def test__not_confirmed(self, publisher, queue_name):
+        # Setup
+        def drain_events(timeout):
+            confirms.on_ack(1, False)
+            confirms.on_nack(2, False)
+
+        confirms = _with_confirms(publisher, Mock(side_effect=drain_events))
+        first, second = _messages(queue_name, 2)
+
+        # Call and Assert
+        publisher.publish(first)
+        with pytest.raises(MessageNotConfirmed):
+            publisher.publish(second)
+
+    def test__publish_each(self, publisher, queue_name):
+        # Setup
+        def drain_events(timeout):
+            confirms.on_ack(1, False)
+            confirms.on_nack(2, False)
+            confirms.on_ack(3, False)
+
+        confirms = _with_confirms(publisher, Mock(side_effect=drain_events))
+
+        # Call
+        result = publisher.publish_each(*_messages(queue_name, 3))
+
+        # Assert
+        assert result == [True, False, True]
+
+    def test__confirm_timeout(self, publisher, queue_name):
+        # Setup
+        publisher.confirm_timeout = 0.1
+        _with_confirms(publisher, Mock(side_effect=socket.timeout))
+
+        # Call
+        with pytest.raises(MessageNotConfirmed):
+            publisher.publish(*_messages(queue_name, 2))
+
+        # Assert
+        # Опоздавшие подтверждения не относятся к следующей пачке
+        assert publisher._confirms is None
+
+    def test__publish_after_idle_connection_is_lost(self, scheme, queue_name):
+        # Setup
+        connection = Connection('memory://', heartbeat=60)
+        scheme.declare(connection)
+        publisher = ConfirmingKombuPublisher(connection=connection, scheme=scheme)
+        first, second = _messages(queue_name, 2)
+        publisher.publish(first)
+        idle_connection = publisher._publishing_connection
+        # Брокер закрыл соединение, пока публикатор простаивал
+        publisher._producer.publish = Mock(
+            side_effect=ConnectionForced('Too many heartbeats missed')
+        )
+
+        # Call
+        publisher.publish(second)
+
+        # Assert
+        assert idle_connection.heartbeat == 0
+        assert publisher._publishing_connection is not idle_connection
+        assert _read_bodies(connection, queue_name) == [first.body, second.body]
+        publisher.close()
+        connection.release()
+
+    def test__close(self, publisher, connection, queue_name):
+        # Setup
+        publisher.publish(*_messages(queue_name, 1))
+
+        # Call
+        publisher.close()
+
+        # Assert
+        assert publisher._thread is None
+        assert len(_read_bodies(connection, queue_name)) == 1
+
+
+class TestMessageIds:
+    def test__message_ids(self, publisher, connection, queue_name):
+        # Setup
+        messages = _messages(queue_name, 2)
+        messages[0].message_id = 'message_1'
+
+        # Call
+        publisher.publish(*messages)
+
+        # Assert
+        with connection.SimpleQueue(queue_name) as queue:
+            message_ids = [queue.get(timeout=1).properties['message_id']
+                           for _ in messages]
+        assert message_ids[0] == 'message_1'
+        assert message_ids[1]
+
+
+class TestPriorityLanes:
+    @pytest.mark.parametrize('priority, routing_key', [
+        (None, ''), (9, ''), (5, ''), (4, 'bulk'), (0, 'bulk'), (-1, 'bulk'),
+    ])
+    def test__routing_key(self, priority, routing_key):
+        # Setup
+        lanes = PriorityLanes(lanes={'': 5, 'bulk': 0}, default_priority=5)
+
+        # Call and Assert
+        assert lanes.routing_key(priority) == routing_key
+
+    def test__params_for_message(self, publisher, queue_name):
+        # Setup
+        target = f'{queue_name}_exchange'
+        publisher.priority_lanes = {target: PriorityLanes(lanes={'': 5, 'bulk': 0})}
+
+        # Call
+        params = publisher.params_for_message(
+            QueueMessage(target=target, body={}, priority=1)
+        )
+
+        # Assert
+        assert params['priority'] == 1
+        assert params['routing_key'] == 'bulk'
+
+
+class TestPublisherConfirms:
+    def test__confirms(self):
+        # Setup
+        confirms = _PublisherConfirms(MagicMock())
+        for _ in range(4):
+            confirms.on_publish()
+
+        # Call
+        confirms.on_ack(2, True)
+        confirms.on_nack(4, False)
+
+        # Assert
+        assert confirms.pending == {3}
+        assert confirms.nacked == {4}
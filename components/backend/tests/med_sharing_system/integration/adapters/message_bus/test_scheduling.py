@@ -0,0 +1,57 @@
+from med_sharing_system.adapters.message_bus.messaging_kombu import WeightedFairQueue
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+def _pop_all(lanes: WeightedFairQueue) -> list[str]:
+    items: list[str] = []
+    while (item := lanes.pop()) is not None:
+        items.append(item)
+    return items
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestWeightedFairQueue:
+    def test__shares_by_weights(self):
+        # Setup
+        lanes = WeightedFairQueue({'interactive': 3, 'bulk': 1})
+        for number in range(8):
+            lanes.put('bulk', f'b{number}')
+            lanes.put('interactive', f'i{number}')
+
+        # Call
+        items = _pop_all(lanes)
+
+        # Assert
+        assert items[:8] == ['i0', 'b0', 'i1', 'i2', 'i3', 'b1', 'i4', 'i5']
+        assert len(lanes) == 0
+
+    def test__idle_lane_gets_no_credit(self):
+        # Setup
+        lanes = WeightedFairQueue({'interactive': 1, 'bulk': 1})
+        for number in range(4):
+            lanes.put('bulk', f'b{number}')
+        lanes.pop()
+        lanes.pop()
+
+        # Call
+        for number in range(2):
+            lanes.put('interactive', f'i{number}')
+        items = _pop_all(lanes)
+
+        # Assert
+        assert items == ['i0', 'i1', 'b2', 'b3']
+
+    def test__clear(self):
+        # Setup
+        lanes = WeightedFairQueue({'interactive': 1})
+        lanes.put('interactive', 'i0')
+
+        # Call
+        lanes.clear()
+
+        # Assert
+        assert lanes.pop() is None
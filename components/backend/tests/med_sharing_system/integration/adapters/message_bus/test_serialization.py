@@ -0,0 +1,137 @@
+import json
+import uuid
+
+import pytest
+from kombu import Connection, Exchange, Queue
+
+from med_sharing_system.adapters.message_bus.messaging_kombu import (
+    COMPACT_CONTENT_TYPE,
+    BrokerScheme,
+    CompactCodec,
+    KombuPublisher,
+    MessageSerializer
+)
+from med_sharing_system.application.interfaces.message_publishing import QueueMessage
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+MATCH_RESULT = {
+    'patient_id': 17,
+    'matched': [{'patient_id': patient_id, 'score': 1 / patient_id}
+                for patient_id in range(1, 51)],
+    'symptom_ids': list(range(-3, 300, 7)),
+    'comment': 'Похожие пациенты',
+    'is_final': True,
+    'error': None,
+    'raw': b'\x00\xff',
+}
+
+
+@pytest.fixture(scope='function')
+def queue_name() -> str:
+    # Очереди транспорта 'memory' общие для всего процесса
+    return f'TestQueue_{uuid.uuid4().hex}'
+
+
+@pytest.fixture(scope='function')
+def scheme(queue_name) -> BrokerScheme:
+    return BrokerScheme(Queue(queue_name, Exchange(f'{queue_name}_exchange')))
+
+
+@pytest.fixture(scope='function')
+def connection(scheme) -> Connection:
+    connection = Connection('memory://')
+    scheme.declare(connection)
+    yield connection
+    connection.release()
+
+
+def _publish_and_get(connection: Connection,
+                     scheme: BrokerScheme,
+                     queue_name: str,
+                     serializer: MessageSerializer,
+                     body: dict):
+    publisher = KombuPublisher(connection=connection, scheme=scheme,
+                               serializer=serializer)
+    publisher.publish(QueueMessage(target=f'{queue_name}_exchange', body=body))
+    with connection.SimpleQueue(queue_name) as queue:
+        message = queue.get(timeout=1)
+        message.ack()
+    return message
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestCompactCodec:
+    def test__roundtrip(self):
+        # Setup
+        codec = CompactCodec()
+
+        # Call
+        encoded = codec.encode(MATCH_RESULT)
+
+        # Assert
+        assert codec.decode(encoded) == MATCH_RESULT
+        body_without_bytes = {key: value for key, value in MATCH_RESULT.items()
+                              if key != 'raw'}
+        assert (len(codec.encode(body_without_bytes))
+                < len(json.dumps(body_without_bytes).encode('utf-8')))
+
+    @pytest.mark.parametrize('value', [0, -1, 63, -64, 2 ** 70, -2 ** 70,
+                                       0.0, '', [], {}])
+    def test__scalars(self, value):
+        # Setup
+        codec = CompactCodec()
+
+        # Call and Assert
+        assert codec.decode(codec.encode(value)) == value
+
+    def test__not_serializable(self):
+        # Call and Assert
+        with pytest.raises(TypeError):
+            CompactCodec().encode({'value': {1, 2}})
+
+    def test__truncated(self):
+        # Setup
+        codec = CompactCodec()
+        encoded = codec.encode('symptom')
+
+        # Call and Assert
+        with pytest.raises(ValueError):
+            codec.decode(encoded[:-1])
+
+
+class TestMessageSerializer:
+    def test__compression_threshold(self):
+        # Setup
+        serializer = MessageSerializer(serializer='compact', compression='zlib',
+                                       compression_threshold=100)
+
+        # Call
+        small = serializer.params_for_body({'patient_id': 1})
+        large = serializer.params_for_body(MATCH_RESULT)
+
+        # Assert
+        assert small['content_type'] == COMPACT_CONTENT_TYPE
+        assert 'compression' not in small
+        assert large['compression'] == 'zlib'
+
+    @pytest.mark.parametrize('serializer', [
+        MessageSerializer(),
+        MessageSerializer(serializer='compact'),
+        MessageSerializer(serializer='compact', compression='zlib',
+                          compression_threshold=0),
+    ])
+    def test__consume(self, connection, scheme, queue_name, serializer):
+        # Setup
+        body = {key: value for key, value in MATCH_RESULT.items() if key != 'raw'}
+
+        # Call
+        message = _publish_and_get(connection, scheme, queue_name, serializer, body)
+
+        # Assert
+        assert message.payload == body
+        assert ('compression' in message.headers) == bool(serializer.compression)
@@ -0,0 +1,73 @@
+import pytest
+
+from med_sharing_system.adapters.snapshots import PatientIndexSnapshotStorage
+from med_sharing_system.application import entities
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+PROFILES: list[entities.PatientProfile] = [
+    entities.PatientProfile(patient_id=1, gender='female', age=30, skin_type='сухая',
+                            symptom_ids=frozenset({1, 2, 3}),
+                            diagnosis_ids=frozenset({1})),
+    entities.PatientProfile(patient_id=2, gender='male', age=45, skin_type='жирная'),
+    entities.PatientProfile(patient_id=7, gender='female', age=60, skin_type='жирная',
+                            symptom_ids=frozenset({3}),
+                            diagnosis_ids=frozenset({2, 5})),
+]
+
+
+@pytest.fixture(scope='function')
+def storage(tmp_path) -> PatientIndexSnapshotStorage:
+    return PatientIndexSnapshotStorage(tmp_path / 'snapshots' / 'patient_index.bin')
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestSnapshot:
+    def test__save_and_load(self, storage):
+        # Call
+        storage.save(PROFILES, change_mark=42)
+        result = storage.load()
+
+        # Assert
+        assert result == (PROFILES, 42)
+
+    def test__overwrite(self, storage):
+        # Setup
+        storage.save(PROFILES, change_mark=42)
+
+        # Call
+        storage.save(PROFILES[:1], change_mark=50)
+
+        # Assert
+        assert storage.load() == (PROFILES[:1], 50)
+        assert [path.name for path in storage.path.parent.iterdir()] == [
+            storage.path.name
+        ]
+
+    def test__empty_index(self, storage):
+        # Call
+        storage.save([], change_mark=1)
+
+        # Assert
+        assert storage.load() == ([], 1)
+
+    def test__missing_snapshot(self, storage):
+        # Call and Assert
+        assert storage.load() is None
+
+    @pytest.mark.parametrize('corrupt', [
+        lambda data: b'UNKNOWN!' + data[8:],
+        lambda data: data[:len(data) // 2],
+        lambda data: b'',
+    ])
+    def test__corrupted_snapshot(self, storage, corrupt):
+        # Setup
+        storage.save(PROFILES, change_mark=42)
+        storage.path.write_bytes(corrupt(storage.path.read_bytes()))
+
+        # Call and Assert
+        assert storage.load() is None
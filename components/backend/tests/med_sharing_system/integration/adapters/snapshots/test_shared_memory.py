@@ -0,0 +1,36 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+from med_sharing_system.adapters.snapshots import SharedPatientProfiles
+from .test_patient_index import PROFILES
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestSharedPatientProfiles:
+    @pytest.mark.parametrize('profiles', [PROFILES, []])
+    def test__create_and_read(self, profiles):
+        # Setup
+        shared = SharedPatientProfiles.create(profiles, change_mark=42)
+
+        # Call
+        try:
+            result = SharedPatientProfiles.read(shared.name)
+        finally:
+            shared.unlink()
+
+        # Assert
+        assert result == (profiles, 42)
+
+    def test__unlink(self):
+        # Setup
+        shared = SharedPatientProfiles.create(PROFILES)
+
+        # Call
+        shared.unlink()
+
+        # Assert
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=shared.name)
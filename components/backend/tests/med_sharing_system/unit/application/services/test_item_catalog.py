@@ -216,6 +216,34 @@ class TestGetItemWithReviews:
         assert types_repo.method_calls == []
 
 
+class TestGetRelatedItems:
+    def test__get_related_items(self, items_repo, reviews_repo, categories_repo,
+                                types_repo):
+        # Setup
+        cooccurrence_index = Mock(interfaces.ItemCooccurrenceIndex)
+        cooccurrence_index.is_built = True
+        related_items = [dtos.RelatedItem(item_id=2, med_books_count=3)]
+        cooccurrence_index.get_related_items.return_value = related_items
+        service = services.TreatmentItemCatalog(items_repo=items_repo,
+                                                item_reviews_repo=reviews_repo,
+                                                item_categories_repo=categories_repo,
+                                                item_types_repo=types_repo,
+                                                cooccurrence_index=cooccurrence_index)
+
+        # Call
+        result = service.get_related_items(schemas.GetRelatedItems(item_id=1, limit=5))
+
+        # Assert
+        assert result == related_items
+        assert cooccurrence_index.method_calls == [call.get_related_items(1, 5)]
+        assert items_repo.method_calls == []
+
+    def test__without_index(self, service):
+        # Call and Assert
+        with pytest.raises(errors.ItemCooccurrenceIndexError):
+            service.get_related_items(schemas.GetRelatedItems(item_id=1))
+
+
 class TestFindItems:
 
     def test__find_items(self, service, items_repo, reviews_repo, categories_repo,
@@ -371,28 +399,20 @@ class TestFindItemsWithReviews:
                 ]
             ),
         ]
-        first_review_filter_params = schemas.FindItemReviews(
-            item_ids=[items_repo_output[0].id],
+        review_filter_params = schemas.FindItemReviews(
+            item_ids=[item.id for item in items_repo_output],
             sort_field=filter_params.reviews_sort_field,
             sort_direction=filter_params.reviews_sort_direction,
             limit=filter_params.reviews_limit,
             offset=filter_params.reviews_offset,
             exclude_review_fields=[]
         )
-        second_review_filter_params = schemas.FindItemReviews(
-            item_ids=[items_repo_output[1].id],
-            sort_field=filter_params.reviews_sort_field,
-            sort_direction=filter_params.reviews_sort_direction,
-            limit=filter_params.reviews_limit,
-            offset=filter_params.reviews_offset,
-            exclude_review_fields=[]
-        )
-        reviews_repo_output = [
-            [entities.ItemReview(id=1, item_id=1, is_helped=True, item_rating=8.0,
-                                 item_count=5, usage_period=2000000)],
-            [entities.ItemReview(id=2, item_id=2, is_helped=False, item_rating=2.5,
-                                 item_count=2, usage_period=1000000)],
-        ]
+        reviews_repo_output = {
+            1: [entities.ItemReview(id=1, item_id=1, is_helped=True, item_rating=8.0,
+                                    item_count=5, usage_period=2000000)],
+            2: [entities.ItemReview(id=2, item_id=2, is_helped=False, item_rating=2.5,
+                                    item_count=2, usage_period=1000000)],
+        }
 
         service_output = [
             dtos.TreatmentItemWithReviews(
@@ -412,7 +432,7 @@ class TestFindItemsWithReviews:
 
         ]
         items_repo.fetch_all.return_value = items_repo_output
-        reviews_repo.fetch_by_items.side_effect = reviews_repo_output
+        reviews_repo.fetch_top_by_items.return_value = reviews_repo_output
 
         # Call
         result = service.find_items_with_reviews(filter_params=filter_params)
@@ -420,10 +440,7 @@ class TestFindItemsWithReviews:
         # Assert
         assert result == service_output
         assert items_repo.method_calls == [call.fetch_all(filter_params, False)]
-        assert reviews_repo.method_calls == [
-            call.fetch_by_items(first_review_filter_params),
-            call.fetch_by_items(second_review_filter_params)
-        ]
+        assert reviews_repo.method_calls == [call.fetch_top_by_items(review_filter_params)]
         assert categories_repo.method_calls == []
         assert types_repo.method_calls == []
 
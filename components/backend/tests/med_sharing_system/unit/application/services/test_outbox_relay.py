@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock, Mock
+
+import pytest
+
+from med_sharing_system.application import interfaces, services
+from med_sharing_system.application.interfaces.message_publishing import (
+    OutboxPublisher,
+    QueueMessage
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def outbox_repo() -> Mock:
+    return Mock(interfaces.OutboxRepo)
+
+
+@pytest.fixture(scope='function')
+def publisher() -> Mock:
+    publisher = MagicMock(interfaces.Publisher)
+    publisher.publish_each.side_effect = lambda *messages: [True] * len(messages)
+    return publisher
+
+
+@pytest.fixture(scope='function')
+def service(outbox_repo, publisher) -> services.OutboxRelay:
+    return services.OutboxRelay(outbox_repo=outbox_repo, publisher=publisher,
+                                batch_size=2)
+
+
+def _messages(count: int) -> list[QueueMessage]:
+    return [QueueMessage(target='exchange', body={'client_id': f'client_{number}'})
+            for number in range(count)]
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestOutboxRelay:
+    def test__relay_batch(self, service, outbox_repo, publisher):
+        # Setup
+        messages = _messages(2)
+        outbox_repo.take.return_value = messages
+
+        # Call
+        result = service.relay_batch()
+
+        # Assert
+        assert result == 2
+        outbox_repo.take.assert_called_once_with(2)
+        publisher.publish_each.assert_called_once_with(*messages)
+        outbox_repo.remove.assert_called_once_with(messages)
+        outbox_repo.postpone.assert_not_called()
+
+    def test__not_confirmed_messages_are_postponed(self, service, outbox_repo,
+                                                   publisher):
+        # Setup
+        messages = _messages(2)
+        outbox_repo.take.return_value = messages
+        publisher.publish_each.side_effect = None
+        publisher.publish_each.return_value = [False, True]
+
+        # Call
+        result = service.relay_batch()
+
+        # Assert
+        assert result == 2
+        outbox_repo.remove.assert_called_once_with(messages[1:])
+        outbox_repo.postpone.assert_called_once_with(messages[:1], 1, 300)
+
+    def test__empty_outbox(self, service, outbox_repo, publisher):
+        # Setup
+        outbox_repo.take.return_value = []
+
+        # Call
+        result = service.relay_batch()
+
+        # Assert
+        assert result == 0
+        publisher.publish_each.assert_not_called()
+
+    def test__relay_pending(self, service, outbox_repo, publisher):
+        # Setup
+        messages = _messages(3)
+        outbox_repo.take.side_effect = [messages[:2], messages[2:]]
+
+        # Call
+        result = service.relay_pending()
+
+        # Assert
+        assert result == 3
+        assert publisher.publish_each.call_count == 2
+
+
+class TestOutboxPublisher:
+    def test__flush_to_outbox(self, outbox_repo):
+        # Setup
+        publisher = OutboxPublisher(outbox_repo=outbox_repo)
+        messages = _messages(2)
+
+        # Call
+        with publisher:
+            publisher.plan(*messages)
+
+        # Assert
+        outbox_repo.add.assert_called_once_with(tuple(messages))
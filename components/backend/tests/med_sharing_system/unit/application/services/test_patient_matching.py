@@ -0,0 +1,454 @@
+from unittest.mock import MagicMock, Mock, call
+
+import pytest
+
+from med_sharing_system.application import (
+    dtos,
+    entities,
+    errors,
+    interfaces,
+    schemas,
+    services
+)
+from med_sharing_system.application.utils import (
+    ExactPatientSimilarityIndex,
+    TTLMatchResultCache
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def patient_profiles_repo() -> Mock:
+    repo = Mock(interfaces.PatientProfilesRepo)
+    repo.fetch_all.return_value = [
+        entities.PatientProfile(patient_id=1, gender='female', age=30,
+                                skin_type='сухая', symptom_ids=frozenset({1, 2}),
+                                diagnosis_ids=frozenset({1})),
+        entities.PatientProfile(patient_id=2, gender='male', age=50,
+                                skin_type='жирная', symptom_ids=frozenset({3}),
+                                diagnosis_ids=frozenset({2})),
+    ]
+    return repo
+
+
+@pytest.fixture(scope='function')
+def patient_changes_repo() -> Mock:
+    repo = Mock(interfaces.PatientChangesRepo)
+    repo.get_change_mark.return_value = 10
+    repo.fetch_changed_patient_ids.return_value = (set(), 10)
+    return repo
+
+
+@pytest.fixture(scope='function')
+def publisher() -> Mock:
+    return MagicMock(interfaces.Publisher)
+
+
+@pytest.fixture(scope='function')
+def service(patient_profiles_repo, publisher) -> services.PatientMatcher:
+    return services.PatientMatcher(
+        publisher=publisher,
+        targets={'find_matching_patient': 'exchange'},
+        similarity_index=ExactPatientSimilarityIndex(),
+        patient_profiles_repo=patient_profiles_repo
+    )
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestFindMatchingPatient:
+    def test__find_matching_patient(self, service, patient_profiles_repo, publisher):
+        # Call
+        result = service.find_matching_patient(client_id='client_1',
+                                               symptom_ids=[1, 2],
+                                               gender='female')
+
+        # Assert
+        assert result == [dtos.MatchedPatient(patient_id=1, score=1.0)]
+        assert patient_profiles_repo.method_calls == [call.fetch_all()]
+        published_message = publisher.plan.call_args.args[0]
+        assert published_message.body == {
+            'client_id': 'client_1',
+            'found_patients': [{'patient_id': 1, 'score': 1.0}]
+        }
+
+    def test__index_is_built_once(self, service, patient_profiles_repo):
+        # Call
+        service.find_matching_patient(client_id='client_1', symptom_ids=[1])
+        service.find_matching_patient(client_id='client_1', symptom_ids=[3])
+
+        # Assert
+        assert patient_profiles_repo.method_calls == [call.fetch_all()]
+
+    def test__without_index(self):
+        # Setup
+        service = services.PatientMatcher()
+
+        # Call and Assert
+        with pytest.raises(errors.SimilarityIndexError):
+            service.find_matching_patient(client_id='client_1', symptom_ids=[1])
+
+    def test__deadline(self, service, publisher):
+        # Setup
+        similarity_index = Mock(interfaces.PatientSimilarityIndex, is_built=True)
+        similarity_index.search.side_effect = errors.MatchingDeadlineExceeded
+        service.similarity_index = similarity_index
+        service.match_timeout = 0.5
+
+        # Call
+        with pytest.raises(errors.MatchingDeadlineExceeded):
+            service.find_matching_patient(client_id='client_1', symptom_ids=[1])
+
+        # Assert
+        assert similarity_index.search.call_args.kwargs['deadline'] is not None
+        publisher.plan.assert_not_called()
+
+
+class TestCatchUpSimilarityIndex:
+    @pytest.fixture(scope='function')
+    def service(self, patient_profiles_repo, patient_changes_repo, publisher):
+        return services.PatientMatcher(
+            publisher=publisher,
+            targets={'find_matching_patient': 'exchange'},
+            similarity_index=ExactPatientSimilarityIndex(),
+            patient_profiles_repo=patient_profiles_repo,
+            patient_changes_repo=patient_changes_repo
+        )
+
+    def test__changes_are_applied(self, service, patient_profiles_repo,
+                                  patient_changes_repo):
+        # Setup
+        service.rebuild_similarity_index()
+        patient_changes_repo.fetch_changed_patient_ids.return_value = ({1, 2, 3}, 15)
+        patient_profiles_repo.fetch_by_patient_ids.return_value = [
+            entities.PatientProfile(patient_id=3, gender='male', age=40,
+                                    skin_type='сухая', symptom_ids=frozenset({1, 2}),
+                                    diagnosis_ids=frozenset())
+        ]
+
+        # Call
+        result = service.catch_up_similarity_index()
+
+        # Assert
+        assert result == {1, 2, 3}
+        assert service.change_mark == 15
+        patient_changes_repo.fetch_changed_patient_ids.assert_called_once_with(10)
+        patient_profiles_repo.fetch_by_patient_ids.assert_called_once_with({1, 2, 3})
+        assert len(service.similarity_index) == 1
+
+    def test__search_catches_up_after_build(self, service, patient_changes_repo):
+        # Call
+        service.find_matching_patient(client_id='client_1', symptom_ids=[1])
+        service.find_matching_patient(client_id='client_1', symptom_ids=[1])
+
+        # Assert
+        assert patient_changes_repo.method_calls == [
+            call.get_change_mark(),
+            call.fetch_changed_patient_ids(10)
+        ]
+
+    def test__change_mark_is_saved_and_journal_pruned(self, service,
+                                                     patient_changes_repo):
+        # Setup
+        service.change_consumer = 'worker-1'
+        service.rebuild_similarity_index()
+        patient_changes_repo.fetch_changed_patient_ids.return_value = (set(), 12)
+
+        # Call
+        service.catch_up_similarity_index()
+        service.catch_up_similarity_index()
+
+        # Assert
+        # Второй вызов укладывается в `prune_interval`
+        patient_changes_repo.save_change_mark.assert_called_once_with('worker-1', 12)
+        patient_changes_repo.prune.assert_called_once_with(service.change_consumer_ttl)
+
+    def test__without_changes_repo(self, service):
+        # Setup
+        service.patient_changes_repo = None
+        service.rebuild_similarity_index()
+
+        # Call
+        result = service.catch_up_similarity_index()
+
+        # Assert
+        assert result == set()
+
+
+class TestLoadSimilarityIndex:
+    @pytest.fixture(scope='function')
+    def snapshot_storage(self) -> Mock:
+        return Mock(interfaces.PatientIndexSnapshotStorage)
+
+    @pytest.fixture(scope='function')
+    def service(self, patient_profiles_repo, patient_changes_repo, snapshot_storage):
+        return services.PatientMatcher(
+            similarity_index=ExactPatientSimilarityIndex(),
+            patient_profiles_repo=patient_profiles_repo,
+            patient_changes_repo=patient_changes_repo,
+            snapshot_storage=snapshot_storage
+        )
+
+    def test__from_snapshot(self, service, patient_profiles_repo,
+                            patient_changes_repo, snapshot_storage):
+        # Setup
+        profiles = patient_profiles_repo.fetch_all.return_value
+        snapshot_storage.load.return_value = (profiles[:1], 7)
+        patient_changes_repo.fetch_saved_change_mark.return_value = 7
+        patient_changes_repo.fetch_changed_patient_ids.return_value = ({2}, 12)
+        patient_profiles_repo.fetch_by_patient_ids.return_value = profiles[1:]
+
+        # Call
+        service.load_similarity_index()
+
+        # Assert
+        patient_profiles_repo.fetch_all.assert_not_called()
+        patient_changes_repo.fetch_changed_patient_ids.assert_called_once_with(7)
+        assert service.change_mark == 12
+        assert service.similarity_index.get_profiles() == profiles
+
+    @pytest.mark.parametrize('saved_mark', [None, 9])
+    def test__pruned_snapshot(self, service, patient_profiles_repo,
+                              patient_changes_repo, snapshot_storage, saved_mark):
+        # Setup
+        profiles = patient_profiles_repo.fetch_all.return_value
+        snapshot_storage.load.return_value = (profiles[:1], 7)
+        # Журнал после отметки снимка мог быть очищен
+        patient_changes_repo.fetch_saved_change_mark.return_value = saved_mark
+
+        # Call
+        service.load_similarity_index()
+
+        # Assert
+        patient_profiles_repo.fetch_all.assert_called_once_with()
+        patient_changes_repo.fetch_changed_patient_ids.assert_not_called()
+        patient_changes_repo.save_change_mark.assert_called_once_with(
+            service.SNAPSHOT_CHANGE_CONSUMER, 10
+        )
+
+    def test__without_snapshot(self, service, patient_profiles_repo, snapshot_storage):
+        # Setup
+        snapshot_storage.load.return_value = None
+
+        # Call
+        service.load_similarity_index()
+
+        # Assert
+        patient_profiles_repo.fetch_all.assert_called_once_with()
+        snapshot_storage.save.assert_called_once_with(
+            patient_profiles_repo.fetch_all.return_value, 10
+        )
+
+    def test__save_before_build(self, service, snapshot_storage):
+        # Call
+        result = service.save_similarity_index_snapshot()
+
+        # Assert
+        assert result is False
+        snapshot_storage.save.assert_not_called()
+
+
+class TestMatchPatients:
+    @pytest.fixture(scope='function')
+    def service(self, patient_profiles_repo, publisher):
+        return services.PatientMatcher(
+            publisher=publisher,
+            targets={'publish_request_for_search_patients': 'exchange'},
+            similarity_index=ExactPatientSimilarityIndex(),
+            patient_profiles_repo=patient_profiles_repo
+        )
+
+    @pytest.fixture(scope='function')
+    def match_params(self) -> schemas.MatchPatients:
+        return schemas.MatchPatients(symptom_ids=[1, 2], gender='female')
+
+    def test__inline(self, service, publisher, match_params):
+        # Setup
+        service.rebuild_similarity_index()
+
+        # Call
+        result = service.match_patients('client_1', match_params, timeout=1)
+
+        # Assert
+        assert result == [dtos.MatchedPatient(patient_id=1, score=1.0)]
+        publisher.plan.assert_not_called()
+
+    def test__deadline_exceeded(self, service, publisher, match_params):
+        # Setup
+        service.rebuild_similarity_index()
+        service.similarity_index = Mock(wraps=service.similarity_index)
+        service.similarity_index.search.side_effect = errors.MatchingDeadlineExceeded
+
+        # Call
+        result = service.match_patients('client_1', match_params, timeout=1)
+
+        # Assert
+        assert result is None
+        publisher.plan.assert_called_once()
+
+    @pytest.mark.parametrize('timeout', [None, 0])
+    def test__inline_disabled(self, service, publisher, match_params, timeout):
+        # Setup
+        service.rebuild_similarity_index()
+
+        # Call
+        result = service.match_patients('client_1', match_params, timeout=timeout)
+
+        # Assert
+        assert result is None
+        publisher.plan.assert_called_once()
+
+    def test__changes_are_not_read_in_request(self, service, patient_changes_repo,
+                                              match_params):
+        # Setup
+        service.patient_changes_repo = patient_changes_repo
+        service.rebuild_similarity_index()
+        patient_changes_repo.reset_mock()
+
+        # Call
+        result = service.match_patients('client_1', match_params, timeout=1)
+
+        # Assert
+        assert result == [dtos.MatchedPatient(patient_id=1, score=1.0)]
+        patient_changes_repo.fetch_changed_patient_ids.assert_not_called()
+
+    def test__index_is_not_built(self, service, publisher, patient_profiles_repo,
+                                 match_params):
+        # Call
+        result = service.match_patients('client_1', match_params, timeout=1)
+
+        # Assert
+        assert result is None
+        publisher.plan.assert_called_once()
+        patient_profiles_repo.fetch_all.assert_not_called()
+
+
+class TestMatchCache:
+    @pytest.fixture(scope='function')
+    def service(self, patient_profiles_repo, patient_changes_repo, publisher):
+        return services.PatientMatcher(
+            publisher=publisher,
+            targets={'publish_request_for_search_patients': 'exchange',
+                     'find_matching_patient': 'exchange'},
+            similarity_index=ExactPatientSimilarityIndex(),
+            patient_profiles_repo=patient_profiles_repo,
+            patient_changes_repo=patient_changes_repo,
+            match_cache=TTLMatchResultCache(ttl=60, max_size=10)
+        )
+
+    def test__worker_result_is_reused(self, service, publisher):
+        # Setup
+        service.find_matching_patient(client_id='client_1', symptom_ids=[2, 1])
+        publisher.reset_mock()
+        service.similarity_index = Mock(wraps=service.similarity_index)
+
+        # Call
+        service.find_matching_patient(client_id='client_2', symptom_ids=[1, 2])
+        result = service.publish_request_for_search_patients(
+            'client_3', schemas.MatchPatients(symptom_ids=[1, 2])
+        )
+
+        # Assert
+        service.similarity_index.search.assert_not_called()
+        assert result == [dtos.MatchedPatient(patient_id=1, score=1.0)]
+        assert [message.args[0].body['client_id']
+                for message in publisher.plan.call_args_list] == ['client_2']
+
+    def test__overloaded_queue(self, service, publisher):
+        # Setup
+        service.admission_control = Mock()
+        service.admission_control.check.side_effect = (
+            errors.MatchingQueueOverloaded(retry_after=5)
+        )
+
+        # Call and Assert
+        with pytest.raises(errors.MatchingQueueOverloaded):
+            service.publish_request_for_search_patients(
+                'client_1', schemas.MatchPatients(symptom_ids=[1, 2])
+            )
+        publisher.plan.assert_not_called()
+
+    def test__bulk_request_skips_admission_control(self, service, publisher):
+        # Setup
+        service.admission_control = Mock()
+        service.admission_control.check.side_effect = (
+            errors.MatchingQueueOverloaded(retry_after=5)
+        )
+
+        # Call
+        service.publish_request_for_search_patients(
+            'client_1', schemas.MatchPatients(symptom_ids=[1, 2]),
+            priority=dtos.MatchPriorityEnum.BULK
+        )
+
+        # Assert
+        message = publisher.plan.call_args.args[0]
+        assert message.priority == dtos.MatchPriorityEnum.BULK
+        service.admission_control.check.assert_not_called()
+
+    def test__cache_miss_is_published(self, service, publisher):
+        # Call
+        result = service.publish_request_for_search_patients(
+            'client_1', schemas.MatchPatients(symptom_ids=[1, 2])
+        )
+
+        # Assert
+        assert result is None
+        publisher.plan.assert_called_once()
+
+    def test__changes_are_not_read_in_request(self, service, publisher,
+                                              patient_changes_repo):
+        # Setup
+        service.find_matching_patient(client_id='client_1', symptom_ids=[1, 2])
+        patient_changes_repo.reset_mock()
+
+        # Call
+        result = service.publish_request_for_search_patients(
+            'client_2', schemas.MatchPatients(symptom_ids=[1, 2])
+        )
+
+        # Assert
+        assert result == [dtos.MatchedPatient(patient_id=1, score=1.0)]
+        assert patient_changes_repo.method_calls == []
+
+    def test__changes_invalidate_results(self, service, patient_profiles_repo,
+                                         patient_changes_repo):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[3])
+        service.find_matching_patient(client_id='client_1', symptom_ids=[3])
+        patient_changes_repo.fetch_changed_patient_ids.return_value = ({4}, 11)
+        patient_profiles_repo.fetch_by_patient_ids.return_value = [
+            entities.PatientProfile(patient_id=4, gender='male', age=40,
+                                    skin_type='сухая', symptom_ids=frozenset({3}))
+        ]
+
+        # Call
+        service.catch_up_similarity_index()
+
+        # Assert
+        assert service.match_cache.get(match_params) is None
+        assert [patient.patient_id
+                for patient in service.match_patients('client_1', match_params,
+                                                      timeout=1)] == [2, 4]
+
+
+class TestSendMessageToClient:
+    def test__send_message_to_client(self):
+        # Setup
+        message_deliverer = Mock(interfaces.MessageSender)
+        service = services.PatientMatcher(message_deliverer=message_deliverer)
+
+        # Call
+        result = service.send_message_to_client(
+            client_id='client_1',
+            found_patients=[{'patient_id': 1, 'score': 0.5}]
+        )
+
+        # Assert
+        assert result == 'Found 1 similar patients: #1 (0.50)'
+        message = message_deliverer.send.call_args.args[0]
+        assert message.target == 'client_1'
+        assert message.body == result
@@ -0,0 +1,79 @@
+from unittest.mock import Mock
+
+import pytest
+
+from med_sharing_system.application import (
+    dtos,
+    entities,
+    errors,
+    interfaces,
+    schemas,
+    services
+)
+from med_sharing_system.application.utils import ItemRecommendationIndex
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def treatment_outcomes_repo() -> Mock:
+    repo = Mock(interfaces.TreatmentOutcomesRepo)
+    repo.fetch_all.return_value = [
+        entities.TreatmentOutcome(
+            med_book_id=1,
+            diagnosis_id=1,
+            symptom_ids=frozenset({1, 2}),
+            item_outcomes=(entities.ItemOutcome(item_id=1, is_helped=True,
+                                                item_rating=9),)
+        ),
+    ]
+    return repo
+
+
+@pytest.fixture(scope='function')
+def service(treatment_outcomes_repo) -> services.TreatmentRecommender:
+    return services.TreatmentRecommender(
+        recommendation_index=ItemRecommendationIndex(),
+        treatment_outcomes_repo=treatment_outcomes_repo
+    )
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestRecommend:
+    def test__builds_index_on_first_call(self, service, treatment_outcomes_repo):
+        # Setup
+        params = schemas.RecommendTreatmentItems(symptom_ids=[1])
+
+        # Call
+        first = service.recommend(params)
+        second = service.recommend(params)
+
+        # Assert
+        assert first == second == [
+            dtos.RecommendedItem(item_id=1, score=0.97, helped_ratio=1,
+                                 avg_rating=9, support=0.5)
+        ]
+        assert treatment_outcomes_repo.fetch_all.call_count == 1
+
+    def test__without_index(self):
+        # Setup
+        service = services.TreatmentRecommender()
+
+        # Call and Assert
+        with pytest.raises(errors.RecommendationIndexError):
+            service.recommend(schemas.RecommendTreatmentItems(diagnosis_id=1))
+
+
+class TestRebuildIndex:
+    def test__without_repo(self):
+        # Setup
+        service = services.TreatmentRecommender(
+            recommendation_index=ItemRecommendationIndex()
+        )
+
+        # Call and Assert
+        with pytest.raises(errors.RecommendationIndexError):
+            service.rebuild_index()
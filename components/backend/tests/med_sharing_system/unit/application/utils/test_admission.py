@@ -0,0 +1,71 @@
+from unittest.mock import Mock
+
+import pytest
+
+from med_sharing_system.application import dtos, errors, interfaces
+from med_sharing_system.application.utils import QueueAdmissionControl
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+@pytest.fixture(scope='function')
+def monitor() -> Mock:
+    monitor = Mock(interfaces.SearchQueueMonitor)
+    monitor.get_load.return_value = dtos.QueueLoad(depth=0, consumers=1)
+    return monitor
+
+
+@pytest.fixture(scope='function')
+def admission(monitor) -> QueueAdmissionControl:
+    return QueueAdmissionControl(monitor=monitor, high_watermark=80,
+                                 low_watermark=50, retry_after=5, max_retry_after=60)
+
+
+def _check(admission: QueueAdmissionControl) -> int | None:
+    """
+    Возвращает Retry-After, если запрос отклонен.
+    """
+    try:
+        admission.check()
+    except errors.MatchingQueueOverloaded as error:
+        return error.context['retry_after']
+    return None
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestQueueAdmissionControl:
+    def test__watermarks(self, admission, monitor):
+        # Setup
+        depths = [79, 80, 60, 50, 60]
+
+        # Call
+        results = []
+        for depth in depths:
+            monitor.get_load.return_value = dtos.QueueLoad(depth=depth, consumers=1)
+            results.append(_check(admission))
+
+        # Assert
+        assert results == [None, 5, 5, None, None]
+
+    @pytest.mark.parametrize('load, retry_after', [
+        (dtos.QueueLoad(depth=90, consumers=2, drain_rate=4.0), 10),
+        (dtos.QueueLoad(depth=90, consumers=2, drain_rate=0.1), 60),
+        (dtos.QueueLoad(depth=90, consumers=2), 5),
+        (dtos.QueueLoad(depth=90, consumers=0, drain_rate=4.0), 60),
+    ])
+    def test__retry_after(self, admission, monitor, load, retry_after):
+        # Setup
+        monitor.get_load.return_value = load
+
+        # Call and Assert
+        assert _check(admission) == retry_after
+
+    def test__default_low_watermark(self, monitor):
+        # Call
+        admission = QueueAdmissionControl(monitor=monitor, high_watermark=100)
+
+        # Assert
+        assert admission.low_watermark == 75
@@ -0,0 +1,116 @@
+import pytest
+
+from med_sharing_system.application import dtos, entities, schemas
+from med_sharing_system.application.utils import TTLMatchResultCache
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+class _Clock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope='function')
+def clock() -> _Clock:
+    return _Clock()
+
+
+@pytest.fixture(scope='function')
+def cache(clock) -> TTLMatchResultCache:
+    return TTLMatchResultCache(ttl=10, max_size=2, clock=clock)
+
+
+def _profile(patient_id: int,
+             symptom_ids: set[int] = frozenset(),
+             diagnosis_ids: set[int] = frozenset()
+             ) -> entities.PatientProfile:
+    return entities.PatientProfile(patient_id=patient_id,
+                                   gender='female',
+                                   age=30,
+                                   skin_type='сухая',
+                                   symptom_ids=frozenset(symptom_ids),
+                                   diagnosis_ids=frozenset(diagnosis_ids))
+
+
+FOUND_PATIENTS = [dtos.MatchedPatient(patient_id=5, score=0.5)]
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestGetAndPut:
+    def test__normalized_key(self, cache):
+        # Setup
+        cache.put(schemas.MatchPatients(symptom_ids=[2, 1, 2], gender='male'),
+                  FOUND_PATIENTS)
+
+        # Call
+        result = cache.get(schemas.MatchPatients(symptom_ids=[1, 2], gender='male'))
+
+        # Assert
+        assert result == FOUND_PATIENTS
+        assert cache.get(schemas.MatchPatients(symptom_ids=[1, 2])) is None
+
+    def test__ttl(self, cache, clock):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1])
+        cache.put(match_params, FOUND_PATIENTS)
+
+        # Call
+        clock.now = 10
+
+        # Assert
+        assert cache.get(match_params) is None
+        assert len(cache) == 0
+
+    def test__least_recently_used_is_evicted(self, cache):
+        # Setup
+        first, second, third = (schemas.MatchPatients(symptom_ids=[symptom_id])
+                                for symptom_id in (1, 2, 3))
+        cache.put(first, FOUND_PATIENTS)
+        cache.put(second, FOUND_PATIENTS)
+        cache.get(first)
+
+        # Call
+        cache.put(third, FOUND_PATIENTS)
+
+        # Assert
+        assert cache.get(first) == FOUND_PATIENTS
+        assert cache.get(second) is None
+        assert cache.get(third) == FOUND_PATIENTS
+
+    def test__stale_version_is_not_saved(self, cache):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1])
+        version = cache.version
+        cache.invalidate([], [])
+
+        # Call
+        cache.put(match_params, FOUND_PATIENTS, version)
+
+        # Assert
+        assert cache.get(match_params) is None
+
+
+class TestInvalidate:
+    @pytest.mark.parametrize('patient_ids, profiles, is_invalidated', [
+        ([5], [], True),
+        ([7], [_profile(7, symptom_ids={2})], True),
+        ([7], [_profile(7, diagnosis_ids={3})], True),
+        ([7], [_profile(7, symptom_ids={4}, diagnosis_ids={4})], False),
+    ])
+    def test__invalidate(self, cache, patient_ids, profiles, is_invalidated):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1, 2], diagnosis_id=3)
+        cache.put(match_params, FOUND_PATIENTS)
+
+        # Call
+        cache.invalidate(patient_ids, profiles)
+
+        # Assert
+        assert (cache.get(match_params) is None) == is_invalidated
@@ -0,0 +1,262 @@
+import random
+import time
+
+import pytest
+
+from med_sharing_system.application import entities, errors, schemas
+from med_sharing_system.application.utils import (
+    ExactPatientSimilarityIndex,
+    MinHashPatientSimilarityIndex
+)
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+def _profile(patient_id: int,
+             symptom_ids: set[int],
+             diagnosis_ids: set[int] = frozenset(),
+             gender: str = 'female',
+             age: int = 30,
+             skin_type: str = 'сухая'
+             ) -> entities.PatientProfile:
+    return entities.PatientProfile(patient_id=patient_id,
+                                   gender=gender,
+                                   age=age,
+                                   skin_type=skin_type,
+                                   symptom_ids=frozenset(symptom_ids),
+                                   diagnosis_ids=frozenset(diagnosis_ids))
+
+
+@pytest.fixture(scope='function')
+def index() -> ExactPatientSimilarityIndex:
+    index = ExactPatientSimilarityIndex()
+    index.rebuild([
+        _profile(1, {1, 2, 3}, {1}),
+        _profile(2, {1, 2}, {2}, gender='male', age=60),
+        _profile(3, {4}, {1}),
+        _profile(4, {5, 6}, {3}),
+    ])
+    return index
+
+
+def _brute_force(index: ExactPatientSimilarityIndex,
+                 profiles: list[entities.PatientProfile],
+                 match_params: schemas.MatchPatients
+                 ) -> list[tuple[int, float]]:
+    """
+    Оценивает всех пациентов по определению, без отбора кандидатов.
+    """
+    weights = index.weights
+    symptom_weights = index._get_symptom_weights()
+    max_score = (weights.symptoms
+                 + (weights.diagnosis if match_params.diagnosis_id else 0)
+                 + (weights.age if match_params.age else 0)
+                 + (weights.gender if match_params.gender else 0)
+                 + (weights.skin_type if match_params.skin_type else 0))
+
+    scored = []
+    for profile in profiles:
+        query = set(match_params.symptom_ids)
+        common = sum(symptom_weights[s] for s in query & profile.symptom_ids)
+        union = sum(symptom_weights.get(s, index._idf(0))
+                    for s in query | profile.symptom_ids)
+        if not common and match_params.diagnosis_id not in profile.diagnosis_ids:
+            continue
+
+        score = weights.symptoms * common / union
+        score += weights.diagnosis * (match_params.diagnosis_id in profile.diagnosis_ids)
+        if match_params.age:
+            score += weights.age * max(
+                0.0, 1 - abs(match_params.age - profile.age) / weights.age_scale
+            )
+        if match_params.gender:
+            score += weights.gender * (profile.gender == match_params.gender.value)
+        if match_params.skin_type:
+            score += weights.skin_type * (profile.skin_type == match_params.skin_type.value)
+        scored.append((round(min(score / max_score, 1.0), 6), profile.patient_id))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(patient_id, score) for score, patient_id in scored[:match_params.limit]]
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestSearch:
+    def test__ranked_by_similarity(self, index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1, 2, 3], diagnosis_id=1)
+
+        # Call
+        result = index.search(match_params)
+
+        # Assert
+        assert [patient.patient_id for patient in result] == [1, 2, 3]
+        assert result[0].score == 1.0
+        assert result[0].score > result[1].score > result[2].score > 0
+
+    def test__unrelated_patients_are_skipped(self, index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[100])
+
+        # Call
+        result = index.search(match_params)
+
+        # Assert
+        assert result == []
+
+    def test__limit(self, index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1, 4], limit=1)
+
+        # Call
+        result = index.search(match_params)
+
+        # Assert
+        assert len(result) == 1
+
+    def test__same_result_as_brute_force(self):
+        # Setup
+        random_ = random.Random(0)
+        profiles = [
+            _profile(patient_id,
+                     set(random_.sample(range(1, 30), random_.randint(1, 6))),
+                     set(random_.sample(range(1, 8), random_.randint(1, 2))),
+                     gender=random_.choice(['male', 'female']),
+                     age=random_.randint(10, 90),
+                     skin_type=random_.choice(['сухая', 'жирная']))
+            for patient_id in range(1, 500)
+        ]
+        index = ExactPatientSimilarityIndex()
+        index.rebuild(profiles)
+        queries = [
+            schemas.MatchPatients(
+                symptom_ids=random_.sample(range(1, 32), random_.randint(1, 5)),
+                diagnosis_id=random_.choice([None, random_.randint(1, 8)]),
+                gender=random_.choice([None, 'male']),
+                age=random_.choice([None, 30]),
+                skin_type=random_.choice([None, 'сухая']),
+                limit=7
+            )
+            for _ in range(50)
+        ]
+
+        for match_params in queries:
+            # Call
+            result = index.search(match_params)
+
+            # Assert
+            assert [(patient.patient_id, patient.score) for patient in result] == (
+                _brute_force(index, profiles, match_params)
+            )
+
+
+    def test__deadline(self, index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1, 2, 3])
+
+        # Call and Assert
+        with pytest.raises(errors.MatchingDeadlineExceeded):
+            index.search(match_params, deadline=time.monotonic() - 1)
+        assert index.search(match_params, deadline=time.monotonic() + 60)
+
+
+class TestUpdate:
+    def test__upsert(self, index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[5, 6])
+
+        # Call
+        index.upsert([_profile(4, {1})])
+
+        # Assert
+        assert index.search(match_params) == []
+        assert len(index) == 4
+
+    def test__remove(self, index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1, 2, 3])
+
+        # Call
+        index.remove([1, 100])
+
+        # Assert
+        assert [patient.patient_id for patient in index.search(match_params)] == [2]
+
+
+class TestMinHashIndex:
+    @pytest.fixture(scope='function')
+    def minhash_index(self) -> MinHashPatientSimilarityIndex:
+        index = MinHashPatientSimilarityIndex(bands=16, rows=2)
+        index.rebuild([
+            _profile(1, {1, 2, 3}, {1}),
+            _profile(2, {1, 2}, {2}),
+            _profile(3, {4}, {1}),
+        ])
+        return index
+
+    def test__identical_symptoms_are_found(self, minhash_index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[1, 2, 3], diagnosis_id=1)
+
+        # Call
+        result = minhash_index.search(match_params)
+
+        # Assert
+        assert result[0].patient_id == 1
+        assert result[0].score == 1.0
+
+    def test__diagnosis_only_patients_are_not_candidates(self, minhash_index):
+        # Setup
+        match_params = schemas.MatchPatients(symptom_ids=[100], diagnosis_id=1)
+
+        # Call
+        result = minhash_index.search(match_params)
+
+        # Assert
+        assert result == []
+
+    def test__upsert_and_remove_keep_buckets(self, minhash_index):
+        # Call
+        minhash_index.upsert([_profile(1, {7, 8})])
+        minhash_index.remove([2])
+
+        # Assert
+        assert [patient.patient_id for patient in minhash_index.search(
+            schemas.MatchPatients(symptom_ids=[7, 8])
+        )] == [1]
+        assert minhash_index.search(schemas.MatchPatients(symptom_ids=[1, 2])) == []
+        assert all(
+            patient_ids <= {1, 3}
+            for bucket in minhash_index._buckets
+            for patient_ids in bucket.values()
+        )
+
+    def test__recall_against_exact_index(self):
+        # Setup
+        random_ = random.Random(0)
+        profiles = [
+            _profile(patient_id,
+                     set(random_.sample(range(1, 30), random_.randint(1, 6))))
+            for patient_id in range(1, 500)
+        ]
+        exact_index = ExactPatientSimilarityIndex()
+        exact_index.rebuild(profiles)
+        minhash_index = MinHashPatientSimilarityIndex(bands=64, rows=1)
+        minhash_index.rebuild(profiles)
+        queries = [
+            schemas.MatchPatients(symptom_ids=list(profile.symptom_ids), limit=5)
+            for profile in random_.sample(profiles, 30)
+        ]
+
+        # Call
+        hits = total = 0
+        for match_params in queries:
+            expected = {patient.patient_id for patient in exact_index.search(match_params)}
+            found = {patient.patient_id for patient in minhash_index.search(match_params)}
+            hits += len(expected & found)
+            total += len(expected)
+
+        # Assert
+        assert hits / total >= 0.9
@@ -0,0 +1,194 @@
+import math
+import random
+
+import pytest
+
+from med_sharing_system.application import entities, errors, schemas
+from med_sharing_system.application.utils import ItemRecommendationIndex
+
+
+# ---------------------------------------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------------------------------------
+def _outcome(med_book_id: int,
+             symptom_ids: set[int],
+             diagnosis_id: int | None,
+             *item_outcomes: tuple[int, bool, float]
+             ) -> entities.TreatmentOutcome:
+    return entities.TreatmentOutcome(
+        med_book_id=med_book_id,
+        diagnosis_id=diagnosis_id,
+        symptom_ids=frozenset(symptom_ids),
+        item_outcomes=tuple(
+            entities.ItemOutcome(item_id=item_id, is_helped=is_helped,
+                                 item_rating=item_rating)
+            for item_id, is_helped, item_rating in item_outcomes
+        )
+    )
+
+
+OUTCOMES: list[entities.TreatmentOutcome] = [
+    _outcome(1, {1, 2}, 1, (10, True, 9), (20, False, 3)),
+    _outcome(2, {1, 2}, 1, (10, True, 8)),
+    _outcome(3, {1}, 2, (20, True, 7)),
+    _outcome(4, {3}, 3, (30, True, 10), (20, False, 2)),
+    _outcome(5, {4}, 1),
+    _outcome(6, {5}, None, (40, True, 10)),
+]
+
+
+@pytest.fixture(scope='function')
+def index() -> ItemRecommendationIndex:
+    index = ItemRecommendationIndex()
+    index.rebuild(OUTCOMES)
+    return index
+
+
+def _brute_force(index: ItemRecommendationIndex,
+                 outcomes: list[entities.TreatmentOutcome],
+                 params: schemas.RecommendTreatmentItems
+                 ) -> list[tuple[int, float]]:
+    """
+    Оценивает товары по определению сходства, перебирая все карты.
+    """
+    frequencies: dict[int, int] = {}
+    for outcome in outcomes:
+        for symptom_id in outcome.symptom_ids:
+            frequencies[symptom_id] = frequencies.get(symptom_id, 0) + 1
+
+    def weight(symptom_id: int) -> float:
+        return math.log((1 + len(outcomes)) / (1 + frequencies.get(symptom_id, 0))) + 1
+
+    query = set(params.symptom_ids or ())
+    query_weight = sum(weight(symptom_id) for symptom_id in query)
+    max_score = ((index.symptoms_weight if query else 0)
+                 + (index.diagnosis_weight if params.diagnosis_id else 0))
+
+    reviews_count = sum(len(outcome.item_outcomes) for outcome in outcomes)
+    prior = sum(item.is_helped for outcome in outcomes
+                for item in outcome.item_outcomes) / reviews_count
+
+    stats: dict[int, list[float]] = {}
+    for outcome in outcomes:
+        similarity = 0.0
+        if query and outcome.symptom_ids:
+            similarity += (index.symptoms_weight
+                           * sum(weight(symptom_id)
+                                 for symptom_id in query & outcome.symptom_ids)
+                           / sum(weight(symptom_id) for symptom_id in outcome.symptom_ids)
+                           / query_weight)
+        if params.diagnosis_id and outcome.diagnosis_id == params.diagnosis_id:
+            similarity += index.diagnosis_weight
+        if not similarity:
+            continue
+
+        for item in outcome.item_outcomes:
+            item_stats = stats.setdefault(item.item_id, [0.0, 0.0, 0.0])
+            item_stats[0] += similarity / max_score
+            item_stats[1] += similarity / max_score * item.is_helped
+            item_stats[2] += similarity / max_score * item.item_rating
+
+    scored = []
+    for item_id, (reviews, helped, rating_sum) in stats.items():
+        helped_ratio = ((helped + index.prior_strength * prior)
+                        / (reviews + index.prior_strength))
+        score = (index.helped_weight * helped_ratio
+                 + index.rating_weight * rating_sum / reviews / 10)
+        scored.append((item_id, score))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:params.limit]
+
+
+# ---------------------------------------------------------------------------------------
+# TESTS
+# ---------------------------------------------------------------------------------------
+class TestRecommend:
+    def test__ranks_items_of_similar_books(self, index):
+        # Call
+        result = index.recommend(
+            schemas.RecommendTreatmentItems(diagnosis_id=1, symptom_ids=[1, 2])
+        )
+
+        # Assert
+        # Товар 30 известен только по карте без общих признаков с профилем
+        assert [item.item_id for item in result] == [10, 20]
+        assert result[0].avg_rating == 8.5
+        assert result[0].support > result[1].support > 0
+
+    def test__diagnosis_only(self, index):
+        # Call
+        result = index.recommend(schemas.RecommendTreatmentItems(diagnosis_id=2))
+
+        # Assert
+        assert [item.item_id for item in result] == [20]
+        assert result[0].support == 1
+
+    def test__unknown_profile(self, index):
+        # Call
+        result = index.recommend(
+            schemas.RecommendTreatmentItems(diagnosis_id=100, symptom_ids=[100])
+        )
+
+        # Assert
+        assert result == []
+
+    def test__limit(self, index):
+        # Call
+        result = index.recommend(
+            schemas.RecommendTreatmentItems(symptom_ids=[1], limit=1)
+        )
+
+        # Assert
+        assert [item.item_id for item in result] == [10]
+
+    def test__same_result_as_brute_force(self):
+        # Setup
+        rnd = random.Random(7)
+        outcomes = [
+            _outcome(med_book_id,
+                     set(rnd.sample(range(1, 16), rnd.randint(1, 4))),
+                     rnd.choice([None, *range(1, 6)]),
+                     *[(rnd.randint(1, 30), rnd.random() < 0.6, rnd.randint(1, 10))
+                       for _ in range(rnd.randint(0, 3))])
+            for med_book_id in range(1, 301)
+        ]
+        index = ItemRecommendationIndex()
+        index.rebuild(outcomes)
+
+        for _ in range(50):
+            params = schemas.RecommendTreatmentItems(
+                diagnosis_id=rnd.choice([None, rnd.randint(1, 5)]),
+                symptom_ids=rnd.sample(range(1, 18), rnd.randint(1, 4)),
+                limit=rnd.randint(1, 20)
+            )
+
+            # Call
+            result = index.recommend(params)
+
+            # Assert
+            expected = _brute_force(index, outcomes, params)
+            assert [item.item_id for item in result] == [
+                item_id for item_id, _ in expected
+            ]
+            assert [item.score for item in result] == pytest.approx(
+                [score for _, score in expected], abs=1e-6
+            )
+
+
+class TestRebuild:
+    def test__replaces_previous_data(self, index):
+        # Call
+        index.rebuild([_outcome(1, {1}, 1, (40, True, 10))])
+
+        # Assert
+        assert len(index) == 1
+        assert [item.item_id for item in index.recommend(
+            schemas.RecommendTreatmentItems(symptom_ids=[1])
+        )] == [40]
+
+
+class TestSchema:
+    def test__empty_profile(self):
+        # Call
+        with pytest.raises(errors.EmptyTreatmentProfile):
+            schemas.RecommendTreatmentItems(symptom_ids=[])
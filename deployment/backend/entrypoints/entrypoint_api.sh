@@ -61,5 +61,5 @@ if [[ $MED_API_ASYNC_MODE == 'TRUE' && $MED_API_PRELOAD_MODE == 'TRUE' ]]; then
 elif [[ $MED_API_ASYNC_MODE == 'TRUE' ]]; then
   gunicorn -k 'gevent' -w "${MED_API_WORKER_COUNT}" med_sharing_system.launchers.api_with_rabbitmq:app --config "med_sharing_system/launchers/gevent_settings/api_gevent_config.py"
 else
-  gunicorn med_sharing_system.launchers.api:app
+  gunicorn med_sharing_system.launchers.api:app --config "med_sharing_system/launchers/api_gunicorn_config.py"
 fi
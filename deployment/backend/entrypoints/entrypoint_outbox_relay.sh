@@ -0,0 +1,6 @@
+#!/usr/bin/env bash
+
+set -e
+
+echo "Starting outbox relay..."
+python -m med_sharing_system.launchers.outbox_relay
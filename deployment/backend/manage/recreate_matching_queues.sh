@@ -0,0 +1,42 @@
+#!/usr/bin/env bash
+
+# Очереди подбора объявляются с ограничением длины и `x-overflow: reject-publish`.
+# Если на брокере они уже существуют с другими аргументами, объявление
+# завершается ошибкой PRECONDITION_FAILED. Скрипт останавливает сервисы,
+# объявляющие схему брокера, удаляет очереди подбора и запускает сервисы
+# снова - они объявят очереди заново. Сообщения в удаляемых очередях теряются.
+
+set -e
+
+cd ../..
+
+set -a
+source "$PWD"/components/backend/.env
+cd deployment/backend
+set +a
+
+case "$1" in
+--dev)
+  export COMPOSE_PROJECT_NAME=clean-architecture-dev
+  COMPOSE_FILE=docker-compose.dev.yml
+  ;;
+*)
+  export COMPOSE_PROJECT_NAME=clean-architecture
+  COMPOSE_FILE=docker-compose.prod.yml
+  ;;
+esac
+
+SERVICES="backend match_worker delivery_consumer outbox_relay"
+
+echo "The broker scheme services are stopping ..."
+# shellcheck disable=SC2086
+docker compose -f "$COMPOSE_FILE" stop $SERVICES
+
+for QUEUE in PatientSearchQueue PatientBulkSearchQueue; do
+  echo "Deleting queue ${QUEUE} ..."
+  docker compose -f "$COMPOSE_FILE" exec rabbitmq rabbitmqctl delete_queue "$QUEUE"
+done
+
+echo "The broker scheme services are starting ..."
+# shellcheck disable=SC2086
+docker compose -f "$COMPOSE_FILE" start $SERVICES